@@ -8,17 +8,33 @@
 # - Imports `importlib` to load and run scripts with prefix-numbered filenames.
 # - Each script must define a `main()` function.
 # - Progress messaging is handled inside each script's `main()`.
+# - `--engine duckdb` is passed to stages whose `main()` accepts `engine` (optional DuckDB store; default polars).
+# - `--figure-formats png,svg,...` is passed to plotting stages whose `main()` accepts `figure_formats`.
+# - `--snapshot ID` is passed to 02.0, which then rebuilds the raw files from that archived download
+#   (or `latest`) instead of fetching; the run needs no network (see utils/archive.py).
+# - `--spatial-lag` is passed to 05.0 as `include_spatial_lag` (adds the 04.2 neighbour averages to the features).
+# - `--incremental` is passed to stages whose `main()` accepts it (append new years only, reuse the saved cluster model).
+# - `--profile` wraps each stage in cProfile, tracemalloc and a stack sampler and writes per-stage
+#   .prof / .folded / .memory.txt files plus summary.json to `--profile-dir` (see utils/profiling.py).
+# - Every run gets a run ID; stage outputs are written atomically and versioned under data/artifacts/
+#   (see utils/artifacts.py). A run where every stage succeeds moves the `latest` pointer;
+#   `--restore RUN_ID` rolls the outputs back to that run's snapshot without recomputing.
 # References:
 # - [https://realpython.com/python-main-function/]
 
 #### Workplace setup ####
-import importlib.util
-from pathlib import Path
-import traceback
-
 import importlib.util  # For loading scripts dynamically
 from pathlib import Path  # For handling file paths
 import traceback  # For printing full error tracebacks
+import argparse  # For command-line options (e.g., --incremental)
+import inspect  # For checking which stages accept options
+import json  # For the profiling summary
+import os  # For sharing the run ID with stages
+from contextlib import nullcontext  # Stand-in when profiling is off
+
+from utils.artifacts import RUN_ID_VARIABLE, finish_run, new_run_id, restore
+from utils.profiling import PROFILE_DIR, StageProfile, format_summary
+from utils.warehouse import require_duckdb
 
 #### Pipeline: ordered list of Python filenames (no need for ".py") ####
 pipeline = [
@@ -26,11 +42,22 @@ pipeline = [
     "02.0-download_data",
     "03.0-clean_crime_data",
     "03.1-clean_profile_data",
+    "03.2-profile_store",
+    "03.4-smooth_rates",
     "04.0-merge_crime_profile",
+    "04.2-spatial_features",
     "05.0-eda_neighbourhood_clusters",
+    "05.1-trajectory_clusters",
+    "05.5-similarity_index",
     "06.0-table_crime_clusters",
+    "06.1-permutation_tests",
+    "06.4-forecast_crime",
+    "06.6-change_points",
+    "06.8-count_models",
     "07.0-plot_crime_clusters",
+    "07.2-dashboard_export",
     "08.0-model_evaluation",
+    "08.4-results_bundle",
 ]
 
 
@@ -48,22 +75,153 @@ def import_module_from_file(script_file: Path):
 
 
 #### Main Pipeline Execution ####
-def main():
+def main(
+    incremental=False,
+    engine="polars",
+    figure_formats=("png",),
+    rates="raw",
+    layout="wide",
+    snapshot=None,
+    include_spatial_lag=False,
+    profile=False,
+    profile_dir=PROFILE_DIR,
+):
+    # Check the optional DuckDB extra up front rather than failing in every SQL stage
+    if engine == "duckdb":
+        require_duckdb()
+
+    # One run ID for every stage (and their worker processes) via the environment
+    run_id = new_run_id()
+    os.environ[RUN_ID_VARIABLE] = run_id
+    print(f"Run ID: {run_id}")
+
+    summaries, failed = [], []
     for filename in pipeline:
         script_path = (
             Path(__file__).parent / f"{filename}.py"
         )  # Absolute path to script
         print(f"Running: {filename}.py")
 
+        # Built before the stage is loaded, so a failed import never reuses the last profile
+        profiler = StageProfile(filename, profile_dir) if profile else nullcontext()
         try:
             module = import_module_from_file(script_path)  # Load script as module
-            module.main()  # Call its main() function
+            # Call its main() function, forwarding options the stage understands
+            options = {}
+            parameters = inspect.signature(module.main).parameters
+            if "incremental" in parameters:
+                options["incremental"] = incremental
+            if "engine" in parameters:
+                options["engine"] = engine
+            if "figure_formats" in parameters:
+                options["figure_formats"] = figure_formats
+            if "rates" in parameters:
+                options["rates"] = rates
+            if "layout" in parameters:
+                options["layout"] = layout
+            if "snapshot" in parameters:
+                options["snapshot"] = snapshot
+            if "include_spatial_lag" in parameters:
+                options["include_spatial_lag"] = include_spatial_lag
+            with profiler:
+                module.main(**options)
         except Exception:
             print(f"Error occurred while running: {filename}.py")
             traceback.print_exc()
+            failed.append(filename)
+        if profile and hasattr(profiler, "summary"):
+            summaries.append(profiler.summary)
+
+    # Per-stage time, memory and spans (profiles are in profile_dir)
+    if profile:
+        print(format_summary(summaries))
+        Path(profile_dir, "summary.json").write_text(
+            json.dumps(summaries, indent=2), encoding="utf-8"
+        )
+        print(f"Profiles written to {profile_dir}/.")
+
+    # Snapshot this run's outputs; `latest` only moves when every stage succeeded
+    manifest = finish_run(run_id, complete=not failed, stages=pipeline)
+    print(
+        f"Run {run_id}: {len(manifest['written'])} outputs written"
+        + (f"; failed stages {failed}, `latest` unchanged." if failed else ".")
+    )
+    return failed
 
 
 #### Entry Point ####
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Run the Toronto crime pipeline.")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="only process newly released years and reuse the saved cluster model",
+    )
+    parser.add_argument(
+        "--engine",
+        choices=["polars", "duckdb"],
+        default="polars",
+        help="run merges and aggregations in Polars (default) or against the DuckDB store",
+    )
+    parser.add_argument(
+        "--figure-formats",
+        default="png",
+        help="comma-separated figure outputs: png, svg, pdf, webp (default: png)",
+    )
+    parser.add_argument(
+        "--rates",
+        choices=["raw", "smoothed"],
+        default="raw",
+        help="rates for the cluster tables and plots (smoothed: empirical Bayes, see 03.4)",
+    )
+    parser.add_argument(
+        "--layout",
+        choices=["wide", "compact"],
+        default="wide",
+        help="keep a compact Parquet copy of the merged table (UInt32/Float32/Enum) for 06.0",
+    )
+    parser.add_argument(
+        "--snapshot",
+        metavar="SNAPSHOT_ID",
+        default=None,
+        help="run offline on an archived raw-data snapshot (ID or `latest`) instead of downloading",
+    )
+    parser.add_argument(
+        "--spatial-lag",
+        action="store_true",
+        help="add each neighbourhood's spatially lagged SES (04.2) to the 05.0 cluster features",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="profile each stage (cProfile, tracemalloc, sampled stacks) and time its spans",
+    )
+    parser.add_argument(
+        "--profile-dir",
+        default=PROFILE_DIR,
+        help=f"where per-stage profiles are written (default: {PROFILE_DIR})",
+    )
+    parser.add_argument(
+        "--restore",
+        metavar="RUN_ID",
+        help="roll the pipeline outputs back to a previous run's snapshot and exit",
+    )
+    args = parser.parse_args()
+    if args.restore:
+        restored = restore(args.restore)
+        print(f"Restored {len(restored)} outputs from run {args.restore}.")
+        raise SystemExit(0)
+    failed = main(
+        incremental=args.incremental,
+        engine=args.engine,
+        figure_formats=tuple(args.figure_formats.split(",")),
+        rates=args.rates,
+        layout=args.layout,
+        snapshot=args.snapshot,
+        include_spatial_lag=args.spatial_lag,
+        profile=args.profile,
+        profile_dir=args.profile_dir,
+    )
+    if failed:
+        raise SystemExit(f"Pipeline finished with failed stages: {failed}")
     print("Pipeline completed successfully.")
@@ -0,0 +1,106 @@
+#### Preamble ####
+# Purpose: Tests the per-stage profiler and timing spans used by 00.0-run_pipeline.py --profile.
+# Author: Mike Cowan
+# Date: 19 May 2025
+# Contact: m.cowan@mail.utoronto.ca
+# License: MIT
+# Pre-requisites:
+# - `pytest` must be installed (pip install pytest); run with "pytest -q"
+# References:
+# - [https://docs.pytest.org/en/stable]
+
+#### Workspace setup ####
+import importlib.util  # inherent to Python
+import json  # inherent to Python
+import pstats  # inherent to Python
+import time  # inherent to Python
+from pathlib import Path  # inherent to Python
+from types import SimpleNamespace  # inherent to Python
+
+import numpy as np
+import pytest  # test functions across any .py ending with "test"
+
+from utils import profiling
+from utils.artifacts import RUN_ID_VARIABLE
+from utils.profiling import StageProfile, format_summary, span
+
+
+#### A stand-in stage with nested spans ####
+def stage():
+    with span("load"):
+        time.sleep(0.02)
+    with span("fit"):
+        with span("allocate"):
+            block = np.ones(2**20)  # 8 MiB, traced by tracemalloc
+        del block
+    with span("fit"):
+        pass
+
+
+#### Tests ####
+# Without a profile, span() hands back one shared no-op object
+def test_span_is_free_when_disabled():
+    assert profiling._active is None
+    assert span("load") is span("fit")
+    stage()  # runs unchanged
+
+
+def test_stage_profile_outputs(tmp_path):
+    with StageProfile("06.0-example", tmp_path, sample_interval=0.001) as profile:
+        stage()
+    summary = profile.summary
+    spans = summary["spans"]
+
+    assert profiling._active is None
+    assert set(spans) == {"load", "fit", "fit/allocate"}
+    assert spans["fit"]["calls"] == 2
+    assert spans["load"]["seconds"] >= 0.02
+    # Peaks propagate from the nested span to its parent and the stage
+    assert spans["fit/allocate"]["peak_mib"] >= 8
+    assert spans["fit"]["peak_mib"] >= spans["fit/allocate"]["peak_mib"]
+    assert summary["peak_mib"] >= 8
+    assert spans["load"]["peak_mib"] < 8
+
+    stats = pstats.Stats(str(tmp_path / "06.0-example.prof"))
+    assert any(func[2] == "stage" for func in stats.stats)
+    folded = (tmp_path / "06.0-example.folded").read_text().splitlines()
+    assert folded and all(line.startswith("06.0-example;") for line in folded)
+    assert any(";stage (" in line for line in folded)
+    assert (tmp_path / "06.0-example.memory.txt").exists()
+    assert "06.0-example" in format_summary([summary])
+
+
+# A failing stage still closes its profile and re-raises
+def test_stage_profile_propagates_errors(tmp_path):
+    with pytest.raises(ZeroDivisionError):
+        with StageProfile("broken", tmp_path):
+            with span("load"):
+                1 / 0
+    assert profiling._active is None
+    assert (tmp_path / "broken.prof").exists()
+
+
+# A stage that fails to load is reported once, with no profile of its own (nor the last one's)
+def test_runner_profiles_only_stages_that_ran(tmp_path, monkeypatch):
+    spec = importlib.util.spec_from_file_location(
+        "run_pipeline", Path(__file__).parent / "00.0-run_pipeline.py"
+    )
+    runner = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(runner)
+
+    def fake_import(path):
+        if path.stem.startswith("bad"):
+            raise SyntaxError(f"broken stage {path.stem}")
+        return SimpleNamespace(main=lambda: None)
+
+    monkeypatch.chdir(
+        tmp_path
+    )  # the artifact store is relative to the working directory
+    monkeypatch.delenv(RUN_ID_VARIABLE, raising=False)
+    monkeypatch.setattr(runner, "pipeline", ["bad-first", "good", "bad-later"])
+    monkeypatch.setattr(runner, "import_module_from_file", fake_import)
+    failed = runner.main(profile=True, profile_dir=tmp_path / "profiles")
+
+    assert failed == ["bad-first", "bad-later"]
+    summaries = json.loads((tmp_path / "profiles" / "summary.json").read_text())
+    assert [summary["stage"] for summary in summaries] == ["good"]
@@ -0,0 +1,154 @@
+#### Preamble ####
+# Purpose: Tests atomic, versioned artifact writes, run manifests and rollback.
+# Author: Mike Cowan
+# Date: 19 May 2025
+# Contact: m.cowan@mail.utoronto.ca
+# License: MIT
+# Pre-requisites:
+# - `polars` must be installed (pip install polars)
+# - `pytest` must be installed (pip install pytest); run with "pytest -q"
+# References:
+# - [https://docs.pytest.org/en/stable]
+
+#### Workspace setup ####
+import json  # inherent to Python
+import os  # inherent to Python
+import subprocess  # inherent to Python
+import sys  # inherent to Python
+
+import numpy as np
+import polars as pl
+import pytest  # test functions across any .py ending with "test"
+
+from utils.artifacts import (
+    LOCK_NAME,
+    file_hash,
+    finish_run,
+    latest_run,
+    new_run_id,
+    read_manifest,
+    restore,
+    write_csv,
+)
+from utils.dashboard import write_bundle
+from utils.panel import append_new_years
+
+OUTPUT = "data/02-analysis_data/05-cluster_evaluation_metrics.csv"
+
+
+#### Isolated working directory (stages write relative to the repo root) ####
+@pytest.fixture
+def root(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return "data/artifacts"
+
+
+def table(value):
+    return pl.DataFrame({"Model": ["KMeans"], "Silhouette": [value]})
+
+
+#### Tests ####
+def test_write_publishes_and_versions(root):
+    digest = write_csv(table(0.424), OUTPUT, run_id="run-1", root=root)
+    assert file_hash(OUTPUT) == digest
+    assert os.path.exists(f"{root}/objects/{digest[:2]}/{digest}")
+    assert os.path.exists(f"{root}/runs/run-1/files/{OUTPUT}")
+    assert read_manifest("run-1", root)["artifacts"][OUTPUT]["sha256"] == digest
+
+    # Same content again: no new object, file left untouched
+    mtime = os.stat(OUTPUT).st_mtime_ns
+    assert write_csv(table(0.424), OUTPUT, run_id="run-2", root=root) == digest
+    assert os.stat(OUTPUT).st_mtime_ns == mtime
+    assert len(os.listdir(f"{root}/objects")) == 1
+
+
+# A writer that fails halfway leaves the previous file and no temp files behind
+def test_failed_write_keeps_previous_output(root):
+    write_csv(table(0.424), OUTPUT, run_id="run-1", root=root)
+    before = file_hash(OUTPUT)
+
+    class Broken(pl.DataFrame):
+        def write_csv(self, path):
+            with open(path, "w") as file:
+                file.write("Model,Silh")
+            raise OSError("disk full")
+
+    with pytest.raises(OSError, match="disk full"):
+        write_csv(Broken(table(0.5)), OUTPUT, run_id="run-2", root=root)
+    assert file_hash(OUTPUT) == before
+    assert os.listdir(os.path.dirname(OUTPUT)) == [os.path.basename(OUTPUT)]
+
+
+# Manifests are complete snapshots; `latest` skips failed runs; restore rolls back
+def test_runs_latest_and_restore(root):
+    write_csv(table(0.424), OUTPUT, run_id="run-1", root=root)
+    write_csv(
+        table(1.0),
+        "data/03-table_data/assault_rate_change.csv",
+        run_id="run-1",
+        root=root,
+    )
+    finish_run("run-1", root=root)
+    assert latest_run(root) == "run-1"
+
+    write_csv(table(0.999), OUTPUT, run_id="run-2", root=root)
+    manifest = finish_run("run-2", root=root)
+    assert manifest["parent"] == "run-1"
+    assert manifest["written"] == [OUTPUT]
+    assert len(manifest["artifacts"]) == 2  # unchanged table inherited from run-1
+
+    write_csv(table(-1.0), OUTPUT, run_id="run-3", root=root)
+    assert finish_run("run-3", complete=False, root=root)["complete"] is False
+    assert latest_run(root) == "run-2"
+
+    assert restore("run-1", root=root) == [OUTPUT]
+    assert pl.read_csv(OUTPUT)["Silhouette"][0] == 0.424
+    assert restore("run-1", root=root) == []  # already matches
+    saved = json.loads(open(f"{root}/runs/run-2/manifest.json").read())
+    assert saved["artifacts"][OUTPUT]["sha256"] != file_hash(OUTPUT)
+
+
+# Stores written by helpers (panel partitions, dashboard bundle) are versioned like stage tables
+def test_stores_go_through_the_artifact_layer(root, monkeypatch):
+    monkeypatch.setenv("PIPELINE_RUN_ID", "run-1")
+    clean = pl.DataFrame(
+        {"neighbourhood": ["annex"], "assault_2024": [3], "assault_rate_2024": [1.5]}
+    )
+    append_new_years(clean, "data/02-analysis_data/11-crime_panel", ["assault"], [2024])
+    write_bundle({"crimes": ["assault"]}, {"city_mean": np.ones((1, 1))}, "dashboard")
+
+    artifacts = read_manifest("run-1", root)["artifacts"]
+    assert set(artifacts) == {
+        "data/02-analysis_data/11-crime_panel/2024.parquet",
+        "dashboard/bundle.bin",
+        "dashboard/bundle.json",
+    }
+    for path, entry in artifacts.items():
+        assert file_hash(path) == entry["sha256"]
+
+
+# One run per workspace: a live holder blocks a second run, a dead one's lock is taken over,
+# and finish_run releases the lock
+def test_run_lock(root):
+    lock = f"{root}/{LOCK_NAME}"
+    os.makedirs(root)
+    with open(lock, "w", encoding="utf-8") as handle:
+        json.dump({"run_id": "other", "pid": os.getppid()}, handle)
+    with pytest.raises(RuntimeError, match="concurrent runs"):
+        new_run_id(root)
+
+    exited = subprocess.run(
+        [sys.executable, "-c", "import os; print(os.getpid())"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    with open(lock, "w", encoding="utf-8") as handle:
+        json.dump({"run_id": "other", "pid": int(exited.stdout)}, handle)
+    run_id = new_run_id(root)
+    with open(lock, encoding="utf-8") as handle:
+        assert json.load(handle) == {"run_id": run_id, "pid": os.getpid()}
+    assert os.listdir(root) == [LOCK_NAME]  # no temp files left
+
+    finish_run(run_id, root=root)
+    assert not os.path.exists(lock)
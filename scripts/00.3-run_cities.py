@@ -0,0 +1,88 @@
+#### Preamble ####
+# Purpose: Runs the full pipeline for several cities concurrently, each from its config/cities/<city>.toml.
+# Author: Mike Cowan
+# Date: 19 May 2025
+# Contact: m.cowan@mail.utoronto.ca
+# License: MIT
+# Pre-requisites:
+# - Everything 00.0-run_pipeline.py needs; one config file per city (see utils/config.py)
+# - Toronto runs in the repo root; other cities in their `workspace` (default cities/<name>/),
+#   each with its own data/, artifact store and pipeline.log (see utils/cities.py)
+# Usage:
+# - python scripts/00.3-run_cities.py --cities toronto,<city> --jobs 2 [--incremental ...]
+# References:
+# - [https://docs.python.org/3/library/concurrent.futures.html#processpoolexecutor]
+
+#### Workspace setup ####
+import argparse  # inherent to Python
+
+from utils.cities import run_cities
+from utils.config import available_cities
+
+
+#### MAIN FUNCTION ####
+def main(
+    cities=None,
+    jobs=None,
+    incremental=False,
+    engine="polars",
+    figure_formats=("png",),
+    rates="raw",
+    layout="wide",
+):
+    cities = available_cities() if cities is None else list(cities)
+    print(f"Running the pipeline for {len(cities)} cities: {', '.join(cities)}.")
+
+    #### 00.3-run_cities.py ####
+    #### Run every city (one pool; stage options as in 00.0) ####
+    results = run_cities(
+        cities,
+        jobs=jobs,
+        options={
+            "incremental": incremental,
+            "engine": engine,
+            "figure_formats": figure_formats,
+            "rates": rates,
+            "layout": layout,
+        },
+    )
+
+    #### Summary ####
+    for result in results:
+        status = "ok" if not result["failed"] else f"failed: {result['failed']}"
+        print(f"{result['city']:<20} {status:<40} log: {result['log']}")
+    return [result["city"] for result in results if result["failed"]]
+
+
+#### ENTRY POINT ####
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the pipeline for many cities.")
+    parser.add_argument(
+        "--cities",
+        default=None,
+        help="comma-separated city configs to run (default: every file in config/cities/)",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=None,
+        help="cities run at once (default: all of them, up to the core count)",
+    )
+    parser.add_argument("--incremental", action="store_true")
+    parser.add_argument("--engine", choices=["polars", "duckdb"], default="polars")
+    parser.add_argument("--figure-formats", default="png")
+    parser.add_argument("--rates", choices=["raw", "smoothed"], default="raw")
+    parser.add_argument("--layout", choices=["wide", "compact"], default="wide")
+    args = parser.parse_args()
+    failed = main(
+        cities=args.cities.split(",") if args.cities else None,
+        jobs=args.jobs,
+        incremental=args.incremental,
+        engine=args.engine,
+        figure_formats=tuple(args.figure_formats.split(",")),
+        rates=args.rates,
+        layout=args.layout,
+    )
+    if failed:
+        raise SystemExit(f"Cities with failed stages: {failed}")
+    print("All cities completed successfully.")
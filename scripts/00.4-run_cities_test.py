@@ -0,0 +1,158 @@
+#### Preamble ####
+# Purpose: Tests the per-city config and the multi-city driver (workspaces, shared caches, one process per city).
+# Author: Mike Cowan
+# Date: 19 May 2025
+# Contact: m.cowan@mail.utoronto.ca
+# License: MIT
+# Pre-requisites:
+# - `pytest` must be installed (pip install pytest); run with "pytest -q"
+# References:
+# - [https://docs.pytest.org/en/stable]
+
+#### Workspace setup ####
+import json  # inherent to Python
+
+import pytest  # test functions across any .py ending with "test"
+
+from utils.cities import prepare_workspace, run_cities
+from utils.config import (
+    analyzed_crimes,
+    available_cities,
+    load_city,
+    profile_vintages,
+)
+from utils.profile_store import VINTAGES
+
+
+# A stand-in for 00.0: records what each city's process saw, fails for one city
+FAKE_RUNNER = """
+import os
+from pathlib import Path
+
+from utils.config import load_city
+
+
+def main(layout="wide"):
+    city = load_city()
+    Path("data/02-analysis_data/seen.json").write_text(
+        f'{{"name": "{city["name"]}", "n_areas": {city["n_areas"]}, '
+        f'"cwd": "{Path.cwd()}", "jobs": "{os.environ["PIPELINE_JOBS"]}", '
+        f'"layout": "{layout}", "pid": {os.getpid()}}}'
+    )
+    print("stage output goes to the log")
+    return ["05.0-eda_neighbourhood_clusters"] if city["name"] == "halifax" else []
+"""
+
+
+#### Test data ####
+@pytest.fixture
+def config_dir(tmp_path):
+    directory = tmp_path / "config"
+    directory.mkdir()
+    for name, n_areas in [("ottawa", 111), ("halifax", 51)]:
+        (directory / f"{name}.toml").write_text(
+            f"""
+name = "{name}"
+title = "{name.title()}"
+n_areas = {n_areas}
+area_column = "AREA_NAME"
+
+[portal]
+base_url = "https://open.example.ca"
+
+[crime]
+types = ["assault", "robbery"]
+
+[profiles.2021.crosswalk]
+median_income = ["Median total income of household in 2020 ($)", "last"]
+""",
+            encoding="utf-8",
+        )
+    return directory
+
+
+#### Tests ####
+# Toronto's config reproduces the constants the scripts used to hard-code
+def test_toronto_config():
+    toronto = load_city("toronto")
+    assert "toronto" in available_cities()
+    assert toronto["n_areas"] == 158
+    assert toronto["workspace"] == "."
+    assert toronto["portal"]["packages"]["crime"]["id"] == "neighbourhood-crime-rates"
+    assert toronto["crime"]["types"] == [
+        "assault",
+        "breakenter",
+        "homicide",
+        "robbery",
+        "shooting",
+    ]
+    assert analyzed_crimes(toronto) == ["assault", "breakenter", "robbery", "shooting"]
+    assert VINTAGES == profile_vintages(toronto)
+    assert VINTAGES[2021]["crosswalk"]["unemployment_rate"] == (
+        "Unemployment rate",
+        "last",
+    )
+
+
+# Without [crime] analyzed every published crime is analyzed; unknown crimes are rejected
+def test_analyzed_crimes(config_dir):
+    ottawa = load_city("ottawa", config_dir)
+    assert analyzed_crimes(ottawa) == ["assault", "robbery"]
+    bad = {**ottawa, "crime": {**ottawa["crime"], "analyzed": ["assault", "arson"]}}
+    with pytest.raises(ValueError, match="arson"):
+        analyzed_crimes(bad)
+
+
+def test_config_errors(config_dir):
+    assert load_city("ottawa", config_dir)["workspace"] == "cities/ottawa"
+    with pytest.raises(FileNotFoundError, match="ottawa"):
+        load_city("montreal", config_dir)
+    (config_dir / "broken.toml").write_text('name = "broken"\n', encoding="utf-8")
+    with pytest.raises(KeyError, match="n_areas"):
+        load_city("broken", config_dir)
+
+
+# Workspaces get the standard tree; content-keyed caches are links to the shared ones
+def test_prepare_workspace(config_dir, tmp_path):
+    workspace = prepare_workspace(load_city("ottawa", config_dir), tmp_path)
+    assert workspace == tmp_path / "cities" / "ottawa"
+    assert (workspace / "data" / "01-raw_data").is_dir()
+    link = workspace / "data" / "cache" / "features"
+    assert link.is_symlink()
+    assert link.resolve() == tmp_path / "data" / "cache" / "features"
+    assert prepare_workspace(load_city("ottawa", config_dir), tmp_path) == workspace
+
+
+# Every city runs in its own process and workspace with its own config; a failed city is reported
+def test_run_cities(config_dir, tmp_path):
+    runner = tmp_path / "runner.py"
+    runner.write_text(FAKE_RUNNER, encoding="utf-8")
+    results = run_cities(
+        ["ottawa", "halifax"],
+        jobs=2,
+        options={"layout": "compact"},
+        config_dir=config_dir,
+        root=tmp_path,
+        runner_path=runner,
+    )
+    assert [result["city"] for result in results] == ["ottawa", "halifax"]
+    assert results[0]["failed"] == []
+    assert results[1]["failed"] == ["05.0-eda_neighbourhood_clusters"]
+
+    seen = {
+        name: json.loads(
+            (
+                tmp_path / "cities" / name / "data" / "02-analysis_data" / "seen.json"
+            ).read_text(encoding="utf-8")
+        )
+        for name in ["ottawa", "halifax"]
+    }
+    assert seen["ottawa"]["n_areas"] == 111
+    assert seen["halifax"]["n_areas"] == 51
+    assert seen["ottawa"]["cwd"].endswith("cities/ottawa")
+    assert seen["ottawa"]["layout"] == "compact"
+    assert seen["ottawa"]["pid"] != seen["halifax"]["pid"]
+    assert int(seen["ottawa"]["jobs"]) >= 1
+    assert "stage output" in (
+        tmp_path / "cities" / "ottawa" / "pipeline.log"
+    ).read_text(encoding="utf-8")
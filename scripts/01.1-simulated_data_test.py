@@ -1,5 +1,5 @@
 #### Preamble ####
-# Purpose: Tests the merged neighbourhood crime and Census profile data.
+# Purpose: Tests the structure of the simulated data (utils/synthetic.py, as written by 01.0).
 # Author: Mike Cowan
 # Date: 19 May 2025
 # Contact: m.cowan@mail.utoronto.ca
@@ -16,17 +16,20 @@ import pytest  # test functions across any .py ending with "test"
 
 
 #### Test data ####
-# Test if data loads correctly (uses fixture function to try to read simulate_ data.csv)
-@pytest.fixture
-def sim_data():
-    return pl.read_csv("data/00-simulated_data/simulated_data.csv")
+# Simulated in memory once per session at the configured scale (synthetic_city in conftest.py)
+@pytest.fixture(scope="session")
+def sim_data(synthetic_city):
+    return synthetic_city["simulated"]
 
 
-# Check that there are actually 158 rows (neighbourhoods in Toronto; height in polars)
+# Check that there is one row per neighbourhood (158 in Toronto by default; height in polars)
 # [https://docs.pola.rs/api/python/stable/reference/dataframe/api/polars.DataFrame.height.html]
-def test_row_count(sim_data):
+def test_row_count(sim_data, synthetic_city):
     # assert = if the condition is not met, raise an error with the message (from the f-string literal)
-    assert sim_data.height == 158, f"Expected 158 rows, found {sim_data.height}"
+    n_areas = synthetic_city["n_areas"]
+    assert (
+        sim_data.height == n_areas
+    ), f"Expected {n_areas} rows, found {sim_data.height}"
 
 
 # Check how many columns (width in polars)
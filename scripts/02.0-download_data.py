@@ -1,67 +1,65 @@
 #### Preamble ####
-# Purpose: Downloads and saves Toronto neighbourhood profile and crime data from Open Data Toronto's CKAN
+# Purpose: Downloads a city's neighbourhood profile, crime and boundary data from its open data portal's CKAN (Toronto by default) into the raw-data archive, then checks the snapshot out to data/01-raw_data/
 # Author: Mike Cowan
 # Date: 19 May 2025
 # Contact: m.cowan@mail.utoronto.ca
 # License: MIT
 # Pre-requisites:
 # - `requests` must be installed (pip install requests)
+# - The portal, package IDs and output paths come from config/cities/<city>.toml ([portal]; see utils/config.py)
+# - With `snapshot="<id>"` (or `--snapshot <id>`, `latest` for the newest), nothing is downloaded: the
+#   raw files are rebuilt from that archived snapshot (see utils/archive.py)
 
 #### Workspace setup ####
+import argparse  # inherent to Python
+import os  # inherent to Python
+
 import requests
 
+from utils.archive import SNAPSHOT_VARIABLE, checkout, fetch_snapshot, read_snapshot
+from utils.config import load_city
+
 
 #### MAIN FUNCTION ####
-def main():
-    print("Downloading datasets.")
+def main(snapshot=None):
+    city = load_city()
+    snapshot = os.environ.get(SNAPSHOT_VARIABLE) if snapshot is None else snapshot
 
     #### 02.0-download_data.py ####
+    #### Pinned snapshot: rebuild the raw files offline ####
+    if snapshot is not None:
+        manifest = read_snapshot(snapshot)
+        written = checkout(manifest["snapshot_id"])
+        print(
+            f"Raw data checked out from snapshot {manifest['snapshot_id']} "
+            f"({len(written)} of {len(manifest['resources'])} files changed)."
+        )
+        return
+
     #### Download data ####
+    print(f"Downloading datasets for {city['title']}.")
     # Toronto Open Data is stored in a CKAN instance. It's APIs are documented here:
     # [https://docs.ckan.org/en/latest/api/]
+    # Datasets are called "packages". Each package can contain many "resources"; the package
+    # metadata comes from <base_url>/api/3/action/package_show?id=<package>. Every resource body
+    # is stored once in data/archive/ (content-addressed) and recorded in a new snapshot with its
+    # CKAN metadata and fetch time; the raw files are only replaced once the whole download is in.
+    with requests.Session() as session:  # one session, so connections are reused
+        snapshot_id = fetch_snapshot(city, session)
 
-    # To hit our API, you'll be making requests to:
-    base_url = "https://ckan0.cf.opendata.inter.prod-toronto.ca"
-
-    # Datasets are called "packages". Each package can contain many "resources"
-    # To retrieve the metadata for this package and its resources, use the package name in this page's URL:
-    url = base_url + "/api/3/action/package_show"
-
-    # Crime package
-    params_crime = {"id": "neighbourhood-crime-rates"}
-    package_crime = requests.get(url, params=params_crime).json()
-
-    # Profile package
-    params_profile = {"id": "neighbourhood-profiles"}
-    package_profile = requests.get(url, params=params_profile).json()
-
-    # To get resource data for crime:
-    for c_idx, c_resource in enumerate(package_crime["result"]["resources"]):
-        # for datastore_active resources:
-        if c_resource["datastore_active"]:
-            # To get all records in CSV format:
-            c_url = base_url + "/datastore/dump/" + c_resource["id"]
-            c_resource_dump_data = requests.get(c_url).text
-            #### Save string data to CSV file ####
-            # [https://docs.python.org/3/library/functions.html#open]
-            with open(
-                "data/01-raw_data/neighbourhood_crime.csv", "w", encoding="utf-8"
-            ) as f:
-                f.write(c_resource_dump_data)
-
-    # To get resource data for profiles:
-    for p_idx, p_resource in enumerate(package_profile["result"]["resources"]):
-        # To get all records in XLSX format:
-        if p_resource.get("format", "").lower() == "xlsx":
-            p_url = p_resource["url"]
-            p_resource_dump_data = requests.get(p_url).content
-            #### Save bytes data to XLSX file ####
-            # [https://docs.python.org/3/library/functions.html#open]
-            with open("data/01-raw_data/neighbourhood_profiles.xlsx", "wb") as f:
-                f.write(p_resource_dump_data)
+    #### Save data ####
+    written = checkout(snapshot_id)
+    print(f"Snapshot {snapshot_id}: {len(written)} raw files changed.")
 
 
 #### ENTRY POINT ####
 if __name__ == "__main__":
-    main()
-    print("Data downloaded successfully.")
+    parser = argparse.ArgumentParser(description="Download (or check out) raw data")
+    parser.add_argument(
+        "--snapshot",
+        default=None,
+        help="rebuild data/01-raw_data/ from an archived snapshot ID (or `latest`) offline",
+    )
+    args = parser.parse_args()
+    main(snapshot=args.snapshot)
+    print("Raw data ready.")
@@ -0,0 +1,78 @@
+#### Preamble ####
+# Purpose: Lists, compares, checks out and adopts raw-data snapshots in the local archive (data/archive/).
+# Author: Mike Cowan
+# Date: 19 May 2025
+# Contact: m.cowan@mail.utoronto.ca
+# License: MIT
+# Pre-requisites:
+# - `polars` must be installed (pip install polars); no network access is needed
+# Usage:
+# - python scripts/02.1-raw_archive.py                      (list snapshots and archive size)
+# - python scripts/02.1-raw_archive.py --diff OLD NEW       (what a release revised; `latest` works)
+# - python scripts/02.1-raw_archive.py --checkout ID        (rebuild data/01-raw_data/ from ID)
+# - python scripts/02.1-raw_archive.py --adopt              (archive the raw files on disk now)
+# References:
+# - [https://docs.pola.rs/api/python/stable/reference/config.html]
+
+#### Workspace setup ####
+import argparse  # inherent to Python
+from pathlib import Path  # inherent to Python
+
+import polars as pl
+
+from utils.archive import (
+    adopt_files,
+    archive_usage,
+    checkout,
+    diff_snapshots,
+    list_snapshots,
+)
+from utils.config import load_city
+
+
+#### MAIN FUNCTION ####
+def main(diff=None, checkout_id=None, adopt=False):
+    #### 02.1-raw_archive.py ####
+    city = load_city()
+
+    #### Adopt the raw files on disk as a snapshot ####
+    if adopt:
+        paths = [
+            package["path"]
+            for package in city["portal"]["packages"].values()
+            if Path(package["path"]).exists()
+        ]
+        snapshot_id = adopt_files(paths, city["name"])
+        print(f"Archived {len(paths)} raw files as snapshot {snapshot_id}.")
+
+    #### Check out a snapshot (offline) ####
+    if checkout_id is not None:
+        written = checkout(checkout_id)
+        print(f"Checked out {checkout_id}: {len(written)} raw files changed.")
+
+    #### Compare two snapshots ####
+    with pl.Config(tbl_rows=-1, tbl_width_chars=160, fmt_str_lengths=60):
+        if diff is not None:
+            print(diff_snapshots(*diff))
+            return
+
+        #### List snapshots ####
+        print(list_snapshots())
+    usage = archive_usage()
+    print(
+        f"{usage['snapshots']} snapshots, {usage['objects']} objects: "
+        f"{usage['logical_bytes'] / 2**20:.1f} MiB of raw files stored in "
+        f"{usage['stored_bytes'] / 2**20:.1f} MiB."
+    )
+
+
+#### ENTRY POINT ####
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Raw-data snapshot archive")
+    parser.add_argument("--diff", nargs=2, metavar=("OLD", "NEW"), default=None)
+    parser.add_argument("--checkout", metavar="SNAPSHOT_ID", default=None)
+    parser.add_argument(
+        "--adopt", action="store_true", help="archive the current raw files"
+    )
+    args = parser.parse_args()
+    main(diff=args.diff, checkout_id=args.checkout, adopt=args.adopt)
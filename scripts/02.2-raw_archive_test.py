@@ -0,0 +1,174 @@
+#### Preamble ####
+# Purpose: Tests the raw-data archive (deduplicated compressed objects, consistent snapshots, offline checkout, release diffs).
+# Author: Mike Cowan
+# Date: 19 May 2025
+# Contact: m.cowan@mail.utoronto.ca
+# License: MIT
+# Pre-requisites:
+# - `polars` must be installed (pip install polars)
+# - `pytest` must be installed (pip install pytest); run with "pytest -q"
+# References:
+# - [https://docs.pytest.org/en/stable]
+
+#### Workspace setup ####
+from pathlib import Path  # inherent to Python
+
+import pytest  # test functions across any .py ending with "test"
+
+from utils.archive import (
+    archive_usage,
+    checkout,
+    diff_snapshots,
+    fetch_snapshot,
+    list_snapshots,
+    read_snapshot,
+)
+
+CITY = {
+    "name": "example",
+    "portal": {
+        "base_url": "https://open.example.ca",
+        "packages": {
+            "crime": {
+                "id": "crime-rates",
+                "format": "datastore",
+                "path": "data/01-raw_data/crime.csv",
+            },
+            "boundaries": {
+                "id": "areas",
+                "format": "geojson",
+                "path": "data/01-raw_data/areas.geojson",
+                "first": True,
+            },
+        },
+    },
+}
+
+
+#### Test data ####
+# A stand-in for requests.Session serving a small CKAN portal; `bodies` can be revised
+class FakeResponse:
+    def __init__(self, content=b"", payload=None, status=200):
+        self.content, self.payload, self.status = content, payload, status
+
+    def json(self):
+        return self.payload
+
+    def raise_for_status(self):
+        if self.status != 200:
+            raise RuntimeError(f"HTTP {self.status}")
+
+
+class FakePortal:
+    def __init__(self):
+        self.bodies = {
+            "https://open.example.ca/datastore/dump/r1": b"AREA_NAME,ASSAULT_2024\nannex,120\n"
+            * 200,
+            "https://open.example.ca/files/areas.geojson": b'{"type": "FeatureCollection"}',
+            "https://open.example.ca/files/areas-utm.geojson": b'{"crs": "utm"}',
+        }
+        self.requests = 0
+
+    def get(self, url, params=None):
+        self.requests += 1
+        if url.endswith("package_show"):
+            resources = {
+                "crime-rates": [
+                    {"id": "r1", "datastore_active": True, "format": "CSV"},
+                    {"id": "r0", "datastore_active": False, "format": "XLSX"},
+                ],
+                "areas": [
+                    {
+                        "id": "b1",
+                        "format": "GeoJSON",
+                        "url": "https://open.example.ca/files/areas.geojson",
+                        "last_modified": "2025-01-01",
+                    },
+                    {
+                        "id": "b2",
+                        "format": "GeoJSON",
+                        "url": "https://open.example.ca/files/areas-utm.geojson",
+                    },
+                ],
+            }[params["id"]]
+            return FakeResponse(payload={"result": {"resources": resources}})
+        if url not in self.bodies:
+            return FakeResponse(status=404)
+        return FakeResponse(content=self.bodies[url])
+
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # raw paths are relative, as in the pipeline
+    return tmp_path
+
+
+#### Tests ####
+# One snapshot per download; unchanged bodies are stored once, compressed
+def test_fetch_dedup_and_metadata(workspace):
+    portal, root = FakePortal(), workspace / "archive"
+    first = fetch_snapshot(CITY, portal, root)
+    second = fetch_snapshot(CITY, portal, root)
+    assert first != second
+
+    manifest = read_snapshot(first, root)
+    assert set(manifest["resources"]) == {
+        "data/01-raw_data/crime.csv",
+        "data/01-raw_data/areas.geojson",
+    }
+    boundary = manifest["resources"]["data/01-raw_data/areas.geojson"]
+    assert boundary["url"].endswith("/areas.geojson")  # first GeoJSON only
+    assert boundary["resource"]["last_modified"] == "2025-01-01"
+    assert "fetched" in boundary
+
+    usage = archive_usage(root)
+    assert usage["snapshots"] == 2 and usage["objects"] == 2
+    assert usage["stored_bytes"] < usage["logical_bytes"] / 2
+    assert read_snapshot("latest", root)["snapshot_id"] == second
+
+
+# Checkout rebuilds the raw files with no portal at all, and skips files already in place
+def test_offline_checkout(workspace):
+    portal, root = FakePortal(), workspace / "archive"
+    snapshot_id = fetch_snapshot(CITY, portal, root)
+    assert not Path(
+        "data/01-raw_data/crime.csv"
+    ).exists()  # fetch alone never touches raw files
+
+    assert len(checkout(snapshot_id, root)) == 2
+    body = portal.bodies["https://open.example.ca/datastore/dump/r1"]
+    assert Path("data/01-raw_data/crime.csv").read_bytes() == body
+    assert checkout(snapshot_id, root) == []
+    with pytest.raises(FileNotFoundError):
+        checkout("19990101T000000000000-deadbeef", root)
+
+
+# A revised release shows up in the diff; an older snapshot can be checked out again
+def test_release_diff_and_rollback(workspace):
+    portal, root = FakePortal(), workspace / "archive"
+    old = fetch_snapshot(CITY, portal, root)
+    url = "https://open.example.ca/datastore/dump/r1"
+    portal.bodies[url] = portal.bodies[url].replace(b"120", b"121")
+    new = fetch_snapshot(CITY, portal, root)
+
+    diff = diff_snapshots(old, new, root)
+    status = dict(zip(diff["path"], diff["status"]))
+    assert status == {
+        "data/01-raw_data/areas.geojson": "unchanged",
+        "data/01-raw_data/crime.csv": "changed",
+    }
+    assert list_snapshots(root)["snapshot_id"].to_list() == sorted([old, new])
+
+    checkout(new, root)
+    assert checkout(old, root) == ["data/01-raw_data/crime.csv"]
+    assert b"120" in Path("data/01-raw_data/crime.csv").read_bytes()
+
+
+# A failed request leaves no snapshot behind
+def test_failed_fetch_writes_no_snapshot(workspace):
+    portal, root = FakePortal(), workspace / "archive"
+    del portal.bodies["https://open.example.ca/files/areas.geojson"]
+    with pytest.raises(RuntimeError):
+        fetch_snapshot(CITY, portal, root)
+    assert list_snapshots(root).height == 0
+    assert not (root / "latest").exists()
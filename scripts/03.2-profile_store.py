@@ -0,0 +1,102 @@
+#### Preamble ####
+# Purpose: Ingests every available Census profile vintage and harmonizes them onto the 158 neighbourhoods.
+# Author: Mike Cowan
+# Date: 19 May 2025
+# Contact: m.cowan@mail.utoronto.ca
+# License: MIT
+# Pre-requisites:
+# - `polars` must be installed (pip install polars)
+# - `numpy`, `scipy` and `matplotlib` must be installed
+# - Profile workbooks and boundary files in data/01-raw_data, one per vintage configured in
+#   config/cities/<city>.toml (the stage skips what is missing)
+# References:
+# - [https://open.toronto.ca/dataset/neighbourhood-profiles/]
+# - [https://open.toronto.ca/dataset/neighbourhoods/]
+
+#### Workspace setup ####
+import polars as pl
+import time  # inherent to Python
+from pathlib import Path  # inherent to Python
+
+from utils.artifacts import write_csv
+from utils.profile_store import (
+    CANONICAL_VARIABLES,
+    VINTAGES,
+    area_overlap,
+    ingest_vintage,
+    interpolate,
+    read_vintage,
+)
+
+
+#### MAIN FUNCTION ####
+def main():
+    print("Building the multi-vintage neighbourhood profile store.")
+
+    #### 03.2-profile_store.py ####
+    #### Ingest each vintage whose workbook is on disk ####
+    store_path = "data/02-analysis_data/12-profile_store"
+    available = [
+        v for v, spec in sorted(VINTAGES.items()) if Path(spec["path"]).exists()
+    ]
+    for vintage in available:
+        start = time.perf_counter()
+        ingested = ingest_vintage(vintage, store_path)
+        status = "ingested" if ingested else "unchanged, skipped"
+        print(f"{vintage}: {status} ({time.perf_counter() - start:.2f}s)")
+
+    #### Harmonize older vintages onto the current geography ####
+    target = max(VINTAGES)
+    target_geojson = VINTAGES[target]["geography"]
+    frames = []
+    if target in available:
+        frames.append(read_vintage(store_path, target).with_columns(vintage=target))
+
+    kinds = list(CANONICAL_VARIABLES.values())
+    for vintage in available:
+        if vintage == target:
+            continue
+        source_geojson = VINTAGES[vintage]["geography"]
+        if not (Path(source_geojson).exists() and Path(target_geojson).exists()):
+            print(f"{vintage}: boundary files missing; not harmonized.")
+            continue
+
+        # Overlap matrix is cached per (source, target) boundary pair
+        start = time.perf_counter()
+        source_names, target_names, overlap = area_overlap(
+            source_geojson,
+            target_geojson,
+            f"data/cache/profile_crosswalk_{vintage}_{target}.npz",
+        )
+        print(f"{vintage}->{target} overlap in {time.perf_counter() - start:.2f}s")
+
+        # Order the source values to match the boundary file (names cleaned the same way)
+        source = read_vintage(store_path, vintage)
+        ordered = (
+            pl.DataFrame({"neighbourhood": source_names})
+            .join(source, on="neighbourhood", how="left", maintain_order="left")
+            .select(list(CANONICAL_VARIABLES))
+            .to_numpy()
+        )
+        harmonized = interpolate(overlap, ordered, kinds)
+        frames.append(
+            pl.DataFrame(harmonized, schema=list(CANONICAL_VARIABLES))
+            .with_columns(neighbourhood=pl.Series(target_names), vintage=vintage)
+            .select(["neighbourhood", *CANONICAL_VARIABLES, "vintage"])
+        )
+
+    if len(frames) < 2:
+        print("Only one vintage available; skipping 13-profile_vintages.csv.")
+        return
+
+    #### Save data ####
+    vintages = pl.concat(frames, how="vertical_relaxed").select(
+        ["vintage", "neighbourhood", *CANONICAL_VARIABLES]
+    )
+    write_csv(vintages, "data/02-analysis_data/13-profile_vintages.csv")
+
+
+#### ENTRY POINT ####
+if __name__ == "__main__":
+    main()
+    print("Neighbourhood profile store updated.")
@@ -0,0 +1,174 @@
+#### Preamble ####
+# Purpose: Tests the profile store crosswalk resolution, cached ingest, area overlap and areal interpolation.
+# Author: Mike Cowan
+# Date: 19 May 2025
+# Contact: m.cowan@mail.utoronto.ca
+# License: MIT
+# Pre-requisites:
+# - `numpy` and `polars` must be installed
+# - `pytest` must be installed (pip install pytest); run with "pytest -q"
+# References:
+# - [https://docs.pytest.org/en/stable]
+
+#### Workspace setup ####
+import json  # inherent to Python
+
+import numpy as np
+import polars as pl
+import pytest  # test functions across any .py ending with "test"
+
+from utils import profile_store
+from utils.profile_store import (
+    CANONICAL_VARIABLES,
+    area_overlap,
+    ingest_vintage,
+    interpolate,
+    read_vintage,
+    resolve_rows,
+)
+
+
+#### Test data ####
+# Source: two unit squares side by side; target: the same strip split at x = 0.5
+def write_boundaries(path, boxes):
+    features = [
+        {
+            "type": "Feature",
+            "properties": {"AREA_NAME": name},
+            "geometry": {
+                "type": "Polygon",
+                "coordinates": [
+                    [[x0, y0], [x1, y0], [x1, y1], [x0, y1], [x0, y0]],
+                ],
+            },
+        }
+        for name, (x0, y0, x1, y1) in boxes.items()
+    ]
+    path.write_text(json.dumps({"type": "FeatureCollection", "features": features}))
+    return path
+
+
+@pytest.fixture
+def boundary_pair(tmp_path):
+    source = write_boundaries(
+        tmp_path / "source.geojson", {"West": (0, 0, 1, 1), "East": (1, 0, 2, 1)}
+    )
+    target = write_boundaries(
+        tmp_path / "target.geojson", {"Left": (0, 0, 0.5, 1), "Right": (0.5, 0, 2, 1)}
+    )
+    return source, target
+
+
+# A small profile workbook (one row per canonical variable, one column per area) and its vintage
+def write_workbook(path, scale=1, header_rows=()):
+    labels = [*header_rows, *(f"Label {v}" for v in CANONICAL_VARIABLES)]
+    values = [0] * len(header_rows) + list(range(1, len(CANONICAL_VARIABLES) + 1))
+    pl.DataFrame(
+        {
+            "Characteristic": labels,
+            "West": [str(v * scale) for v in values],
+            "East": [f"{v * scale * 10:,}" for v in values],
+        }
+    ).write_csv(path)
+    return path
+
+
+@pytest.fixture
+def vintage(tmp_path, monkeypatch):
+    monkeypatch.chdir(
+        tmp_path
+    )  # the artifact store is relative to the working directory
+    spec = {
+        "path": str(tmp_path / "profiles.csv"),
+        "label_column": "Characteristic",
+        "skip_columns": [],
+        "crosswalk": {v: (f"Label {v}", "first") for v in CANONICAL_VARIABLES},
+    }
+    monkeypatch.setitem(profile_store.VINTAGES, 2099, spec)
+    return 2099, tmp_path / "store"
+
+
+#### Tests ####
+# Duplicated labels resolve to the requested occurrence; apostrophes are standardized
+def test_resolve_rows_occurrence():
+    labels = ["Total", "Bachelor’s degree", "Other", "Bachelor's degree"]
+    crosswalk = {
+        "total": ("Total", "first"),
+        "first_degree": ("Bachelor's degree", "first"),
+        "last_degree": ("Bachelor's degree", "last"),
+    }
+    assert resolve_rows(labels, crosswalk) == {
+        "total": 0,
+        "first_degree": 1,
+        "last_degree": 3,
+    }
+    with pytest.raises(KeyError):
+        resolve_rows(labels, {"missing": ("Median income", "first")})
+
+
+# Overlap shares follow the polygon areas (grid sampling, so approximately)
+def test_area_overlap_shares(boundary_pair, tmp_path):
+    source, target = boundary_pair
+    source_names, target_names, overlap = area_overlap(
+        source, target, tmp_path / "overlap.npz", resolution=200
+    )
+    assert source_names == ["west", "east"]
+    assert target_names == ["left", "right"]
+    shares = overlap.toarray() / overlap.sum()
+    np.testing.assert_allclose(shares, [[0.25, 0.0], [0.25, 0.5]], atol=0.02)
+
+    # Second call is served from the cache
+    _, _, cached = area_overlap(
+        source, target, tmp_path / "overlap.npz", resolution=200
+    )
+    np.testing.assert_array_equal(cached.toarray(), overlap.toarray())
+
+
+# Counts are split by area (totals conserved); rates are area-weighted averages
+def test_interpolate_extensive_and_intensive(boundary_pair, tmp_path):
+    source, target = boundary_pair
+    _, _, overlap = area_overlap(
+        source, target, tmp_path / "overlap.npz", resolution=200
+    )
+    values = np.array([[100.0, 10.0], [50.0, 20.0]])  # (households, rate) per source
+    result = interpolate(overlap, values, ["extensive", "intensive"])
+
+    np.testing.assert_allclose(result[:, 0].sum(), 150.0)
+    np.testing.assert_allclose(result[:, 0], [50.0, 100.0], rtol=0.03)
+    np.testing.assert_allclose(result[:, 1], [10.0, 50 / 3], rtol=0.03)
+
+
+# An unchanged workbook is skipped; a revised one reuses the cached crosswalk rows while the
+# labels at those rows still match, and resolves them again when rows have moved; an edited
+# config spec re-ingests an unchanged workbook
+def test_ingest_skips_and_reuses_rows(vintage, monkeypatch):
+    year, store = vintage
+    path = profile_store.VINTAGES[year]["path"]
+    write_workbook(path)
+    assert ingest_vintage(year, store)
+    parquet = store / f"{year}.parquet"
+    mtime = parquet.stat().st_mtime_ns
+    assert not ingest_vintage(year, store)
+    assert parquet.stat().st_mtime_ns == mtime
+
+    def no_resolve(labels, crosswalk):
+        raise AssertionError("cached rows should have been reused")
+
+    write_workbook(path, scale=2)
+    with monkeypatch.context() as patch:
+        patch.setattr(profile_store, "resolve_rows", no_resolve)
+        assert ingest_vintage(year, store)
+    revised = read_vintage(store, year)
+    assert revised["median_income"].to_list() == [8.0, 80.0]  # commas stripped
+
+    write_workbook(path, header_rows=["Population"])
+    assert ingest_vintage(year, store)
+    manifest = json.loads((store / "manifest.json").read_text(encoding="utf-8"))
+    assert manifest[str(year)]["rows"]["total_households"] == 1
+    assert read_vintage(store, year)["total_households"].to_list() == [1.0, 10.0]
+
+    # Same workbook, edited config spec: the vintage is ingested again
+    assert not ingest_vintage(year, store)
+    profile_store.VINTAGES[year]["skip_columns"] = ["East"]
+    assert ingest_vintage(year, store)
+    assert read_vintage(store, year)["neighbourhood"].to_list() == ["west"]
@@ -0,0 +1,62 @@
+#### Preamble ####
+# Purpose: Recomputes crime rates from counts and population with empirical-Bayes smoothing and intervals.
+# Author: Mike Cowan
+# Date: 19 May 2025
+# Contact: m.cowan@mail.utoronto.ca
+# License: MIT
+# Pre-requisites:
+# - `polars`, `numpy` and `scipy` must be installed
+# - Run after 03.0 (long crime panel in 11-crime_panel/)
+# - 06.0 and 07.0 use these rates with `rates="smoothed"` (or `00.0-run_pipeline.py --rates smoothed`)
+# Output: data/02-analysis_data/17-smoothed_rates.parquet, one row per neighbourhood, crime and year:
+# - count, population (the City's yearly denominator, recovered from count / rate)
+# - rate_raw: count per 100K (empty counts are zeros)
+# - rate_smoothed, rate_lower, rate_upper: posterior mean and 95% interval per 100K
+# - shrinkage: weight on the crime-year mean (near 1 for rare crimes such as homicide)
+# References:
+# - [https://doi.org/10.2307/2347503]
+
+#### Workspace setup ####
+import polars as pl
+
+from utils.artifacts import write_parquet
+from utils.panel import scan_panel
+from utils.smoothing import SMOOTHED_PATH, smooth_panel
+
+
+#### MAIN FUNCTION ####
+def main():
+    print("Smoothing neighbourhood crime rates (empirical Bayes).")
+
+    #### 03.4-smooth_rates.py ####
+    #### Load panel ####
+    panel = scan_panel("data/02-analysis_data/11-crime_panel").collect()
+
+    #### Shrink every neighbourhood x crime x year in one pass ####
+    # Prior per crime and year: each neighbourhood borrows strength from the rest of the city
+    smoothed = smooth_panel(panel, by=("crime", "year")).sort(
+        ["crime", "year", "neighbourhood"]
+    )
+
+    # How far each crime moved on average (rare crimes shrink the most)
+    print(
+        smoothed.group_by("crime")
+        .agg(
+            pl.col("count").sum().alias("incidents"),
+            pl.col("shrinkage").mean().round(3).alias("mean_shrinkage"),
+            (pl.col("rate_upper") - pl.col("rate_lower"))
+            .mean()
+            .round(1)
+            .alias("mean_interval_width"),
+        )
+        .sort("crime")
+    )
+
+    #### Save data ####
+    write_parquet(smoothed, SMOOTHED_PATH)
+
+
+#### ENTRY POINT ####
+if __name__ == "__main__":
+    main()
+    print(f"Smoothed crime rates saved to: {SMOOTHED_PATH}")
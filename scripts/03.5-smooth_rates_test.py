@@ -0,0 +1,167 @@
+#### Preamble ####
+# Purpose: Tests the empirical-Bayes rate smoothing (shrinkage, intervals, grouping, rate swap).
+# Author: Mike Cowan
+# Date: 19 May 2025
+# Contact: m.cowan@mail.utoronto.ca
+# License: MIT
+# Pre-requisites:
+# - `numpy`, `polars` and `scipy` must be installed
+# - `pytest` must be installed (pip install pytest); run with "pytest -q"
+# References:
+# - [https://docs.pytest.org/en/stable]
+
+#### Workspace setup ####
+from pathlib import Path  # inherent to Python
+
+import numpy as np
+import polars as pl
+import pytest  # test functions across any .py ending with "test"
+
+from utils.smoothing import (
+    PER,
+    eb_smooth,
+    implied_population,
+    rates_path,
+    smooth_panel,
+    use_rates,
+)
+
+
+#### Test data ####
+@pytest.fixture
+def panel():
+    rng = np.random.default_rng(838)
+    areas = [f"area-{i:02d}" for i in range(30)]
+    population = dict(zip(areas, rng.integers(2_000, 40_000, len(areas))))
+    risk = dict(zip(areas, rng.lognormal(0, 0.5, len(areas))))  # true rates differ
+    rows = []
+    for crime, base in [("assault", 600.0), ("shooting", 8.0)]:
+        for year in [2019, 2020]:
+            for area in areas:
+                count = int(rng.poisson(base * risk[area] * population[area] / PER))
+                rows.append(
+                    {
+                        "neighbourhood": area,
+                        "crime": crime,
+                        "year": year,
+                        # The City leaves zero counts (and their rates) empty
+                        "count": count or None,
+                        "rate": count * PER / population[area] if count else None,
+                    }
+                )
+    return pl.DataFrame(rows), population
+
+
+#### Tests ####
+# Rare, small-area rates shrink towards the group mean; large counts barely move
+def test_shrinkage_and_intervals():
+    counts = np.array([0, 1, 3, 2000, 2100, 1900])
+    population = np.array([2_000, 2_500, 3_000, 300_000, 310_000, 290_000])
+    result = eb_smooth(counts, population, np.zeros(6, dtype=int))
+    mean = counts.sum() / population.sum() * PER
+
+    assert result["rate_smoothed"][0] > 0  # zero counts no longer mean a zero rate
+    assert np.all(result["shrinkage"][:3] > result["shrinkage"][3:])
+    assert np.all(
+        np.abs(result["rate_smoothed"] - mean) <= np.abs(result["rate_raw"] - mean)
+    )
+    assert np.all(result["rate_lower"] <= result["rate_smoothed"])
+    assert np.all(result["rate_smoothed"] <= result["rate_upper"])
+
+
+# One vectorized pass over several groups equals smoothing each group on its own
+def test_groups_are_independent():
+    rng = np.random.default_rng(42)
+    population = rng.integers(1_000, 50_000, 40)
+    counts = rng.poisson(population / PER * np.repeat([10.0, 500.0], 20))
+    groups = np.repeat([0, 1], 20)
+    together = eb_smooth(counts, population, groups)
+    for g in [0, 1]:
+        alone = eb_smooth(
+            counts[groups == g], population[groups == g], np.zeros(20, int)
+        )
+        np.testing.assert_allclose(
+            together["rate_smoothed"][groups == g], alone["rate_smoothed"]
+        )
+
+
+def test_implied_population(panel):
+    frame, population = panel
+    implied = implied_population(frame)
+    assert implied.height == 30 * 2
+    for row in implied.iter_rows(named=True):
+        assert row["population"] == pytest.approx(population[row["neighbourhood"]])
+
+
+def test_smooth_panel(panel):
+    frame, _ = panel
+    smoothed = smooth_panel(frame)
+    assert smoothed.height == frame.height
+    assert smoothed["rate_smoothed"].null_count() == 0
+    # Shootings (tiny counts) are pooled far more than assaults
+    shrinkage = smoothed.group_by("crime").agg(pl.col("shrinkage").mean())
+    by_crime = dict(shrinkage.iter_rows())
+    assert by_crime["shooting"] > by_crime["assault"]
+
+
+# An area with no positive count (unknown population) keeps its zero rate and stays out of the
+# prior, so the other areas are smoothed as if it were absent
+def test_all_zero_area(panel):
+    frame, _ = panel
+    empty = frame.with_columns(
+        [
+            pl.when(pl.col("neighbourhood") == "area-00")
+            .then(None)
+            .otherwise(pl.col(c))
+            .alias(c)
+            for c in ["count", "rate"]
+        ]
+    )
+    smoothed = smooth_panel(empty)
+    assert smoothed["rate_smoothed"].is_nan().sum() == 0
+    zero = smoothed.filter(pl.col("neighbourhood") == "area-00")
+    assert zero["rate_smoothed"].to_list() == [0.0] * 4
+    assert zero["shrinkage"].to_list() == [0.0] * 4
+
+    others = smoothed.filter(pl.col("neighbourhood") != "area-00")
+    alone = smooth_panel(frame.filter(pl.col("neighbourhood") != "area-00"))
+    np.testing.assert_allclose(
+        others["rate_smoothed"].to_numpy(), alone["rate_smoothed"].to_numpy()
+    )
+
+
+# The tables and plots can swap the raw rate columns for smoothed ones
+def test_use_rates(panel, tmp_path):
+    frame, _ = panel
+    path = tmp_path / "smoothed.parquet"
+    smooth_panel(frame).write_parquet(path)
+    merged = pl.DataFrame(
+        {
+            "neighbourhood": ["area-00", "area-01"],
+            "shooting_rate_2019": [0.0, 0.0],
+            "cluster": [0, 1],
+        }
+    )
+    assert use_rates(merged, "raw", ["shooting"], [2019], path) is merged
+    swapped = use_rates(merged, "smoothed", ["shooting"], [2019], path)
+    assert swapped["shooting_rate_2019"].min() > 0
+    assert swapped["cluster"].to_list() == [0, 1]
+    with pytest.raises(ValueError):
+        use_rates(merged, "median", ["shooting"], [2019], path)
+
+
+# Smoothed outputs never land on the raw outputs' paths
+def test_rates_path():
+    table = "data/03-table_data/assault_rate_change.csv"
+    assert rates_path(table, "raw") == Path(table)
+    assert rates_path(table, "smoothed") == Path(
+        "data/03-table_data/assault_rate_change_smoothed.csv"
+    )
+    assert rates_path(Path("other/figures/1_assault"), "smoothed").name == (
+        "1_assault_smoothed"
+    )
+    assert rates_path("data/02-analysis_data/16-results_bundle", "smoothed").name == (
+        "16-results_bundle_smoothed"
+    )
+    with pytest.raises(ValueError):
+        rates_path(table, "median")
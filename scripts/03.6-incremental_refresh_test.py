@@ -0,0 +1,171 @@
+#### Preamble ####
+# Purpose: Tests the incremental refresh path (year detection, per-year panel appends, the saved cluster model, 06.0 stitching).
+# Author: Mike Cowan
+# Date: 19 May 2025
+# Contact: m.cowan@mail.utoronto.ca
+# License: MIT
+# Pre-requisites:
+# - `numpy`, `polars` and `scikit-learn` must be installed
+# - `pytest` must be installed (pip install pytest); run with "pytest -q"
+# References:
+# - [https://docs.pytest.org/en/stable]
+# - [https://docs.pola.rs/api/python/stable/reference/api/polars.testing.assert_frame_equal.html]
+
+#### Workspace setup ####
+import importlib.util  # inherent to Python
+from pathlib import Path  # inherent to Python
+
+import numpy as np
+import polars as pl
+import pytest  # test functions across any .py ending with "test"
+from polars.testing import assert_frame_equal
+from sklearn.cluster import KMeans
+
+from utils.cluster_model import load_cluster_model, predict_clusters, save_cluster_model
+from utils.panel import append_new_years, scan_panel, stored_years
+from utils.schema import detect_years, latest_population_column
+
+STAGE = Path(__file__).parent / "06.0-table_crime_clusters.py"
+TABLE_CRIMES = [
+    "assault",
+    "robbery",
+    "breakenter",
+    "shooting",
+]  # the crimes 06.0 tabulates
+LEVELS = ["High Opportunity", "Medium Opportunity", "Low Opportunity"]
+
+
+#### Test data ####
+# The synthetic merged table with cluster labels, as 05.0 leaves it
+@pytest.fixture
+def clustered(synthetic_city):
+    merged = synthetic_city["merged"]
+    return merged.with_columns(
+        pl.Series("opportunity_index", [LEVELS[i % 3] for i in range(merged.height)])
+    )
+
+
+# Run 06.0 in `workspace` on `merged` (loaded the way 00.0 loads stages)
+def run_table_stage(workspace, merged, monkeypatch, **options):
+    Path(workspace, "data/02-analysis_data").mkdir(parents=True, exist_ok=True)
+    monkeypatch.chdir(workspace)
+    merged.write_csv("data/02-analysis_data/02-analysis_data_merged.csv")
+    spec = importlib.util.spec_from_file_location("table_crime_clusters", STAGE)
+    stage = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(stage)
+    stage.main(**options)
+    return {
+        path.name: pl.read_csv(path)
+        for path in [
+            Path("data/02-analysis_data/04-cluster_crime_rates.csv"),
+            *sorted(Path("data/03-table_data").glob("*_rate_change.csv")),
+        ]
+    }
+
+
+# Drop every column of the given years from a wide table
+def drop_years(merged, years):
+    return merged.select(
+        [c for c in merged.columns if not any(c.endswith(f"_{y}") for y in years)]
+    )
+
+
+#### Tests ####
+# Years come from the raw portal schema (upper case), only where every crime reports them
+def test_detect_years_from_raw_schema(synthetic_city):
+    raw = synthetic_city["raw_crime"]
+    assert detect_years(raw.columns, TABLE_CRIMES) == list(range(2019, 2025))
+    assert detect_years(raw.columns, TABLE_CRIMES, start_year=2014)[0] == 2014
+
+    # A new release only counts once every crime reports it
+    partial = raw.with_columns(pl.lit(1.0).alias("ASSAULT_RATE_2025"))
+    assert detect_years(partial.columns, TABLE_CRIMES)[-1] == 2024
+    assert detect_years(partial.columns, ["assault"])[-1] == 2025
+    assert detect_years(raw.columns, ["assault", "arson"]) == []
+
+
+# Rates per 100K use the newest population column the release has
+def test_latest_population_column():
+    columns = ["AREA_NAME", "POPULATION_2021", "POPULATION_2024", "ASSAULT_RATE_2025"]
+    assert latest_population_column(columns) == "POPULATION_2024"
+    assert latest_population_column(["AREA_NAME"]) is None
+
+
+# Appending a year writes only that year; the stored years are left untouched
+def test_panel_append_keeps_stored_years(synthetic_city, tmp_path, monkeypatch):
+    monkeypatch.chdir(
+        tmp_path
+    )  # the artifact store is relative to the working directory
+    crime, crime_types = synthetic_city["crime"], synthetic_city["crime_types"]
+    years, store = synthetic_city["years"], tmp_path / "panel"
+
+    assert append_new_years(crime, store, crime_types, years[:-1]) == years[:-1]
+    before = {p.name: (p.stat().st_mtime_ns, p.read_bytes()) for p in store.iterdir()}
+
+    assert append_new_years(crime, store, crime_types, years) == [years[-1]]
+    assert stored_years(store) == years
+    for name, (mtime, body) in before.items():
+        assert (store / name).stat().st_mtime_ns == mtime
+        assert (store / name).read_bytes() == body
+
+    panel = scan_panel(store).collect()
+    assert panel.height == crime.height * len(crime_types) * len(years)
+    latest = scan_panel(store, [years[-1]]).collect()
+    assert latest["year"].unique().to_list() == [years[-1]]
+    assert append_new_years(crime, store, crime_types, years) == []
+
+
+# The saved scaler + centroids assign every row to the cluster it was fitted to
+def test_saved_model_reproduces_labels(synthetic_city, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    X = synthetic_city["merged"].select(["education_rate", "median_income"]).to_numpy()
+    mean, scale = X.mean(axis=0), X.std(axis=0)
+    kmeans = KMeans(n_clusters=3, random_state=42).fit((X - mean) / scale)
+    label_map = dict(enumerate(LEVELS))
+
+    path = tmp_path / "cluster_model.json"
+    save_cluster_model(
+        path, ["education_rate", "median_income"], mean, scale, kmeans, label_map
+    )
+    model = load_cluster_model(path)
+    assert model["label_map"] == label_map
+    np.testing.assert_array_equal(predict_clusters(model, X), kmeans.labels_)
+    assert load_cluster_model(tmp_path / "missing.json") is None
+
+
+# Adding a year incrementally writes the same tables as tabulating every year at once
+def test_incremental_table_matches_full(clustered, tmp_path, monkeypatch):
+    full = run_table_stage(tmp_path / "full", clustered, monkeypatch)
+
+    run_table_stage(tmp_path / "inc", drop_years(clustered, [2024]), monkeypatch)
+    incremental = run_table_stage(
+        tmp_path / "inc", clustered, monkeypatch, incremental=True
+    )
+    assert full.keys() == incremental.keys()
+    for name in full:
+        assert_frame_equal(full[name], incremental[name], check_column_order=False)
+
+
+# A release that skips a year compares each year with the previous one published
+def test_table_skipped_year(clustered, tmp_path, monkeypatch):
+    merged = drop_years(clustered, [2020])
+    tables = run_table_stage(tmp_path / "full", merged, monkeypatch)
+    rates = tables["04-cluster_crime_rates.csv"]
+    assert "Low Opportunity_pct_2019_2021" in rates.columns
+    assert tables["assault_rate_change.csv"]["Year"].to_list() == [
+        2019,
+        2021,
+        2022,
+        2023,
+        2024,
+    ]
+
+    # Incremental: 2022 onwards added to a 2019/2021 table
+    run_table_stage(
+        tmp_path / "inc", drop_years(merged, range(2022, 2025)), monkeypatch
+    )
+    incremental = run_table_stage(
+        tmp_path / "inc", merged, monkeypatch, incremental=True
+    )
+    for name in tables:
+        assert_frame_equal(tables[name], incremental[name], check_column_order=False)
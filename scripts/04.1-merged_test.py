@@ -1,5 +1,5 @@
 #### Preamble ####
-# Purpose: Tests the merged neighbourhood crime and Census profile data.
+# Purpose: Tests the merged neighbourhood crime and Census profile data (03.0 -> 04.0 run in memory on synthetic inputs).
 # Author: Mike Cowan
 # Date: 19 May 2025
 # Contact: m.cowan@mail.utoronto.ca
@@ -14,26 +14,35 @@
 import polars as pl
 import pytest  # test functions across any .py ending with "test"
 
+from utils.cleaning import PROFILE_COLUMNS
+
 
 #### Test data ####
-# Test if data loads correctly (uses fixture function to try to read 02-analysis_data_merged.csv)
-@pytest.fixture
-def merged_data():
-    return pl.read_csv("data/02-analysis_data/02-analysis_data_merged.csv")
+# Raw crime and profile tables generated in memory once per session, then cleaned and merged
+# with the same functions 03.0, 03.1 and 04.0 use (synthetic_city in conftest.py)
+@pytest.fixture(scope="session")
+def merged_data(synthetic_city):
+    return synthetic_city["merged"]
 
 
-# Check that the dataset has 158 rows (there are 158 neighbourhoods in Toronto; height in polars)
+# Check that the dataset has one row per neighbourhood (158 in Toronto by default; height in polars)
 # [https://docs.pola.rs/api/python/stable/reference/dataframe/api/polars.DataFrame.height.html]
-def test_row_count(merged_data):
+def test_row_count(merged_data, synthetic_city):
+    n_areas = synthetic_city["n_areas"]
     assert (
-        merged_data.height == 158
-    ), f"Looking for 158 rows, found {merged_data.height}"
+        merged_data.height == n_areas
+    ), f"Looking for {n_areas} rows, found {merged_data.height}"
 
 
-# Check how many columns (width in polars)
+# Check how many columns: profile columns + a count and a rate per crime-year (width in polars)
 # [https://docs.pola.rs/api/python/stable/reference/dataframe/api/polars.DataFrame.width.html]
-def test_column_count(merged_data):
-    assert merged_data.width == 72, f"Looking for 72 columns, got {merged_data.width}."
+def test_column_count(merged_data, synthetic_city):
+    expected = len(PROFILE_COLUMNS) + 2 * len(synthetic_city["crime_types"]) * len(
+        synthetic_city["years"]
+    )
+    assert (
+        merged_data.width == expected
+    ), f"Looking for {expected} columns, got {merged_data.width}."
 
 
 # Check that the neighbourhoods are unique (i.e., no duplicates)
@@ -55,7 +64,7 @@ def test_no_missing(merged_data):
 # Check that all analysis columns have the correct data type (compared data to the map; e.g., integers for counts, floats for proportion/rates)
 # Polars DFs have schemas (.schema) that map column names to data types
 # [https://docs.pola.rs/api/python/stable/reference/dataframe/api/polars.DataFrame.schema.html]
-def test_variable_types(merged_data):
+def test_variable_types(merged_data, synthetic_city):
     expected_types = {
         "neighbourhood": pl.Utf8,  # character/string data
         "one_parent_families": pl.Int64,  # integer count
@@ -71,10 +80,10 @@ def test_variable_types(merged_data):
 
     # Need to loop through each column in the expected_types dictionary + add the year
     # Generate a list of crime types
-    crime_types = ["assault", "robbery", "breakenter", "homicide", "shooting"]
+    crime_types = synthetic_city["crime_types"]
 
-    # Range of years to check (2019-2024)
-    years = range(2019, 2025)
+    # Years detected from the raw schema (2019-2024)
+    years = synthetic_city["years"]
     # For each crime type and year, dynamically generate two expected column names (count, rate)
     for crime in crime_types:
         for year in years:
@@ -95,18 +104,18 @@ def test_variable_types(merged_data):
 
 # Check that the crime incidents = 0 or greater
 # [https://docs.pola.rs/api/python/stable/reference/dataframe/api/polars.DataFrame.min.html]
-def test_non_negative_counts(merged_data):
-    for crime in ["assault", "robbery", "breakenter", "homicide", "shooting"]:
-        for year in range(2019, 2025):
+def test_non_negative_counts(merged_data, synthetic_city):
+    for crime in synthetic_city["crime_types"]:
+        for year in synthetic_city["years"]:
             column = f"{crime}_{year}"
             min = merged_data.select(pl.col(column).min()).item()
             assert min >= 0, f"{column} has negative values (min = {min})"
 
 
 # Check that the crime rates are actually plausible (again, guesstimating 0-2500 per 100K people)
-def test_plausible_rates(merged_data):
-    for crime in ["assault", "robbery", "breakenter", "homicide", "shooting"]:
-        for year in range(2019, 2025):
+def test_plausible_rates(merged_data, synthetic_city):
+    for crime in synthetic_city["crime_types"]:
+        for year in synthetic_city["years"]:
             column = f"{crime}_rate_{year}"
             min_value, max_value = merged_data.select(
                 pl.col(column).min().alias("min"), pl.col(column).max().alias("max")
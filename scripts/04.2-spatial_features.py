@@ -0,0 +1,100 @@
+#### Preamble ####
+# Purpose: Builds sparse neighbourhood weights and computes spatial-lag features and Moran's I.
+# Author: Mike Cowan
+# Date: 19 May 2025
+# Contact: m.cowan@mail.utoronto.ca
+# License: MIT
+# Pre-requisites:
+# - `polars` must be installed (pip install polars)
+# - `numpy` must be installed (pip install numpy)
+# - `scipy` must be installed (pip install scipy)
+# - Neighbourhood boundaries downloaded by 02.0 to data/01-raw_data/neighbourhood_boundaries.geojson
+# References:
+# - [https://pysal.org/esda/generated/esda.Moran.html]
+
+#### Workspace setup ####
+import polars as pl
+from pathlib import Path  # inherent to Python
+
+from utils.artifacts import write_csv
+from utils.config import analyzed_crimes, load_city
+from utils.schema import detect_years
+from utils.spatial import (
+    align_weights,
+    load_or_build_weights,
+    morans_i,
+    row_standardize,
+    spatial_lag,
+)
+
+
+#### MAIN FUNCTION ####
+def main():
+    print("Computing spatial-lag features and Moran's I.")
+
+    #### 04.2-spatial_features.py ####
+    #### Load boundaries and weights ####
+    geojson_path = Path(load_city()["portal"]["packages"]["boundaries"]["path"])
+    if not geojson_path.exists():
+        print(f"No boundary file at {geojson_path}; skipping spatial features.")
+        return
+
+    # Queen contiguity (shared vertex); use method="knn" for point-like areas or islands
+    # The CSR matrix is cached on disk and only rebuilt when the GeoJSON or options change
+    names, weights = load_or_build_weights(
+        geojson_path, "data/cache/spatial_weights.npz", method="queen"
+    )
+
+    #### Load merged data ####
+    merged_data = pl.read_csv("data/02-analysis_data/02-analysis_data_merged.csv")
+    ses_columns = [
+        "education_rate",
+        "prop_single_parent",
+        "unemployment_rate",
+        "median_income",
+    ]
+    crime_types = analyzed_crimes()
+    years = detect_years(merged_data.columns, crime_types)
+    rate_columns = [f"{crime}_rate_{year}" for crime in crime_types for year in years]
+    feature_columns = ses_columns + rate_columns
+
+    # Put the weights in the same row order as the merged table, then row-standardize
+    weights, unmatched = align_weights(
+        names, weights, merged_data["neighbourhood"].to_list()
+    )
+    if unmatched:
+        print(f"Neighbourhoods without a boundary match: {unmatched}")
+    weights = row_standardize(weights)
+    print(
+        f"Weights: {weights.shape[0]} areas, {weights.nnz} links "
+        f"(avg. {weights.nnz / weights.shape[0]:.1f} neighbours)"
+    )
+
+    #### Spatial lags (one sparse @ dense product for every feature) ####
+    values = merged_data.select(feature_columns).fill_null(0.0).to_numpy().astype(float)
+    lagged = spatial_lag(weights, values)
+
+    lag_df = pl.DataFrame(
+        {
+            "neighbourhood": merged_data["neighbourhood"],
+            **{f"lag_{col}": lagged[:, i] for i, col in enumerate(feature_columns)},
+        }
+    )
+
+    #### Moran's I (global spatial autocorrelation) ####
+    moran_df = morans_i(weights, values).insert_column(
+        0, pl.Series("variable", feature_columns)
+    )
+    print(moran_df.with_columns(pl.col("morans_i", "p_value").round(3)))
+
+    #### Save data ####
+    write_csv(lag_df, "data/02-analysis_data/06-spatial_lag_features.csv")
+    write_csv(moran_df, "data/02-analysis_data/07-morans_i.csv")
+
+
+#### ENTRY POINT ####
+if __name__ == "__main__":
+    main()
+    print(
+        "Spatial-lag features saved to data/02-analysis_data/06-spatial_lag_features.csv."
+    )
@@ -0,0 +1,127 @@
+#### Preamble ####
+# Purpose: Tests the sparse spatial weights, spatial lags and Moran's I helpers.
+# Author: Mike Cowan
+# Date: 19 May 2025
+# Contact: m.cowan@mail.utoronto.ca
+# License: MIT
+# Pre-requisites:
+# - `numpy` must be installed (pip install numpy)
+# - `scipy` must be installed (pip install scipy)
+# - `pytest` must be installed (pip install pytest); run with "pytest -q"
+# References:
+# - [https://docs.pytest.org/en/stable]
+
+#### Workspace setup ####
+import json  # inherent to Python
+
+import numpy as np
+import pytest  # test functions across any .py ending with "test"
+
+from utils.spatial import (
+    contiguity_weights,
+    knn_weights,
+    load_or_build_weights,
+    morans_i,
+    ring_centroids,
+    row_standardize,
+    spatial_lag,
+)
+
+
+#### Test data ####
+# A 3x3 grid of unit squares (areas numbered row by row, 0-8)
+@pytest.fixture
+def grid_rings():
+    rings = []
+    for row in range(3):
+        for col in range(3):
+            square = np.array(
+                [
+                    [col, row],
+                    [col + 1, row],
+                    [col + 1, row + 1],
+                    [col, row + 1],
+                    [col, row],
+                ],
+                dtype=float,
+            )
+            rings.append([square])
+    return rings
+
+
+# Queen contiguity: corners have 3 neighbours, edges 5, the centre 8
+def test_queen_neighbour_counts(grid_rings):
+    weights = contiguity_weights(grid_rings)
+    counts = np.asarray(weights.sum(axis=1)).ravel()
+    assert counts.tolist() == [3, 5, 3, 5, 8, 5, 3, 5, 3]
+    assert (weights != weights.T).nnz == 0, "Contiguity weights should be symmetric"
+
+
+# k-NN: every area gets exactly k neighbours and never itself
+def test_knn_weights(grid_rings):
+    weights = knn_weights(ring_centroids(grid_rings), k=4)
+    assert np.all(np.asarray(weights.sum(axis=1)).ravel() == 4)
+    assert weights.diagonal().sum() == 0
+
+
+# Centroids of the unit squares sit at their centres
+def test_ring_centroids(grid_rings):
+    centroids = ring_centroids(grid_rings)
+    assert np.allclose(centroids[4], [1.5, 1.5])
+
+
+# Row-standardized lag of a constant is that constant
+def test_spatial_lag_constant(grid_rings):
+    weights = row_standardize(contiguity_weights(grid_rings))
+    lagged = spatial_lag(weights, np.full((9, 2), 7.0))
+    assert np.allclose(lagged, 7.0)
+
+
+# A checkerboard is negatively autocorrelated; a gradient is positively autocorrelated
+def test_morans_i_sign(grid_rings):
+    weights = row_standardize(contiguity_weights(grid_rings))
+    checkerboard = np.array([1, 0, 1, 0, 1, 0, 1, 0, 1], dtype=float)
+    gradient = np.repeat([0.0, 1.0, 2.0], 3)
+    result = morans_i(
+        weights, np.column_stack([checkerboard, gradient]), permutations=99
+    )
+    assert result["morans_i"][0] < result["expected_i"][0]
+    assert result["morans_i"][1] > 0
+    assert result["p_value"].is_between(0, 1).all()
+
+
+# Permutations run in chunks; the chunk size changes memory use, not the result
+def test_morans_i_chunks(grid_rings):
+    weights = row_standardize(contiguity_weights(grid_rings))
+    values = np.random.default_rng(1).normal(size=(9, 3))
+    whole = morans_i(weights, values, permutations=99)
+    for chunk_size in [9, 9 * 7, 1]:
+        assert whole.equals(
+            morans_i(weights, values, permutations=99, chunk_size=chunk_size)
+        )
+
+
+# The weights cache is reused until the boundary file changes
+def test_weights_cache(tmp_path, grid_rings):
+    features = [
+        {
+            "type": "Feature",
+            "properties": {"AREA_NAME": f"Area {i} ({i:03d})"},
+            "geometry": {"type": "Polygon", "coordinates": [rings[0].tolist()]},
+        }
+        for i, rings in enumerate(grid_rings)
+    ]
+    geojson_path = tmp_path / "boundaries.geojson"
+    geojson_path.write_text(
+        json.dumps({"type": "FeatureCollection", "features": features})
+    )
+    cache_path = tmp_path / "weights.npz"
+
+    names, weights = load_or_build_weights(geojson_path, cache_path)
+    assert names[0] == "area-0"
+    modified = cache_path.stat().st_mtime_ns
+
+    names_cached, weights_cached = load_or_build_weights(geojson_path, cache_path)
+    assert cache_path.stat().st_mtime_ns == modified, "Cache should not be rewritten"
+    assert names_cached == names
+    assert (weights_cached != weights).nnz == 0
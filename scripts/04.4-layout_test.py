@@ -0,0 +1,113 @@
+#### Preamble ####
+# Purpose: Tests the compact column layout (dtypes, lossless values, Enum labels, IDs, memory report).
+# Author: Mike Cowan
+# Date: 19 May 2025
+# Contact: m.cowan@mail.utoronto.ca
+# License: MIT
+# Pre-requisites:
+# - `polars` must be installed (pip install polars)
+# - `pytest` must be installed (pip install pytest); run with "pytest -q"
+# References:
+# - [https://docs.pytest.org/en/stable]
+
+#### Workspace setup ####
+import polars as pl
+import pytest  # test functions across any .py ending with "test"
+
+from utils.layout import OPPORTUNITY_LEVELS, compact_frame, memory_report, read_merged
+from utils.profiling import StageProfile, format_summary, track_frame
+from utils.smoothing import use_rates
+
+
+#### Test data ####
+# Shaped like the merged table: names, SES, counts, float32-precision rates, cluster labels
+@pytest.fixture
+def merged():
+    return pl.DataFrame(
+        {
+            "neighbourhood": ["york-university-heights", "annex", "weston"],
+            "total_households": [9_000, 16_000, 7_500],
+            "median_income": [62_000.0, 95_000.0, 58_000.0],
+            "assault_2024": [310, 120, 95],
+            "assault_rate_2024": [1021.9754638671875, 376.30487060546875, 512.5],
+            "cluster": [2, 1, 2],
+            "opportunity_index": [
+                "Low Opportunity",
+                "Medium Opportunity",
+                "Low Opportunity",
+            ],
+        }
+    )
+
+
+#### Tests ####
+def test_compact_types_and_values(merged):
+    compact = compact_frame(merged)
+    assert compact.schema["assault_2024"] == pl.UInt32
+    assert compact.schema["assault_rate_2024"] == pl.Float32
+    assert compact.schema["total_households"] == pl.Int32
+    assert compact.schema["cluster"] == pl.UInt8
+    assert compact.schema["opportunity_index"] == pl.Enum(OPPORTUNITY_LEVELS)
+
+    # Integer IDs follow the sorted names and sit next to them
+    assert compact.columns[:2] == ["neighbourhood", "neighbourhood_id"]
+    assert compact["neighbourhood_id"].to_list() == [2, 0, 1]
+
+    # Values survive the round trip (rates are published at float32 precision)
+    restored = compact.drop("neighbourhood_id").cast(merged.schema)
+    assert restored.equals(merged)
+
+
+def test_compact_long_panel():
+    panel = pl.DataFrame(
+        {
+            "neighbourhood": ["annex", "annex"],
+            "crime": ["assault", "shooting"],
+            "year": [2024, 2024],
+            "count": [120, 2],
+            "rate": [376.3, 6.3],
+        }
+    )
+    compact = compact_frame(panel)
+    assert isinstance(compact.schema["crime"], pl.Enum)
+    assert compact.schema["year"] == pl.UInt16
+    assert compact.filter(pl.col("crime") == "shooting")["count"].item() == 2
+
+
+# Negative counts and unknown labels fail instead of wrapping or becoming null
+def test_compact_is_strict(merged):
+    with pytest.raises(pl.exceptions.InvalidOperationError):
+        compact_frame(merged.with_columns(pl.lit(-1).alias("assault_2024")))
+    with pytest.raises(pl.exceptions.InvalidOperationError):
+        compact_frame(merged.with_columns(pl.lit("Top").alias("opportunity_index")))
+    with pytest.raises(ValueError):
+        read_merged("narrow")
+
+
+def test_memory_report_and_profile(merged, tmp_path):
+    wide = pl.concat([merged] * 1_000)
+    report = memory_report({"merged": wide}).row(0, named=True)
+    assert report["rows"] == 3_000
+    assert report["ratio"] > 1.5
+
+    with StageProfile("06.0-example", tmp_path, cpu=False) as profile:
+        track_frame("merged", wide)
+    assert profile.summary["frames_mib"]["merged"] == pytest.approx(
+        wide.estimated_size("mb"), abs=1e-3
+    )
+    assert "table merged" in format_summary([profile.summary])
+
+
+# Smoothed rates join onto the compact table's Enum names
+def test_use_rates_with_enum_names(merged, tmp_path):
+    path = tmp_path / "smoothed.parquet"
+    pl.DataFrame(
+        {
+            "neighbourhood": ["annex", "weston", "york-university-heights"],
+            "crime": ["assault"] * 3,
+            "year": [2024] * 3,
+            "rate_smoothed": [380.0, 500.0, 1000.0],
+        }
+    ).write_parquet(path)
+    swapped = use_rates(compact_frame(merged), "smoothed", ["assault"], [2024], path)
+    assert swapped["assault_rate_2024"].to_list() == [1000.0, 380.0, 500.0]
@@ -0,0 +1,108 @@
+#### Preamble ####
+# Purpose: Runs the cleaning and merge stages in memory on synthetic inputs and checks their invariants, at the configured scale and (with --run-slow) at ~50K areas.
+# Author: Mike Cowan
+# Date: 19 May 2025
+# Contact: m.cowan@mail.utoronto.ca
+# License: MIT
+# Pre-requisites:
+# - `numpy`, `polars` and `scikit-learn` must be installed
+# - `pytest` must be installed (pip install pytest); run with "pytest -q" (add --run-slow for the scale tier)
+# References:
+# - [https://docs.pytest.org/en/stable]
+
+#### Workspace setup ####
+import time  # inherent to Python
+
+import numpy as np
+import polars as pl
+import pytest  # test functions across any .py ending with "test"
+
+from utils.cleaning import PROFILE_COLUMNS, crime_columns
+from utils.layout import compact_frame
+from utils.similarity import SimilarityIndex
+from utils.synthetic import build_city
+
+SES_COLUMNS = [
+    "education_rate",
+    "prop_single_parent",
+    "unemployment_rate",
+    "median_income",
+]
+
+
+#### Invariants shared by both tiers ####
+def check_city(city):
+    raw, crime, merged = city["raw_crime"], city["crime"], city["merged"]
+    n_areas, years = city["n_areas"], city["years"]
+
+    # 03.0: one row per area, names normalized, rates filled, counts carried over unchanged
+    assert crime.height == n_areas
+    assert crime["neighbourhood"].n_unique() == n_areas
+    assert not crime["neighbourhood"].str.contains(r"[A-Z\s.`]").any()
+    assert years == list(range(2019, 2025))
+    assert (
+        crime.select(pl.col("^.*_rate_.*$").null_count()).sum_horizontal().item() == 0
+    )
+    for crime_type in city["crime_types"]:
+        column = f"{crime_type}_{years[-1]}"
+        assert crime[column].sum() == raw[column.upper()].sum()
+
+    # 04.0: every area finds its profile, and the schema is the published one
+    assert merged.height == n_areas
+    assert merged.null_count().to_series().sum() == 0
+    assert merged.columns == PROFILE_COLUMNS + crime_columns(city["crime_types"], years)
+    counts = merged.select(pl.col(r"^[a-z]+_\d{4}$"))
+    assert all(dtype == pl.Int64 for dtype in counts.dtypes)
+    assert counts.min().min_horizontal().item() >= 0
+    assert merged["prop_single_parent"].is_between(0, 1).all()
+    assert merged["education_rate"].is_between(0, 1).all()
+
+
+#### Tests ####
+def test_stage_invariants(synthetic_city):
+    check_city(synthetic_city)
+
+
+# Same seed, same city; the raw table and the merged table line up row for row
+def test_deterministic_and_aligned(synthetic_city):
+    again = build_city(synthetic_city["n_areas"], synthetic_city["crime_types"])
+    assert again["merged"].equals(synthetic_city["merged"])
+    year = synthetic_city["years"][0]
+    raw_rates = synthetic_city["raw_crime"][f"ASSAULT_RATE_{year}"].fill_null(0.0)
+    np.testing.assert_allclose(
+        synthetic_city["merged"][f"assault_rate_{year}"].to_numpy(),
+        raw_rates.to_numpy(),
+    )
+
+
+# Downstream helpers accept the merged table as built (compact layout, similarity index)
+def test_downstream_helpers(synthetic_city):
+    merged = synthetic_city["merged"]
+    compact = compact_frame(merged)
+    assert compact.drop("neighbourhood_id").height == merged.height
+    X = merged.select(SES_COLUMNS).to_numpy()
+    scaled = (X - X.mean(axis=0)) / X.std(axis=0)
+    index = SimilarityIndex(
+        merged["neighbourhood"], scaled, X.mean(axis=0), X.std(axis=0), "test"
+    )
+    result = index.query(merged["neighbourhood"][:5].to_list(), k=3)
+    assert result.height == 15
+
+
+#### Scale tier ####
+# Invariants hold at ~50K areas, and building the city (generation + 03.0 -> 04.0) grows about
+# linearly: 4x the areas must cost well under the 16x a quadratic step would.
+@pytest.mark.slow
+def test_scale_tier(large_synthetic_city):
+    check_city(large_synthetic_city)
+
+    crime_types = large_synthetic_city["crime_types"]
+    n_areas = large_synthetic_city["n_areas"]
+    timings = []
+    for size in (n_areas // 4, n_areas):
+        start = time.perf_counter()
+        build_city(size, crime_types)
+        timings.append(time.perf_counter() - start)
+    assert timings[1] < 10 * timings[0] + 1.0, f"superlinear build: {timings}"
+
+    test_downstream_helpers(large_synthetic_city)
@@ -9,6 +9,8 @@
 # - `numpy` must be installed (pip install numpy)
 # - `matplotlib` must be installed (pip install matplotlib)
 # - `scikit-learn` must be installed (pip install scikit-learn)
+# - With `incremental=True`, clusters come from data/02-analysis_data/cluster_model.json (written by a full run)
+# - With `include_spatial_lag=True` (00.0 `--spatial-lag`), the 04.2 neighbour averages are added to the features
 # References:
 # - [https://scikit-learn.org/stable/modules/clustering.html#clustering-evaluation]
 
@@ -16,19 +18,25 @@
 import polars as pl
 import numpy as np
 import matplotlib.pyplot as plt
-from sklearn.preprocessing import (
-    StandardScaler,
-)  # Brings each variable to mean 0 / std 1 so no one feature dominates
+from pathlib import Path  # inherent to Python
 from sklearn.cluster import (
     KMeans,
 )  # Separate into k groups by minimizing within‐cluster variance
-from sklearn.metrics import (
-    silhouette_score,
+
+from utils.artifacts import write_csv, write_parquet
+from utils.cluster_model import load_cluster_model, predict_clusters, save_cluster_model
+from utils.config import analyzed_crimes
+from utils.features import load_or_fit_transform
+from utils.layout import MERGED_COMPACT_PATH, compact_frame, memory_report
+from utils.metrics import (
+    ClusterMetrics,
 )  # Measure optimal k via silhouette score (higher is better)
+from utils.profiling import span
+from utils.schema import detect_years
 
 
 #### MAIN FUNCTION ####
-def main():
+def main(incremental=False, layout="wide", include_spatial_lag=False):
     print("Generating neighbourhood K-means clusters based on Census profile data.")
 
     #### 05.0-eda_neighbourhood_clusters.py####
@@ -45,8 +53,8 @@ def main():
     ]
 
     # Fill any missing rate columns with 0.0 (float)
-    crime_types = ["assault", "breakenter", "robbery", "shooting"]
-    years = [2019, 2020, 2021, 2022, 2023, 2024]
+    crime_types = analyzed_crimes()
+    years = detect_years(profiles.columns, crime_types)
 
     # Create a list of feature columns for the SES and crime rates
     crime_rate_columns = [
@@ -58,42 +66,80 @@ def main():
         [pl.col(col).fill_null(0.0).alias(col) for col in crime_rate_columns]
     )
 
-    # Convert the selected SES columns to a float array
-    X = profiles.select(ses_columns).to_numpy().astype(float)
-
-    # Scale features so each has mean=0, std=1 (prevents any one feature dominating)
-    # [https://scikit-learn.org/stable/modules/generated/sklearn.preprocessing.StandardScaler.html]
-    scaler = StandardScaler()
-    X_scaled = scaler.fit_transform(X)
-
-    # Find the best K via silhouette score (higher is better: range [-1,1])
-    # [https://scikit-learn.org/stable/modules/generated/sklearn.metrics.silhouette_score.html]
-    best_k, best_score = 3, -1
-    for k in range(2, 7):
-        labels = KMeans(n_clusters=k, random_state=42).fit_predict(X_scaled)
-        score = silhouette_score(X_scaled, labels)
-        print(f"K = {k} silhouette={score:.3f}")
-        if score > best_score:
-            best_k, best_score = k, score
-    print(f"Best K = {best_k} (silhouette={best_score:.3f})\n")
-
-    #### K-means Cluster Model ####
-    # Fit K-Means (K = 3), attach integer cluster labels
-    # [https://scikit-learn.org/stable/modules/generated/sklearn.cluster.KMeans.html#sklearn.cluster.KMeans.labels]
-    kmeans = KMeans(n_clusters=3, random_state=42).fit(X_scaled)
-    profiles = profiles.with_columns(
-        pl.Series("cluster", kmeans.labels_)  # cluster ∈ {0,1,2}
-    )
+    # Optionally add each neighbourhood's spatially lagged SES (neighbour averages from 04.2)
+    # so adjacent areas with similar surroundings are pulled together
+    lag_path = Path("data/02-analysis_data/06-spatial_lag_features.csv")
+    features = profiles.select(ses_columns)
+    if include_spatial_lag and lag_path.exists():
+        lag_columns = [f"lag_{col}" for col in ses_columns]
+        features = profiles.join(
+            pl.read_csv(lag_path).select(["neighbourhood", *lag_columns]),
+            on="neighbourhood",
+            how="left",
+            maintain_order="left",
+        ).select(ses_columns + lag_columns)
 
-    # Map clusters to SES labels
-    # [https://scikit-learn.org/stable/modules/generated/sklearn.cluster.KMeans.html#sklearn.cluster.KMeans.labels_]
-    label_map = {0: "High Opportunity", 1: "Medium Opportunity", 2: "Low Opportunity"}
+    # Convert the selected SES columns to a float array
+    X = features.to_numpy().astype(float)
+
+    # Incremental refresh: assign neighbourhoods from the persisted model instead of refitting
+    model_path = "data/02-analysis_data/cluster_model.json"
+    model = load_cluster_model(model_path) if incremental else None
+    if model is not None and model["feature_columns"] == features.columns:
+        print(f"Assigning clusters from the saved model ({model_path}).")
+        label_map = model["label_map"]
+        labels = predict_clusters(model, X)
+    else:
+        # Scale features so each has mean=0, std=1 (prevents any one feature dominating)
+        # The shared transform (scaling + SVD) is cached by feature hash and reused by 08.0
+        # [https://scikit-learn.org/stable/modules/generated/sklearn.preprocessing.StandardScaler.html]
+        transform = load_or_fit_transform(X, features.columns)
+        X_scaled = transform["scaled"]
+
+        # Find the best K via silhouette score (higher is better: range [-1,1])
+        # [https://scikit-learn.org/stable/modules/generated/sklearn.metrics.silhouette_score.html]
+        # Pairwise distances are computed once and shared by every K
+        with span("select_k"):
+            metrics = ClusterMetrics(X_scaled)
+            best_k, best_score = 3, -1
+            for k in range(2, 7):
+                labels = KMeans(n_clusters=k, random_state=42).fit_predict(X_scaled)
+                score = metrics.score(labels)["Silhouette"]
+                print(f"K = {k} silhouette={score:.3f}")
+                if score > best_score:
+                    best_k, best_score = k, score
+        print(f"Best K = {best_k} (silhouette={best_score:.3f})\n")
+
+        #### K-means Cluster Model ####
+        # Fit K-Means (K = 3), attach integer cluster labels
+        # [https://scikit-learn.org/stable/modules/generated/sklearn.cluster.KMeans.html#sklearn.cluster.KMeans.labels]
+        with span("fit"):
+            kmeans = KMeans(n_clusters=3, random_state=42).fit(X_scaled)
+        labels = kmeans.labels_  # cluster ∈ {0,1,2}
+
+        # Map clusters to SES labels
+        # [https://scikit-learn.org/stable/modules/generated/sklearn.cluster.KMeans.html#sklearn.cluster.KMeans.labels_]
+        label_map = {
+            0: "High Opportunity",
+            1: "Medium Opportunity",
+            2: "Low Opportunity",
+        }
+
+        # Persist scaling + centroids so incremental refreshes reuse this exact model
+        save_cluster_model(
+            model_path,
+            features.columns,
+            transform["mean"],
+            transform["scale"],
+            kmeans,
+            label_map,
+        )
 
     profiles = profiles.with_columns(
-        pl.Series("cluster", kmeans.labels_),
+        pl.Series("cluster", labels),
         pl.Series(
             "opportunity_index",  # renamed qualitative category
-            [label_map[c] for c in kmeans.labels_],
+            [label_map[c] for c in labels],
         ),
     )
 
@@ -122,12 +168,19 @@ def main():
     print(clustered)
 
     #### Save cluster data ####
-    profiles.select(["neighbourhood", "cluster", "opportunity_index"]).write_csv(
-        "data/02-analysis_data/03-cluster_neighbourhoods.csv"
+    write_csv(
+        profiles.select(["neighbourhood", "cluster", "opportunity_index"]),
+        "data/02-analysis_data/03-cluster_neighbourhoods.csv",
     )
 
-    # Append cluster info back to merged_data
-    profiles.write_csv("data/02-analysis_data/02-analysis_data_merged.csv")
+    # Append cluster info back to merged_data (this stage's own input: the atomic write means
+    # a crash here leaves the previous merged file intact)
+    write_csv(profiles, "data/02-analysis_data/02-analysis_data_merged.csv")
+
+    # Compact layout (opt-in): the same table with UInt32 counts, Float32 rates and Enum labels
+    if layout == "compact":
+        print(memory_report({"merged": profiles}))
+        write_parquet(compact_frame(profiles), MERGED_COMPACT_PATH)
 
 
 #### ENTRY POINT ####
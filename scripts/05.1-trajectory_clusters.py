@@ -0,0 +1,119 @@
+#### Preamble ####
+# Purpose: Clusters neighbourhood crime trajectories (every year from 2014 in the raw data) with dynamic time warping.
+# Author: Mike Cowan
+# Date: 19 May 2025
+# Contact: m.cowan@mail.utoronto.ca
+# License: MIT
+# Pre-requisites:
+# - `polars` must be installed (pip install polars)
+# - `numpy` must be installed (pip install numpy)
+# - Clusters from 05.0 (optional, used for the cross-tabulation)
+# References:
+# - [https://en.wikipedia.org/wiki/Dynamic_time_warping]
+# - [https://en.wikipedia.org/wiki/Silhouette_(clustering)]
+
+#### Workspace setup ####
+import polars as pl
+import numpy as np
+import time  # inherent to Python
+from pathlib import Path  # inherent to Python
+
+from utils.artifacts import write_csv
+from utils.config import analyzed_crimes, load_city
+from utils.metrics import silhouette_precomputed
+from utils.schema import detect_years, normalize_names
+from utils.trajectory import cross_dtw, kmedoids_dtw, znormalize
+
+
+#### MAIN FUNCTION ####
+def main():
+    print("Clustering neighbourhood crime trajectories.")
+
+    #### 05.1-trajectory_clusters.py ####
+    #### Build the neighbourhood x crime x year tensor ####
+    city = load_city()
+    crime_raw = pl.read_csv(city["portal"]["packages"]["crime"]["path"])
+    crime_types = analyzed_crimes()
+    years = detect_years(crime_raw.columns, crime_types, start_year=2014)
+    print(f"Years: {years[0]}–{years[-1]}")
+    rate_columns = [
+        f"{crime.upper()}_RATE_{year}" for crime in crime_types for year in years
+    ]
+
+    neighbourhoods = normalize_names(crime_raw[city["area_column"]].to_list())
+    rates = crime_raw.select(rate_columns).fill_null(0.0).to_numpy().astype(float)
+    tensor = rates.reshape(len(neighbourhoods), len(crime_types), len(years))
+
+    # Shape-based comparison: each (neighbourhood, crime) series is z-scored
+    X = znormalize(tensor)
+    window = 2  # warping window (years) either side of the diagonal
+
+    #### Choose K via silhouette on the DTW distance matrix ####
+    # Full pairwise matrix is only built here, where n is small; it runs in parallel row blocks
+    start = time.perf_counter()
+    distances = cross_dtw(X, X, window=window)
+    print(
+        f"Pairwise DTW for {len(X)} trajectories in {time.perf_counter() - start:.2f}s"
+    )
+    for k in range(2, 7):
+        labels, _, _, _ = kmedoids_dtw(X, k, window=window)
+        score = silhouette_precomputed(distances, labels)
+        print(f"K = {k} silhouette={score:.3f}")
+
+    #### Fit K = 3 to compare with the opportunity clusters ####
+    start = time.perf_counter()
+    labels, medoids, medoid_distance, pruned = kmedoids_dtw(X, 3, window=window)
+    print(
+        f"k-medoids fit in {time.perf_counter() - start:.2f}s "
+        f"({pruned:.0%} of assignment DTW calls pruned by LB_Keogh)"
+    )
+
+    trajectories = pl.DataFrame(
+        {
+            "neighbourhood": neighbourhoods,
+            "trajectory_cluster": labels,
+            "medoid_distance": medoid_distance,
+            "is_medoid": np.isin(np.arange(len(labels)), medoids),
+        }
+    )
+
+    # Cross-tabulate against the SES clusters when 05.0 has run
+    cluster_path = Path("data/02-analysis_data/03-cluster_neighbourhoods.csv")
+    if cluster_path.exists():
+        crosstab = (
+            trajectories.join(pl.read_csv(cluster_path), on="neighbourhood", how="left")
+            .group_by(["trajectory_cluster", "opportunity_index"])
+            .len()
+            .pivot(index="trajectory_cluster", on="opportunity_index", values="len")
+            .sort("trajectory_cluster")
+        )
+        print("Trajectory clusters vs. opportunity clusters:")
+        print(crosstab)
+
+    # Medoid trajectories (raw rates) in long format for plotting
+    medoid_long = pl.DataFrame(
+        [
+            {
+                "trajectory_cluster": k,
+                "neighbourhood": neighbourhoods[m],
+                "crime": crime,
+                "year": year,
+                "rate": tensor[m, c, t],
+            }
+            for k, m in enumerate(medoids)
+            for c, crime in enumerate(crime_types)
+            for t, year in enumerate(years)
+        ]
+    )
+
+    #### Save data ####
+    write_csv(trajectories, "data/02-analysis_data/09-trajectory_clusters.csv")
+    write_csv(medoid_long, "data/02-analysis_data/10-trajectory_medoids.csv")
+
+
+#### ENTRY POINT ####
+if __name__ == "__main__":
+    main()
+    print(
+        "Trajectory clusters saved to data/02-analysis_data/09-trajectory_clusters.csv."
+    )
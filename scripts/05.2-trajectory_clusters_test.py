@@ -0,0 +1,84 @@
+#### Preamble ####
+# Purpose: Tests the vectorized DTW, LB_Keogh bound and DTW k-medoids helpers.
+# Author: Mike Cowan
+# Date: 19 May 2025
+# Contact: m.cowan@mail.utoronto.ca
+# License: MIT
+# Pre-requisites:
+# - `numpy` must be installed (pip install numpy)
+# - `pytest` must be installed (pip install pytest); run with "pytest -q"
+# References:
+# - [https://docs.pytest.org/en/stable]
+
+#### Workspace setup ####
+import numpy as np
+import pytest  # test functions across any .py ending with "test"
+
+from utils.trajectory import (
+    cross_dtw,
+    dtw_batch,
+    dtw_to_all,
+    kmedoids_dtw,
+    lb_keogh,
+    znormalize,
+)
+
+
+#### Test data ####
+# 40 areas x 2 crimes x 11 years: half trend upward, half trend downward
+@pytest.fixture
+def trajectories():
+    rng = np.random.default_rng(838)
+    trend = np.linspace(0, 1, 11)
+    up = trend + rng.normal(0, 0.05, (20, 2, 11))
+    down = trend[::-1] + rng.normal(0, 0.05, (20, 2, 11))
+    return znormalize(np.concatenate([up, down]))
+
+
+# Textbook O(T^2) DTW with a Sakoe-Chiba band, one pair at a time
+def naive_dtw(a, b, window):
+    T = len(a)
+    D = np.full((T + 1, T + 1), np.inf)
+    D[0, 0] = 0.0
+    for i in range(1, T + 1):
+        for j in range(max(1, i - window), min(T, i + window) + 1):
+            D[i, j] = (a[i - 1] - b[j - 1]) ** 2 + min(
+                D[i - 1, j], D[i, j - 1], D[i - 1, j - 1]
+            )
+    return D[T, T]
+
+
+# The batched DTW matches the naive recursion
+def test_dtw_batch_matches_naive():
+    rng = np.random.default_rng(1)
+    Q, S = rng.normal(size=(5, 9)), rng.normal(size=(5, 9))
+    for window in [0, 2, None]:
+        expected = [
+            naive_dtw(q, s, 9 if window is None else window) for q, s in zip(Q, S)
+        ]
+        assert np.allclose(dtw_batch(Q, S, window), expected)
+
+
+# LB_Keogh never exceeds the true DTW distance
+def test_lb_keogh_is_lower_bound(trajectories):
+    for window in [0, 2]:
+        bound = lb_keogh(trajectories[0], trajectories, window)
+        exact = dtw_to_all(trajectories[0], trajectories, window)
+        assert np.all(bound <= exact + 1e-9)
+
+
+# Serial and multi-process pairwise matrices agree (and are symmetric with a zero diagonal)
+def test_cross_dtw_parallel(trajectories):
+    serial = cross_dtw(trajectories, trajectories, window=2, n_jobs=1)
+    parallel = cross_dtw(trajectories, trajectories, window=2, n_jobs=2)
+    assert np.allclose(serial, parallel)
+    assert np.allclose(serial, serial.T)
+    assert np.allclose(np.diag(serial), 0)
+
+
+# k-medoids separates upward from downward trajectories
+def test_kmedoids_recovers_groups(trajectories):
+    labels, medoids, _, pruned = kmedoids_dtw(trajectories, 2, window=2, n_jobs=1)
+    assert len(set(labels[:20])) == 1 and len(set(labels[20:])) == 1
+    assert labels[0] != labels[-1]
+    assert 0 <= pruned <= 1
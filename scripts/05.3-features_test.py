@@ -0,0 +1,59 @@
+#### Preamble ####
+# Purpose: Tests the shared feature transform against scikit-learn's StandardScaler and PCA.
+# Author: Mike Cowan
+# Date: 19 May 2025
+# Contact: m.cowan@mail.utoronto.ca
+# License: MIT
+# Pre-requisites:
+# - `numpy` must be installed (pip install numpy)
+# - `scikit-learn` must be installed (pip install scikit-learn)
+# - `pytest` must be installed (pip install pytest); run with "pytest -q"
+# References:
+# - [https://docs.pytest.org/en/stable]
+
+#### Workspace setup ####
+import numpy as np
+import pytest  # test functions across any .py ending with "test"
+from sklearn.decomposition import PCA
+from sklearn.preprocessing import StandardScaler
+
+from utils.features import feature_hash, load_or_fit_transform
+
+
+#### Test data ####
+@pytest.fixture
+def features():
+    rng = np.random.default_rng(838)
+    X = rng.normal(size=(60, 4)) @ rng.normal(size=(4, 4)) + [0.3, 0.2, 8.0, 90_000]
+    return X, ["education_rate", "prop_single_parent", "unemployment_rate", "income"]
+
+
+#### Tests ####
+# One SVD reproduces the scaler, the 2-D projection and the full PCA spectrum
+def test_transform_matches_sklearn(features, tmp_path):
+    X, columns = features
+    transform = load_or_fit_transform(X, columns, cache_dir=tmp_path)
+    scaled = StandardScaler().fit_transform(X)
+    pca = PCA().fit(scaled)
+
+    np.testing.assert_allclose(transform["scaled"], scaled)
+    np.testing.assert_allclose(
+        transform["scores"][:, :2],
+        PCA(n_components=2).fit_transform(scaled),
+        atol=1e-10,
+    )
+    np.testing.assert_allclose(transform["explained_variance"], pca.explained_variance_)
+    np.testing.assert_allclose(
+        transform["explained_variance_ratio"], pca.explained_variance_ratio_
+    )
+
+
+# Second call is read from the cache; different columns get a different key
+def test_transform_cache(features, tmp_path):
+    X, columns = features
+    first = load_or_fit_transform(X, columns, cache_dir=tmp_path)
+    assert len(list(tmp_path.iterdir())) == 1
+    second = load_or_fit_transform(X, columns, cache_dir=tmp_path)
+    np.testing.assert_array_equal(first["scores"], second["scores"])
+    assert second["columns"] == columns
+    assert feature_hash(X, columns) != feature_hash(X, columns[::-1])
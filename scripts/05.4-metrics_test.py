@@ -0,0 +1,85 @@
+#### Preamble ####
+# Purpose: Tests the cluster-quality metrics engine against scikit-learn.
+# Author: Mike Cowan
+# Date: 19 May 2025
+# Contact: m.cowan@mail.utoronto.ca
+# License: MIT
+# Pre-requisites:
+# - `numpy` must be installed (pip install numpy)
+# - `scikit-learn` must be installed (pip install scikit-learn)
+# - `pytest` must be installed (pip install pytest); run with "pytest -q"
+# References:
+# - [https://docs.pytest.org/en/stable]
+
+#### Workspace setup ####
+import numpy as np
+import pytest  # test functions across any .py ending with "test"
+from sklearn.metrics import (
+    calinski_harabasz_score,
+    davies_bouldin_score,
+    silhouette_score,
+)
+
+from utils.metrics import ClusterMetrics, sampled_silhouette, silhouette_precomputed
+
+
+#### Test data ####
+# Three shifted Gaussian blobs with random labels mixed in
+@pytest.fixture
+def blobs():
+    rng = np.random.default_rng(838)
+    X = rng.normal(size=(150, 3)) + np.repeat([[0, 0, 0], [4, 0, 0], [0, 4, 0]], 50, 0)
+    labels = np.repeat([0, 1, 2], 50)
+    labels[rng.choice(150, 15, replace=False)] = rng.integers(0, 3, 15)
+    return X, labels
+
+
+def sklearn_scores(X, labels):
+    return {
+        "Silhouette": silhouette_score(X, labels),
+        "Davies-Bouldin": davies_bouldin_score(X, labels),
+        "Calinski-Harabasz": calinski_harabasz_score(X, labels),
+    }
+
+
+#### Tests ####
+# All three scores match scikit-learn
+def test_scores_match_sklearn(blobs):
+    X, labels = blobs
+    scores = ClusterMetrics(X).score(labels)
+    for name, expected in sklearn_scores(X, labels).items():
+        assert scores[name] == pytest.approx(expected, rel=1e-9)
+
+
+# Moving a few points incrementally gives the same scores as a full recompute
+def test_incremental_update(blobs):
+    X, labels = blobs
+    metrics = ClusterMetrics(X)
+    metrics.score(labels)
+    moved = labels.copy()
+    moved[:5] = (moved[:5] + 1) % 3
+    updated = metrics.update(moved)
+    for name, expected in sklearn_scores(X, moved).items():
+        assert updated[name] == pytest.approx(expected, rel=1e-9)
+
+
+# Sampling every point is exact; precomputed distances give the same silhouette
+def test_sampled_and_precomputed_silhouette(blobs):
+    X, labels = blobs
+    expected = silhouette_score(X, labels)
+    assert sampled_silhouette(X, labels, sample_size=len(X)) == pytest.approx(expected)
+    assert abs(sampled_silhouette(X, labels, sample_size=60) - expected) < 0.1
+    D = ClusterMetrics(X).D
+    assert silhouette_precomputed(D, labels) == pytest.approx(expected)
+
+
+# Noise points (-1) are left out: scores equal scikit-learn's on the clustered points alone
+def test_noise_excluded(blobs):
+    X, labels = blobs
+    labels = labels.copy()
+    labels[::10] = -1
+    clustered = labels >= 0
+    scores = ClusterMetrics(X).score_clustered(labels)
+    expected = sklearn_scores(X[clustered], labels[clustered])
+    for name, value in expected.items():
+        assert scores[name] == pytest.approx(value)
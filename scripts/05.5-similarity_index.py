@@ -0,0 +1,102 @@
+#### Preamble ####
+# Purpose: Builds (or reuses) the SES similarity index and lists each neighbourhood's most similar neighbourhoods.
+# Author: Mike Cowan
+# Date: 19 May 2025
+# Contact: m.cowan@mail.utoronto.ca
+# License: MIT
+# Pre-requisites:
+# - `polars`, `numpy` and `scikit-learn` must be installed
+# - Run after 05.0 (opportunity_index in the merged data); same SES columns, so the scaled
+#   features come from 05.0's cached transform
+# Usage:
+# - python scripts/05.5-similarity_index.py --like annex --k 5 [--radius 0.5]
+# Output:
+# - data/02-analysis_data/22-similar_neighbourhoods.csv: neighbourhood, rank, similar, distance,
+#   and both opportunity clusters
+# References:
+# - [https://scikit-learn.org/stable/modules/generated/sklearn.neighbors.KDTree.html]
+
+#### Workspace setup ####
+import argparse  # inherent to Python
+import time  # inherent to Python
+
+import polars as pl
+
+from utils.artifacts import write_csv
+from utils.schema import normalize_names
+from utils.similarity import load_or_build_index
+
+
+#### MAIN FUNCTION ####
+def main(like=None, k=5, radius=None):
+    print("Indexing neighbourhood SES profiles for similarity queries.")
+
+    #### 05.5-similarity_index.py ####
+    #### Load SES features ####
+    profiles = pl.read_csv("data/02-analysis_data/02-analysis_data_merged.csv")
+    ses_columns = [
+        "education_rate",
+        "prop_single_parent",
+        "unemployment_rate",
+        "median_income",
+    ]
+    X = profiles.select(ses_columns).to_numpy().astype(float)
+    names = profiles["neighbourhood"].to_list()
+
+    #### Build or load the index (rebuilt only when the features change) ####
+    start = time.perf_counter()
+    index = load_or_build_index(X, ses_columns, names)
+    print(f"Index {index.key} ready in {1000 * (time.perf_counter() - start):.1f}ms.")
+
+    #### Top-k for every neighbourhood (one batch query) ####
+    clusters = profiles.select("neighbourhood", "opportunity_index")
+    similar = (
+        index.query(names, k=k)
+        .rename({"neighbourhood": "similar", "query": "neighbourhood"})
+        .join(clusters, on="neighbourhood", how="left")
+        .join(
+            clusters.rename(
+                {
+                    "neighbourhood": "similar",
+                    "opportunity_index": "similar_opportunity_index",
+                }
+            ),
+            on="similar",
+            how="left",
+        )
+        .with_columns(pl.col("distance").round(4))
+    )
+    agreement = similar.filter(
+        pl.col("opportunity_index") == pl.col("similar_opportunity_index")
+    ).height / max(similar.height, 1)
+    print(f"{agreement:.1%} of top-{k} neighbours share the opportunity cluster.")
+
+    #### Ad hoc lookup ####
+    if like is not None:
+        like = normalize_names([like])[0]
+        start = time.perf_counter()
+        matches = (
+            index.within(like, radius) if radius is not None else index.similar(like, k)
+        )
+        elapsed = 1000 * (time.perf_counter() - start)
+        print(f"Most similar to {like} ({elapsed:.3f}ms):")
+        for name, distance in matches:
+            print(f"  {name:<45} {distance:.3f}")
+
+    #### Save data ####
+    write_csv(similar, "data/02-analysis_data/22-similar_neighbourhoods.csv")
+
+
+#### ENTRY POINT ####
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="SES similarity index")
+    parser.add_argument("--like", default=None, help="neighbourhood to look up")
+    parser.add_argument("--k", type=int, default=5, help="neighbours per query")
+    parser.add_argument(
+        "--radius", type=float, default=None, help="standardized distance cut-off"
+    )
+    args = parser.parse_args()
+    main(like=args.like, k=args.k, radius=args.radius)
+    print(
+        "Similar neighbourhoods saved to data/02-analysis_data/22-similar_neighbourhoods.csv."
+    )
@@ -0,0 +1,103 @@
+#### Preamble ####
+# Purpose: Tests the SES similarity index (exact neighbours, radius and batch queries, hash-keyed cache).
+# Author: Mike Cowan
+# Date: 19 May 2025
+# Contact: m.cowan@mail.utoronto.ca
+# License: MIT
+# Pre-requisites:
+# - `numpy`, `polars` and `scikit-learn` must be installed
+# - `pytest` must be installed (pip install pytest); run with "pytest -q"
+# References:
+# - [https://docs.pytest.org/en/stable]
+
+#### Workspace setup ####
+import numpy as np
+import pytest  # test functions across any .py ending with "test"
+
+from utils.similarity import load_or_build_index
+
+COLUMNS = ["education_rate", "prop_single_parent", "unemployment_rate", "median_income"]
+
+
+#### Test data ####
+@pytest.fixture
+def profiles():
+    rng = np.random.default_rng(838)
+    X = np.column_stack(
+        [
+            rng.uniform(0.2, 0.8, 300),
+            rng.uniform(0.05, 0.3, 300),
+            rng.uniform(3, 15, 300),
+            rng.uniform(40_000, 150_000, 300),
+        ]
+    )
+    names = [f"area-{i:03d}" for i in range(300)]
+    return X, names
+
+
+@pytest.fixture
+def index(profiles, tmp_path):
+    X, names = profiles
+    return load_or_build_index(
+        X, COLUMNS, names, tmp_path / "similarity", tmp_path / "features"
+    )
+
+
+# Brute-force distances on the standardized features
+def brute_force(X, row):
+    scaled = (X - X.mean(axis=0)) / X.std(axis=0)
+    distances = np.sqrt(((scaled - scaled[row]) ** 2).sum(axis=1))
+    distances[row] = np.inf
+    return distances
+
+
+#### Tests ####
+def test_similar_matches_brute_force(profiles, index):
+    X, names = profiles
+    distances = brute_force(X, 17)
+    expected = np.argsort(distances)[:5]
+    result = index.similar("area-017", k=5)
+    assert [name for name, _ in result] == [names[i] for i in expected]
+    np.testing.assert_allclose([d for _, d in result], distances[expected])
+    with pytest.raises(KeyError):
+        index.similar("nowhere")
+
+
+def test_within_radius(profiles, index):
+    X, names = profiles
+    distances = brute_force(X, 3)
+    result = index.within("area-003", 0.8)
+    assert {name for name, _ in result} == {
+        names[i] for i in np.flatnonzero(distances <= 0.8)
+    }
+    assert [d for _, d in result] == sorted(d for _, d in result)
+
+
+# Batch queries by name equal single queries; raw profiles are scaled by the index
+def test_batch_queries(profiles, index):
+    X, names = profiles
+    batch = index.query(names[:10], k=3)
+    assert batch.height == 30
+    for name in names[:10]:
+        single = [n for n, _ in index.similar(name, k=3)]
+        rows = batch.filter(batch["query"] == name).sort("rank")
+        assert rows["neighbourhood"].to_list() == single
+
+    by_profile = index.query(profiles=X[[5, 6]], k=1)
+    assert by_profile["neighbourhood"].to_list() == ["area-005", "area-006"]
+    assert by_profile["distance"].max() == pytest.approx(0.0, abs=1e-9)
+
+
+# The pickled index is reused until the features (or names) change
+def test_cache_keyed_on_features(profiles, index, tmp_path):
+    X, names = profiles
+    args = (tmp_path / "similarity", tmp_path / "features")
+    again = load_or_build_index(X, COLUMNS, names, *args)
+    assert again.key == index.key
+    assert len(list((tmp_path / "similarity").glob("*.pkl"))) == 1
+
+    changed = X.copy()
+    changed[0, 3] += 1_000
+    rebuilt = load_or_build_index(changed, COLUMNS, names, *args)
+    assert rebuilt.key != index.key
+    assert len(list((tmp_path / "similarity").glob("*.pkl"))) == 2
@@ -1,119 +1,193 @@
+#### Preamble ####
+# Purpose: Tabulates average crime rates and year-over-year changes by opportunity cluster.
+# Author: Mike Cowan
+# Date: 19 May 2025
+# Contact: m.cowan@mail.utoronto.ca
+# License: MIT
+# Pre-requisites:
+# - `polars` must be installed (pip install polars)
+# - With `incremental=True`, only years missing from 04-cluster_crime_rates.csv are computed
+# - With `engine="duckdb"`, cluster averages are computed in SQL against the DuckDB store (see 04.0)
+# - With `rates="smoothed"`, cluster averages use the empirical-Bayes rates from 03.4 (Polars engine)
+#   and are written next to the raw tables with a `_smoothed` suffix (see utils/smoothing.py)
+# - With `layout="compact"`, reads the compact merged Parquet written by 05.0 (see utils/layout.py)
+
 #### Workspace setup ####
 import polars as pl
 import itertools  # for crime-year pairs
 from pathlib import Path
 
+from utils.artifacts import write_csv
+from utils.config import analyzed_crimes
+from utils.layout import read_merged
+from utils.profiling import span, track_frame
+from utils.schema import detect_years
+from utils.smoothing import rates_path, use_rates
+from utils.warehouse import cluster_rates, connect, write_table
+
 
 #### MAIN FUNCTION ####
-def main():
-    print("Generating crime trends by neighbourhood clusters (2019–2024).")
+def main(incremental=False, engine="polars", rates="raw", layout="wide"):
+    print("Generating crime trends by neighbourhood clusters.")
 
     #### 06.0-table_crime_clusters.py ####
     #### Load data ####
-    merged_data = pl.read_csv("data/02-analysis_data/02-analysis_data_merged.csv")
+    with span("load"):
+        merged_data = read_merged(layout)
+    track_frame("merged", merged_data)
 
     # Set parameters
     cluster_col = (
         "opportunity_index"  # SES cluster label (0 = High, 1 = Medium, 2 = Low)
     )
-    crime_types = ["assault", "robbery", "breakenter", "shooting"]  # crime categories
-    years = list(range(2019, 2025))  # inclusive year range
-
-    # Collect yearly summaries for each crime type and cluster
-    summaries = []
-    for crime, year in itertools.product(crime_types, years):
-        col_name = f"{crime}_rate_{year}"
-        if col_name not in merged_data.columns:
-            continue  # skip if rate column is missing
-
-        avg_rate = (
-            merged_data.select([cluster_col, col_name])
-            .group_by(cluster_col)
-            .agg(pl.mean(col_name).alias("avg_rate"))
-            .with_columns([pl.lit(crime).alias("crime"), pl.lit(year).alias("year")])
-        )
-        summaries.append(avg_rate)
-
-    # Combine into long format DF
-    all_rates = pl.concat(summaries)
+    crime_types = analyzed_crimes()  # crime categories
+    years = detect_years(merged_data.columns, crime_types)  # e.g., 2019–2024
+
+    # Raw City rates or smoothed rates (small counts shrunk towards the city mean; see 03.4)
+    if rates != "raw" and engine == "duckdb":
+        raise ValueError("Smoothed rates are only available with the Polars engine.")
+    merged_data = use_rates(merged_data, rates, crime_types, years)
+
+    # Incremental refresh: keep the rows already tabulated and only add the new years
+    # (plus the last tabulated year before the first new one, which the percent change needs)
+    table_path = rates_path("data/02-analysis_data/04-cluster_crime_rates.csv", rates)
+    previous_df = None
+    new_years = years
+    if incremental and table_path.exists():
+        previous_df = pl.read_csv(table_path)
+        done_years = set(previous_df["year"].unique().to_list())
+        new_years = [y for y in years if y not in done_years]
+        if not new_years:
+            print("Cluster crime-rate table already covers every year.")
+            return
+        print(f"Tabulating new years: {new_years}")
+        earlier = [y for y in done_years if y < new_years[0]]
+        if earlier:
+            new_years = [max(earlier), *new_years]
+
+    with span("aggregate"):
+        if engine == "duckdb":
+            # One SQL join + group-by over the long crime_rates table replaces the per-column loop
+            with connect() as con:
+                write_table(
+                    con,
+                    "clusters",
+                    "data/02-analysis_data/03-cluster_neighbourhoods.csv",
+                )
+                all_rates = cluster_rates(con, crime_types, new_years, cluster_col)
+        else:
+            # Collect yearly summaries for each crime type and cluster
+            summaries = []
+            for crime, year in itertools.product(crime_types, new_years):
+                col_name = f"{crime}_rate_{year}"
+                if col_name not in merged_data.columns:
+                    continue  # skip if rate column is missing
+
+                avg_rate = (
+                    merged_data.select([cluster_col, col_name])
+                    .group_by(cluster_col)
+                    # Float64 accumulation whether the column is stored wide or compact
+                    .agg(pl.col(col_name).cast(pl.Float64).mean().alias("avg_rate"))
+                    .with_columns(
+                        [pl.lit(crime).alias("crime"), pl.lit(year).alias("year")]
+                    )
+                )
+                summaries.append(avg_rate)
+
+            # Combine into long format DF
+            all_rates = pl.concat(summaries)
 
     #### Pivot wider: one row per (crime, year), columns = clusters ####
-    wide_df = all_rates.pivot(
-        index=["crime", "year"], on=cluster_col, values="avg_rate"
-    ).sort(["crime", "year"])
-
-    #### Compute year-to-year percent change for each consecutive year ####
-    cluster_cols = [c for c in wide_df.columns if c not in ["crime", "year"]]
-    pct_change_exprs = []
-    for col in cluster_cols:
-        for prev_year, curr_year in zip(years[:-1], years[1:]):
-            pct_name = f"{col}_pct_{prev_year}_{curr_year}"
-            expr = (
-                pl.when(pl.col("year") == curr_year)
-                .then(
-                    (
-                        (pl.col(col) - pl.col(col).shift(1).over("crime"))
-                        / pl.col(col).shift(1).over("crime")
-                        * 100
-                    ).round(1)
+    with span("transform"):
+        wide_df = all_rates.pivot(
+            index=["crime", "year"], on=cluster_col, values="avg_rate"
+        ).sort(["crime", "year"])
+
+        #### Compute year-to-year percent change for each consecutive year ####
+        cluster_cols = [c for c in wide_df.columns if c not in ["crime", "year"]]
+        pct_change_exprs = []
+        for col in cluster_cols:
+            for prev_year, curr_year in zip(new_years[:-1], new_years[1:]):
+                pct_name = f"{col}_pct_{prev_year}_{curr_year}"
+                expr = (
+                    pl.when(pl.col("year") == curr_year)
+                    .then(
+                        (
+                            (pl.col(col) - pl.col(col).shift(1).over("crime"))
+                            / pl.col(col).shift(1).over("crime")
+                            * 100
+                        ).round(1)
+                    )
+                    .alias(pct_name)
                 )
-                .alias(pct_name)
-            )
-            pct_change_exprs.append(expr)
-    wide_df = wide_df.with_columns(pct_change_exprs)
+                pct_change_exprs.append(expr)
+        wide_df = wide_df.with_columns(pct_change_exprs)
+
+        # Stitch the new rows onto the existing table (new percent-change columns start empty),
+        # with the columns in the order a full run writes them
+        if previous_df is not None:
+            wide_df = wide_df.filter(~pl.col("year").is_in(done_years))
+            wide_df = pl.concat([previous_df, wide_df], how="diagonal_relaxed")
+            pct_cols = [
+                f"{col}_pct_{prev_year}_{curr_year}"
+                for col in cluster_cols
+                for prev_year, curr_year in zip(years[:-1], years[1:])
+            ]
+            ordered = ["crime", "year", *cluster_cols, *pct_cols]
+            wide_df = wide_df.select(
+                [c for c in ordered if c in wide_df.columns]
+                + [c for c in wide_df.columns if c not in ordered]
+            ).sort(["crime", "year"])
 
     #### Save to CSV ####
-    Path("data/02-analysis_data").mkdir(parents=True, exist_ok=True)
-    wide_df.write_csv("data/02-analysis_data/04-cluster_crime_rates.csv")
-
-    #### Separate Tables by Crime ####
-    cluster_labels = ["Low Opportunity", "Medium Opportunity", "High Opportunity"]
-    years = list(range(2019, 2025))
-    crime_types = ["assault", "robbery", "breakenter", "shooting"]
-
-    #### Separate Tables by Crime ####
-    cluster_labels = ["Low Opportunity", "Medium Opportunity", "High Opportunity"]
-    years = list(range(2019, 2025))
-    crime_types = ["assault", "robbery", "breakenter", "shooting"]
-
-    for crime in crime_types:
-        records = []
-        for y in years:
-            row = wide_df.filter((pl.col("crime") == crime) & (pl.col("year") == y))
-            if row.is_empty():
-                continue
-            data = row.to_dicts()[0]
-
-            rec = {"Year": y}
-            for label in cluster_labels:
-                rate = data[label]
-                if y == 2019:
-                    # 2019: just show the base rate
-                    rec[label] = f"{rate:.1f}"
-                else:
-                    pct = data[f"{label}_pct_{y-1}_{y}"]
-                    sign = "+" if pct >= 0 else ""
-                    rec[label] = f"{rate:.1f} ({sign}{pct:.1f})"
-            records.append(rec)
-
-        table = pl.DataFrame(records).rename(
-            {
-                "Low Opportunity": "Low",
-                "Medium Opportunity": "Med",
-                "High Opportunity": "High",
-            }
-        )
-
-        # Display header and table
-        print(f"### {crime.title()} Rate Change")
-        print(table)
-
-        # Save each crime to its own CSV
-        Path("data/03-table_data").mkdir(parents=True, exist_ok=True)
-        table.write_csv(f"data/03-table_data/{crime}_rate_change.csv")
+    with span("save"):
+        Path("data/02-analysis_data").mkdir(parents=True, exist_ok=True)
+        write_csv(wide_df, table_path)
+
+        #### Separate Tables by Crime ####
+        cluster_labels = ["Low Opportunity", "Medium Opportunity", "High Opportunity"]
+
+        for crime in crime_types:
+            records = []
+            # Changes are against the previous detected year (releases can skip a year)
+            for prev_year, y in zip([None, *years[:-1]], years):
+                row = wide_df.filter((pl.col("crime") == crime) & (pl.col("year") == y))
+                if row.is_empty():
+                    continue
+                data = row.to_dicts()[0]
+
+                rec = {"Year": y}
+                for label in cluster_labels:
+                    rate = data[label]
+                    if prev_year is None:
+                        # Baseline year (2019): just show the base rate
+                        rec[label] = f"{rate:.1f}"
+                    else:
+                        pct = data[f"{label}_pct_{prev_year}_{y}"]
+                        sign = "+" if pct >= 0 else ""
+                        rec[label] = f"{rate:.1f} ({sign}{pct:.1f})"
+                records.append(rec)
+
+            table = pl.DataFrame(records).rename(
+                {
+                    "Low Opportunity": "Low",
+                    "Medium Opportunity": "Med",
+                    "High Opportunity": "High",
+                }
+            )
+
+            # Display header and table
+            print(f"### {crime.title()} Rate Change")
+            print(table)
+
+            # Save each crime to its own CSV
+            Path("data/03-table_data").mkdir(parents=True, exist_ok=True)
+            write_csv(
+                table, rates_path(f"data/03-table_data/{crime}_rate_change.csv", rates)
+            )
 
 
 #### ENTRY POINT ####
 if __name__ == "__main__":
     main()
-    print("Crime trends by neighbourhood clusters (2019–2024) have been generated.")
+    print("Crime trends by neighbourhood clusters have been generated.")
@@ -0,0 +1,88 @@
+#### Preamble ####
+# Purpose: Tests cluster differences in crime rates with permutation p-values and bootstrap intervals.
+# Author: Mike Cowan
+# Date: 19 May 2025
+# Contact: m.cowan@mail.utoronto.ca
+# License: MIT
+# Pre-requisites:
+# - `polars` must be installed (pip install polars)
+# - `numpy` must be installed (pip install numpy)
+# - Clusters assigned by 05.0 (`opportunity_index` in the merged data)
+# References:
+# - [https://en.wikipedia.org/wiki/Permutation_test]
+
+#### Workspace setup ####
+import polars as pl
+import time  # inherent to Python
+from pathlib import Path  # inherent to Python
+
+from utils.artifacts import write_csv
+from utils.config import analyzed_crimes
+from utils.permutation import contrast_table
+from utils.schema import detect_years
+
+
+#### MAIN FUNCTION ####
+def main():
+    print("Testing crime rate differences between opportunity clusters.")
+
+    #### 06.1-permutation_tests.py ####
+    #### Load data ####
+    merged_data = pl.read_csv("data/02-analysis_data/02-analysis_data_merged.csv")
+    cluster_col = "opportunity_index"
+    cluster_labels = ["Low Opportunity", "Medium Opportunity", "High Opportunity"]
+    crime_types = analyzed_crimes()
+    years = detect_years(merged_data.columns, crime_types)
+    print(f"Years: {years[0]}–{years[-1]}")
+    rate_columns = [f"{crime}_rate_{year}" for crime in crime_types for year in years]
+
+    # Rate matrix (neighbourhoods x crime-years) and integer cluster codes (0 = Low, 1 = Medium, 2 = High)
+    rates = merged_data.select(rate_columns).fill_null(0.0).to_numpy().astype(float)
+    codes = (
+        merged_data.select(
+            pl.col(cluster_col).replace_strict(
+                {label: i for i, label in enumerate(cluster_labels)},
+                return_dtype=pl.Int64,
+            )
+        )
+        .to_series()
+        .to_numpy()
+    )
+
+    #### Permutation tests + bootstrap CIs ####
+    # 10,000 label shuffles and 10,000 stratified resamples, 2,000 at a time
+    start = time.perf_counter()
+    tests = contrast_table(
+        rate_columns,
+        cluster_labels,
+        rates,
+        codes,
+        permutations=10_000,
+        resamples=10_000,
+        chunk_size=2_000,
+    )
+    print(f"Ran {tests.height} contrasts in {time.perf_counter() - start:.2f}s")
+
+    # Split "assault_rate_2019" into crime and year columns
+    tests = tests.with_columns(
+        pl.col("variable").str.extract(r"^(\w+?)_rate_", 1).alias("crime"),
+        pl.col("variable").str.extract(r"_(\d{4})$", 1).cast(pl.Int64).alias("year"),
+    ).select(["crime", "year", pl.exclude("crime", "year", "variable")])
+
+    print(
+        tests.filter(pl.col("q_value") < 0.05)
+        .select(["crime", "year", "cluster_a", "cluster_b", "difference", "p_value"])
+        .with_columns(pl.col("difference").round(1))
+    )
+
+    #### Save to CSV ####
+    Path("data/02-analysis_data").mkdir(parents=True, exist_ok=True)
+    write_csv(tests, "data/02-analysis_data/08-cluster_contrast_tests.csv")
+
+
+#### ENTRY POINT ####
+if __name__ == "__main__":
+    main()
+    print(
+        "Cluster contrast tests saved to data/02-analysis_data/08-cluster_contrast_tests.csv."
+    )
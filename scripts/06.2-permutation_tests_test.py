@@ -0,0 +1,72 @@
+#### Preamble ####
+# Purpose: Tests the batched permutation test and bootstrap helpers.
+# Author: Mike Cowan
+# Date: 19 May 2025
+# Contact: m.cowan@mail.utoronto.ca
+# License: MIT
+# Pre-requisites:
+# - `numpy` must be installed (pip install numpy)
+# - `pytest` must be installed (pip install pytest); run with "pytest -q"
+# References:
+# - [https://docs.pytest.org/en/stable]
+
+#### Workspace setup ####
+import numpy as np
+import pytest  # test functions across any .py ending with "test"
+
+from utils.permutation import (
+    batched_cluster_means,
+    benjamini_hochberg,
+    contrast_table,
+    permutation_pvalues,
+)
+
+
+#### Test data ####
+# 60 neighbourhoods in 3 clusters; column 0 differs strongly by cluster, column 1 is pure noise
+@pytest.fixture
+def cluster_rates():
+    rng = np.random.default_rng(838)
+    labels = np.repeat([0, 1, 2], 20)
+    shifted = rng.normal(100, 5, 60) + labels * 50
+    noise = rng.normal(100, 5, 60)
+    return np.column_stack([shifted, noise]), labels
+
+
+# Batched means match a plain per-cluster mean
+def test_batched_means_match_numpy(cluster_rates):
+    rates, labels = cluster_rates
+    sizes = np.bincount(labels)
+    means = batched_cluster_means(labels[None, :], rates, 3, sizes)[0]
+    for k in range(3):
+        assert np.allclose(means[k], rates[labels == k].mean(axis=0))
+
+
+# Real differences get tiny p-values; noise does not
+def test_permutation_pvalues(cluster_rates):
+    rates, labels = cluster_rates
+    pairs, _, _, p_values = permutation_pvalues(
+        rates, labels, permutations=2_000, chunk_size=500
+    )
+    assert pairs == [(0, 1), (0, 2), (1, 2)]
+    assert np.all(p_values[:, 0] < 0.01)
+    assert np.all(p_values[:, 1] > 0.01)
+    assert np.all((p_values > 0) & (p_values <= 1))
+
+
+# The bootstrap interval should bracket the observed difference
+def test_contrast_table_intervals(cluster_rates):
+    rates, labels = cluster_rates
+    table = contrast_table(
+        ["shifted", "noise"], ["a", "b", "c"], rates, labels, 1_000, 1_000, 250
+    )
+    assert table.height == 6
+    assert (table["difference_low"] <= table["difference"]).all()
+    assert (table["difference"] <= table["difference_high"]).all()
+    assert (table["q_value"] >= table["p_value"]).all()
+
+
+# Benjamini-Hochberg keeps the ordering of p-values and never goes above 1
+def test_benjamini_hochberg():
+    q_values = benjamini_hochberg([0.01, 0.04, 0.03, 0.5])
+    assert np.allclose(q_values, [0.04, 0.16 / 3, 0.16 / 3, 0.5])
@@ -0,0 +1,82 @@
+#### Preamble ####
+# Purpose: Tests that the DuckDB store's SQL aggregation matches the Polars path in 06.0.
+# Author: Mike Cowan
+# Date: 19 May 2025
+# Contact: m.cowan@mail.utoronto.ca
+# License: MIT
+# Pre-requisites:
+# - `polars` must be installed (pip install polars)
+# - `duckdb` is optional; the store tests are skipped without it
+# - `pytest` must be installed (pip install pytest); run with "pytest -q"
+# References:
+# - [https://docs.pytest.org/en/stable/how-to/skipping.html]
+
+#### Workspace setup ####
+import polars as pl
+import pytest  # test functions across any .py ending with "test"
+
+from utils import warehouse
+from utils.warehouse import cluster_rates, connect, write_crime_rates, write_table
+
+
+#### Test data ####
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    pytest.importorskip("duckdb")
+    monkeypatch.chdir(tmp_path)  # temp_directory is relative to the working directory
+    merged = pl.DataFrame(
+        {
+            "neighbourhood": ["a", "b", "c"],
+            "assault_2019": [1, 2, 3],
+            "assault_rate_2019": [100.0, 200.0, 50.0],
+            "assault_rate_2020": [300.0, None, 70.0],
+            "robbery_rate_2019": [10.0, 20.0, 5.0],
+        }
+    )
+    clusters = pl.DataFrame(
+        {
+            "neighbourhood": ["a", "b", "c"],
+            "opportunity_index": [
+                "Low Opportunity",
+                "Low Opportunity",
+                "High Opportunity",
+            ],
+        }
+    )
+    con = connect(tmp_path / "test.duckdb")
+    write_table(con, "merged", merged)
+    write_table(con, "clusters", clusters)
+    write_crime_rates(con, "merged")
+    yield con, merged.join(clusters, on="neighbourhood")
+    con.close()
+
+
+#### Tests ####
+# Long table: only rate columns, one row per (neighbourhood, crime, year)
+def test_crime_rates_long(store):
+    con, _ = store
+    rows = con.execute(
+        "SELECT crime, year, count(*) FROM crime_rates GROUP BY ALL ORDER BY ALL"
+    ).fetchall()
+    assert rows == [("assault", 2019, 3), ("assault", 2020, 3), ("robbery", 2019, 3)]
+
+
+# SQL averages (nulls ignored) equal Polars group-by means
+def test_cluster_rates_match_polars(store):
+    con, merged = store
+    sql = cluster_rates(con, ["assault"], [2020]).sort("opportunity_index")
+    expected = (
+        merged.group_by("opportunity_index")
+        .agg(pl.mean("assault_rate_2020").alias("avg_rate"))
+        .sort("opportunity_index")
+    )
+    assert sql["avg_rate"].to_list() == expected["avg_rate"].to_list()
+    assert sql["avg_rate"].to_list() == [70.0, 300.0]
+
+
+# Without the optional extra, the engine fails with an install hint, not a bare import error
+def test_missing_extra(tmp_path, monkeypatch):
+    monkeypatch.setattr(warehouse, "duckdb", None)
+    assert not warehouse.available()
+    with pytest.raises(ImportError, match="uv sync --extra duckdb"):
+        connect(tmp_path / "test.duckdb")
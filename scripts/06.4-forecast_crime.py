@@ -0,0 +1,130 @@
+#### Preamble ####
+# Purpose: Forecasts neighbourhood crime counts past the last release (Poisson trend per series) and sums them by opportunity cluster.
+# Author: Mike Cowan
+# Date: 19 May 2025
+# Contact: m.cowan@mail.utoronto.ca
+# License: MIT
+# Pre-requisites:
+# - `polars` and `numpy` must be installed
+# - Run after 05.0 (opportunity_index in the merged data)
+# - Fits every neighbourhood x crime series (2014 onwards, raw counts) at once; see utils/forecast.py
+# Output:
+# - data/02-analysis_data/18-crime_forecasts.parquet: neighbourhood, crime, year, forecast, lower, upper
+# - data/02-analysis_data/19-cluster_forecasts.csv: the same summed by opportunity_index, with rates
+#   per 100K on the latest population the release publishes (POPULATION_<year>)
+# References:
+# - [https://docs.pola.rs/api/python/stable/reference/dataframe/api/polars.DataFrame.join.html]
+
+#### Workspace setup ####
+import time  # inherent to Python
+
+import numpy as np
+import polars as pl
+
+from utils.artifacts import write_csv, write_parquet
+from utils.config import load_city
+from utils.forecast import (
+    aggregate_forecasts,
+    fit_trends,
+    forecast_trends,
+    series_matrix,
+)
+from utils.profiling import span
+from utils.schema import detect_years, latest_population_column, normalize_names
+
+
+#### MAIN FUNCTION ####
+def main(horizon=3, level=0.95):
+    print("Forecasting neighbourhood crime counts.")
+
+    #### 06.4-forecast_crime.py ####
+    #### Load data ####
+    city = load_city()
+    crime_raw = pl.read_csv(city["portal"]["packages"]["crime"]["path"])
+    merged_data = pl.read_csv("data/02-analysis_data/02-analysis_data_merged.csv")
+
+    # Every crime and year in the raw release (2014 onwards), not only the analysis years
+    years = detect_years(crime_raw.columns, start_year=2014)
+    crime_types = sorted(
+        {
+            c.split("_")[0].lower()
+            for c in crime_raw.columns
+            if c.endswith(f"_RATE_{years[0]}")
+        }
+    )
+    future = list(range(years[-1] + 1, years[-1] + 1 + horizon))
+    print(f"Fitting {years[0]}–{years[-1]}, forecasting {future[0]}–{future[-1]}.")
+
+    # Same neighbourhood names as the cleaned data, so clusters join on them
+    crime_raw = crime_raw.with_columns(
+        pl.Series("neighbourhood", normalize_names(crime_raw[city["area_column"]]))
+    )
+    keys, counts = series_matrix(crime_raw, crime_types, years)
+
+    #### Fit and forecast every series together ####
+    start = time.perf_counter()
+    with span("fit"):
+        fit = fit_trends(counts, years)
+        forecast = forecast_trends(fit, future, level)
+    print(
+        f"{len(keys)} series ({len(crime_types)} crimes) fitted "
+        f"in {time.perf_counter() - start:.3f}s."
+    )
+
+    #### Neighbourhood forecasts (long) ####
+    neighbourhood_forecasts = pl.concat(
+        [
+            keys.with_columns(
+                pl.lit(year).alias("year"),
+                pl.Series("forecast", forecast["mean"][:, h]),
+                pl.Series("lower", forecast["lower"][:, h]),
+                pl.Series("upper", forecast["upper"][:, h]),
+                pl.Series("annual_change", np.expm1(fit["slope"])),
+            )
+            for h, year in enumerate(future)
+        ]
+    ).sort(["crime", "neighbourhood", "year"])
+
+    #### Sum by opportunity cluster ####
+    clusters = merged_data.select(["neighbourhood", "opportunity_index"])
+    population_column = latest_population_column(crime_raw.columns)
+    if population_column is None:
+        raise ValueError("The crime release has no POPULATION_<year> column.")
+    population = (
+        crime_raw.select("neighbourhood", population_column)
+        .join(clusters, on="neighbourhood")
+        .group_by("opportunity_index")
+        .agg(pl.col(population_column).sum().alias("population"))
+    )
+    cluster_forecasts = (
+        # Forecast rows attach by position, so the join must keep the order of `keys`
+        aggregate_forecasts(
+            keys.join(clusters, on="neighbourhood", how="left", maintain_order="left"),
+            forecast,
+            future,
+            by=["opportunity_index", "crime"],
+            level=level,
+        )
+        .join(population, on="opportunity_index", how="left")
+        .with_columns(
+            (pl.col(column) / pl.col("population") * 100_000)
+            .round(1)
+            .alias(f"rate_{column}")
+            for column in ["forecast", "lower", "upper"]
+        )
+        .with_columns(pl.col("forecast", "lower", "upper").round(1))
+        .filter(pl.col("opportunity_index").is_not_null())
+    )
+    print(cluster_forecasts.filter(pl.col("year") == future[-1]))
+
+    #### Save data ####
+    write_parquet(
+        neighbourhood_forecasts, "data/02-analysis_data/18-crime_forecasts.parquet"
+    )
+    write_csv(cluster_forecasts, "data/02-analysis_data/19-cluster_forecasts.csv")
+
+
+#### ENTRY POINT ####
+if __name__ == "__main__":
+    main()
+    print("Crime forecasts saved to data/02-analysis_data/ (18- and 19-).")
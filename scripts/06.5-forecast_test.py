@@ -0,0 +1,93 @@
+#### Preamble ####
+# Purpose: Tests the batched Poisson trend forecasts (fit, intervals, sparse series, cluster sums).
+# Author: Mike Cowan
+# Date: 19 May 2025
+# Contact: m.cowan@mail.utoronto.ca
+# License: MIT
+# Pre-requisites:
+# - `numpy` and `polars` must be installed
+# - `pytest` must be installed (pip install pytest); run with "pytest -q"
+# References:
+# - [https://docs.pytest.org/en/stable]
+
+#### Workspace setup ####
+import numpy as np
+import polars as pl
+import pytest  # test functions across any .py ending with "test"
+
+from utils.forecast import (
+    aggregate_forecasts,
+    fit_trends,
+    forecast_trends,
+    series_matrix,
+)
+
+YEARS = list(range(2014, 2025))
+
+
+#### Tests ####
+# Large counts: the fitted growth matches the simulated one and the forecast continues it
+def test_recovers_trend():
+    rng = np.random.default_rng(838)
+    growth = np.array([0.05, -0.03, 0.0])
+    t = np.arange(len(YEARS))
+    counts = rng.poisson(2000 * np.exp(growth[:, None] * t))
+    fit = fit_trends(counts, YEARS, ridge=0.0)
+    np.testing.assert_allclose(fit["slope"], growth, atol=0.01)
+
+    forecast = forecast_trends(fit, [2025, 2026])
+    expected = 2000 * np.exp(growth * len(YEARS))
+    np.testing.assert_allclose(forecast["mean"][:, 0], expected, rtol=0.05)
+    assert np.all(forecast["lower"] < forecast["mean"])
+    assert np.all(forecast["mean"] < forecast["upper"])
+    # Intervals widen with the horizon
+    width = forecast["upper"] - forecast["lower"]
+    assert np.all(width[:, 1] > width[:, 0])
+
+
+# The batched fit equals fitting each series on its own
+def test_batched_equals_single():
+    rng = np.random.default_rng(42)
+    counts = rng.poisson(rng.gamma(2, 10, (20, 1)), (20, len(YEARS)))
+    together = fit_trends(counts, YEARS)
+    for s in range(len(counts)):
+        alone = fit_trends(counts[s : s + 1], YEARS)
+        assert together["slope"][s] == pytest.approx(alone["slope"][0], abs=1e-6)
+        assert together["intercept"][s] == pytest.approx(
+            alone["intercept"][0], abs=1e-6
+        )
+
+
+# Rare events only at the end of the window, or none at all, stay finite
+def test_sparse_and_empty_series():
+    counts = np.zeros((3, len(YEARS)))
+    counts[0, -1] = 2  # two events in the last year only
+    counts[1, 3] = 1
+    forecast = forecast_trends(fit_trends(counts, YEARS), [2025, 2026, 2027])
+    assert np.all(np.isfinite(forecast["mean"]))
+    assert np.all(forecast["mean"][0] < 10)
+    assert forecast["mean"][2].max() < 1e-6
+    assert np.all(forecast["lower"] >= 0)
+
+
+def test_series_matrix_and_aggregate():
+    table = pl.DataFrame(
+        {
+            "neighbourhood": ["a", "b", "c"],
+            "ASSAULT_2023": [10, 20, None],
+            "ASSAULT_2024": [12, 22, 5],
+        }
+    )
+    keys, counts = series_matrix(table, ["assault"], [2023, 2024])
+    assert keys["crime"].to_list() == ["assault"] * 3
+    assert np.isnan(counts[2, 0])
+
+    forecast = {
+        "mean": np.array([[1.0], [2.0], [4.0]]),
+        "variance": np.array([[1.0], [1.0], [2.0]]),
+    }
+    groups = keys.with_columns(pl.Series("cluster", ["x", "x", "y"]))
+    totals = aggregate_forecasts(groups, forecast, [2025], by=["cluster"])
+    x = totals.filter(pl.col("cluster") == "x").row(0, named=True)
+    assert x["forecast"] == pytest.approx(3.0)
+    assert x["upper"] - x["forecast"] == pytest.approx(1.959964 * np.sqrt(2.0))
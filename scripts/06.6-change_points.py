@@ -0,0 +1,103 @@
+#### Preamble ####
+# Purpose: Finds structural breaks (change points) in every neighbourhood x crime count series and summarizes them by opportunity cluster.
+# Author: Mike Cowan
+# Date: 19 May 2025
+# Contact: m.cowan@mail.utoronto.ca
+# License: MIT
+# Pre-requisites:
+# - `polars` and `numpy` must be installed
+# - Run after 05.0 (opportunity_index in the merged data)
+# - Binary segmentation with a Poisson cost over every series at once; see utils/changepoint.py
+# - `max_breaks` caps the breaks kept per series (the largest cost drops win)
+# Output:
+# - data/02-analysis_data/20-change_points.parquet: one row per break (neighbourhood, crime,
+#   break_year, mean_before, mean_after, rate_ratio, gain, opportunity_index)
+# References:
+# - [https://doi.org/10.1080/01621459.2012.737745] (Killick et al. 2012)
+
+#### Workspace setup ####
+import time  # inherent to Python
+
+import polars as pl
+
+from utils.artifacts import write_parquet
+from utils.changepoint import break_table, detect_changes
+from utils.config import load_city
+from utils.forecast import series_matrix
+from utils.profiling import span
+from utils.schema import detect_years, normalize_names
+
+
+#### MAIN FUNCTION ####
+def main(beta=2.0, min_size=2, max_breaks=3, n_jobs=None):
+    print("Detecting change points in neighbourhood crime counts.")
+
+    #### 06.6-change_points.py ####
+    #### Load data ####
+    city = load_city()
+    crime_raw = pl.read_csv(city["portal"]["packages"]["crime"]["path"])
+    merged_data = pl.read_csv("data/02-analysis_data/02-analysis_data_merged.csv")
+
+    # Every crime and year in the raw release (2014 onwards), as in 06.4
+    years = detect_years(crime_raw.columns, start_year=2014)
+    crime_types = sorted(
+        {
+            c.split("_")[0].lower()
+            for c in crime_raw.columns
+            if c.endswith(f"_RATE_{years[0]}")
+        }
+    )
+    crime_raw = crime_raw.with_columns(
+        pl.Series("neighbourhood", normalize_names(crime_raw[city["area_column"]]))
+    )
+    keys, counts = series_matrix(crime_raw, crime_types, years)
+
+    #### Detect breaks in every series ####
+    start = time.perf_counter()
+    with span("detect"):
+        series, positions, gains = detect_changes(
+            counts, beta, min_size, max_breaks, n_jobs
+        )
+    print(
+        f"{len(keys)} series ({years[0]}–{years[-1]}): {len(series)} breaks "
+        f"in {time.perf_counter() - start:.3f}s."
+    )
+
+    #### Effect sizes, joined to clusters ####
+    breaks = (
+        break_table(keys, counts, years, series, positions, gains)
+        .join(
+            merged_data.select(["neighbourhood", "opportunity_index"]),
+            on="neighbourhood",
+            how="left",
+        )
+        .sort(["crime", "neighbourhood", "break_year"])
+    )
+
+    #### Summary: share of neighbourhoods with a break, by cluster, crime and year ####
+    sizes = merged_data.group_by("opportunity_index").agg(
+        pl.len().alias("neighbourhoods")
+    )
+    summary = (
+        breaks.filter(pl.col("opportunity_index").is_not_null())
+        .group_by(["opportunity_index", "crime", "break_year"])
+        .agg(
+            pl.len().alias("breaks"),
+            pl.col("rate_ratio").median().alias("median_ratio"),
+        )
+        .join(sizes, on="opportunity_index")
+        .with_columns(
+            (pl.col("breaks") / pl.col("neighbourhoods")).round(3).alias("share")
+        )
+        .sort(["crime", "break_year", "opportunity_index"])
+    )
+    print(summary.sort("breaks", descending=True).head(15))
+
+    #### Save data ####
+    write_parquet(breaks, "data/02-analysis_data/20-change_points.parquet")
+
+
+#### ENTRY POINT ####
+if __name__ == "__main__":
+    main()
+    print("Change points saved to data/02-analysis_data/20-change_points.parquet.")
@@ -0,0 +1,95 @@
+#### Preamble ####
+# Purpose: Tests the batched change-point detection (break location, no false breaks, blocks, effect sizes).
+# Author: Mike Cowan
+# Date: 19 May 2025
+# Contact: m.cowan@mail.utoronto.ca
+# License: MIT
+# Pre-requisites:
+# - `numpy` and `polars` must be installed
+# - `pytest` must be installed (pip install pytest); run with "pytest -q"
+# References:
+# - [https://docs.pytest.org/en/stable]
+
+#### Workspace setup ####
+import numpy as np
+import polars as pl
+import pytest  # test functions across any .py ending with "test"
+
+from utils.changepoint import break_table, detect_block, detect_changes
+
+YEARS = list(range(2014, 2025))
+
+
+#### Test data ####
+# Half the series drop by 40% from 2020 on, half stay flat
+@pytest.fixture
+def counts():
+    rng = np.random.default_rng(838)
+    level = np.full((100, len(YEARS)), 200.0)
+    level[:50, YEARS.index(2020) :] *= 0.6
+    return rng.poisson(level).astype(float)
+
+
+#### Tests ####
+def test_finds_the_break(counts):
+    series, positions, _ = detect_changes(counts, n_jobs=1)
+    shifted = series < 50
+    found = np.unique(series[shifted])
+    assert len(found) >= 48
+    assert np.mean(np.array(YEARS)[positions[shifted]] == 2020) > 0.9
+    # Flat series rarely break
+    assert len(np.unique(series[~shifted])) <= 5
+
+
+# max_breaks caps the breaks per series, keeping the largest; a staircase has more to find
+def test_max_breaks_per_series():
+    staircase = np.repeat([[50.0, 400.0, 100.0, 800.0, 200.0, 1200.0]], 4, axis=1)
+    y = np.repeat(staircase, 3, axis=0)
+    for max_breaks in [0, 1, 2, 3, 5]:
+        series, positions, gains = detect_block(y, max_breaks=max_breaks)
+        assert np.bincount(series, minlength=3).max() <= max_breaks
+    series, positions, gains = detect_block(y, max_breaks=5)
+    assert np.bincount(series).tolist() == [5, 5, 5]
+    series, positions, gains = detect_block(y, max_breaks=1)
+    assert positions.tolist() == [20, 20, 20]  # the largest step (200 -> 1200)
+
+
+# Blocks (and worker processes) give the same breaks as one pass
+def test_blocks_equal_single_pass(counts):
+    series, positions, gains = detect_block(counts)
+    order = np.lexsort((positions, series))
+    blocked = detect_changes(counts, n_jobs=2, block_size=17)
+    np.testing.assert_array_equal(blocked[0], series[order])
+    np.testing.assert_array_equal(blocked[1], positions[order])
+    np.testing.assert_allclose(blocked[2], gains[order])
+
+
+# Zero and empty series never break or fail
+def test_sparse_series():
+    y = np.zeros((3, len(YEARS)))
+    y[1, 4] = 1
+    y[2] = np.nan
+    series, positions, gains = detect_changes(y, n_jobs=1)
+    assert len(series) == 0
+    table = break_table(
+        pl.DataFrame({"neighbourhood": ["a", "b", "c"]}),
+        y,
+        YEARS,
+        series,
+        positions,
+        gains,
+    )
+    assert table.height == 0
+
+
+# Segment means are bounded by the neighbouring breaks of the same series
+def test_break_table():
+    y = np.array([[10.0] * 4 + [40.0] * 4 + [20.0] * 3, [5.0] * 11])
+    keys = pl.DataFrame({"neighbourhood": ["a", "b"], "crime": ["assault"] * 2})
+    table = break_table(
+        keys, y, YEARS, np.array([0, 0]), np.array([4, 8]), np.array([1.0, 2.0])
+    )
+    assert table["break_year"].to_list() == [2018, 2022]
+    assert table["mean_before"].to_list() == [10.0, 40.0]
+    assert table["mean_after"].to_list() == [40.0, 20.0]
+    assert table["rate_ratio"].to_list() == [4.0, 0.5]
@@ -0,0 +1,175 @@
+#### Preamble ####
+# Purpose: Regresses neighbourhood crime counts on the SES variables (Poisson and negative binomial, population offset) for every crime and year at once.
+# Author: Mike Cowan
+# Date: 19 May 2025
+# Contact: m.cowan@mail.utoronto.ca
+# License: MIT
+# Pre-requisites:
+# - `polars`, `numpy` and `scipy` must be installed
+# - Run after 04.0 (merged data); batched IRLS in utils/regression.py
+# Models:
+# - cross_section: one model per crime x year, log E[count] = log(population / 100K) + b0 + b'SES,
+#   with SES standardized (coefficients are log rate ratios per SD)
+# - neighbourhood_fe: one pooled model per crime over every detected year with neighbourhood fixed effects
+#   (absorbed) and year effects; the census SES does not vary by year, so with fixed effects only
+#   SES x year interactions (how each SD shifts the yearly trend) are identified
+# Output:
+# - data/02-analysis_data/21-count_model_coefficients.csv: model, family, crime, year, term,
+#   estimate, std_error, p_value, ci_lower, ci_upper, alpha, boot_lower, boot_upper, rate_ratio
+# References:
+# - [https://en.wikipedia.org/wiki/Poisson_regression#%22Exposure%22_and_offset]
+
+#### Workspace setup ####
+import time  # inherent to Python
+
+import numpy as np
+import polars as pl
+
+from utils.artifacts import write_csv
+from utils.config import analyzed_crimes
+from utils.panel import year_rows
+from utils.profiling import span
+from utils.regression import bootstrap_counts, coefficient_table, fit_counts
+from utils.schema import detect_years
+from utils.smoothing import PER, implied_population
+
+
+#### MAIN FUNCTION ####
+def main(families=("poisson", "negbin"), resamples=200, seed=838):
+    print("Fitting count regressions of crime on SES.")
+
+    #### 06.8-count_models.py ####
+    #### Load data ####
+    merged_data = pl.read_csv("data/02-analysis_data/02-analysis_data_merged.csv")
+    ses_columns = [
+        "education_rate",
+        "prop_single_parent",
+        "unemployment_rate",
+        "median_income",
+    ]
+    crime_types = analyzed_crimes()
+    years = detect_years(merged_data.columns, crime_types)
+    print(f"Years: {years[0]}–{years[-1]}")
+
+    # Standardized SES, and each neighbourhood-year's population (count * 100K / rate)
+    ses = merged_data.select(ses_columns).to_numpy().astype(float)
+    ses = (ses - ses.mean(axis=0)) / ses.std(axis=0)
+    panel = pl.concat([year_rows(merged_data, crime_types, year) for year in years])
+    population = (
+        implied_population(panel)
+        .pivot(on="year", index="neighbourhood", values="population")
+        # Rows must line up with `counts` and `ses`, i.e. the merged table's order
+        .join(
+            merged_data.select("neighbourhood"),
+            on="neighbourhood",
+            how="right",
+            maintain_order="right",
+        )
+        .select([str(year) for year in years])
+        .to_numpy()
+    )
+    log_exposure = np.log(population / PER)  # (neighbourhoods, years)
+
+    #### Cross-section: every crime x year in one batch ####
+    n_areas = merged_data.height
+    counts = merged_data.select(
+        [f"{crime}_{year}" for crime in crime_types for year in years]
+    ).to_numpy()
+    offset = np.tile(log_exposure, len(crime_types))
+    X = np.column_stack([np.ones(n_areas), ses])
+    outcomes = pl.DataFrame(
+        {
+            "crime": [crime for crime in crime_types for _ in years],
+            "year": [year for _ in crime_types for year in years],
+        }
+    )
+    terms = ["intercept", *ses_columns]
+
+    #### Neighbourhood fixed effects: every crime, pooled over years ####
+    # Rows are neighbourhood x year (year-major); year effects and SES x year are the regressors
+    t = np.repeat(np.arange(len(years)), n_areas)
+    panel_counts = np.column_stack(
+        [
+            merged_data.select([f"{crime}_{year}" for year in years])
+            .to_numpy()
+            .T.ravel()
+            for crime in crime_types
+        ]
+    )
+    panel_offset = log_exposure.T.ravel()[:, None]
+    panel_X = np.column_stack(
+        [
+            (t[:, None] == np.arange(1, len(years))).astype(float),
+            np.tile(ses, (len(years), 1)) * (t - t.mean())[:, None],
+        ]
+    )
+    groups = np.tile(np.arange(n_areas), len(years))
+    panel_outcomes = pl.DataFrame(
+        {"crime": crime_types, "year": [None] * len(crime_types)},
+        schema={"crime": pl.String, "year": pl.Int64},
+    )
+    panel_terms = [f"year_{year}" for year in years[1:]] + [
+        f"{column}_x_year" for column in ses_columns
+    ]
+
+    #### Fit, bootstrap and tabulate ####
+    tables = []
+    start = time.perf_counter()
+    for family in families:
+        with span(f"cross_section_{family}"):
+            fit = fit_counts(counts, X, offset, family=family)
+            replicates = bootstrap_counts(
+                counts, X, offset, family, resamples=resamples, seed=seed
+            )
+        tables.append(
+            coefficient_table(outcomes, terms, fit, family, replicates).with_columns(
+                pl.lit("cross_section").alias("model")
+            )
+        )
+        with span(f"neighbourhood_fe_{family}"):
+            fit = fit_counts(
+                panel_counts, panel_X, panel_offset, family=family, groups=groups
+            )
+            # Whole neighbourhoods are resampled, keeping each one's years together
+            replicates = bootstrap_counts(
+                panel_counts,
+                panel_X,
+                panel_offset,
+                family,
+                groups,
+                resamples=resamples,
+                seed=seed,
+            )
+        tables.append(
+            coefficient_table(
+                panel_outcomes, panel_terms, fit, family, replicates
+            ).with_columns(pl.lit("neighbourhood_fe").alias("model"))
+        )
+    coefficients = pl.concat(tables).select(
+        "model", "family", pl.exclude("model", "family")
+    )
+    models = len(families) * (len(outcomes) + len(panel_outcomes)) * (1 + resamples)
+    print(f"{models} model fits in {time.perf_counter() - start:.2f}s.")
+
+    print(
+        coefficients.filter(
+            (pl.col("model") == "cross_section")
+            & (pl.col("family") == "negbin")
+            & (pl.col("year") == years[-1])
+            & (pl.col("term") != "intercept")
+        )
+        .select(["crime", "term", "rate_ratio", "boot_lower", "boot_upper"])
+        .with_columns(pl.col("boot_lower", "boot_upper").exp())
+        .with_columns(pl.exclude("crime", "term").round(3))
+    )
+
+    #### Save data ####
+    write_csv(coefficients, "data/02-analysis_data/21-count_model_coefficients.csv")
+
+
+#### ENTRY POINT ####
+if __name__ == "__main__":
+    main()
+    print(
+        "Coefficients saved to data/02-analysis_data/21-count_model_coefficients.csv."
+    )
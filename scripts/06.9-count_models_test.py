@@ -0,0 +1,90 @@
+#### Preamble ####
+# Purpose: Tests the batched Poisson / negative-binomial regressions (recovery, fixed effects, bootstrap, table).
+# Author: Mike Cowan
+# Date: 19 May 2025
+# Contact: m.cowan@mail.utoronto.ca
+# License: MIT
+# Pre-requisites:
+# - `numpy`, `polars` and `scipy` must be installed
+# - `pytest` must be installed (pip install pytest); run with "pytest -q"
+# References:
+# - [https://docs.pytest.org/en/stable]
+
+#### Workspace setup ####
+import numpy as np
+import polars as pl
+import pytest  # test functions across any .py ending with "test"
+
+from utils.regression import bootstrap_counts, coefficient_table, fit_counts
+
+
+#### Test data ####
+# 400 areas, two standardized covariates, three outcomes with their own coefficients
+@pytest.fixture
+def data():
+    rng = np.random.default_rng(838)
+    X = np.column_stack([np.ones(400), rng.standard_normal((400, 2))])
+    beta = np.array([[1.0, 0.5, -0.3], [2.0, 0.0, 0.4], [-0.5, 0.8, 0.0]])
+    population = rng.integers(2_000, 40_000, 400)
+    offset = np.log(population / 100_000)[:, None]
+    mu = np.exp(offset + X @ beta.T) * 100
+    return X, beta, offset, mu, rng
+
+
+#### Tests ####
+def test_poisson_recovers_coefficients(data):
+    X, beta, offset, mu, rng = data
+    fit = fit_counts(rng.poisson(mu), X, offset)
+    assert fit["converged"]
+    np.testing.assert_allclose(fit["coef"], beta + [np.log(100), 0, 0], atol=0.05)
+    assert np.all(fit["alpha"] == 0)
+
+
+# Overdispersed counts: NB2 finds alpha, and its standard errors are wider than Poisson's
+def test_negbin_alpha(data):
+    X, beta, offset, mu, rng = data
+    y = rng.negative_binomial(1 / 0.3, 1 / (1 + 0.3 * mu))
+    poisson = fit_counts(y, X, offset)
+    negbin = fit_counts(y, X, offset, family="negbin")
+    np.testing.assert_allclose(negbin["alpha"], 0.3, atol=0.08)
+    np.testing.assert_allclose(negbin["coef"][:, 1:], beta[:, 1:], atol=0.15)
+    assert np.all(negbin["se"] > poisson["se"])
+    with pytest.raises(ValueError):
+        fit_counts(y, X, family="binomial")
+
+
+# Absorbed fixed effects give the same slopes as explicit dummy columns
+def test_fixed_effects_match_dummies(data):
+    X, _, _, mu, rng = data
+    groups = np.repeat(np.arange(40), 10)
+    y = rng.poisson(mu * np.exp(rng.normal(0, 0.5, 40))[groups, None])
+    y[groups == 3] = 0  # a group without events
+    absorbed = fit_counts(y, X[:, 1:], groups=groups)
+    keep = groups != 3
+    dummies = np.eye(40)[groups[keep]][:, np.arange(40) != 3]
+    explicit = fit_counts(y[keep], np.column_stack([X[keep, 1:], dummies]))
+    np.testing.assert_allclose(absorbed["coef"], explicit["coef"][:, :2], atol=1e-6)
+    np.testing.assert_allclose(absorbed["se"], explicit["se"][:, :2], rtol=1e-5)
+
+
+# Bootstrap replicates centre on the estimate; the table has one row per outcome x term
+def test_bootstrap_and_table(data):
+    X, _, offset, mu, rng = data
+    y = rng.poisson(mu)
+    fit = fit_counts(y, X, offset)
+    replicates = bootstrap_counts(y, X, offset, resamples=100)
+    assert replicates.shape == (100, 3, 3)
+    np.testing.assert_allclose(replicates.mean(axis=0), fit["coef"], atol=0.05)
+
+    outcomes = pl.DataFrame({"crime": ["a", "b", "c"], "year": [2019] * 3})
+    table = coefficient_table(
+        outcomes, ["intercept", "x1", "x2"], fit, "poisson", replicates
+    )
+    assert table.height == 9
+    assert table.filter(pl.col("crime") == "b")["term"].to_list() == [
+        "intercept",
+        "x1",
+        "x2",
+    ]
+    assert (table["boot_lower"] < table["estimate"]).all()
+    assert (table["estimate"] < table["boot_upper"]).all()
@@ -1,5 +1,5 @@
 #### Preamble ####
-# Purpose: Plots 2019-2024 crime trend data by Toronto neighbourhood clusters.
+# Purpose: Plots 2019-onward crime trend data by Toronto neighbourhood clusters.
 # Author: Mike Cowan
 # Date: 19 May 2025
 # Contact: m.cowan@mail.utoronto.ca
@@ -7,105 +7,156 @@
 # Pre-requisites:
 # - `polars` must be installed (pip install polars)
 # - `matplotlib` must be installed (pip install matplotlib)
+# - `figure_formats` picks the outputs: "png" (300 dpi), "svg", "pdf", "webp" (lossless, 120 dpi)
+# - With `engine="duckdb"`, trend averages are read from the DuckDB store (see 04.0 and 06.0)
+# - With `rates="smoothed"`, trends use the empirical-Bayes rates from 03.4 (Polars engine) and
+#   figures are saved with a `_smoothed` suffix (e.g., 1_assault_smoothed.png)
 
 #### Workspace setup ####
 import polars as pl
 import matplotlib.pyplot as plt
+import math  # inherent to Python
 from pathlib import Path  # inherent to Python
 
+from utils.config import analyzed_crimes
+from utils.figures import FigureWriter, figure_key
+from utils.schema import detect_years
+from utils.smoothing import rates_path, use_rates
+from utils.warehouse import cluster_rates, connect
+
 
 #### MAIN FUNCTION ####
-def main():
-    print("Plotting crime trends by neighbourhood clusters (2019–2024).")
+def main(engine="polars", figure_formats=("png",), rates="raw"):
+    print("Plotting crime trends by neighbourhood clusters.")
 
     #### 07.0-plot_crime_clusters.py ####
     #### Load data ####
     merged_data = pl.read_csv("data/02-analysis_data/02-analysis_data_merged.csv")
-    crime_types = ["assault", "breakenter", "robbery", "shooting"]
-    years = [2019, 2020, 2021, 2022, 2023, 2024]
+    crime_types = analyzed_crimes()
+    years = detect_years(merged_data.columns, crime_types)
+    period = f"{years[0]}–{years[-1]}"  # e.g., "2019–2024"
+
+    # Raw City rates or smoothed rates (see 03.4)
+    if rates != "raw" and engine == "duckdb":
+        raise ValueError("Smoothed rates are only available with the Polars engine.")
+    merged_data = use_rates(merged_data, rates, crime_types, years)
+
+    # DuckDB engine: every crime's trend comes from one SQL aggregation
+    store_trends = None
+    if engine == "duckdb":
+        with connect(read_only=True) as con:
+            store_trends = cluster_rates(con, crime_types, years).rename(
+                {"avg_rate": "average_rate"}
+            )
 
     # Specify figures directory
     png_directory = Path("other/figures")
     png_directory.mkdir(parents=True, exist_ok=True)
+    levels = ["Low Opportunity", "Medium Opportunity", "High Opportunity"]
 
-    # 2x2 subplot figure for combined trends plot
-    # [https://matplotlib.org/stable/gallery/subplots_axes_and_figures/subplot_demo.html]
-    fig_combined, axes = plt.subplots(2, 2, figsize=(12, 8))
-    axes = axes.flatten()
-
-    # Loop through each crime and save plots
-    for idx, crime in enumerate(crime_types):
-        # Build rate column names for each year
-        rate_columns = [f"{crime}_rate_{y}" for y in years]
-
-        # Unpivot wide to long for time-series, extract year as integer (like pivot_longer)
-        # Before: Columns = years, Rows = neighborhoods
-        # After: Rows = neighborhood-year combinations, Columns = [SES, year, rate]
-        # [https://docs.pola.rs/api/python/stable/reference/dataframe/api/polars.DataFrame.unpivot.html#polars.DataFrame.unpivot]
-        merged_long = (
-            merged_data.select(
-                ["opportunity_index", *rate_columns]
-            )  # * = "and all individual columns from list"
-            .unpivot(
-                on=rate_columns,
-                index="opportunity_index",
-                variable_name="year",
-                value_name="rate",
-            )
-            .with_columns(pl.col("year").str.extract(r"_(\d{4})$", 1).cast(pl.Int64))
-        )
-
-        # Group by SES and year, calculating mean rates
-        trend = (
-            merged_long.group_by(["opportunity_index", "year"])
-            .agg(pl.col("rate").mean().alias("average_rate"))
-            .sort(["opportunity_index", "year"])
-        )
-
-        # Plot each SES cluster individually
-        fig_indiv, ax_indiv = plt.subplots(figsize=(6, 4))
-        for lvl in ["Low Opportunity", "Medium Opportunity", "High Opportunity"]:
-            sub = trend.filter(pl.col("opportunity_index") == lvl)
-            ax_indiv.plot(
-                sub["year"].to_list(),
-                sub["average_rate"].to_list(),
-                marker="o",
-                label=lvl,
-            )
-        # Enhance plot readability
-        ax_indiv.set_title(f"{crime.title()} Rate Trends (2019–2024)")
-        ax_indiv.set_xlabel("Year")
-        ax_indiv.set_ylabel(f"Average {crime.title()} Rate per 100K Persons")
-        ax_indiv.legend(title="Opportunity Level")
-        fig_indiv.tight_layout()
-        fig_indiv.savefig(png_directory / f"{idx+1}_{crime}.png", dpi=300)
-        plt.close(fig_indiv)
-
-        # Add crime type to its position in 2x2 grid
-        ax_combined = axes[idx]
-        for lvl in ["Low Opportunity", "Medium Opportunity", "High Opportunity"]:
-            sub = trend.filter(pl.col("opportunity_index") == lvl)
-            ax_combined.plot(
-                sub["year"].to_list(),
-                sub["average_rate"].to_list(),
-                marker="o",
-                label=lvl,
+    # Figures are keyed on their plotted data + labels; unchanged ones are not re-rendered,
+    # and rendering (savefig) runs in worker processes (see utils/figures.py)
+    with FigureWriter(formats=figure_formats) as writer:
+        # Loop through each crime and save plots
+        trends = {}
+        for idx, crime in enumerate(crime_types):
+            if store_trends is not None:
+                trend = (
+                    store_trends.filter(pl.col("crime") == crime)
+                    .select(["opportunity_index", "year", "average_rate"])
+                    .sort(["opportunity_index", "year"])
+                )
+            else:
+                # Build rate column names for each year
+                rate_columns = [f"{crime}_rate_{y}" for y in years]
+
+                # Unpivot wide to long for time-series, extract year as integer (like pivot_longer)
+                # Before: Columns = years, Rows = neighborhoods
+                # After: Rows = neighborhood-year combinations, Columns = [SES, year, rate]
+                # [https://docs.pola.rs/api/python/stable/reference/dataframe/api/polars.DataFrame.unpivot.html#polars.DataFrame.unpivot]
+                merged_long = (
+                    merged_data.select(
+                        ["opportunity_index", *rate_columns]
+                    )  # * = "and all individual columns from list"
+                    .unpivot(
+                        on=rate_columns,
+                        index="opportunity_index",
+                        variable_name="year",
+                        value_name="rate",
+                    )
+                    .with_columns(
+                        pl.col("year").str.extract(r"_(\d{4})$", 1).cast(pl.Int64)
+                    )
+                )
+
+                # Group by SES and year, calculating mean rates
+                trend = (
+                    merged_long.group_by(["opportunity_index", "year"])
+                    .agg(pl.col("rate").mean().alias("average_rate"))
+                    .sort(["opportunity_index", "year"])
+                )
+            trends[crime] = trend
+
+            # Plot each SES cluster individually (skipped if this exact figure exists)
+            stem = rates_path(png_directory / f"{idx+1}_{crime}", rates)
+            key = figure_key(trend, crime, period, levels, "individual")
+            if not writer.needs(stem, key):
+                continue
+            fig_indiv, ax_indiv = plt.subplots(figsize=(6, 4))
+            for lvl in levels:
+                sub = trend.filter(pl.col("opportunity_index") == lvl)
+                ax_indiv.plot(
+                    sub["year"].to_list(),
+                    sub["average_rate"].to_list(),
+                    marker="o",
+                    label=lvl,
+                )
+            # Enhance plot readability
+            ax_indiv.set_title(f"{crime.title()} Rate Trends ({period})")
+            ax_indiv.set_xlabel("Year")
+            ax_indiv.set_ylabel(f"Average {crime.title()} Rate per 100K Persons")
+            ax_indiv.legend(title="Opportunity Level")
+            fig_indiv.tight_layout()
+            writer.save(fig_indiv, stem, key)
+
+        # Two-column subplot grid for combined trends plot (2x2 for four crimes)
+        # [https://matplotlib.org/stable/gallery/subplots_axes_and_figures/subplot_demo.html]
+        stem = rates_path(png_directory / "fig_1_crime_trends", rates)
+        key = figure_key(*trends.values(), crime_types, period, levels, "combined")
+        if writer.needs(stem, key):
+            n_rows = math.ceil(len(crime_types) / 2)
+            fig_combined, axes = plt.subplots(
+                n_rows, 2, figsize=(12, 4 * n_rows), squeeze=False
             )
-        ax_combined.set_title(f"{crime.title()} Rate")
-        ax_combined.set_xlabel("Year")
-        ax_combined.set_ylabel("Rate per 100K")
-        ax_combined.legend(title="SES Cluster", fontsize=8)
+            axes = axes.flatten()
+            for ax_unused in axes[len(crime_types) :]:
+                ax_unused.set_visible(False)
+
+            # Add each crime type to its position in the grid
+            for idx, crime in enumerate(crime_types):
+                ax_combined = axes[idx]
+                for lvl in levels:
+                    sub = trends[crime].filter(pl.col("opportunity_index") == lvl)
+                    ax_combined.plot(
+                        sub["year"].to_list(),
+                        sub["average_rate"].to_list(),
+                        marker="o",
+                        label=lvl,
+                    )
+                ax_combined.set_title(f"{crime.title()} Rate")
+                ax_combined.set_xlabel("Year")
+                ax_combined.set_ylabel("Rate per 100K")
+                ax_combined.legend(title="SES Cluster", fontsize=8)
 
-    #### Save figures ####
-    fig_combined.suptitle(
-        "Crime Rate Trends by Opportunity Cluster (2019–2024)", fontsize=16
-    )
-    fig_combined.tight_layout(rect=[0, 0.03, 1, 0.95])
-    fig_combined.savefig(png_directory / "fig_1_crime_trends.png", dpi=300)
-    plt.close(fig_combined)
+            #### Save figures ####
+            fig_combined.suptitle(
+                f"Crime Rate Trends by Opportunity Cluster ({period})", fontsize=16
+            )
+            fig_combined.tight_layout(rect=[0, 0.03, 1, 0.95])
+            writer.save(fig_combined, stem, key)
 
 
 #### ENTRY POINT ####
 if __name__ == "__main__":
     main()
-    print("Crime trends by neighbourhood clusters (2019–2024) have been plotted.")
+    print("Crime trends by neighbourhood clusters have been plotted.")
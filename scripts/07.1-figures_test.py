@@ -0,0 +1,93 @@
+#### Preamble ####
+# Purpose: Tests the figure cache and multi-format writer used by 07.0 and 08.0.
+# Author: Mike Cowan
+# Date: 19 May 2025
+# Contact: m.cowan@mail.utoronto.ca
+# License: MIT
+# Pre-requisites:
+# - `matplotlib`, `numpy` and `polars` must be installed
+# - `pytest` must be installed (pip install pytest); run with "pytest -q"
+# References:
+# - [https://docs.pytest.org/en/stable]
+
+#### Workspace setup ####
+import matplotlib
+
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import numpy as np
+import polars as pl
+import pytest  # test functions across any .py ending with "test"
+
+from utils.artifacts import RUN_ID_VARIABLE, file_hash, read_manifest
+from utils.figures import FigureWriter, figure_key
+
+
+#### Helpers ####
+# Figures are versioned in the artifact store, which is relative to the working directory
+@pytest.fixture(autouse=True)
+def workspace(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+
+def line_figure(values):
+    fig, ax = plt.subplots(figsize=(3, 2))
+    ax.plot(values)
+    ax.set_title("$K$ = 2")  # mathtext, as in fig_2/fig_3
+    return fig
+
+
+def write(tmp_path, key, values, formats=("png",)):
+    with FigureWriter(formats, cache_path=tmp_path / "cache.json") as writer:
+        if writer.needs(tmp_path / "fig", key):
+            writer.save(line_figure(values), tmp_path / "fig", key)
+    return writer
+
+
+#### Tests ####
+# The key follows the plotted data and the styling arguments
+def test_figure_key_tracks_inputs():
+    frame = pl.DataFrame({"year": [2014, 2015], "rate": [1.0, 2.0]})
+    key = figure_key(frame, np.arange(3), "Assault")
+    assert key == figure_key(frame.clone(), np.arange(3), "Assault")
+    assert key != figure_key(
+        frame.with_columns(pl.col("rate") * 2), np.arange(3), "Assault"
+    )
+    assert key != figure_key(frame, np.arange(4), "Assault")
+    assert key != figure_key(frame, np.arange(3), "Robbery")
+
+
+# An unchanged figure is skipped; new data or a new format renders again
+def test_writer_skips_unchanged_figures(tmp_path):
+    assert write(tmp_path, "a", [1, 2, 3]).written == 1
+    assert (tmp_path / "fig.png").stat().st_size > 0
+
+    again = write(tmp_path, "a", [1, 2, 3])
+    assert (again.written, again.skipped) == (0, 1)
+
+    assert write(tmp_path, "b", [3, 2, 1]).written == 1
+    both = write(tmp_path, "b", [3, 2, 1], formats=("png", "svg"))
+    assert both.written == 1  # only the SVG was missing
+    assert (tmp_path / "fig.svg").read_text().lstrip().startswith("<?xml")
+
+
+# A deleted output is re-rendered even if the cache still lists it
+def test_writer_rerenders_missing_files(tmp_path):
+    write(tmp_path, "a", [1, 2, 3])
+    (tmp_path / "fig.png").unlink()
+    assert write(tmp_path, "a", [1, 2, 3]).written == 1
+
+
+# Rendered files go through the artifact layer: recorded under the run, no temp files left
+def test_figures_are_versioned(tmp_path, monkeypatch):
+    monkeypatch.setenv(RUN_ID_VARIABLE, "run-1")
+    write(tmp_path, "a", [1, 2, 3], formats=("png", "svg"))
+    artifacts = read_manifest("run-1")["artifacts"]
+    assert set(artifacts) == {"fig.png", "fig.svg"}
+    assert artifacts["fig.png"]["sha256"] == file_hash(tmp_path / "fig.png")
+    assert sorted(p.name for p in tmp_path.glob("*fig*")) == ["fig.png", "fig.svg"]
+
+
+def test_unknown_format_rejected(tmp_path):
+    with pytest.raises(ValueError, match="tiff"):
+        FigureWriter(("png", "tiff"), cache_path=tmp_path / "cache.json")
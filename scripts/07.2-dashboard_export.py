@@ -0,0 +1,55 @@
+#### Preamble ####
+# Purpose: Exports the cluster crime trends as a precomputed bundle for the static dashboard (other/dashboard/index.html).
+# Author: Mike Cowan
+# Date: 19 May 2025
+# Contact: m.cowan@mail.utoronto.ca
+# License: MIT
+# Pre-requisites:
+# - `polars` and `numpy` must be installed
+# - Run after 05.0 (opportunity_index in the merged data)
+# - View with: python -m http.server -d other/dashboard  (then open http://localhost:8000)
+
+#### Workspace setup ####
+import polars as pl
+
+from utils.config import analyzed_crimes
+from utils.dashboard import build_bundle, write_bundle
+from utils.schema import detect_years
+
+
+#### MAIN FUNCTION ####
+def main():
+    print("Exporting dashboard bundle.")
+
+    #### 07.2-dashboard_export.py ####
+    #### Load data ####
+    merged_data = pl.read_csv("data/02-analysis_data/02-analysis_data_merged.csv")
+    crime_types = analyzed_crimes()
+    years = detect_years(merged_data.columns, crime_types)
+    levels = ["Low Opportunity", "Medium Opportunity", "High Opportunity"]
+    ses_columns = [
+        "education_rate",
+        "prop_single_parent",
+        "unemployment_rate",
+        "median_income",
+    ]
+
+    #### Precompute every level the viewer shows ####
+    manifest, arrays = build_bundle(
+        merged_data, crime_types, years, levels, ses_columns
+    )
+
+    #### Save bundle ####
+    manifest = write_bundle(manifest, arrays)
+    size = sum(array.size for array in arrays.values()) * 4
+    print(
+        f"Dashboard bundle {manifest['version']}: {len(crime_types)} crimes x "
+        f"{len(years)} years x {len(manifest['neighbourhoods'])} neighbourhoods "
+        f"({size / 1024:.1f} KiB) saved to other/dashboard/."
+    )
+
+
+#### ENTRY POINT ####
+if __name__ == "__main__":
+    main()
+    print("Dashboard bundle has been exported.")
@@ -0,0 +1,93 @@
+#### Preamble ####
+# Purpose: Tests the dashboard bundle (pre-aggregated levels and the binary layout the viewer reads).
+# Author: Mike Cowan
+# Date: 19 May 2025
+# Contact: m.cowan@mail.utoronto.ca
+# License: MIT
+# Pre-requisites:
+# - `numpy` and `polars` must be installed
+# - `pytest` must be installed (pip install pytest); run with "pytest -q"
+# References:
+# - [https://docs.pytest.org/en/stable]
+
+#### Workspace setup ####
+import numpy as np
+import polars as pl
+import pytest  # test functions across any .py ending with "test"
+
+from utils.dashboard import build_bundle, read_bundle, write_bundle
+
+LEVELS = ["Low Opportunity", "Medium Opportunity", "High Opportunity"]
+
+
+#### Test data ####
+@pytest.fixture
+def merged():
+    rng = np.random.default_rng(838)
+    n = 12
+    columns = {
+        "neighbourhood": [f"area-{i:02d}" for i in range(n)][::-1],
+        "opportunity_index": [LEVELS[i % 3] for i in range(n)],
+        "median_income": rng.uniform(50_000, 150_000, n),
+    }
+    for crime in ["assault", "robbery"]:
+        for year in [2019, 2020, 2021]:
+            columns[f"{crime}_rate_{year}"] = rng.uniform(0, 500, n)
+    frame = pl.DataFrame(columns)
+    # One missing rate: skipped by the cluster mean, as in 07.0
+    return frame.with_columns(
+        pl.when(pl.col("neighbourhood") == "area-00")
+        .then(None)
+        .otherwise(pl.col("robbery_rate_2020"))
+        .alias("robbery_rate_2020")
+    )
+
+
+#### Tests ####
+# Cluster and city levels equal the Polars group means
+def test_levels_match_group_means(merged):
+    manifest, arrays = build_bundle(
+        merged, ["assault", "robbery"], [2019, 2020, 2021], LEVELS, ["median_income"]
+    )
+    assert arrays["neighbourhood"].shape == (2, 3, 12)
+    for c, crime in enumerate(manifest["crimes"]):
+        for y, year in enumerate(manifest["years"]):
+            column = f"{crime}_rate_{year}"
+            means = merged.group_by("opportunity_index").agg(pl.col(column).mean())
+            for k, level in enumerate(LEVELS):
+                expected = means.filter(pl.col("opportunity_index") == level)[column][0]
+                assert arrays["cluster_mean"][c, y, k] == pytest.approx(expected)
+            assert arrays["city_mean"][c, y] == pytest.approx(merged[column].mean())
+    assert [s["neighbourhoods"] for s in manifest["summaries"]] == [4, 4, 4]
+
+
+# Neighbourhood rows line up with the names and cluster indices in the manifest
+def test_neighbourhood_order(merged):
+    manifest, arrays = build_bundle(merged, ["assault"], [2021], LEVELS)
+    assert manifest["neighbourhoods"] == sorted(merged["neighbourhood"].to_list())
+    name = manifest["neighbourhoods"][3]
+    row = merged.filter(pl.col("neighbourhood") == name)
+    assert arrays["neighbourhood"][0, 0, 3] == pytest.approx(
+        row["assault_rate_2021"][0]
+    )
+    assert LEVELS[manifest["neighbourhood_cluster"][3]] == row["opportunity_index"][0]
+
+
+# The binary round-trips as float32 at the advertised offsets; NaN marks missing rates
+def test_bundle_round_trip(merged, tmp_path, monkeypatch):
+    monkeypatch.chdir(
+        tmp_path
+    )  # the artifact store is relative to the working directory
+    manifest, arrays = build_bundle(
+        merged, ["assault", "robbery"], [2019, 2020, 2021], LEVELS
+    )
+    written = write_bundle(manifest, arrays, tmp_path)
+    loaded_manifest, loaded = read_bundle(tmp_path)
+    assert loaded_manifest["version"] == written["version"]
+    assert (tmp_path / "bundle.bin").stat().st_size == 4 * sum(
+        a.size for a in arrays.values()
+    )
+    for name, array in arrays.items():
+        np.testing.assert_allclose(loaded[name], array, rtol=1e-6)
+    missing = manifest["neighbourhoods"].index("area-00")
+    assert np.isnan(loaded["neighbourhood"][1, 1, missing])
@@ -9,6 +9,12 @@
 # - `numpy` must be installed (pip install numpy)
 # - `matplotlib` must be installed (pip install matplotlib)
 # - `scikit-learn` must be installed (pip install scikit-learn)
+# - `figure_formats` picks the outputs: "png" (300 dpi), "svg", "pdf", "webp" (lossless, 120 dpi)
+# - Models come from the registry in utils/models.py (K-means, GMM variants, Bayesian GMM,
+#   agglomerative, HDBSCAN); the broader sweep is saved to 14-model_sweep.csv with the clusters
+#   each fit actually used (`k_effective`) and its HDBSCAN noise points (`noise`, not scored)
+# - The K-means/GMM fits (PCA scores + labels) and their unrounded metrics are saved to
+#   23-cluster_fits.parquet and 24-cluster_fit_metrics.parquet, which 08.4 reads instead of refitting
 # References:
 # - [https://scikit-learn.org/stable/auto_examples/cluster/plot_kmeans_assumptions.html]
 
@@ -16,19 +22,18 @@
 import polars as pl
 import numpy as np
 import matplotlib.pyplot as plt
-from sklearn.preprocessing import StandardScaler
-from sklearn.decomposition import PCA
-from sklearn.cluster import KMeans
-from sklearn.mixture import GaussianMixture
-from sklearn.metrics import (
-    silhouette_score,
-    davies_bouldin_score,
-    calinski_harabasz_score,
-)
+import time  # inherent to Python
+
+from utils.artifacts import write_csv, write_parquet
+from utils.features import load_or_fit_transform
+from utils.figures import FigureWriter, figure_key
+from utils.metrics import ClusterMetrics
+from utils.models import MODELS, fit_models
+from utils.profiling import span
 
 
 #### MAIN FUNCTION ####
-def main():
+def main(figure_formats=("png",)):
     print("Evaluating K-means vs. Gaussian Mixture clustering models ($K$ = 2, 3).")
 
     #### 08.0-model_evaluation.py ####
@@ -41,92 +46,107 @@ def main():
         "median_income",
     ]
     feature_matrix = data.select(ses_columns).to_numpy()
-    scaled_matrix = StandardScaler().fit_transform(feature_matrix)
 
-    # PCA for 2D visualization (preserves variance)
+    # Scaling and a single full SVD are shared with 05.0 (cached by feature hash)
+    transform = load_or_fit_transform(feature_matrix, ses_columns)
+    scaled_matrix = transform["scaled"]
+
+    # PCA for 2D visualization (preserves variance): first two columns of the SVD scores
     # [https://scikit-learn.org/stable/modules/generated/sklearn.decomposition.PCA.html]
-    pca_coordinates = PCA(n_components=2).fit_transform(scaled_matrix)
+    pca_coordinates = transform["scores"][:, :2]
+
+    #### Train models (LLM assistance) ####
+    # K-means: Hard assignments; GMM: Probabilistic assignments
+    # Cold fits (K-means: 10 restarts, seed 42) so the published comparison is reproducible;
+    # the two model chains are fitted in parallel (see utils/models.py)
+    with span("fit"):
+        fits = {
+            (fit["model"], fit["k"]): fit["labels"]
+            for fit in fit_models(
+                scaled_matrix, ["kmeans", "gmm"], [2, 3], warm_start=False
+            )
+        }
 
     # Define clustering configurations (K-means vs. GMM; K =2, 3) and colour maps
     cluster_configs = [
-        ("$K$-means", 2, "Paired", "$K$-means ($K$ = 2)"),
-        ("GMM", 2, "Accent", "GMM ($K$ = 2)"),
-        ("$K$-means", 3, "Set1", "$K$-means ($K$ = 3)"),
-        ("GMM", 3, "Set2", "GMM ($K$ = 3)"),
+        ("kmeans", 2, "Paired", "$K$-means ($K$ = 2)"),
+        ("gmm", 2, "Accent", "GMM ($K$ = 2)"),
+        ("kmeans", 3, "Set1", "$K$-means ($K$ = 3)"),
+        ("gmm", 3, "Set2", "GMM ($K$ = 3)"),
     ]
 
-    # Plot PCA visualizations in a 2x2 grid
-    fig_pca, axes_pca = plt.subplots(2, 2, figsize=(12, 10))
-    axes_pca = axes_pca.flatten()
-
-    for idx, (model_type, num_clusters, colormap, title) in enumerate(cluster_configs):
-        #### Train models (LLM assistance) ####
-        # K-means: Hard assignments; GMM: Probabilistic assignments
-        if model_type == "KMeans":
-            model = KMeans(n_clusters=num_clusters, random_state=42, n_init=10)
-        else:
-            model = GaussianMixture(n_components=num_clusters, random_state=42)
-
-        cluster_labels = model.fit_predict(scaled_matrix)  # cluster assignments
-        # Plot PCA results with cluster labels
-        # [https://matplotlib.org/stable/api/_as_gen/matplotlib.pyplot.scatter.html]
-        scatter = axes_pca[idx].scatter(
-            pca_coordinates[:, 0],
-            pca_coordinates[:, 1],
-            c=cluster_labels,
-            cmap=colormap,
-            alpha=0.8,
-        )
-        axes_pca[idx].set_title(title)
-        axes_pca[idx].set_xlabel("Principal Component 1")
-        axes_pca[idx].set_ylabel("Principal Component 2")
-        axes_pca[idx].legend(*scatter.legend_elements(), title="Cluster")
-
-    fig_pca.suptitle(
-        "Dimensionality Reduced Clustering Results ($K$-Means vs. GMM)", fontsize=16
+    # Figures are skipped when their plotted data + labels are unchanged (see utils/figures.py)
+    writer = FigureWriter(formats=figure_formats)
+    stem = "other/figures/fig_2_cluster_comparisons"
+    key = figure_key(
+        pca_coordinates,
+        *[fits[config[:2]] for config in cluster_configs],
+        cluster_configs,
     )
-    fig_pca.tight_layout(rect=[0, 0.03, 1, 0.95])
-    fig_pca.savefig("other/figures/fig_2_cluster_comparisons.png", dpi=300)
+    if writer.needs(stem, key):
+        # Plot PCA visualizations in a 2x2 grid
+        fig_pca, axes_pca = plt.subplots(2, 2, figsize=(12, 10))
+        axes_pca = axes_pca.flatten()
+
+        for idx, (model_name, num_clusters, colormap, title) in enumerate(
+            cluster_configs
+        ):
+            cluster_labels = fits[(model_name, num_clusters)]  # cluster assignments
+            # Plot PCA results with cluster labels
+            # [https://matplotlib.org/stable/api/_as_gen/matplotlib.pyplot.scatter.html]
+            scatter = axes_pca[idx].scatter(
+                pca_coordinates[:, 0],
+                pca_coordinates[:, 1],
+                c=cluster_labels,
+                cmap=colormap,
+                alpha=0.8,
+            )
+            axes_pca[idx].set_title(title)
+            axes_pca[idx].set_xlabel("Principal Component 1")
+            axes_pca[idx].set_ylabel("Principal Component 2")
+            axes_pca[idx].legend(*scatter.legend_elements(), title="Cluster")
+
+        fig_pca.suptitle(
+            "Dimensionality Reduced Clustering Results ($K$-Means vs. GMM)", fontsize=16
+        )
+        fig_pca.tight_layout(rect=[0, 0.03, 1, 0.95])
+        writer.save(fig_pca, stem, key)
 
     #### Check PCA scores ####
-    # Fit PCA on the scaled matrix (using all components)
-    pca_full = PCA().fit(scaled_matrix)
+    # All components come from the same SVD as the 2D projection (no second PCA fit)
+    explained_variance_ratio = transform["explained_variance_ratio"]
 
     # Explained variance ratio per component
-    print("Explained variance ratio:", pca_full.explained_variance_ratio_)
+    print("Explained variance ratio:", explained_variance_ratio)
 
     # Cumulative explained variance
-    print("Cumulative explained variance:", pca_full.explained_variance_ratio_.cumsum())
+    print("Cumulative explained variance:", explained_variance_ratio.cumsum())
 
     # Singular values (proportional to component strengths)
-    print("Singular values:", pca_full.singular_values_)
+    print("Singular values:", transform["singular_values"])
 
     # Eigenvalues (variance captured by each principal axis)
-    eigenvalues = pca_full.explained_variance_
+    eigenvalues = transform["explained_variance"]
     print("Eigenvalues:", eigenvalues)
 
     #### Cluster Metrics Evaluation ####
     # Compare models using Silhouette, Davies-Bouldin, and Calinski-Harabasz scores
     # [https://scikit-learn.org/stable/modules/clustering.html#clustering-evaluation]
+    # One engine per feature matrix: distances and centering are shared by every model
+    metrics = ClusterMetrics(scaled_matrix)
     evaluation_results = []
-    for model_type in ["KMeans", "GMM"]:
+    for model_name in ["kmeans", "gmm"]:
         for num_clusters in [2, 3]:
-            if model_type == "KMeans":
-                model = KMeans(n_clusters=num_clusters, random_state=42, n_init=10)
-            else:
-                model = GaussianMixture(n_components=num_clusters, random_state=42)
-            labels = model.fit_predict(scaled_matrix)
+            labels = fits[(model_name, num_clusters)]
 
             # Silhouette: Cluster separation/cohesion (-1 to 1, higher = better)
             # Davies-Bouldin: Cluster overlap (lower = better)
             # Calinski-Harabasz: Variance ratio (higher = tighter clusters)
             evaluation_results.append(
                 {
-                    "Model": model_type,
+                    "Model": MODELS[model_name][0],
                     "k": num_clusters,
-                    "Silhouette": silhouette_score(scaled_matrix, labels),
-                    "Davies-Bouldin": davies_bouldin_score(scaled_matrix, labels),
-                    "Calinski-Harabasz": calinski_harabasz_score(scaled_matrix, labels),
+                    **metrics.score(labels),
                 }
             )
 
@@ -138,33 +158,39 @@ def main():
         "Calinski–Harabasz Score (↑ tighter clusters)",
     ]
 
-    fig_metrics, axes_metrics = plt.subplots(1, 3, figsize=(18, 5))
-    for i, metric in enumerate(metric_names):
-        ax = axes_metrics[i]
-        bar_width = 0.35
-        x_positions = np.arange(2)  # for K = 2 and K = 3
+    stem = "other/figures/fig_3_cluster_metrics"
+    key = figure_key(evaluation_results, metric_names, metric_titles)
+    if writer.needs(stem, key):
+        fig_metrics, axes_metrics = plt.subplots(1, 3, figsize=(18, 5))
+        for i, metric in enumerate(metric_names):
+            ax = axes_metrics[i]
+            bar_width = 0.35
+            x_positions = np.arange(2)  # for K = 2 and K = 3
 
-        #  # Plot KMeans and GMM bars side-by-side
-        for j, model_type in enumerate(["KMeans", "GMM"]):
-            metric_scores = [
-                res[metric] for res in evaluation_results if res["Model"] == model_type
-            ]
-            offset = x_positions + (j - 0.5) * bar_width
-            ax.bar(offset, metric_scores, width=bar_width, label=model_type)
-
-        ax.set_xticks(x_positions)
-        ax.set_xticklabels(["$K$ = 2", "$K$ = 3"])
-        ax.set_xlabel("Number of Clusters ($K$)")
-        ax.set_ylabel(metric)
-        ax.set_title(metric_titles[i])
-        ax.legend()
-
-    #### Save metrics figure ####
-    fig_metrics.suptitle(
-        "Clustering Evaluation Metrics ($K$-Means vs. GMM; $K$ = 2, 3)", fontsize=16
-    )
-    fig_metrics.tight_layout(rect=[0, 0.03, 1, 0.95])
-    fig_metrics.savefig("other/figures/fig_3_cluster_metrics.png", dpi=300)
+            #  # Plot KMeans and GMM bars side-by-side
+            for j, model_type in enumerate(["KMeans", "GMM"]):
+                metric_scores = [
+                    res[metric]
+                    for res in evaluation_results
+                    if res["Model"] == model_type
+                ]
+                offset = x_positions + (j - 0.5) * bar_width
+                ax.bar(offset, metric_scores, width=bar_width, label=model_type)
+
+            ax.set_xticks(x_positions)
+            ax.set_xticklabels(["$K$ = 2", "$K$ = 3"])
+            ax.set_xlabel("Number of Clusters ($K$)")
+            ax.set_ylabel(metric)
+            ax.set_title(metric_titles[i])
+            ax.legend()
+
+        #### Save metrics figure ####
+        fig_metrics.suptitle(
+            "Clustering Evaluation Metrics ($K$-Means vs. GMM; $K$ = 2, 3)", fontsize=16
+        )
+        fig_metrics.tight_layout(rect=[0, 0.03, 1, 0.95])
+        writer.save(fig_metrics, stem, key)
+    writer.close()  # wait for background rendering
 
     #### Results Summary Table ####
     # Convert evaluation results to a Polars DataFrame for nice formatting
@@ -195,7 +221,51 @@ def main():
     print(eval_table)
 
     #### Save CSV ####
-    eval_table.write_csv("data/02-analysis_data/05-cluster_evaluation_metrics.csv")
+    write_csv(eval_table, "data/02-analysis_data/05-cluster_evaluation_metrics.csv")
+
+    # The same fits for the results bundle (08.4), so the paper quotes exactly these models
+    cluster_fits = pl.DataFrame(
+        {
+            "neighbourhood": data["neighbourhood"],
+            "pc1": pca_coordinates[:, 0],
+            "pc2": pca_coordinates[:, 1],
+            **{f"{model}_{k}": labels for (model, k), labels in fits.items()},
+        }
+    )
+    write_parquet(cluster_fits, "data/02-analysis_data/23-cluster_fits.parquet")
+    write_parquet(eval_df, "data/02-analysis_data/24-cluster_fit_metrics.parquet")
+
+    #### Model zoo sweep (every registered model, K = 2-8) ####
+    # Each model's K + 1 fit warm-starts from its K solution; model chains run in parallel
+    # Scores use the clusters a fit actually produced (a Bayesian GMM may leave components
+    # empty) and leave out HDBSCAN's noise points
+    start = time.perf_counter()
+    with span("sweep"):
+        sweep = fit_models(scaled_matrix, list(MODELS), range(2, 9), warm_start=True)
+    sweep_table = (
+        pl.DataFrame(
+            [
+                {
+                    "Model": fit["Model"],
+                    "k": fit["k"],
+                    "k_effective": fit["k_effective"],
+                    "noise": fit["noise"],
+                    **metrics.score_clustered(fit["labels"]),
+                }
+                for fit in sweep
+                if fit["k_effective"] > 1  # metrics need at least two clusters
+            ]
+        )
+        .with_columns(
+            pl.col("Silhouette").round(3),
+            pl.col("Davies-Bouldin").round(3),
+            pl.col("Calinski-Harabasz").round(1),
+        )
+        .sort(["Model", "k"])
+    )
+    print(f"Fitted {len(sweep)} models in {time.perf_counter() - start:.2f}s")
+    print(sweep_table.sort("Silhouette", descending=True).head(10))
+    write_csv(sweep_table, "data/02-analysis_data/14-model_sweep.csv")
 
 
 #### ENTRY POINT ####
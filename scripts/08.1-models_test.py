@@ -0,0 +1,76 @@
+#### Preamble ####
+# Purpose: Tests the clustering model registry, warm-started sweeps and parallel fits.
+# Author: Mike Cowan
+# Date: 19 May 2025
+# Contact: m.cowan@mail.utoronto.ca
+# License: MIT
+# Pre-requisites:
+# - `numpy` must be installed (pip install numpy)
+# - `scikit-learn` must be installed (pip install scikit-learn)
+# - `pytest` must be installed (pip install pytest); run with "pytest -q"
+# References:
+# - [https://docs.pytest.org/en/stable]
+
+#### Workspace setup ####
+import numpy as np
+import pytest  # test functions across any .py ending with "test"
+from sklearn.cluster import KMeans
+
+from utils.models import MODELS, fit_chain, fit_models
+
+
+#### Test data ####
+# Four well-separated blobs
+@pytest.fixture
+def blobs():
+    rng = np.random.default_rng(838)
+    centres = np.array([[0, 0], [6, 0], [0, 6], [6, 6]])
+    return rng.normal(scale=0.5, size=(120, 2)) + np.repeat(centres, 30, axis=0)
+
+
+#### Tests ####
+# Cold K-means is exactly scikit-learn's KMeans(random_state=42, n_init=10)
+def test_cold_kmeans_matches_sklearn(blobs):
+    labels = fit_chain("kmeans", blobs, [3], warm_start=False)[0]["labels"]
+    expected = KMeans(n_clusters=3, random_state=42, n_init=10).fit_predict(blobs)
+    np.testing.assert_array_equal(labels, expected)
+
+
+# Every registered model returns one labelling per K with the requested number of clusters;
+# `k_effective` is the number the labels actually use
+@pytest.mark.parametrize("name", [n for n, (_, _, uses_k) in MODELS.items() if uses_k])
+def test_warm_chain_cluster_counts(blobs, name):
+    fits = fit_chain(name, blobs, [2, 3, 4])
+    assert [fit["k"] for fit in fits] == [2, 3, 4]
+    for fit in fits:
+        assert fit["k_effective"] == len(np.unique(fit["labels"]))
+        assert fit["noise"] == 0
+    if name != "bayesian_gmm":  # may leave components empty by design
+        assert [fit["k_effective"] for fit in fits] == [2, 3, 4]
+
+
+# A Bayesian GMM asked for far more components than the data supports records fewer
+def test_bayesian_gmm_effective_k(blobs):
+    (fit,) = fit_chain("bayesian_gmm", blobs[::4], [20])
+    assert fit["k"] == 20
+    assert fit["k_effective"] == fit["labels"].max() + 1 < 20
+
+
+# Warm-started K-means recovers the four blobs; parallel and sequential sweeps agree
+def test_warm_start_and_parallel(blobs):
+    warm = fit_chain("kmeans", blobs, [2, 3, 4])[-1]["labels"]
+    assert len(np.unique(warm[::30])) == 4  # one label per blob
+    sequential = fit_models(blobs, ["kmeans", "agglomerative"], [2, 3], n_jobs=1)
+    parallel = fit_models(blobs, ["kmeans", "agglomerative"], [2, 3], n_jobs=2)
+    for a, b in zip(sequential, parallel):
+        assert (a["model"], a["k"]) == (b["model"], b["k"])
+        np.testing.assert_array_equal(a["labels"], b["labels"])
+
+
+# HDBSCAN chooses its own K; noise keeps the label -1 and is not counted as a cluster
+def test_hdbscan_finds_blobs(blobs):
+    (fit,) = fit_chain("hdbscan", blobs, [2, 3])
+    assert fit["k"] == fit["k_effective"] >= 4
+    labels = fit["labels"]
+    assert fit["k_effective"] == labels.max() + 1
+    assert fit["noise"] == (labels == -1).sum()
@@ -0,0 +1,115 @@
+#### Preamble ####
+# Purpose: Sensitivity analysis: re-clusters neighbourhoods across SES feature subsets, weights, models, K and seeds.
+# Author: Mike Cowan
+# Date: 19 May 2025
+# Contact: m.cowan@mail.utoronto.ca
+# License: MIT
+# Pre-requisites:
+# - `polars`, `numpy` and `scikit-learn` must be installed
+# - Run after 05.0 (published clusters in the merged data are the ARI baseline)
+# - Not part of 00.0-run_pipeline.py; run it on demand:
+#   python scripts/08.2-sensitivity_sweep.py --k 2-6 --seeds 42,838,2025 --models kmeans,gmm
+# Output: data/02-analysis_data/15-sensitivity_sweep.parquet, one row per configuration and K:
+# - features, n_features, weighting, model, k, seed
+# - k_effective (clusters the labels actually use), noise (HDBSCAN points in no cluster)
+# - silhouette, davies_bouldin, calinski_harabasz (see utils/metrics.py)
+# - ari_baseline: agreement with the published K = 3 clusters
+# - min_cluster_size
+# - <crime>_low_high_ratio: final-year mean rate, lowest- vs highest-opportunity cluster
+# References:
+# - [https://docs.pola.rs/api/python/stable/reference/api/polars.DataFrame.write_parquet.html]
+
+#### Workspace setup ####
+import argparse  # inherent to Python
+import time  # inherent to Python
+
+import polars as pl
+
+from utils.artifacts import write_parquet
+from utils.config import analyzed_crimes
+from utils.features import load_or_fit_transform
+from utils.schema import detect_years
+from utils.sweep import expand_grid, feature_subsets, run_sweep
+
+
+#### MAIN FUNCTION ####
+def main(ks=range(2, 7), seeds=(42, 838, 2025), models=("kmeans",), n_jobs=None):
+    print("Running the clustering sensitivity sweep.")
+
+    #### 08.2-sensitivity_sweep.py ####
+    #### Load data ####
+    merged_data = pl.read_csv("data/02-analysis_data/02-analysis_data_merged.csv")
+    ses_columns = [
+        "education_rate",
+        "prop_single_parent",
+        "unemployment_rate",
+        "median_income",
+    ]
+    crime_types = analyzed_crimes()
+    year = detect_years(merged_data.columns, crime_types)[-1]
+
+    # One scaled matrix (shared with 05.0/08.0 through the feature cache) serves every subset
+    transform = load_or_fit_transform(
+        merged_data.select(ses_columns).to_numpy(), ses_columns
+    )
+    rates = (
+        merged_data.select([f"{crime}_rate_{year}" for crime in crime_types])
+        .cast(pl.Float64)
+        .to_numpy()
+    )
+
+    #### Grid ####
+    # Every subset of two or more SES columns; equal weights, or one column doubled
+    weightings = {"equal": {}}
+    weightings.update({f"{column}_x2": {column: 2.0} for column in ses_columns})
+    configs = expand_grid(
+        feature_subsets(ses_columns), weightings, list(ks), list(seeds), list(models)
+    )
+
+    #### Sweep ####
+    start = time.perf_counter()
+    results = run_sweep(
+        configs,
+        transform["scaled"],
+        ses_columns,
+        rates,
+        crime_types,
+        merged_data["cluster"].to_numpy(),
+        n_jobs=n_jobs,
+    ).with_columns(pl.lit(year).alias("year"))
+    print(
+        f"{len(configs)} configurations, {results.height} fits "
+        f"in {time.perf_counter() - start:.1f}s."
+    )
+
+    # Settings closest to the published clusters first (K-means, averaged over seeds)
+    print(
+        results.filter(pl.col("model") == "kmeans")
+        .group_by(["features", "weighting", "k"])
+        .agg(pl.col("ari_baseline", "silhouette").mean())
+        .sort("ari_baseline", descending=True)
+        .head(10)
+    )
+
+    #### Save results ####
+    write_parquet(results, "data/02-analysis_data/15-sensitivity_sweep.parquet")
+
+
+#### ENTRY POINT ####
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Clustering sensitivity sweep")
+    parser.add_argument("--k", default="2-6", help="K range, e.g. 2-6")
+    parser.add_argument("--seeds", default="42,838,2025")
+    parser.add_argument("--models", default="kmeans", help="names in utils/models.py")
+    parser.add_argument("--jobs", type=int, default=None, help="worker processes")
+    args = parser.parse_args()
+    k_min, k_max = (int(k) for k in args.k.split("-"))
+    main(
+        ks=range(k_min, k_max + 1),
+        seeds=[int(seed) for seed in args.seeds.split(",")],
+        models=args.models.split(","),
+        n_jobs=args.jobs,
+    )
+    print(
+        "Sensitivity sweep saved to data/02-analysis_data/15-sensitivity_sweep.parquet."
+    )
@@ -0,0 +1,71 @@
+#### Preamble ####
+# Purpose: Tests the sensitivity sweep grid, cluster table and parallel runner.
+# Author: Mike Cowan
+# Date: 19 May 2025
+# Contact: m.cowan@mail.utoronto.ca
+# License: MIT
+# Pre-requisites:
+# - `numpy`, `polars` and `scikit-learn` must be installed
+# - `pytest` must be installed (pip install pytest); run with "pytest -q"
+# References:
+# - [https://docs.pytest.org/en/stable]
+
+#### Workspace setup ####
+import numpy as np
+import pytest  # test functions across any .py ending with "test"
+
+from utils.sweep import cluster_table, expand_grid, feature_subsets, run_sweep
+
+COLUMNS = ["education_rate", "prop_single_parent", "unemployment_rate", "median_income"]
+
+
+#### Test data: three well-separated SES groups with rising crime rates ####
+@pytest.fixture
+def data():
+    rng = np.random.default_rng(838)
+    groups = np.repeat([0, 1, 2], 20)
+    centres = np.array([[2, -2, -2, 2], [0, 0, 0, 0], [-2, 2, 2, -2]], dtype=float)
+    scaled = centres[groups] + rng.normal(scale=0.3, size=(60, 4))
+    rates = np.column_stack([100.0 * (groups + 1), 10.0 * (groups + 1)])
+    return scaled, rates, groups
+
+
+#### Tests ####
+def test_grid_expansion():
+    subsets = feature_subsets(COLUMNS)
+    assert len(subsets) == 11  # 6 pairs + 4 triples + all four
+    weightings = {"equal": {}, "median_income_x2": {"median_income": 2.0}}
+    configs = expand_grid(subsets, weightings, [2, 3], [1, 2])
+    # income doubling only applies to the 7 subsets containing median_income
+    assert len(configs) == (11 + 7) * 2
+    doubled = [c for c in configs if c["weighting"] == "median_income_x2"][0]
+    assert doubled["weights"][doubled["features"].index("median_income")] == 2.0
+    with pytest.raises(ValueError, match="Unknown model"):
+        expand_grid(subsets, weightings, [2], [1], models=["kmedoids"])
+
+
+# Cluster means are ordered from lowest to highest opportunity, whatever the label numbers
+def test_cluster_table_order(data):
+    scaled, rates, groups = data
+    opportunity = scaled @ np.array([1.0, -1.0, -1.0, 1.0])
+    relabelled = np.array([2, 0, 1])[groups]
+    table = cluster_table(relabelled, rates, opportunity)
+    np.testing.assert_allclose(table[:, 0], [300, 200, 100])
+    rates_missing = rates.copy()
+    rates_missing[0, 0] = np.nan  # skipped, not counted as zero
+    np.testing.assert_allclose(
+        cluster_table(groups, rates_missing, opportunity)[-1, 0], 100
+    )
+
+
+# Serial and parallel runs agree, and the published grouping is recovered at K = 3
+def test_sweep_serial_matches_parallel(data):
+    scaled, rates, groups = data
+    configs = expand_grid([COLUMNS, COLUMNS[:2]], {"equal": {}}, [2, 3], [42])
+    serial = run_sweep(configs, scaled, COLUMNS, rates, ["a", "b"], groups, n_jobs=1)
+    parallel = run_sweep(configs, scaled, COLUMNS, rates, ["a", "b"], groups, n_jobs=2)
+    assert serial.equals(parallel)
+    assert serial.height == len(configs) * 2
+    best = serial.filter(serial["k"] == 3).row(0, named=True)
+    assert best["ari_baseline"] == pytest.approx(1.0)
+    assert best["a_low_high_ratio"] == pytest.approx(3.0)
@@ -0,0 +1,130 @@
+#### Preamble ####
+# Purpose: Writes the results bundle that paper/paper.qmd loads (tables, plotted series and quoted numbers).
+# Author: Mike Cowan
+# Date: 19 May 2025
+# Contact: m.cowan@mail.utoronto.ca
+# License: MIT
+# Pre-requisites:
+# - `polars`, `numpy` and `scikit-learn` must be installed
+# - `fastexcel` must be installed (pip install fastexcel); reads the .xlsx profiles preview
+# - Run after 06.0 (rate change tables) and 08.0 (its K-means/GMM fits and metrics are read
+#   from 23-cluster_fits.parquet and 24-cluster_fit_metrics.parquet, not refitted)
+# - With `rates="smoothed"`, the trends and rate change tables come from the 03.4 smoothed rates and
+#   the bundle goes to 16-results_bundle_smoothed/; a bundle never mixes raw and smoothed numbers
+# Output: data/02-analysis_data/16-results_bundle/ (see utils/results.py)
+# - crime_preview, census_preview: raw-data glimpses (columns from [preview] in the city config)
+# - cluster_summary: SES means by cluster
+# - crime_trends: mean rate by crime, cluster and year
+# - cluster_pca: first two PCA scores with K-means/GMM labels (K = 2, 3)
+# - cluster_metrics: Silhouette, Davies-Bouldin, Calinski-Harabasz (unrounded)
+# - rate_change_<crime>: the 03-table_data tables
+# - results.json: quoted values (including which `rates`), table hashes and bundle version
+#   (the run that wrote it is recorded in data/artifacts/runs/<run_id>/)
+# References:
+# - [https://quarto.org/docs/computations/inline-code.html]
+
+#### Workspace setup ####
+import polars as pl
+
+from utils.artifacts import current_run_id
+from utils.config import analyzed_crimes, load_city, profile_vintages
+from utils.features import load_or_fit_transform
+from utils.results import (
+    RESULTS_DIR,
+    census_preview,
+    cluster_summary,
+    crime_preview,
+    crime_trends,
+    write_results,
+)
+from utils.schema import detect_years
+from utils.smoothing import rates_path, use_rates
+
+
+#### MAIN FUNCTION ####
+def main(rates="raw"):
+    print("Writing the paper results bundle.")
+
+    #### 08.4-results_bundle.py ####
+    #### Load data ####
+    city = load_city()
+    profiles = profile_vintages(city)[max(profile_vintages(city))]  # current vintage
+    crime_raw = pl.read_csv(city["portal"]["packages"]["crime"]["path"])
+    profile_raw = pl.read_excel(profiles["path"])
+    merged_data = pl.read_csv("data/02-analysis_data/02-analysis_data_merged.csv")
+    crime_types = analyzed_crimes()
+    years = detect_years(merged_data.columns, crime_types)
+    ses_columns = [
+        "education_rate",
+        "prop_single_parent",
+        "unemployment_rate",
+        "median_income",
+    ]
+
+    #### Clusters in PCA space and their metrics: the 08.0 fits, read back (no refit) ####
+    cluster_pca = pl.read_parquet("data/02-analysis_data/23-cluster_fits.parquet")
+    cluster_metrics = pl.read_parquet(
+        "data/02-analysis_data/24-cluster_fit_metrics.parquet"
+    )
+    if cluster_pca["neighbourhood"].to_list() != merged_data["neighbourhood"].to_list():
+        raise ValueError("23-cluster_fits.parquet is stale; run 08.0 first.")
+    # Explained variance from the cached transform 08.0 used (no PCA refit)
+    transform = load_or_fit_transform(
+        merged_data.select(ses_columns).to_numpy(), ses_columns
+    )
+
+    #### Tables ####
+    tables = {
+        "crime_preview": crime_preview(
+            crime_raw, city["area_column"], city["preview"]["crime_columns"]
+        ),
+        "census_preview": census_preview(
+            profile_raw, profiles["label_column"], city["preview"]["census_columns"]
+        ),
+        "cluster_summary": cluster_summary(merged_data),
+        "crime_trends": crime_trends(
+            use_rates(merged_data, rates, crime_types, years), crime_types, years
+        ),
+        "cluster_pca": cluster_pca,
+        "cluster_metrics": cluster_metrics,
+    }
+    for crime in crime_types:
+        tables[f"rate_change_{crime}"] = pl.read_csv(
+            rates_path(f"data/03-table_data/{crime}_rate_change.csv", rates)
+        )
+
+    #### Numbers quoted in the text ####
+    income = (
+        merged_data.group_by("opportunity_index")
+        .agg(pl.mean("median_income"))
+        .sort("opportunity_index")
+    )
+    values = {
+        "rates": rates,
+        "crime_types": crime_types,
+        "years": years,
+        "neighbourhoods": merged_data.height,
+        "pca_explained_variance": transform["explained_variance_ratio"].tolist(),
+        "median_income": dict(income.iter_rows()),
+        "metrics": {
+            f"{row['Model']}_{row['k']}": {
+                key: row[key]
+                for key in ["Silhouette", "Davies-Bouldin", "Calinski-Harabasz"]
+            }
+            for row in cluster_metrics.iter_rows(named=True)
+        },
+    }
+
+    #### Save bundle ####
+    directory = rates_path(RESULTS_DIR, rates)
+    manifest = write_results(tables, values, directory=directory)
+    print(
+        f"Results bundle {manifest['version']} (run {current_run_id()}): "
+        f"{len(tables)} tables saved to {directory}/."
+    )
+
+
+#### ENTRY POINT ####
+if __name__ == "__main__":
+    main()
+    print("Results bundle has been written.")
@@ -0,0 +1,110 @@
+#### Preamble ####
+# Purpose: Tests the paper results bundle (trend series, cluster summary, previews, versioned round trip).
+# Author: Mike Cowan
+# Date: 19 May 2025
+# Contact: m.cowan@mail.utoronto.ca
+# License: MIT
+# Pre-requisites:
+# - `numpy` and `polars` must be installed
+# - `pytest` must be installed (pip install pytest); run with "pytest -q"
+# References:
+# - [https://docs.pytest.org/en/stable]
+
+#### Workspace setup ####
+from pathlib import Path  # inherent to Python
+
+import numpy as np
+import polars as pl
+import pytest  # test functions across any .py ending with "test"
+
+from utils.artifacts import read_manifest
+from utils.results import (
+    cluster_summary,
+    crime_preview,
+    crime_trends,
+    read_results,
+    write_results,
+)
+
+LEVELS = ["Low Opportunity", "Medium Opportunity", "High Opportunity"]
+
+
+#### Test data ####
+@pytest.fixture
+def merged():
+    rng = np.random.default_rng(838)
+    n = 12
+    columns = {
+        "neighbourhood": [f"area-{i:02d}" for i in range(n)],
+        "cluster": [i % 3 for i in range(n)],
+        "opportunity_index": [LEVELS[i % 3] for i in range(n)],
+        "education_rate": rng.uniform(0, 1, n),
+        "prop_single_parent": rng.uniform(0, 1, n),
+        "unemployment_rate": rng.uniform(0, 20, n),
+        "median_income": rng.uniform(50_000, 150_000, n),
+    }
+    for crime in ["assault", "robbery"]:
+        for year in [2019, 2020]:
+            columns[f"{crime}_rate_{year}"] = rng.uniform(0, 500, n)
+    return pl.DataFrame(columns)
+
+
+#### Tests ####
+# Trend series: one row per crime, cluster and year, equal to the group means
+def test_crime_trends(merged):
+    trends = crime_trends(merged, ["assault", "robbery"], [2019, 2020])
+    assert trends.height == 2 * 3 * 2
+    for row in trends.iter_rows(named=True):
+        expected = merged.filter(
+            pl.col("opportunity_index") == row["opportunity_index"]
+        )[f"{row['crime']}_rate_{row['year']}"].mean()
+        assert row["average_rate"] == pytest.approx(expected)
+
+
+def test_cluster_summary(merged):
+    summary = cluster_summary(merged)
+    assert summary["Cluster"].to_list() == [0, 1, 2]
+    assert summary["Neighbourhoods"].to_list() == [4, 4, 4]
+    assert summary["Med. Income ($)"][0] == pytest.approx(
+        round(merged.filter(pl.col("cluster") == 0)["median_income"].mean(), 2)
+    )
+
+
+def test_crime_preview_fills_nulls():
+    raw = pl.DataFrame(
+        {
+            "AREA_NAME": ["A very long neighbourhood name", "Short"],
+            "HOOD_ID": [1, 2],
+            "ASSAULT_2014": [None, 5],
+            "BREAKENTER_2014": [3, None],
+        }
+    )
+    preview = crime_preview(
+        raw, "AREA_NAME", ["HOOD_ID", "ASSAULT_2014", "BREAKENTER_2014"]
+    )
+    assert preview["AREA_NAME"][0] == "A very long neig"
+    assert preview["ASSAULT_2014"].to_list() == [0, 5]
+    assert preview.columns[-1] == "…"
+
+
+# Round trip: tables and values come back unchanged; the version only moves with content
+def test_write_and_read(merged, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    tables = {"cluster_summary": cluster_summary(merged)}
+    values = {"neighbourhoods": merged.height}
+
+    first = write_results(tables, values, directory="bundle", run_id="run-1")
+    manifest, loaded = read_results("bundle")
+    assert manifest["values"] == values
+    assert "run_id" not in manifest  # the run is recorded in the artifact store
+    assert loaded["cluster_summary"].equals(tables["cluster_summary"])
+    assert "bundle/results.json" in read_manifest("run-1")["artifacts"]
+
+    committed = Path("bundle/results.json").read_bytes()
+    again = write_results(tables, values, directory="bundle", run_id="run-2")
+    assert again["version"] == first["version"]
+    assert Path("bundle/results.json").read_bytes() == committed
+    changed = write_results(
+        tables, {"neighbourhoods": 1}, directory="bundle", run_id="run-3"
+    )
+    assert changed["version"] != first["version"]
@@ -0,0 +1,117 @@
+#### Preamble ####
+# Purpose: Serves cluster × crime × year aggregates over HTTP from the in-memory merged panel.
+# Author: Mike Cowan
+# Date: 19 May 2025
+# Contact: m.cowan@mail.utoronto.ca
+# License: MIT
+# Pre-requisites:
+# - `polars` and `pyarrow` must be installed (pip install polars pyarrow)
+# - Merged data from 04.0 and clusters from 05.0 (`opportunity_index`)
+# - Not part of 00.0-run_pipeline.py; start it after the pipeline has run:
+#   python scripts/09.0-query_service.py --port 8050
+# Usage (JSON responses):
+# - GET /aggregate?crime=assault,robbery&year_min=2020&cluster=High Opportunity&group_by=cluster,year&stat=mean
+# - GET /health  (data version and cache statistics)
+# - POST /refresh  (reload after the pipeline rewrites the merged data)
+# References:
+# - [https://docs.python.org/3/library/http.server.html]
+
+#### Workspace setup ####
+import argparse  # inherent to Python
+import json  # inherent to Python
+import time  # inherent to Python
+import http.server  # inherent to Python
+from urllib.parse import parse_qs, urlparse  # inherent to Python
+
+from utils.query import PanelQueryEngine
+
+
+#### Request handler (one engine shared by every thread) ####
+def make_handler(engine):
+    class QueryHandler(http.server.BaseHTTPRequestHandler):
+        def send_json(self, status, payload):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path == "/health":
+                info, snapshot = engine.cache_info(), engine.snapshot()
+                return self.send_json(
+                    200,
+                    {
+                        "version": snapshot.version,
+                        "rows": snapshot.panel.height,
+                        "cache_hits": info.hits,
+                        "cache_misses": info.misses,
+                        "cache_size": info.currsize,
+                    },
+                )
+            if url.path != "/aggregate":
+                return self.send_json(404, {"error": f"Unknown path {url.path}"})
+
+            # Repeated keys (crime=a&crime=b) and comma lists (crime=a,b) are both accepted
+            params = {
+                key: ",".join(values) for key, values in parse_qs(url.query).items()
+            }
+            start = time.perf_counter()
+            snapshot = engine.snapshot()  # rows and reported version from one panel
+            try:
+                rows = engine.aggregate_at(snapshot, **params)
+            except (TypeError, ValueError) as error:
+                return self.send_json(400, {"error": str(error)})
+            self.send_json(
+                200,
+                {
+                    "version": snapshot.version,
+                    "elapsed_ms": round(1000 * (time.perf_counter() - start), 3),
+                    "rows": list(rows),
+                },
+            )
+
+        def do_POST(self):
+            if urlparse(self.path).path != "/refresh":
+                return self.send_json(404, {"error": f"Unknown path {self.path}"})
+            self.send_json(200, {"version": engine.refresh()})
+
+    return QueryHandler
+
+
+#### MAIN FUNCTION ####
+def main(host="127.0.0.1", port=8050):
+    print("Starting the crime panel query service.")
+
+    #### 09.0-query_service.py ####
+    # Panel is converted to Arrow once (data/cache) and memory-mapped on every start
+    start = time.perf_counter()
+    engine = PanelQueryEngine(
+        "data/02-analysis_data/02-analysis_data_merged.csv",
+        "data/cache/query_panel.arrow",
+    )
+    print(
+        f"Loaded {engine.panel.height} panel rows (version {engine.version}) "
+        f"in {time.perf_counter() - start:.2f}s"
+    )
+
+    server = http.server.ThreadingHTTPServer((host, port), make_handler(engine))
+    print(f"Listening on http://{host}:{port} (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+#### ENTRY POINT ####
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Crime panel query service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8050)
+    args = parser.parse_args()
+    main(host=args.host, port=args.port)
+    print("Query service stopped.")
@@ -0,0 +1,115 @@
+#### Preamble ####
+# Purpose: Tests the panel query engine (long panel, query normalization, aggregates and caching).
+# Author: Mike Cowan
+# Date: 19 May 2025
+# Contact: m.cowan@mail.utoronto.ca
+# License: MIT
+# Pre-requisites:
+# - `polars` and `pyarrow` must be installed (pip install polars pyarrow)
+# - `pytest` must be installed (pip install pytest); run with "pytest -q"
+# References:
+# - [https://docs.pytest.org/en/stable]
+
+#### Workspace setup ####
+import polars as pl
+import pytest  # test functions across any .py ending with "test"
+
+from utils.query import PanelQueryEngine, normalize_query
+
+
+#### Test data ####
+# Three neighbourhoods, two crimes, two years
+@pytest.fixture
+def engine(tmp_path):
+    merged = pl.DataFrame(
+        {
+            "neighbourhood": ["a", "b", "c"],
+            "opportunity_index": [
+                "Low Opportunity",
+                "Low Opportunity",
+                "High Opportunity",
+            ],
+            "assault_2019": [1, 2, 3],
+            "assault_rate_2019": [100.0, 200.0, 50.0],
+            "assault_rate_2020": [300.0, 400.0, 70.0],
+            "robbery_rate_2019": [10.0, 20.0, 5.0],
+            "robbery_rate_2020": [30.0, 40.0, 7.0],
+        }
+    )
+    merged.write_csv(tmp_path / "merged.csv")
+    return PanelQueryEngine(tmp_path / "merged.csv", tmp_path / "panel.arrow")
+
+
+#### Tests ####
+# Only rate columns are unpivoted (counts stay out of the panel)
+def test_panel_is_long(engine):
+    assert engine.panel.height == 3 * 2 * 2
+    assert set(engine.panel["crime"].unique()) == {"assault", "robbery"}
+
+
+# Order and duplicates in list parameters do not change the cache key
+def test_normalize_query_is_order_insensitive():
+    assert normalize_query(crime="robbery,assault") == normalize_query(
+        crime=["assault", "robbery", "assault"]
+    )
+    with pytest.raises(ValueError):
+        normalize_query(group_by="borough")
+    with pytest.raises(ValueError):
+        normalize_query(year_min=2024, year_max=2019)
+
+
+# Cluster means match a direct Polars computation
+def test_aggregate_matches_direct_mean(engine):
+    rows = engine.aggregate(crime="assault", year_min=2020, group_by="cluster")
+    assert rows == (
+        {"cluster": "High Opportunity", "rate": 70.0, "n": 1},
+        {"cluster": "Low Opportunity", "rate": 350.0, "n": 2},
+    )
+    total = engine.aggregate(crime="robbery", stat="sum", group_by=[])
+    assert total == ({"rate": 112.0, "n": 6},)
+
+
+# A refresh swaps panel and version together; results stay keyed to the panel they came from
+def test_refresh_swaps_snapshot(engine, tmp_path):
+    before = engine.snapshot()
+    merged = pl.read_csv(tmp_path / "merged.csv").with_columns(
+        pl.col("robbery_rate_2020") * 10
+    )
+    merged.write_csv(tmp_path / "merged.csv")
+    engine.refresh()
+    after = engine.snapshot()
+    assert after.version != before.version
+    old = engine.aggregate_at(before, crime="robbery", stat="sum", group_by=[])
+    new = engine.aggregate_at(after, crime="robbery", stat="sum", group_by=[])
+    assert old == ({"rate": 112.0, "n": 6},)
+    assert new == ({"rate": 805.0, "n": 6},)
+    assert (
+        before.panel.height == after.panel.height
+    )  # the old mapped file is still readable
+    assert not list(tmp_path.glob(".panel.arrow.*"))  # no temp files left behind
+
+
+# Editing a returned row leaves the cached result alone
+def test_cached_rows_are_copies(engine):
+    rows = engine.aggregate(crime="robbery", stat="sum", group_by=[])
+    rows[0]["rate"] = -1.0
+    assert engine.aggregate(crime="robbery", stat="sum", group_by=[]) == (
+        {"rate": 112.0, "n": 6},
+    )
+    assert engine.cache_info().hits == 1
+
+
+# Repeated queries are served from the cache; new data invalidates it through the version
+def test_cache_hits_and_refresh(engine, tmp_path):
+    engine.aggregate(crime="assault,robbery")
+    engine.aggregate(crime="robbery,assault")
+    assert engine.cache_info().hits == 1
+
+    old_version = engine.version
+    merged = pl.read_csv(tmp_path / "merged.csv").with_columns(
+        pl.col("assault_rate_2020") * 2
+    )
+    merged.write_csv(tmp_path / "merged.csv")
+    assert engine.refresh() != old_version
+    rows = engine.aggregate(crime="assault", year_min=2020, group_by="cluster")
+    assert rows[0]["rate"] == 140.0
@@ -0,0 +1,63 @@
+#### Preamble ####
+# Purpose: Shared pytest options and session-scoped synthetic data (generated in-process, no pipeline outputs needed).
+# Author: Mike Cowan
+# Date: 19 May 2025
+# Contact: m.cowan@mail.utoronto.ca
+# License: MIT
+# Pre-requisites:
+# - `pytest` must be installed (pip install pytest); run with "pytest -q"
+# - `pytest --scale 5000` sizes the synthetic city (default: the city config's n_areas)
+# - `pytest --run-slow` adds the scale tier (tests marked `slow`, ~50K areas)
+# References:
+# - [https://docs.pytest.org/en/stable/how-to/fixtures.html#scope-sharing-fixtures-across-classes-modules-packages-or-session]
+# - [https://docs.pytest.org/en/stable/example/simple.html#control-skipping-of-tests-according-to-command-line-option]
+
+#### Workspace setup ####
+import pytest
+
+from utils.config import load_city
+from utils.synthetic import build_city
+
+# Rows in the scale tier: the order of Canada's dissemination areas, where a quadratic step
+# in a stage shows up as minutes rather than milliseconds
+SLOW_SCALE = 50_000
+
+
+#### Command-line options ####
+def pytest_addoption(parser):
+    parser.addoption(
+        "--scale",
+        type=int,
+        default=None,
+        help="neighbourhoods in the synthetic city (default: the city config's n_areas)",
+    )
+    parser.addoption(
+        "--run-slow", action="store_true", help="also run the slow scale tier"
+    )
+
+
+#### Skip the scale tier unless asked for ####
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("--run-slow"):
+        return
+    skip = pytest.mark.skip(reason="scale tier: run with --run-slow")
+    for item in items:
+        if "slow" in item.keywords:
+            item.add_marker(skip)
+
+
+#### Session fixtures: built once, shared by every test file ####
+@pytest.fixture(scope="session")
+def city_config():
+    return load_city()
+
+
+@pytest.fixture(scope="session")
+def synthetic_city(request, city_config):
+    n_areas = request.config.getoption("--scale") or city_config["n_areas"]
+    return build_city(n_areas, city_config["crime"]["types"])
+
+
+@pytest.fixture(scope="session")
+def large_synthetic_city(city_config):
+    return build_city(SLOW_SCALE, city_config["crime"]["types"])
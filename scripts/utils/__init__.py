@@ -0,0 +1,8 @@
+#### Preamble ####
+# Purpose: Shared helpers imported by the numbered pipeline scripts (e.g., `from utils.spatial import ...`).
+# Author: Mike Cowan
+# Date: 19 May 2025
+# Contact: m.cowan@mail.utoronto.ca
+# License: MIT
+# Pre-requisites:
+# - Scripts are run from the repo root (e.g., `python scripts/00.0-run_pipeline.py`), so `scripts/` is on sys.path.
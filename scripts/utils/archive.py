@@ -0,0 +1,253 @@
+#### Preamble ####
+# Purpose: Content-addressed archive of raw portal downloads (gzip objects keyed by SHA-256, one manifest per download snapshot, offline checkout and release diffs).
+# Author: Mike Cowan
+# Date: 19 May 2025
+# Contact: m.cowan@mail.utoronto.ca
+# License: MIT
+# Pre-requisites:
+# - `polars` must be installed (pip install polars); the rest is the standard library
+# - Fetching takes a `requests.Session` (or anything with the same .get); checkout needs no network
+# References:
+# - [https://docs.ckan.org/en/latest/api/#ckan.logic.action.get.package_show]
+# - [https://docs.python.org/3/library/gzip.html#gzip.compress]
+
+#### Workspace setup ####
+import gzip  # inherent to Python
+import hashlib  # inherent to Python
+import json  # inherent to Python
+from datetime import datetime, timezone  # inherent to Python
+from pathlib import Path  # inherent to Python
+
+import polars as pl
+
+from utils.artifacts import atomic_write, write_json
+
+
+# 02.0 used to overwrite data/01-raw_data/ in place. Every download is now archived first:
+#   objects/<sha[:2]>/<sha>.gz     each distinct body once, gzip-compressed, keyed by the SHA-256
+#                                  of the uncompressed bytes (an unchanged re-download adds no
+#                                  bytes)
+#   snapshots/<snapshot_id>.json   one manifest per download: raw path -> hash, size, source URL,
+#                                  CKAN package/resource metadata and fetch time
+#   latest                         the newest complete snapshot
+# A manifest is written only after every resource of the download is stored, and the raw files
+# are checked out from it afterwards, so data/01-raw_data/ always matches one whole snapshot.
+# checkout(snapshot_id) rebuilds the raw files from local objects (no network), and
+# diff_snapshots(a, b) lists what a release revised. The archive is local and not tracked by git.
+ARCHIVE_ROOT = "data/archive"
+SNAPSHOT_VARIABLE = "PIPELINE_SNAPSHOT"
+RESOURCE_FIELDS = ("id", "name", "format", "last_modified", "metadata_modified")
+
+
+#### Snapshot IDs: fetch time to the microsecond (sortable) + a digest of the manifest entries ####
+def new_snapshot_id(entries):
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+    digest = hashlib.sha256(json.dumps(entries, sort_keys=True).encode("utf-8"))
+    return f"{stamp}-{digest.hexdigest()[:8]}"
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+#### Store one body (deduplicated, compressed); returns its hash ####
+def store_body(body, root=ARCHIVE_ROOT):
+    digest = hashlib.sha256(body).hexdigest()
+    obj = Path(root, "objects", digest[:2], f"{digest}.gz")
+    if not obj.exists():
+        # mtime=0 keeps the compressed bytes a pure function of the body
+        atomic_write(
+            obj,
+            lambda tmp: Path(tmp).write_bytes(gzip.compress(body, mtime=0)),
+            root=None,
+        )
+        obj.chmod(0o444)
+    return digest
+
+
+#### Read one body back (checked against its hash) ####
+def read_body(digest, root=ARCHIVE_ROOT):
+    body = gzip.decompress(
+        Path(root, "objects", digest[:2], f"{digest}.gz").read_bytes()
+    )
+    if hashlib.sha256(body).hexdigest() != digest:
+        raise ValueError(f"Archive object {digest} is corrupt")
+    return body
+
+
+#### Record a snapshot from {raw path: entry} and move `latest` ####
+def write_snapshot(entries, city, root=ARCHIVE_ROOT, snapshot_id=None):
+    snapshot_id = new_snapshot_id(entries) if snapshot_id is None else snapshot_id
+    manifest = {
+        "snapshot_id": snapshot_id,
+        "city": city,
+        "created": _now(),
+        "resources": dict(sorted(entries.items())),
+    }
+    write_json(manifest, Path(root, "snapshots", f"{snapshot_id}.json"), root=None)
+    atomic_write(
+        Path(root, "latest"),
+        lambda tmp: Path(tmp).write_text(snapshot_id, encoding="utf-8"),
+        root=None,
+    )
+    return snapshot_id
+
+
+#### Resolve "latest" (or None) to a snapshot ID ####
+def resolve_snapshot(snapshot_id="latest", root=ARCHIVE_ROOT):
+    if snapshot_id in (None, "latest"):
+        latest = Path(root, "latest")
+        if not latest.exists():
+            raise FileNotFoundError(f"No snapshots in {root}; run 02.0 first")
+        return latest.read_text(encoding="utf-8").strip()
+    return snapshot_id
+
+
+def read_snapshot(snapshot_id="latest", root=ARCHIVE_ROOT):
+    snapshot_id = resolve_snapshot(snapshot_id, root)
+    path = Path(root, "snapshots", f"{snapshot_id}.json")
+    if not path.exists():
+        raise FileNotFoundError(f"No snapshot {snapshot_id!r} in {root}")
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+#### Download a city's portal packages into the archive (one snapshot) ####
+# Same resource rules as before (see the [portal] table in config/cities/<city>.toml): a
+# "datastore" package saves the CSV dump of its datastore_active resources, any other format the
+# matching resource files; `first = true` keeps the first match, otherwise the last wins. If any
+# request fails, no snapshot is written and the raw files are left as they were.
+def fetch_snapshot(city, session, root=ARCHIVE_ROOT):
+    base_url = city["portal"]["base_url"]
+    url = base_url + "/api/3/action/package_show"
+    entries = {}
+    for kind, package in city["portal"]["packages"].items():
+        response = session.get(url, params={"id": package["id"]})
+        response.raise_for_status()
+        metadata = response.json()["result"]
+        for resource in metadata["resources"]:
+            if package["format"] == "datastore":
+                if not resource.get("datastore_active"):
+                    continue
+                resource_url = base_url + "/datastore/dump/" + resource["id"]
+            elif resource.get("format", "").lower() == package["format"]:
+                resource_url = resource["url"]
+            else:
+                continue
+
+            body_response = session.get(resource_url)
+            body_response.raise_for_status()
+            body = body_response.content
+            entries[package["path"]] = {
+                "sha256": store_body(body, root),
+                "bytes": len(body),
+                "kind": kind,
+                "url": resource_url,
+                "package_id": package["id"],
+                "package_modified": metadata.get("metadata_modified"),
+                "resource": {field: resource.get(field) for field in RESOURCE_FIELDS},
+                "fetched": _now(),
+            }
+            if package.get("first", False):
+                break
+    return write_snapshot(entries, city["name"], root)
+
+
+#### Archive files already on disk (e.g., today's raw data) as a snapshot ####
+def adopt_files(paths, city, root=ARCHIVE_ROOT):
+    entries = {}
+    for path in paths:
+        body = Path(path).read_bytes()
+        entries[str(path)] = {
+            "sha256": store_body(body, root),
+            "bytes": len(body),
+            "kind": "local",
+            "fetched": datetime.fromtimestamp(
+                Path(path).stat().st_mtime, timezone.utc
+            ).isoformat(timespec="seconds"),
+        }
+    return write_snapshot(entries, city, root)
+
+
+#### Write a snapshot's files to their raw paths (offline) ####
+# Files already matching the snapshot are left alone; returns the paths written.
+def checkout(snapshot_id="latest", root=ARCHIVE_ROOT, paths=None):
+    manifest = read_snapshot(snapshot_id, root)
+    written = []
+    for path, entry in manifest["resources"].items():
+        if paths is not None and path not in paths:
+            continue
+        target = Path(path)
+        if target.exists() and (
+            hashlib.sha256(target.read_bytes()).hexdigest() == entry["sha256"]
+        ):
+            continue
+        body = read_body(entry["sha256"], root)
+        atomic_write(target, lambda tmp: Path(tmp).write_bytes(body), root=None)
+        written.append(path)
+    return written
+
+
+#### Every snapshot, oldest first ####
+def list_snapshots(root=ARCHIVE_ROOT):
+    rows = []
+    for path in sorted(Path(root, "snapshots").glob("*.json")):
+        manifest = json.loads(path.read_text(encoding="utf-8"))
+        rows.append(
+            {
+                "snapshot_id": manifest["snapshot_id"],
+                "city": manifest["city"],
+                "created": manifest["created"],
+                "resources": len(manifest["resources"]),
+                "bytes": sum(e["bytes"] for e in manifest["resources"].values()),
+            }
+        )
+    return pl.DataFrame(
+        rows,
+        schema={
+            "snapshot_id": pl.Utf8,
+            "city": pl.Utf8,
+            "created": pl.Utf8,
+            "resources": pl.Int64,
+            "bytes": pl.Int64,
+        },
+    )
+
+
+#### What changed between two snapshots (per raw path) ####
+def diff_snapshots(old, new, root=ARCHIVE_ROOT):
+    before = read_snapshot(old, root)["resources"]
+    after = read_snapshot(new, root)["resources"]
+    rows = []
+    for path in sorted(set(before) | set(after)):
+        a, b = before.get(path), after.get(path)
+        if a is None:
+            status = "added"
+        elif b is None:
+            status = "removed"
+        else:
+            status = "unchanged" if a["sha256"] == b["sha256"] else "changed"
+        rows.append(
+            {
+                "path": path,
+                "status": status,
+                "old_sha256": a and a["sha256"],
+                "new_sha256": b and b["sha256"],
+                "old_bytes": a and a["bytes"],
+                "new_bytes": b and b["bytes"],
+                "old_modified": a and a.get("resource", {}).get("last_modified"),
+                "new_modified": b and b.get("resource", {}).get("last_modified"),
+            }
+        )
+    return pl.DataFrame(rows)
+
+
+#### Archive size: logical bytes in all snapshots vs. compressed bytes stored ####
+def archive_usage(root=ARCHIVE_ROOT):
+    objects = list(Path(root, "objects").glob("*/*.gz"))
+    logical = list_snapshots(root)["bytes"].sum()
+    return {
+        "snapshots": len(list(Path(root, "snapshots").glob("*.json"))),
+        "objects": len(objects),
+        "logical_bytes": int(logical or 0),
+        "stored_bytes": sum(obj.stat().st_size for obj in objects),
+    }
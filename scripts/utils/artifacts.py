@@ -0,0 +1,289 @@
+#### Preamble ####
+# Purpose: Atomic, versioned writes of pipeline outputs (run IDs, content-addressed objects, a `latest` pointer, rollback).
+# Author: Mike Cowan
+# Date: 19 May 2025
+# Contact: m.cowan@mail.utoronto.ca
+# License: MIT
+# Pre-requisites:
+# - Standard library only (`polars` DataFrames are written through their own writers)
+# References:
+# - [https://docs.python.org/3/library/os.html#os.replace] (atomic rename on POSIX and Windows)
+# - [https://docs.python.org/3/library/tempfile.html#tempfile.mkstemp]
+
+#### Workspace setup ####
+import hashlib  # inherent to Python
+import json  # inherent to Python
+import os  # inherent to Python
+import shutil  # inherent to Python
+import tempfile  # inherent to Python
+from datetime import datetime, timezone  # inherent to Python
+from pathlib import Path  # inherent to Python
+
+
+# Every output keeps its usual path (data/02-analysis_data/..., data/03-table_data/...), so
+# readers and the paper are unchanged, but it is written like this:
+#   1. the writer fills a temp file in the destination folder,
+#   2. the bytes are hashed and copied once into objects/<sha[:2]>/<sha> (read-only),
+#   3. the temp file replaces the destination with os.replace (readers never see half a file;
+#      identical content is left alone, so mtimes and downstream caches survive),
+#   4. the run records path -> hash under runs/<run_id>/entries/ and hard-links the object
+#      into runs/<run_id>/files/<path>, a browsable snapshot of what that run wrote.
+# Each entry is its own file, so stages (and their worker processes) writing at the same time
+# never share a file. When the runner finishes cleanly it merges the entries over the previous
+# run's manifest into runs/<run_id>/manifest.json (a complete snapshot) and moves the `latest`
+# pointer. restore(run_id) copies a snapshot back from objects/: rollback without recomputing.
+# Outputs are published in place, so os.replace only rules out half-written files: two runs in
+# one workspace would still interleave their outputs. Concurrent runs are therefore not
+# supported; new_run_id() takes <root>/run.lock (refusing while another live process holds it)
+# and finish_run() releases it. Run in parallel from separate workspaces instead (00.3 does).
+ARTIFACT_ROOT = "data/artifacts"
+RUN_ID_VARIABLE = "PIPELINE_RUN_ID"
+LOCK_NAME = "run.lock"
+
+# mkstemp creates files as 0600; outputs get the usual permissions for this umask instead
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+FILE_MODE = 0o666 & ~_UMASK
+
+
+#### Run IDs ####
+# The runner sets PIPELINE_RUN_ID so every stage (and worker process) writes into one run;
+# a stage run on its own gets a run of its own. Either way the run holds the store's lock.
+def new_run_id(root=ARTIFACT_ROOT):
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+    run_id = f"{stamp}-{os.getpid()}"
+    _acquire_lock(run_id, root)
+    return run_id
+
+
+def current_run_id():
+    if RUN_ID_VARIABLE not in os.environ:
+        os.environ[RUN_ID_VARIABLE] = new_run_id()
+    return os.environ[RUN_ID_VARIABLE]
+
+
+#### Run lock: one run at a time per artifact store ####
+def _lock_holder(lock):
+    try:
+        return json.loads(lock.read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+# A lock left by this process (an earlier run) or by a process that has exited is stale;
+# Windows has no signal-0 probe, so there a stale run.lock has to be deleted by hand
+def _holder_running(pid):
+    if pid == os.getpid():
+        return False
+    if os.name == "nt":
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:  # alive, owned by another user
+        return True
+    return True
+
+
+def _acquire_lock(run_id, root=ARTIFACT_ROOT):
+    lock = Path(root, LOCK_NAME)
+    lock.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=lock.parent, prefix=".run.", suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as handle:
+        json.dump({"run_id": run_id, "pid": os.getpid()}, handle)
+    try:
+        while True:
+            try:
+                os.link(
+                    tmp, lock
+                )  # fails if the lock exists; never a half-written lock
+                return
+            except FileExistsError:
+                holder = _lock_holder(lock)
+                if holder and _holder_running(holder["pid"]):
+                    raise RuntimeError(
+                        f"Run {holder['run_id']} (pid {holder['pid']}) is using {root}; "
+                        "concurrent runs in one workspace are not supported."
+                    ) from None
+                lock.unlink(missing_ok=True)  # stale: take it over
+    finally:
+        os.unlink(tmp)
+
+
+def _release_lock(run_id, root=ARTIFACT_ROOT):
+    lock = Path(root, LOCK_NAME)
+    holder = _lock_holder(lock)
+    if holder and holder["run_id"] == run_id:
+        lock.unlink(missing_ok=True)
+
+
+#### Hash a file in 1 MiB blocks ####
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(2**20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+#### Replace `path` with `source` via a temp copy beside it (never a partial file) ####
+def _replace_with_copy(source, path):
+    fd, tmp = tempfile.mkstemp(dir=Path(path).parent, prefix=f".{Path(path).name}.")
+    os.close(fd)
+    try:
+        shutil.copyfile(source, tmp)
+        os.chmod(tmp, FILE_MODE)
+        os.replace(tmp, path)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+
+#### Content-addressed object store (each distinct output stored once) ####
+def _store_object(tmp, digest, root):
+    obj = Path(root, "objects", digest[:2], digest)
+    if not obj.exists():
+        obj.parent.mkdir(parents=True, exist_ok=True)
+        _replace_with_copy(tmp, obj)
+        obj.chmod(0o444)
+    return obj
+
+
+#### Record what a run wrote ####
+def _record(run_id, relative, digest, size, obj, root):
+    run_dir = Path(root, "runs", run_id)
+    entry = {
+        "path": relative,
+        "sha256": digest,
+        "bytes": size,
+        "written": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }
+    key = hashlib.sha256(relative.encode("utf-8")).hexdigest()[:16]
+    write_json(entry, run_dir / "entries" / f"{key}.json", root=None)
+
+    snapshot = run_dir / "files" / relative
+    snapshot.parent.mkdir(parents=True, exist_ok=True)
+    snapshot.unlink(missing_ok=True)
+    try:
+        os.link(obj, snapshot)  # no extra copy: the object is immutable
+    except OSError:  # e.g., filesystems without hard links
+        shutil.copyfile(obj, snapshot)
+
+
+#### Atomic, versioned write ####
+# `write` receives a temp path and fills it (e.g., df.write_csv). Returns the content hash.
+# root=None skips versioning (plain atomic write; used for the store's own metadata).
+def atomic_write(path, write, run_id=None, root=ARTIFACT_ROOT):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    os.close(fd)
+    try:
+        write(tmp)
+        os.chmod(tmp, FILE_MODE)
+        with open(tmp, "rb") as file:
+            os.fsync(file.fileno())
+        digest = file_hash(tmp)
+        size = os.path.getsize(tmp)
+        if root is not None:
+            obj = _store_object(tmp, digest, root)
+        if path.exists() and file_hash(path) == digest:
+            os.unlink(tmp)  # unchanged output: keep the file (and its mtime)
+        else:
+            os.replace(tmp, path)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+    if root is not None:
+        relative = Path(os.path.relpath(path.resolve(), Path.cwd())).as_posix()
+        _record(run_id or current_run_id(), relative, digest, size, obj, root)
+    return digest
+
+
+#### Writers for the formats the stages use ####
+def write_csv(df, path, **kwargs):
+    return atomic_write(path, df.write_csv, **kwargs)
+
+
+def write_parquet(df, path, **kwargs):
+    return atomic_write(path, df.write_parquet, **kwargs)
+
+
+def write_json(obj, path, indent=2, **kwargs):
+    def write(tmp):
+        with open(tmp, "w", encoding="utf-8") as file:
+            json.dump(obj, file, indent=indent)
+
+    return atomic_write(path, write, **kwargs)
+
+
+#### Runs ####
+def latest_run(root=ARTIFACT_ROOT):
+    pointer = Path(root, "latest")
+    return pointer.read_text(encoding="utf-8").strip() if pointer.exists() else None
+
+
+def read_manifest(run_id, root=ARTIFACT_ROOT):
+    path = Path(root, "runs", run_id, "manifest.json")
+    if path.exists():
+        return json.loads(path.read_text(encoding="utf-8"))
+    # Unfinished run: just the entries it wrote
+    entries = [
+        json.loads(entry.read_text(encoding="utf-8"))
+        for entry in sorted(Path(root, "runs", run_id, "entries").glob("*.json"))
+    ]
+    return {
+        "run_id": run_id,
+        "complete": False,
+        "artifacts": {e["path"]: e for e in entries},
+    }
+
+
+def list_runs(root=ARTIFACT_ROOT):
+    runs_dir = Path(root, "runs")
+    return sorted(p.name for p in runs_dir.iterdir()) if runs_dir.exists() else []
+
+
+#### Close a run: full snapshot manifest (previous latest + this run's writes) ####
+# Only a run whose stages all succeeded moves `latest`; a failed run keeps its manifest for
+# inspection while `latest` still points at the last good one. Either way the lock is released.
+def finish_run(run_id, complete=True, stages=(), root=ARTIFACT_ROOT):
+    previous = latest_run(root)
+    artifacts = read_manifest(previous, root)["artifacts"] if previous else {}
+    written = read_manifest(run_id, root)["artifacts"]
+    artifacts.update(written)
+    manifest = {
+        "run_id": run_id,
+        "parent": previous,
+        "complete": complete,
+        "finished": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "stages": list(stages),
+        "written": sorted(written),
+        "artifacts": dict(sorted(artifacts.items())),
+    }
+    write_json(manifest, Path(root, "runs", run_id, "manifest.json"), root=None)
+    if complete:
+        atomic_write(
+            Path(root, "latest"),
+            lambda tmp: Path(tmp).write_text(run_id, encoding="utf-8"),
+            root=None,
+        )
+    _release_lock(run_id, root)
+    return manifest
+
+
+#### Roll the working files back to a run's snapshot (no recomputation) ####
+def restore(run_id, paths=None, root=ARTIFACT_ROOT):
+    artifacts = read_manifest(run_id, root)["artifacts"]
+    restored = []
+    for relative, entry in artifacts.items():
+        if paths is not None and relative not in paths:
+            continue
+        obj = Path(root, "objects", entry["sha256"][:2], entry["sha256"])
+        if Path(relative).exists() and file_hash(relative) == entry["sha256"]:
+            continue
+        Path(relative).parent.mkdir(parents=True, exist_ok=True)
+        _replace_with_copy(obj, relative)
+        restored.append(relative)
+    return restored
@@ -0,0 +1,173 @@
+#### Preamble ####
+# Purpose: Batched change-point detection (binary segmentation, Poisson cost on cumulative sums) for many count series.
+# Author: Mike Cowan
+# Date: 19 May 2025
+# Contact: m.cowan@mail.utoronto.ca
+# License: MIT
+# Pre-requisites:
+# - `numpy` must be installed (pip install numpy)
+# - `polars` must be installed (pip install polars)
+# References:
+# - [https://doi.org/10.1080/01621459.2012.737745] (Killick et al. 2012; segment costs and penalties)
+# - [https://docs.python.org/3/library/concurrent.futures.html#processpoolexecutor]
+
+#### Workspace setup ####
+from concurrent.futures import ProcessPoolExecutor  # inherent to Python
+
+import numpy as np
+import polars as pl
+
+from utils.config import default_jobs
+
+
+# Cost of a segment (i, j] with a constant Poisson mean: -2 * (C log(C / n) - C), where C is the
+# segment's count and n its length. With the cumulative sums Y[:, t] = y[:, :t] precomputed,
+# any segment's C is Y[:, j] - Y[:, i], so every candidate split of every series is scored in
+# one (segments, T) array operation. Binary segmentation then splits, per round, every open
+# segment at its best point when the cost drop beats the penalty; a series of length T costs
+# O(T) per round, and all series share each round. `max_breaks` caps the breaks accepted per
+# series: when a round proposes more splits than a series has left, its largest gains are kept,
+# and a series that reaches the cap has no open segments left.
+# Counts are overdispersed, so cost drops are divided by a per-series dispersion (robust,
+# from first differences) before the BIC-style penalty beta * log(T) is applied.
+
+
+#### Poisson segment cost (0 log 0 = 0) ####
+def poisson_cost(total, length):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = np.where(length > 0, total / np.maximum(length, 1), 0.0)
+        loglik = np.where(total > 0, total * np.log(np.where(mean > 0, mean, 1.0)), 0.0)
+    return -2.0 * (loglik - total)
+
+
+#### Dispersion per series (1 = Poisson), robust to the level shifts we are looking for ####
+def dispersion(y):
+    diffs = np.abs(np.diff(y, axis=1))
+    sigma2 = (np.median(diffs, axis=1) / 0.6745) ** 2 / 2
+    return np.maximum(sigma2 / np.maximum(y.mean(axis=1), 1e-12), 1.0)
+
+
+#### Binary segmentation over a block of series ####
+# y: (S, T) counts (NaN = 0). Returns arrays (series, position, gain), where position is the
+# index of the first period after the break; each series has at most `max_breaks` breaks.
+def detect_block(y, beta=2.0, min_size=2, max_breaks=3):
+    y = np.nan_to_num(np.asarray(y, dtype=np.float64))
+    n_series, n_periods = y.shape
+    cumsum = np.zeros((n_series, n_periods + 1))
+    np.cumsum(y, axis=1, out=cumsum[:, 1:])
+    scale = dispersion(y)
+    penalty = beta * np.log(n_periods)
+
+    # Open segments: (series, start, end), end exclusive
+    seg_s = np.arange(n_series)
+    seg_a = np.zeros(n_series, dtype=int)
+    seg_b = np.full(n_series, n_periods)
+    if max_breaks < 1:
+        seg_s = seg_s[:0]
+    n_found = np.zeros(n_series, dtype=int)  # breaks accepted so far, per series
+    found_s, found_t, found_gain = [seg_s[:0]], [seg_a[:0]], [np.zeros(0)]
+    splits = np.arange(1, n_periods)  # candidate break positions
+    while len(seg_s):
+        start, end = cumsum[seg_s, seg_a], cumsum[seg_s, seg_b]
+        at = cumsum[seg_s][:, splits]  # (M, T - 1)
+        full = poisson_cost(end - start, seg_b - seg_a)
+        left = poisson_cost(at - start[:, None], splits - seg_a[:, None])
+        right = poisson_cost(end[:, None] - at, seg_b[:, None] - splits)
+        gain = (full[:, None] - left - right) / scale[seg_s][:, None]
+        valid = (splits >= seg_a[:, None] + min_size) & (
+            splits <= seg_b[:, None] - min_size
+        )
+        gain = np.where(valid, gain, -np.inf)
+
+        best = gain.argmax(axis=1)
+        best_gain = gain[np.arange(len(seg_s)), best]
+        accept = best_gain > penalty
+
+        # Cap per series: rank this round's accepted splits by gain within their series and
+        # keep as many as the series has breaks left
+        candidates = np.flatnonzero(accept)
+        candidates = candidates[np.lexsort((-best_gain[candidates], seg_s[candidates]))]
+        owner = seg_s[candidates]
+        first = np.r_[True, owner[1:] != owner[:-1]]
+        rank = np.arange(len(owner)) - np.maximum.accumulate(
+            np.where(first, np.arange(len(owner)), 0)
+        )
+        accept = np.zeros(len(seg_s), dtype=bool)
+        accept[candidates[rank < max_breaks - n_found[owner]]] = True
+        n_found += np.bincount(seg_s[accept], minlength=n_series)
+
+        tau = splits[best][accept]
+        s, a, b = seg_s[accept], seg_a[accept], seg_b[accept]
+        found_s.append(s)
+        found_t.append(tau)
+        found_gain.append(best_gain[accept])
+
+        # Both halves stay open for the next round, unless the series is at its cap
+        open_ = n_found[s] < max_breaks
+        s, a, b, tau = s[open_], a[open_], b[open_], tau[open_]
+        seg_s = np.concatenate([s, s])
+        seg_a = np.concatenate([a, tau])
+        seg_b = np.concatenate([tau, b])
+
+    return (
+        np.concatenate(found_s).astype(int),
+        np.concatenate(found_t).astype(int),
+        np.concatenate(found_gain),
+    )
+
+
+#### All series, split into blocks across processes ####
+def detect_changes(
+    y, beta=2.0, min_size=2, max_breaks=3, n_jobs=None, block_size=50_000
+):
+    y = np.asarray(y, dtype=np.float64)
+    n_jobs = default_jobs() if n_jobs is None else n_jobs
+    starts = list(range(0, len(y), block_size))
+    blocks = [y[i : i + block_size] for i in starts]
+    args = (beta, min_size, max_breaks)
+    if n_jobs <= 1 or len(blocks) == 1:
+        results = [detect_block(block, *args) for block in blocks]
+    else:
+        with ProcessPoolExecutor(max_workers=min(n_jobs, len(blocks))) as pool:
+            results = list(
+                pool.map(
+                    detect_block,
+                    blocks,
+                    *[[arg] * len(blocks) for arg in args],
+                )
+            )
+    series = np.concatenate([s + offset for (s, _, _), offset in zip(results, starts)])
+    positions = np.concatenate([t for _, t, _ in results])
+    gains = np.concatenate([g for _, _, g in results])
+    order = np.lexsort((positions, series))
+    return series[order], positions[order], gains[order]
+
+
+#### Breaks with effect sizes ####
+# Mean count of the segment before and after each break (segments bounded by the
+# neighbouring breaks of the same series), their ratio, and the break period.
+def break_table(keys, y, periods, series, positions, gains):
+    y = np.nan_to_num(np.asarray(y, dtype=np.float64))
+    series, positions = np.asarray(series, dtype=int), np.asarray(positions, dtype=int)
+    cumsum = np.concatenate([np.zeros((len(y), 1)), np.cumsum(y, axis=1)], axis=1)
+    # Previous / next break of the same series (or the ends of the window)
+    same_prev = np.r_[False, series[1:] == series[:-1]][: len(series)]
+    same_next = np.r_[series[:-1] == series[1:], False][: len(series)]
+    before = np.where(same_prev, np.r_[0, positions[:-1]][: len(series)], 0)
+    after = np.where(same_next, np.r_[positions[1:], 0][: len(series)], y.shape[1])
+    mean_before = (cumsum[series, positions] - cumsum[series, before]) / (
+        positions - before
+    )
+    mean_after = (cumsum[series, after] - cumsum[series, positions]) / (
+        after - positions
+    )
+    periods = np.asarray(periods)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = np.where(mean_before > 0, mean_after / mean_before, np.nan)
+    return keys.select(pl.all().gather(series)).with_columns(
+        pl.Series("break_year", periods[positions], dtype=pl.Int64),
+        pl.Series("mean_before", mean_before),
+        pl.Series("mean_after", mean_after),
+        pl.Series("rate_ratio", ratio),
+        pl.Series("gain", gains),
+    )
@@ -0,0 +1,142 @@
+#### Preamble ####
+# Purpose: Runs the full pipeline for several cities at once (one bounded process pool, one workspace per city, shared content-keyed caches).
+# Author: Mike Cowan
+# Date: 19 May 2025
+# Contact: m.cowan@mail.utoronto.ca
+# License: MIT
+# Pre-requisites:
+# - Standard library only; each city's stages need what 00.0-run_pipeline.py needs
+# - One config/cities/<city>.toml per city (see utils/config.py)
+# References:
+# - [https://docs.python.org/3/library/concurrent.futures.html#processpoolexecutor]
+
+#### Workspace setup ####
+import importlib.util  # inherent to Python
+import os  # inherent to Python
+import time  # inherent to Python
+from concurrent.futures import ProcessPoolExecutor, as_completed  # inherent to Python
+from contextlib import redirect_stderr, redirect_stdout  # inherent to Python
+from pathlib import Path  # inherent to Python
+
+from utils.artifacts import RUN_ID_VARIABLE
+from utils.config import (
+    CITY_VARIABLE,
+    CONFIG_DIR,
+    CONFIG_VARIABLE,
+    JOBS_VARIABLE,
+    load_city,
+)
+
+
+# Stages read and write paths relative to the working directory, so a city's workspace is a
+# directory laid out like the repo root (the root itself for Toronto, cities/<name>/ by
+# default): every city has its own raw data, outputs, artifact store and run IDs, and nothing a
+# city writes can land in another city's files.
+#
+# One process pool runs the cities, `jobs` at a time. Each city gets a fresh worker process
+# (max_tasks_per_child=1), so module-level config (e.g., the profile vintages) is read for that
+# city, and PIPELINE_JOBS gives each city's own stage pools an equal share of the cores instead
+# of every stage starting cpu_count workers. The caches keyed on content (scaled features and
+# similarity indexes, under data/cache/<name>/<hash>) are shared through symlinks, so a model
+# input seen by one city is never refitted for another; caches keyed by fixed file names
+# (figures, spatial weights, profiles) stay per city.
+REPO_ROOT = Path(__file__).resolve().parents[2]
+RUNNER = REPO_ROOT / "scripts" / "00.0-run_pipeline.py"
+SHARED_CACHES = ("features", "similarity")
+WORKSPACE_DIRS = (
+    "data/00-simulated_data",
+    "data/01-raw_data",
+    "data/02-analysis_data",
+    "data/03-table_data",
+    "other/figures",
+)
+
+
+#### Create a city's workspace and link the shared caches into it ####
+def prepare_workspace(city, root=REPO_ROOT):
+    root = Path(root).resolve()
+    workspace = (root / city["workspace"]).resolve()
+    for directory in WORKSPACE_DIRS:
+        (workspace / directory).mkdir(parents=True, exist_ok=True)
+    for name in SHARED_CACHES:
+        shared = root / "data" / "cache" / name
+        shared.mkdir(parents=True, exist_ok=True)
+        link = workspace / "data" / "cache" / name
+        if link.resolve() == shared:
+            continue  # the shared cache itself (Toronto) or an existing link
+        if link.exists():
+            raise FileExistsError(f"{link} exists and is not the shared cache {shared}")
+        link.parent.mkdir(parents=True, exist_ok=True)
+        link.symlink_to(shared, target_is_directory=True)
+    return workspace
+
+
+#### Run one city's pipeline (in a pool worker) ####
+# Output goes to <workspace>/pipeline.log; returns the city, seconds, failed stages and log path.
+def run_city(name, workspace, jobs, options, config_dir=CONFIG_DIR, runner_path=RUNNER):
+    os.environ[CITY_VARIABLE] = name
+    os.environ[CONFIG_VARIABLE] = str(config_dir)
+    os.environ[JOBS_VARIABLE] = str(jobs)
+    os.environ.pop(RUN_ID_VARIABLE, None)  # the runner starts a run per city
+    os.chdir(workspace)
+
+    spec = importlib.util.spec_from_file_location("run_pipeline", runner_path)
+    runner = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(runner)
+
+    log_path = Path(workspace) / "pipeline.log"
+    start = time.perf_counter()
+    with open(log_path, "w", encoding="utf-8") as log:
+        with redirect_stdout(log), redirect_stderr(log):
+            failed = runner.main(**options) or []
+    return {
+        "city": name,
+        "seconds": round(time.perf_counter() - start, 1),
+        "failed": list(failed),
+        "log": str(log_path),
+    }
+
+
+#### Run every city, `jobs` at a time ####
+# Results come back in the order given; one city's failure never stops the others.
+def run_cities(
+    names,
+    jobs=None,
+    options=None,
+    config_dir=CONFIG_DIR,
+    root=REPO_ROOT,
+    runner_path=RUNNER,
+):
+    cities = [load_city(name, config_dir) for name in names]
+    jobs = min(jobs or os.cpu_count(), len(cities))
+    stage_jobs = max(1, os.cpu_count() // jobs)
+    workspaces = [prepare_workspace(city, root) for city in cities]
+
+    results = {}
+    with ProcessPoolExecutor(max_workers=jobs, max_tasks_per_child=1) as pool:
+        futures = {
+            pool.submit(
+                run_city,
+                city["name"],
+                workspace,
+                stage_jobs,
+                options or {},
+                config_dir,
+                runner_path,
+            ): city["name"]
+            for city, workspace in zip(cities, workspaces)
+        }
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                results[name] = future.result()
+            except Exception as error:
+                results[name] = {
+                    "city": name,
+                    "seconds": None,
+                    "failed": [f"{type(error).__name__}: {error}"],
+                    "log": None,
+                }
+            status = "ok" if not results[name]["failed"] else "failed"
+            print(f"{name}: {status} ({results[name]['seconds']}s)")
+    return [results[city["name"]] for city in cities]
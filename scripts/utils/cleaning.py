@@ -0,0 +1,125 @@
+#### Preamble ####
+# Purpose: In-memory cleaning and merge steps of 03.0, 03.1 and 04.0 (DataFrame in, DataFrame out), so tests can run them without files.
+# Author: Mike Cowan
+# Date: 19 May 2025
+# Contact: m.cowan@mail.utoronto.ca
+# License: MIT
+# Pre-requisites:
+# - `polars` must be installed (pip install polars)
+# References:
+# - [https://docs.pola.rs/api/python/stable/reference/dataframe/api/polars.DataFrame.select.html]
+
+#### Workspace setup ####
+import polars as pl
+
+
+# Profile columns of the merged table, in order (crime columns follow, count then rate per
+# crime-year)
+PROFILE_COLUMNS = [
+    "neighbourhood",
+    "total_households",
+    "two_parent_families",
+    "one_parent_families",
+    "prop_single_parent",
+    "median_income",
+    "unemployment_rate",
+    "total_education",
+    "bachelors_or_higher",
+    "education_rate",
+]
+
+
+#### Crime columns for the given crimes and years (count, then rate) ####
+def crime_columns(crime_types, years):
+    return [
+        column
+        for crime in crime_types
+        for year in years
+        for column in (f"{crime}_{year}", f"{crime}_rate_{year}")
+    ]
+
+
+#### 03.0: raw portal crime table -> cleaned wide table ####
+def clean_crime(crime_df, crime_types, years, area_column="AREA_NAME"):
+    # Select columns of interest (count and rate for each crime-year)
+    crime_df = crime_df.select(
+        area_column,  # neighbourhoods
+        *[column.upper() for column in crime_columns(crime_types, years)],
+    )
+
+    # Rename neighbourhood column
+    clean_df = crime_df.rename({area_column: "neighbourhood"})
+
+    # Normalize the text in neighbourhood so it matches the profile side
+    clean_df = clean_df.with_columns(
+        pl.col("neighbourhood")
+        .str.normalize(form="NFKC")
+        .str.strip_chars(" ")  # strip leading/trailing spaces
+        .str.replace_all("`", "'")  # standardize apostrophes
+        .str.replace_all(r"\s+", "-")  # spaces become dashes
+        .str.replace_all(r"\.", "")  # drop every period
+        .str.replace_all(r"\s+", "-")  # space become dashes again
+        .str.to_lowercase()  # lowercase
+    )
+
+    # Fill missing values in the rate columns with 0.0
+    rate_cols = [c for c in clean_df.columns if "_RATE_" in c]
+    clean_df = clean_df.with_columns(
+        [
+            pl.col(c).fill_null(0.0).alias(c) for c in rate_cols
+        ]  # replace NA with true zeros
+    )
+
+    # Lowercase all column names so joins/tests don't break later
+    return clean_df.rename({c: c.lower() for c in clean_df.columns})
+
+
+#### 03.1: profile store view -> typed profiles with derived shares ####
+def derive_profiles(profile_df):
+    # Convert numeric columns to integers and floats (the store keeps every value as Float64)
+    profile_df = profile_df.with_columns(
+        [
+            pl.col("total_households").cast(pl.Int64),
+            pl.col("two_parent_families").cast(pl.Int64),
+            pl.col("one_parent_families").cast(pl.Int64),
+            pl.col("median_income").cast(pl.Float64),
+            pl.col("unemployment_rate").cast(pl.Float64),
+            pl.col("total_education").cast(pl.Float64),
+            pl.col("bachelors_or_higher").cast(pl.Float64),
+        ]
+    )
+
+    # Single-parent proportion = one-parent families / (one-parent families + couple-family households)
+    return profile_df.with_columns(
+        [
+            # Single-parent proportion of all nuclear ("Census") families
+            (
+                pl.col("one_parent_families")
+                / (pl.col("one_parent_families") + pl.col("two_parent_families"))
+            ).alias("prop_single_parent"),
+            # Education rate = share with bachelor’s or above among all certificate/degree holders
+            (pl.col("bachelors_or_higher") / pl.col("total_education")).alias(
+                "education_rate"
+            ),
+        ]
+    )
+
+
+#### 04.0: cleaned crime + profiles -> merged table ####
+def merge_crime_profile(crime_df, profile_df, crime_types, years):
+    # Merge the two DFs on the neighbourhood column
+    # [https://dataguymichael.substack.com/p/the-ultimate-polars-cheat-sheet-for]
+    merged_df = crime_df.join(
+        profile_df,
+        on="neighbourhood",
+        how="left",  # keep rows from right dataframe (profile_df)
+    )
+
+    # Reorder columns via select (recommended method for polars); one-parent-family households first, then two-parent families, etc.
+    # [https://stackoverflow.com/questions/71353113/polars-how-to-reorder-columns-in-a-specific-order]
+    return merged_df.select(
+        [
+            *PROFILE_COLUMNS,  # profile columns
+            *crime_columns(crime_types, years),  # count and rate for each crime-year
+        ]
+    )
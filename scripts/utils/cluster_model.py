@@ -0,0 +1,53 @@
+#### Preamble ####
+# Purpose: Persists the fitted SES scaler + K-means centroids so new data can be assigned without refitting.
+# Author: Mike Cowan
+# Date: 19 May 2025
+# Contact: m.cowan@mail.utoronto.ca
+# License: MIT
+# Pre-requisites:
+# - `numpy` must be installed (pip install numpy)
+
+#### Workspace setup ####
+import json  # inherent to Python
+from pathlib import Path  # inherent to Python
+
+import numpy as np
+
+from utils.artifacts import write_json
+
+
+# Stored as plain JSON (feature names, scaler mean/scale, centroids, label map) so the
+# model is human-readable and diffable in git, unlike a pickle.
+
+
+#### Save the scaling (mean/scale) + fitted KMeans ####
+def save_cluster_model(path, feature_columns, mean, scale, kmeans, label_map):
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    model = {
+        "feature_columns": list(feature_columns),
+        "mean": np.asarray(mean).tolist(),
+        "scale": np.asarray(scale).tolist(),
+        "centers": kmeans.cluster_centers_.tolist(),
+        "label_map": {str(k): v for k, v in label_map.items()},
+    }
+    write_json(model, path)
+
+
+#### Load a saved model (None if it has not been fitted yet) ####
+def load_cluster_model(path):
+    if not Path(path).exists():
+        return None
+    with open(path, encoding="utf-8") as f:
+        model = json.load(f)
+    model["label_map"] = {int(k): v for k, v in model["label_map"].items()}
+    return model
+
+
+#### Assign rows to the nearest stored centroid (same rule as KMeans.predict) ####
+def predict_clusters(model, X):
+    scaled = (np.asarray(X, dtype=float) - np.array(model["mean"])) / np.array(
+        model["scale"]
+    )
+    centers = np.array(model["centers"])
+    squared = ((scaled[:, None, :] - centers[None, :, :]) ** 2).sum(axis=-1)
+    return squared.argmin(axis=1)
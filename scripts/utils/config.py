@@ -0,0 +1,108 @@
+#### Preamble ####
+# Purpose: Per-city configuration (portal packages, area count, crime columns, profile crosswalks, paper previews) read from config/cities/<city>.toml.
+# Author: Mike Cowan
+# Date: 19 May 2025
+# Contact: m.cowan@mail.utoronto.ca
+# License: MIT
+# Pre-requisites:
+# - Standard library only (`tomllib`, Python 3.11+)
+# - The city comes from PIPELINE_CITY (set by 00.3-run_cities.py for each city); default "toronto"
+# References:
+# - [https://docs.python.org/3/library/tomllib.html]
+
+#### Workspace setup ####
+import functools  # inherent to Python
+import os  # inherent to Python
+import tomllib  # inherent to Python
+from pathlib import Path  # inherent to Python
+
+
+# Everything that differs between cities lives in one TOML file per city, so stages read the
+# same keys whichever portal they run against. Stages resolve paths relative to the working
+# directory, and the multi-city driver runs each city in its own workspace (the repo root for
+# Toronto), so one set of scripts serves every city. The config directory is found from this
+# file, not the working directory, so a workspace elsewhere still sees it (PIPELINE_CONFIG_DIR
+# points stages at another one).
+CONFIG_DIR = Path(__file__).resolve().parents[2] / "config" / "cities"
+CITY_VARIABLE = "PIPELINE_CITY"
+CONFIG_VARIABLE = "PIPELINE_CONFIG_DIR"
+JOBS_VARIABLE = "PIPELINE_JOBS"
+DEFAULT_CITY = "toronto"
+REQUIRED_KEYS = ("name", "n_areas", "area_column", "portal", "crime", "profiles")
+
+
+#### Name of the city this process runs for ####
+def current_city():
+    return os.environ.get(CITY_VARIABLE, DEFAULT_CITY)
+
+
+#### Every configured city ####
+def available_cities(config_dir=None):
+    config_dir = (
+        os.environ.get(CONFIG_VARIABLE, CONFIG_DIR)
+        if config_dir is None
+        else config_dir
+    )
+    return sorted(path.stem for path in Path(config_dir).glob("*.toml"))
+
+
+#### Load and check one city's config (defaults to the current city) ####
+def load_city(name=None, config_dir=None):
+    name = current_city() if name is None else name
+    config_dir = (
+        os.environ.get(CONFIG_VARIABLE, CONFIG_DIR)
+        if config_dir is None
+        else config_dir
+    )
+    return _read_city(name, Path(config_dir))
+
+
+@functools.lru_cache(maxsize=None)
+def _read_city(name, config_dir):
+    path = Path(config_dir) / f"{name}.toml"
+    if not path.exists():
+        raise FileNotFoundError(
+            f"No config for city {name!r} in {config_dir} "
+            f"(available: {available_cities(config_dir)})"
+        )
+    with open(path, "rb") as f:
+        city = tomllib.load(f)
+    missing = [key for key in REQUIRED_KEYS if key not in city]
+    if missing:
+        raise KeyError(f"{path} is missing {missing}")
+    if city["name"] != name:
+        raise ValueError(f"{path} names itself {city['name']!r}, expected {name!r}")
+    city.setdefault("workspace", f"cities/{name}")
+    return city
+
+
+#### Census vintages in the shape utils/profile_store.py uses ####
+# TOML keys are strings and arrays are lists: vintages become ints, crosswalk entries tuples.
+def profile_vintages(city):
+    return {
+        int(vintage): {
+            **spec,
+            "crosswalk": {
+                variable: tuple(entry) for variable, entry in spec["crosswalk"].items()
+            },
+        }
+        for vintage, spec in city["profiles"].items()
+    }
+
+
+#### Crimes the analysis stages compare ####
+# [crime] analyzed is a subset of `types` (every crime 03.0 reads); all of them when omitted.
+def analyzed_crimes(city=None):
+    city = load_city() if city is None else city
+    analyzed = city["crime"].get("analyzed", city["crime"]["types"])
+    unknown = [crime for crime in analyzed if crime not in city["crime"]["types"]]
+    if unknown:
+        raise ValueError(f"[crime] analyzed lists crimes not in types: {unknown}")
+    return list(analyzed)
+
+
+#### Default worker count for a stage's process pool ####
+# A stage running alone uses every core; under the multi-city driver PIPELINE_JOBS splits the
+# cores between the cities running at once, so nested pools never oversubscribe the machine.
+def default_jobs():
+    return int(os.environ.get(JOBS_VARIABLE, 0)) or os.cpu_count()
@@ -0,0 +1,146 @@
+#### Preamble ####
+# Purpose: Precomputed dashboard bundle (JSON manifest + float32 binary) of crime trends at neighbourhood, cluster and city level.
+# Author: Mike Cowan
+# Date: 19 May 2025
+# Contact: m.cowan@mail.utoronto.ca
+# License: MIT
+# Pre-requisites:
+# - `numpy` must be installed (pip install numpy)
+# - `polars` must be installed (pip install polars)
+# References:
+# - [https://developer.mozilla.org/en-US/docs/Web/JavaScript/Reference/Global_Objects/Float32Array]
+
+#### Workspace setup ####
+import hashlib  # inherent to Python
+import json  # inherent to Python
+from pathlib import Path  # inherent to Python
+
+import numpy as np
+import polars as pl
+
+from utils.artifacts import atomic_write
+
+
+# The viewer never aggregates: every level it can show is precomputed here.
+# - bundle.json: labels (crimes, years, clusters, neighbourhoods), cluster SES summaries and,
+#   for each array, its byte offset and shape in bundle.bin.
+# - bundle.bin: little-endian float32 arrays, C order, missing rates stored as NaN.
+#     neighbourhood  (crime, year, neighbourhood)  rate per 100K
+#     cluster_mean   (crime, year, cluster)        mean rate (missing rates skipped, as in 07.0)
+#     cluster_p25    (crime, year, cluster)        25th percentile
+#     cluster_p75    (crime, year, cluster)        75th percentile
+#     city_mean      (crime, year)                 mean over all neighbourhoods
+# The browser wraps each one in a Float32Array view (no parsing), so any crime x year x cluster
+# selection is an index lookup.
+BUNDLE_DIR = "other/dashboard"
+
+
+#### Rates cube: (crime, year, neighbourhood) ####
+def rate_cube(merged, crime_types, years):
+    return np.stack(
+        [
+            merged.select([f"{crime}_rate_{year}" for year in years])
+            .cast(pl.Float64)
+            .to_numpy()
+            .T
+            for crime in crime_types
+        ]
+    )
+
+
+#### Build the manifest and arrays ####
+def build_bundle(merged, crime_types, years, levels, ses_columns=()):
+    merged = merged.sort("neighbourhood")
+    cluster_index = np.array(
+        [levels.index(level) for level in merged["opportunity_index"]]
+    )
+    rates = rate_cube(merged, crime_types, years)
+
+    shape = (len(crime_types), len(years), len(levels))
+    cluster_mean, cluster_p25, cluster_p75 = (np.full(shape, np.nan) for _ in range(3))
+    for c in range(len(levels)):
+        members = rates[:, :, cluster_index == c]
+        if members.shape[-1] == 0:
+            continue
+        with np.errstate(invalid="ignore"):
+            cluster_mean[:, :, c] = np.nanmean(members, axis=-1)
+            cluster_p25[:, :, c], cluster_p75[:, :, c] = np.nanpercentile(
+                members, [25, 75], axis=-1
+            )
+
+    arrays = {
+        "neighbourhood": rates,
+        "cluster_mean": cluster_mean,
+        "cluster_p25": cluster_p25,
+        "cluster_p75": cluster_p75,
+        "city_mean": np.nanmean(rates, axis=-1),
+    }
+
+    # Cluster summaries: size and mean SES profile (shown beside the chart)
+    summaries = [
+        {
+            "cluster": level,
+            "neighbourhoods": int((cluster_index == c).sum()),
+            **{
+                column: float(merged[column].filter(cluster_index == c).mean())
+                for column in ses_columns
+            },
+        }
+        for c, level in enumerate(levels)
+    ]
+
+    manifest = {
+        "crimes": list(crime_types),
+        "years": [int(year) for year in years],
+        "clusters": list(levels),
+        "neighbourhoods": merged["neighbourhood"].to_list(),
+        "neighbourhood_cluster": cluster_index.tolist(),
+        "summaries": summaries,
+    }
+    return manifest, arrays
+
+
+#### Write bundle.json + bundle.bin ####
+# The manifest carries a content hash so the viewer can cache-bust the binary. The binary is
+# replaced first, so a bundle.json on disk never names arrays its bundle.bin does not hold.
+def write_bundle(manifest, arrays, directory=BUNDLE_DIR):
+    directory = Path(directory)
+
+    blobs, layout, offset = [], {}, 0
+    for name, array in arrays.items():
+        blob = np.ascontiguousarray(array, dtype="<f4").tobytes()
+        layout[name] = {"offset": offset, "shape": list(array.shape)}
+        blobs.append(blob)
+        offset += len(blob)
+    payload = b"".join(blobs)
+
+    manifest = {
+        **manifest,
+        "version": hashlib.sha256(payload).hexdigest()[:16],
+        "dtype": "float32",
+        "arrays": layout,
+    }
+    text = json.dumps(manifest, separators=(",", ":"))
+    atomic_write(directory / "bundle.bin", lambda tmp: Path(tmp).write_bytes(payload))
+    atomic_write(
+        directory / "bundle.json",
+        lambda tmp: Path(tmp).write_text(text, encoding="utf-8"),
+    )
+    return manifest
+
+
+#### Read a bundle back (as the viewer does) ####
+def read_bundle(directory=BUNDLE_DIR):
+    directory = Path(directory)
+    manifest = json.loads((directory / "bundle.json").read_text(encoding="utf-8"))
+    payload = (directory / "bundle.bin").read_bytes()
+    arrays = {
+        name: np.frombuffer(
+            payload,
+            dtype="<f4",
+            count=int(np.prod(spec["shape"])),
+            offset=spec["offset"],
+        ).reshape(spec["shape"])
+        for name, spec in manifest["arrays"].items()
+    }
+    return manifest, arrays
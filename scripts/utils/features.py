@@ -0,0 +1,84 @@
+#### Preamble ####
+# Purpose: Shared SES feature transform (standardization + one full SVD), cached by a feature hash.
+# Author: Mike Cowan
+# Date: 19 May 2025
+# Contact: m.cowan@mail.utoronto.ca
+# License: MIT
+# Pre-requisites:
+# - `numpy` must be installed (pip install numpy)
+# - `scikit-learn` must be installed (pip install scikit-learn)
+# References:
+# - [https://scikit-learn.org/stable/modules/generated/sklearn.preprocessing.StandardScaler.html]
+# - [https://scikit-learn.org/stable/modules/decomposition.html#pca]
+# - [https://numpy.org/doc/stable/reference/generated/numpy.linalg.svd.html]
+
+#### Workspace setup ####
+import hashlib  # inherent to Python
+from pathlib import Path  # inherent to Python
+
+import numpy as np
+from sklearn.preprocessing import StandardScaler
+from sklearn.utils.extmath import svd_flip
+
+from utils.artifacts import atomic_write
+
+
+# Everything 05.0 and 08.0 need from the feature matrix comes from one scaling and one SVD:
+#   scaled = (X - mean) / scale             (StandardScaler, population std)
+#   scaled - column means = U S Vt          (thin SVD)
+#   PCA scores = U S; components = Vt; explained variance = S^2 / (n - 1)
+# so the 2-D projection, eigenvalues and variance ratios are slices of the same decomposition.
+
+
+#### Hash of the feature matrix and its column names (cache key) ####
+def feature_hash(X, columns):
+    digest = hashlib.sha256(np.ascontiguousarray(X, dtype=float).tobytes())
+    digest.update("\0".join(columns).encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+#### Standardize + decompose (no caching) ####
+def fit_transform(X, columns):
+    X = np.asarray(X, dtype=float)
+    scaler = StandardScaler().fit(X)
+    scaled = scaler.transform(X)
+
+    centered = scaled - scaled.mean(axis=0)
+    U, S, Vt = np.linalg.svd(centered, full_matrices=False)
+    U, Vt = svd_flip(U, Vt, u_based_decision=False)  # same sign convention as PCA
+
+    explained_variance = S**2 / (len(X) - 1)
+    return {
+        "columns": np.array(columns),
+        "mean": scaler.mean_,
+        "scale": scaler.scale_,
+        "scaled": scaled,
+        "scores": U * S,
+        "components": Vt,
+        "singular_values": S,
+        "explained_variance": explained_variance,
+        "explained_variance_ratio": explained_variance / explained_variance.sum(),
+    }
+
+
+#### Cached transform: reused by every stage that clusters the same features ####
+# Cached under data/cache/features/<hash>.npz, so adding (or lagging) a feature just adds a file.
+def load_or_fit_transform(X, columns, cache_dir="data/cache/features"):
+    key = feature_hash(X, columns)
+    cache_path = Path(cache_dir) / f"{key}.npz"
+    if cache_path.exists():
+        with np.load(cache_path, allow_pickle=False) as cached:
+            transform = {name: cached[name] for name in cached.files}
+        transform["columns"] = transform["columns"].tolist()
+        return transform
+
+    transform = fit_transform(X, columns)
+
+    # Atomic: the cache is shared between cities running at once (see utils/cities.py)
+    def write(tmp):
+        with open(tmp, "wb") as f:
+            np.savez(f, **transform)
+
+    atomic_write(cache_path, write, root=None)
+    transform["columns"] = list(columns)
+    return transform
@@ -0,0 +1,154 @@
+#### Preamble ####
+# Purpose: Figure cache (skip unchanged figures) and multi-format output with background rendering.
+# Author: Mike Cowan
+# Date: 19 May 2025
+# Contact: m.cowan@mail.utoronto.ca
+# License: MIT
+# Pre-requisites:
+# - `matplotlib` must be installed (pip install matplotlib); WebP output uses Pillow (a matplotlib dependency)
+# - `numpy` and `polars` must be installed
+# References:
+# - [https://matplotlib.org/stable/api/figure_api.html#matplotlib.figure.Figure.savefig]
+# - [https://docs.python.org/3/library/concurrent.futures.html#processpoolexecutor]
+# - [https://matplotlib.org/stable/users/explain/figure/interactive_guide.html] (figures are picklable)
+
+#### Workspace setup ####
+import hashlib  # inherent to Python
+import json  # inherent to Python
+import pickle  # inherent to Python
+from concurrent.futures import ProcessPoolExecutor  # inherent to Python
+from pathlib import Path  # inherent to Python
+
+import matplotlib
+import matplotlib.pyplot as plt
+import numpy as np
+import polars as pl
+
+from utils.artifacts import atomic_write, current_run_id
+
+
+# Output modes: PNG (default, 300 dpi as before), SVG/PDF (vector, for the paper) and
+# lossless WebP at a lower dpi (for dashboards)
+FIGURE_FORMATS = {
+    "png": {"dpi": 300},
+    "svg": {},
+    "pdf": {},
+    "webp": {"dpi": 120, "pil_kwargs": {"lossless": True}},
+}
+
+CACHE_PATH = "data/cache/figure_cache.json"
+
+
+#### Hash the plotted data + style into a figure key ####
+# DataFrames hash their rows, arrays their bytes, anything else its repr (titles, colour maps,
+# sizes). The matplotlib version is included so an upgrade re-renders everything.
+def figure_key(*parts):
+    digest = hashlib.sha256(matplotlib.__version__.encode("utf-8"))
+    for part in parts:
+        if isinstance(part, pl.DataFrame):
+            digest.update(",".join(part.columns).encode("utf-8"))
+            digest.update(part.hash_rows(seed=0).to_numpy().tobytes())
+        elif isinstance(part, np.ndarray):
+            digest.update(np.ascontiguousarray(part).tobytes())
+        else:
+            digest.update(repr(part).encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+#### Worker: unpickle a figure and write each requested format (runs in a child process) ####
+# Each file is rendered into a temp path and published by utils/artifacts.py (atomic, recorded
+# under the parent's run ID); the format is explicit because the temp name has no extension.
+def _render(figure_bytes, outputs, run_id):
+    fig = pickle.loads(figure_bytes)
+    for path, options in outputs:
+        fmt = Path(path).suffix[1:]
+        atomic_write(
+            path,
+            lambda tmp: fig.savefig(tmp, format=fmt, **options),
+            run_id=run_id,
+        )
+    plt.close(fig)
+
+
+#### Cached, multi-format figure writer ####
+# Usage:
+#   with FigureWriter(formats=("png", "svg")) as writer:
+#       key = figure_key(data, title)
+#       if writer.needs("other/figures/fig_1", key):
+#           fig = ...  # build the figure
+#           writer.save(fig, "other/figures/fig_1", key)
+# Figures are pickled and rasterized in worker processes (matplotlib's text layout is not
+# thread-safe), so the main process moves on to the next figure. The pool is only started
+# once something needs rendering, and a cache entry is recorded once its file is on disk.
+class FigureWriter:
+    def __init__(self, formats=("png",), cache_path=CACHE_PATH, max_workers=4):
+        unknown = [f for f in formats if f not in FIGURE_FORMATS]
+        if unknown:
+            raise ValueError(f"Unknown figure format(s): {unknown}")
+        self.formats = tuple(formats)
+        self.cache_path = Path(cache_path)
+        self.cache = (
+            json.loads(self.cache_path.read_text(encoding="utf-8"))
+            if self.cache_path.exists()
+            else {}
+        )
+        self.max_workers = max_workers
+        self.pool = None
+        self.pending = []
+        self.skipped = 0
+        self.written = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # Cache entries are per (stem, format): adding a format later renders only that format
+    def _missing(self, stem, key):
+        return [
+            f
+            for f in self.formats
+            if self.cache.get(f"{stem}.{f}") != key or not Path(f"{stem}.{f}").exists()
+        ]
+
+    def needs(self, stem, key):
+        missing = self._missing(str(stem), key)
+        if not missing:
+            self.skipped += 1
+        return bool(missing)
+
+    # Hand the figure to a worker and close it here; its formats are written in sequence
+    def save(self, fig, stem, key, **savefig_kwargs):
+        stem = str(stem)
+        Path(stem).parent.mkdir(parents=True, exist_ok=True)
+        outputs = [
+            (f"{stem}.{fmt}", {**FIGURE_FORMATS[fmt], **savefig_kwargs})
+            for fmt in self._missing(stem, key)
+        ]
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(max_workers=self.max_workers)
+        future = self.pool.submit(_render, pickle.dumps(fig), outputs, current_run_id())
+        plt.close(fig)
+        self.pending.append((future, [path for path, _ in outputs], key))
+
+    # Wait for every render and record the cache entries
+    def close(self):
+        try:
+            for future, paths, key in self.pending:
+                future.result()
+                for path in paths:
+                    self.cache[path] = key
+                self.written += len(paths)
+        finally:
+            if self.pool is not None:
+                self.pool.shutdown(wait=True)
+                self.pool = None
+            self.pending = []
+            cache = json.dumps(self.cache, indent=2, sort_keys=True)
+            atomic_write(
+                self.cache_path,
+                lambda tmp: Path(tmp).write_text(cache, encoding="utf-8"),
+                root=None,
+            )
+        print(f"Figures: {self.written} written, {self.skipped} unchanged (skipped).")
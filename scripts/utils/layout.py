@@ -0,0 +1,108 @@
+#### Preamble ####
+# Purpose: Opt-in compact column types for the merged table and long crime panels (UInt32 counts, Float32 rates, Enum labels, integer area IDs).
+# Author: Mike Cowan
+# Date: 19 May 2025
+# Contact: m.cowan@mail.utoronto.ca
+# License: MIT
+# Pre-requisites:
+# - `polars` must be installed (pip install polars)
+# - Enabled with `00.0-run_pipeline.py --layout compact`; the CSVs keep the wide Int64/Float64 layout
+# References:
+# - [https://docs.pola.rs/user-guide/concepts/data-types-and-structures/]
+# - [https://docs.pola.rs/api/python/stable/reference/api/polars.datatypes.Enum.html]
+
+#### Workspace setup ####
+import re  # inherent to Python
+
+import polars as pl
+
+from utils.config import load_city
+
+
+# Wide layout: Int64 counts, Float64 rates and SES, and the neighbourhood and opportunity_index
+# strings repeated on every row. Compact layout:
+#   <crime>_<year> counts            -> UInt32 (strict: a negative count fails loudly)
+#   <crime>_rate_<year>, SES floats  -> Float32 (the City publishes rates at float32 precision)
+#   other integer columns            -> Int32; year -> UInt16; cluster -> UInt8
+#   opportunity_index, crime         -> Enum with fixed levels (a UInt32 code per row, not a string)
+#   neighbourhood                    -> Enum over the sorted names, plus neighbourhood_id (UInt32,
+#                                       the same code) for NumPy paths
+# Aggregations should cast Float32 back to Float64 inside the expression (e.g.
+# pl.col(c).cast(pl.Float64).mean()) so sums keep full precision while the scan stays compact.
+MERGED_COMPACT_PATH = "data/02-analysis_data/02-analysis_data_merged.parquet"
+LAYOUTS = ("wide", "compact")
+OPPORTUNITY_LEVELS = ["Low Opportunity", "Medium Opportunity", "High Opportunity"]
+CRIME_TYPES = load_city()["crime"][
+    "types"
+]  # every crime the city publishes (its config)
+
+COUNT_PATTERN = re.compile(r"^[a-z]+_\d{4}$")
+RATE_PATTERN = re.compile(r"^[a-z]+_rate_\d{4}$")
+
+
+#### Compact dtype for one column ####
+def compact_dtype(name, dtype, frame):
+    if name == "opportunity_index":
+        return pl.Enum(OPPORTUNITY_LEVELS)
+    if name == "crime":
+        return pl.Enum(CRIME_TYPES)
+    if name == "neighbourhood":
+        return pl.Enum(sorted(frame[name].unique().drop_nulls().to_list()))
+    if name == "year":
+        return pl.UInt16
+    if name == "cluster":
+        return pl.UInt8
+    if COUNT_PATTERN.match(name) and dtype.is_integer():
+        return pl.UInt32
+    if RATE_PATTERN.match(name) or dtype == pl.Float64:
+        return pl.Float32
+    if dtype == pl.Int64:
+        return pl.Int32
+    return dtype
+
+
+#### Cast a wide merged table or a long panel to the compact layout ####
+def compact_frame(frame):
+    casts = [
+        pl.col(name).cast(compact_dtype(name, dtype, frame), strict=True)
+        for name, dtype in frame.schema.items()
+    ]
+    compact = frame.with_columns(casts)
+    if "neighbourhood" in compact.columns and "neighbourhood_id" not in compact.columns:
+        at = compact.columns.index("neighbourhood") + 1
+        compact = compact.insert_column(
+            at,
+            compact["neighbourhood"]
+            .to_physical()
+            .cast(pl.UInt32)
+            .alias("neighbourhood_id"),
+        )
+    return compact
+
+
+#### The merged table in either layout ####
+def read_merged(layout="wide"):
+    if layout not in LAYOUTS:
+        raise ValueError(f"layout must be one of {LAYOUTS}, got {layout!r}")
+    if layout == "compact":
+        return pl.read_parquet(MERGED_COMPACT_PATH)
+    return pl.read_csv("data/02-analysis_data/02-analysis_data_merged.csv")
+
+
+#### In-memory size of tables, wide vs compact (MiB) ####
+def memory_report(frames):
+    rows = []
+    for name, frame in frames.items():
+        wide = frame.estimated_size("mb")
+        compact = compact_frame(frame).estimated_size("mb")
+        rows.append(
+            {
+                "table": name,
+                "rows": frame.height,
+                "columns": frame.width,
+                "wide_mib": round(wide, 3),
+                "compact_mib": round(compact, 3),
+                "ratio": round(wide / compact, 2) if compact else None,
+            }
+        )
+    return pl.DataFrame(rows)
@@ -0,0 +1,154 @@
+#### Preamble ####
+# Purpose: Cluster-quality metrics (silhouette, Davies–Bouldin, Calinski–Harabasz) from shared distances and sufficient statistics.
+# Author: Mike Cowan
+# Date: 19 May 2025
+# Contact: m.cowan@mail.utoronto.ca
+# License: MIT
+# Pre-requisites:
+# - `numpy` must be installed (pip install numpy)
+# - `scipy` must be installed (pip install scipy)
+# References:
+# - [https://scikit-learn.org/stable/modules/clustering.html#clustering-performance-evaluation]
+# - Rousseeuw (1987), Silhouettes: a graphical aid to the interpretation of cluster analysis
+
+#### Workspace setup ####
+import numpy as np
+from scipy.spatial.distance import cdist
+
+
+# The three scores share two ingredients that do not depend on which model produced the labels:
+# - D, the n x n Euclidean distance matrix (computed once per feature matrix). Silhouette only
+#   needs, for every point, its summed distance to each cluster: S = D @ onehot(labels), one
+#   matrix product per labelling instead of a fresh O(n^2) distance pass.
+# - Per-cluster counts, sums and sums of squares. Calinski–Harabasz follows from these exactly
+#   (within SS = sum_sq - |sum|^2 / n); Davies–Bouldin needs the centroids they give plus one
+#   O(n d) pass for the mean distance to each centroid.
+# Moving a few points between clusters updates S and the statistics in O(n) per point.
+
+
+#### Silhouette from per-cluster distance sums ####
+# sums: (n, K) summed distance from each point to each cluster; labels: (n,); counts: (K,)
+# Points in singleton clusters score 0, as in scikit-learn.
+def silhouette_from_sums(sums, labels, counts):
+    rows = np.arange(len(labels))
+    own_size = counts[labels]
+    a = sums[rows, labels] / np.maximum(own_size - 1, 1)
+    mean_other = np.where(counts > 0, sums / np.maximum(counts, 1), np.inf)
+    mean_other[rows, labels] = np.inf
+    b = mean_other.min(axis=1)
+    scores = np.where(own_size > 1, (b - a) / np.maximum(a, b), 0.0)
+    return np.nan_to_num(scores)
+
+
+#### Silhouette from a precomputed distance matrix (e.g., DTW) ####
+def silhouette_precomputed(distances, labels):
+    labels = np.asarray(labels)
+    n_clusters = labels.max() + 1
+    onehot = np.eye(n_clusters)[labels]
+    counts = onehot.sum(axis=0)
+    return silhouette_from_sums(distances @ onehot, labels, counts).mean()
+
+
+#### Sampled silhouette for large n ####
+# Exact silhouette of `sample_size` random points against all n points: O(sample x n) memory
+# and time instead of O(n^2); the mean is an unbiased estimate of the full score.
+def sampled_silhouette(X, labels, sample_size=2_000, seed=838):
+    X = np.asarray(X, dtype=float)
+    labels = np.asarray(labels)
+    n_clusters = labels.max() + 1
+    counts = np.bincount(labels, minlength=n_clusters)
+    rng = np.random.default_rng(seed)
+    sample = rng.choice(len(X), size=min(sample_size, len(X)), replace=False)
+
+    sums = np.zeros((sample.size, n_clusters))
+    for k in range(n_clusters):
+        members = np.flatnonzero(labels == k)
+        for start in range(0, members.size, 10_000):  # bound the distance block size
+            block = members[start : start + 10_000]
+            sums[:, k] += cdist(X[sample], X[block]).sum(axis=1)
+    return silhouette_from_sums(sums, labels[sample], counts).mean()
+
+
+#### Metrics engine for one feature matrix ####
+# Build once per feature matrix, then score any number of labellings (models, K, bootstrap
+# resamples). `score` computes from scratch; `update` moves only the points whose label changed.
+class ClusterMetrics:
+    def __init__(self, X, distances=None):
+        # Centering changes no score but keeps sums of squares well-conditioned
+        self.X = np.asarray(X, dtype=float) - np.mean(X, axis=0)
+        self.D = cdist(self.X, self.X) if distances is None else distances
+        self.total_ss = (self.X**2).sum()
+        self.labels = None
+
+    # Full pass: sufficient statistics + per-cluster distance sums for a labelling
+    def score(self, labels):
+        labels = np.asarray(labels)
+        self.n_clusters = labels.max() + 1
+        onehot = np.eye(self.n_clusters)[labels]
+        self.labels = labels.copy()
+        self.counts = onehot.sum(axis=0)
+        self.sums = onehot.T @ self.X  # (K, d)
+        self.sum_squares = onehot.T @ (self.X**2).sum(axis=1)  # (K,)
+        self.distance_sums = self.D @ onehot  # (n, K)
+        return self.metrics()
+
+    # Labellings with noise points (label -1, e.g. HDBSCAN) are scored on the clustered points
+    # only; noise is not a cluster, so it would distort every score
+    def score_clustered(self, labels):
+        labels = np.asarray(labels)
+        clustered = labels >= 0
+        if clustered.all():
+            return self.score(labels)
+        subset = ClusterMetrics(self.X[clustered], self.D[np.ix_(clustered, clustered)])
+        return subset.score(labels[clustered])
+
+    # Move the points whose label differs from the last scored labelling (O(n) per point)
+    def update(self, labels):
+        labels = np.asarray(labels)
+        if self.labels is None or labels.max() + 1 > self.n_clusters:
+            return self.score(labels)
+        for i in np.flatnonzero(labels != self.labels):
+            old, new = self.labels[i], labels[i]
+            self.counts[old] -= 1
+            self.counts[new] += 1
+            self.sums[old] -= self.X[i]
+            self.sums[new] += self.X[i]
+            squared = self.X[i] @ self.X[i]
+            self.sum_squares[old] -= squared
+            self.sum_squares[new] += squared
+            self.distance_sums[:, old] -= self.D[:, i]
+            self.distance_sums[:, new] += self.D[:, i]
+        self.labels = labels.copy()
+        return self.metrics()
+
+    # Scores for the current statistics (names match the 08.0 table)
+    def metrics(self):
+        present = self.counts > 0
+        counts, sums = self.counts[present], self.sums[present]
+        centroids = sums / counts[:, None]
+        n, K = len(self.X), present.sum()
+
+        # Calinski–Harabasz: (between SS / (K - 1)) / (within SS / (n - K))
+        within_ss = (self.sum_squares[present] - (sums**2).sum(axis=1) / counts).sum()
+        between_ss = self.total_ss - within_ss
+        calinski_harabasz = (
+            between_ss * (n - K) / (within_ss * (K - 1)) if within_ss > 0 else 1.0
+        )
+
+        # Davies–Bouldin: mean over clusters of max_j (s_i + s_j) / |c_i - c_j|
+        remap = np.cumsum(present) - 1
+        labels = remap[self.labels]
+        spread = np.linalg.norm(self.X - centroids[labels], axis=1)
+        s = np.bincount(labels, weights=spread, minlength=K) / counts
+        separation = cdist(centroids, centroids)
+        np.fill_diagonal(separation, np.inf)
+        davies_bouldin = ((s[:, None] + s[None, :]) / separation).max(axis=1).mean()
+
+        silhouette = silhouette_from_sums(
+            self.distance_sums[:, present], labels, counts
+        ).mean()
+        return {
+            "Silhouette": float(silhouette),
+            "Davies-Bouldin": float(davies_bouldin),
+            "Calinski-Harabasz": float(calinski_harabasz),
+        }
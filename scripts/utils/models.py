@@ -0,0 +1,147 @@
+#### Preamble ####
+# Purpose: Registry of clustering models with a common fit interface, warm-started K sweeps and parallel fits.
+# Author: Mike Cowan
+# Date: 19 May 2025
+# Contact: m.cowan@mail.utoronto.ca
+# License: MIT
+# Pre-requisites:
+# - `numpy` must be installed (pip install numpy)
+# - `scipy` must be installed (pip install scipy)
+# - `scikit-learn` >= 1.3 must be installed (pip install scikit-learn); HDBSCAN ships with it
+# References:
+# - [https://scikit-learn.org/stable/modules/clustering.html]
+# - [https://scikit-learn.org/stable/modules/mixture.html]
+# - [https://docs.scipy.org/doc/scipy/reference/generated/scipy.cluster.hierarchy.linkage.html]
+
+#### Workspace setup ####
+from concurrent.futures import ProcessPoolExecutor  # inherent to Python
+
+import numpy as np
+from scipy.cluster.hierarchy import fcluster, linkage
+from sklearn.cluster import HDBSCAN, KMeans
+from sklearn.mixture import BayesianGaussianMixture, GaussianMixture
+
+from utils.config import default_jobs
+
+
+# Every model is a function fit(X, k, previous, seed) -> (labels, state):
+# - `previous` is the state returned for the previous K in a sweep (None for a cold fit),
+# - `state` is whatever the next K can reuse (centroids, means, a linkage tree).
+# A sweep over K therefore walks upward and hands each fit its predecessor's solution.
+# Labels are 0..K-1, except HDBSCAN's noise points, which keep the label -1.
+
+
+#### Warm-start helper: previous centres plus the worst-fitting point as the new centre ####
+def _grow_centres(X, centres):
+    distance = ((X[:, None, :] - centres[None, :, :]) ** 2).sum(axis=-1).min(axis=1)
+    return np.vstack([centres, X[np.argmax(distance)]])
+
+
+#### K-means (cold: 10 restarts; warm: one run from the grown K - 1 centres) ####
+def fit_kmeans(X, k, previous=None, seed=42):
+    if previous is not None and len(previous) == k - 1:
+        model = KMeans(n_clusters=k, init=_grow_centres(X, previous), n_init=1)
+    else:
+        model = KMeans(n_clusters=k, random_state=seed, n_init=10)
+    labels = model.fit_predict(X)
+    return labels, model.cluster_centers_
+
+
+#### Gaussian mixture with a given covariance structure (warm: grown K - 1 means) ####
+def _gaussian_mixture(covariance_type):
+    def fit(X, k, previous=None, seed=42):
+        means_init = None
+        if previous is not None and len(previous) == k - 1:
+            means_init = _grow_centres(X, previous)
+        model = GaussianMixture(
+            n_components=k,
+            covariance_type=covariance_type,
+            means_init=means_init,
+            random_state=seed,
+        )
+        labels = model.fit_predict(X)
+        return labels, model.means_
+
+    return fit
+
+
+#### Bayesian GMM (Dirichlet process prior; K is an upper bound, unused components shrink) ####
+# scikit-learn offers no means_init here, so each K is a cold fit. Labels are renumbered over
+# the components actually used, so there may be fewer than K (see `k_effective` below).
+def fit_bayesian_gmm(X, k, previous=None, seed=42):
+    model = BayesianGaussianMixture(n_components=k, max_iter=500, random_state=seed)
+    labels = model.fit_predict(X)
+    return np.unique(labels, return_inverse=True)[1], None
+
+
+#### Agglomerative (Ward): the tree is built once and cut at every K ####
+def fit_agglomerative(X, k, previous=None, seed=42):
+    tree = linkage(X, method="ward") if previous is None else previous
+    labels = fcluster(tree, t=k, criterion="maxclust") - 1
+    return labels, tree
+
+
+#### HDBSCAN: density-based, finds its own K (noise points keep the label -1) ####
+def fit_hdbscan(X, k=None, previous=None, seed=42):
+    if previous is not None:
+        return previous, previous
+    labels = HDBSCAN(min_cluster_size=5).fit_predict(X)
+    return labels, labels
+
+
+#### Registry: name -> (display label, fit function, whether K is an input) ####
+MODELS = {
+    "kmeans": ("KMeans", fit_kmeans, True),
+    "gmm": ("GMM", _gaussian_mixture("full"), True),
+    "gmm_tied": ("GMM (tied)", _gaussian_mixture("tied"), True),
+    "gmm_diag": ("GMM (diagonal)", _gaussian_mixture("diag"), True),
+    "gmm_spherical": ("GMM (spherical)", _gaussian_mixture("spherical"), True),
+    "bayesian_gmm": ("Bayesian GMM", fit_bayesian_gmm, True),
+    "agglomerative": ("Agglomerative (Ward)", fit_agglomerative, True),
+    "hdbscan": ("HDBSCAN", fit_hdbscan, False),
+}
+
+
+#### One model across every K (runs in a child process during a sweep) ####
+# `k` is the requested K (the number found, for HDBSCAN); `k_effective` counts the clusters the
+# labels actually use and `noise` the points left unclustered (-1).
+def fit_chain(name, X, ks, warm_start=True, seed=42):
+    label, fit, uses_k = MODELS[name]
+    results, state = [], None
+    for k in sorted(ks) if uses_k else [None]:
+        labels, new_state = fit(X, k, state if warm_start else None, seed)
+        state = new_state
+        labels = np.asarray(labels)
+        k_effective = len(np.unique(labels[labels >= 0]))
+        results.append(
+            {
+                "model": name,
+                "Model": label,
+                "k": k_effective if k is None else k,
+                "k_effective": k_effective,
+                "noise": int((labels < 0).sum()),
+                "labels": labels,
+            }
+        )
+    return results
+
+
+#### Fit several models over a K range; chains run in parallel processes ####
+# Warm starts only happen inside a chain, so chains are independent and split cleanly.
+def fit_models(X, names, ks, warm_start=True, n_jobs=None, seed=42):
+    n_jobs = default_jobs() if n_jobs is None else n_jobs
+    if n_jobs <= 1 or len(names) < 2:
+        chains = [fit_chain(name, X, ks, warm_start, seed) for name in names]
+    else:
+        with ProcessPoolExecutor(max_workers=min(n_jobs, len(names))) as pool:
+            chains = list(
+                pool.map(
+                    fit_chain,
+                    names,
+                    [X] * len(names),
+                    [ks] * len(names),
+                    [warm_start] * len(names),
+                    [seed] * len(names),
+                )
+            )
+    return [result for chain in chains for result in chain]
@@ -0,0 +1,70 @@
+#### Preamble ####
+# Purpose: Long-format crime panel store, partitioned by year so new releases are appended, not rebuilt.
+# Author: Mike Cowan
+# Date: 19 May 2025
+# Contact: m.cowan@mail.utoronto.ca
+# License: MIT
+# Pre-requisites:
+# - `polars` must be installed (pip install polars)
+# - `pyarrow` must be installed (pip install pyarrow)
+# References:
+# - [https://docs.pola.rs/user-guide/io/multiple/]
+
+#### Workspace setup ####
+from pathlib import Path  # inherent to Python
+
+import polars as pl
+
+from utils.artifacts import write_parquet
+
+
+# Layout: <store>/<year>.parquet, each holding neighbourhood, crime, year, count, rate rows.
+
+
+#### Years already in the store (read from file names, no data is loaded) ####
+def stored_years(store_path):
+    store_path = Path(store_path)
+    if not store_path.exists():
+        return []
+    return sorted(int(p.stem) for p in store_path.glob("*.parquet") if p.stem.isdigit())
+
+
+#### Unpivot one year of the wide cleaned table to long rows ####
+def year_rows(clean_df, crime_types, year):
+    return pl.concat(
+        [
+            clean_df.select(
+                pl.col("neighbourhood"),
+                pl.lit(crime).alias("crime"),
+                pl.lit(year, dtype=pl.Int64).alias("year"),
+                pl.col(f"{crime}_{year}").cast(pl.Int64).alias("count"),
+                pl.col(f"{crime}_rate_{year}").cast(pl.Float64).alias("rate"),
+            )
+            for crime in crime_types
+        ]
+    )
+
+
+#### Write the years missing from the store (or every year when rebuilding) ####
+# Returns the years written so later stages can limit their work to them.
+def append_new_years(clean_df, store_path, crime_types, years, rebuild=False):
+    store_path = Path(store_path)
+    store_path.mkdir(parents=True, exist_ok=True)
+    existing = set() if rebuild else set(stored_years(store_path))
+    written = [year for year in years if year not in existing]
+    for year in written:
+        write_parquet(
+            year_rows(clean_df, crime_types, year), store_path / f"{year}.parquet"
+        )
+    return written
+
+
+#### Lazily scan the whole panel (or a subset of years) ####
+def scan_panel(store_path, years=None):
+    store_path = Path(store_path)
+    files = (
+        sorted(store_path.glob("*.parquet"))
+        if years is None
+        else [store_path / f"{year}.parquet" for year in years]
+    )
+    return pl.scan_parquet(files)
@@ -0,0 +1,150 @@
+#### Preamble ####
+# Purpose: Batched Monte Carlo permutation tests and bootstrap intervals for cluster mean differences.
+# Author: Mike Cowan
+# Date: 19 May 2025
+# Contact: m.cowan@mail.utoronto.ca
+# License: MIT
+# Pre-requisites:
+# - `polars` must be installed (pip install polars)
+# - `numpy` must be installed (pip install numpy)
+# References:
+# - [https://en.wikipedia.org/wiki/Permutation_test]
+# - [https://numpy.org/doc/stable/reference/random/generated/numpy.random.Generator.permuted.html]
+# - Efron & Tibshirani (1993), An Introduction to the Bootstrap (percentile intervals)
+
+#### Workspace setup ####
+import itertools  # inherent to Python
+
+import numpy as np
+import polars as pl
+
+
+#### Cluster means for a batch of label vectors ####
+# labels_batch: (B, n) integer cluster codes; rates: (n, m)
+# For each cluster k the 0/1 indicator matrix (B, n) times the rate matrix (n, m) gives the
+# per-permutation column sums in a single BLAS call; dividing by the cluster size gives the means.
+def batched_cluster_means(labels_batch, rates, n_clusters, sizes):
+    means = np.empty((labels_batch.shape[0], n_clusters, rates.shape[1]))
+    for k in range(n_clusters):
+        indicator = (labels_batch == k).astype(rates.dtype)
+        means[:, k, :] = indicator @ rates / sizes[k]
+    return means
+
+
+#### Permutation p-values for every pairwise cluster contrast ####
+# Permutations are drawn in chunks so memory stays at chunk_size x n (labels) and
+# chunk_size x K x m (means), whatever the total number of permutations.
+# Two-sided p = (1 + #{|perm diff| >= |observed diff|}) / (1 + permutations)
+def permutation_pvalues(rates, labels, permutations=10_000, chunk_size=2_000, seed=838):
+    rates = np.asarray(rates, dtype=float)
+    labels = np.asarray(labels)
+    n_clusters = labels.max() + 1
+    sizes = np.bincount(labels, minlength=n_clusters)
+    pairs = list(itertools.combinations(range(n_clusters), 2))
+    first, second = np.array(pairs).T
+
+    observed_means = batched_cluster_means(labels[None, :], rates, n_clusters, sizes)[0]
+    observed_diff = observed_means[first] - observed_means[second]  # (pairs, m)
+
+    rng = np.random.default_rng(seed)
+    exceed = np.zeros_like(observed_diff)
+    done = 0
+    while done < permutations:
+        batch = min(chunk_size, permutations - done)
+        # Each row is an independent shuffle of the observed labels (cluster sizes preserved)
+        shuffled = rng.permuted(np.broadcast_to(labels, (batch, labels.size)), axis=1)
+        means = batched_cluster_means(shuffled, rates, n_clusters, sizes)
+        diff = means[:, first, :] - means[:, second, :]
+        exceed += (np.abs(diff) >= np.abs(observed_diff) - 1e-12).sum(axis=0)
+        done += batch
+
+    return pairs, observed_means, observed_diff, (exceed + 1) / (permutations + 1)
+
+
+#### Stratified bootstrap intervals for cluster means and their differences ####
+# Neighbourhoods are resampled with replacement within each cluster. Resamples are stored
+# as count matrices (B, n_k) so each cluster mean is again a matrix product with the rates.
+def bootstrap_intervals(
+    rates, labels, resamples=10_000, chunk_size=2_000, alpha=0.05, seed=838
+):
+    rates = np.asarray(rates, dtype=float)
+    labels = np.asarray(labels)
+    n_clusters = labels.max() + 1
+    pairs = list(itertools.combinations(range(n_clusters), 2))
+    first, second = np.array(pairs).T
+    members = [np.flatnonzero(labels == k) for k in range(n_clusters)]
+
+    rng = np.random.default_rng(seed)
+    boot_means = np.empty((resamples, n_clusters, rates.shape[1]))
+    for start in range(0, resamples, chunk_size):
+        batch = min(chunk_size, resamples - start)
+        for k, rows in enumerate(members):
+            size = rows.size
+            draws = rng.integers(0, size, size=(batch, size))
+            # Row b of `counts` says how often each member was drawn in resample b
+            offsets = (np.arange(batch)[:, None] * size + draws).ravel()
+            counts = np.bincount(offsets, minlength=batch * size).reshape(batch, size)
+            boot_means[start : start + batch, k, :] = counts @ rates[rows] / size
+
+    quantiles = [alpha / 2, 1 - alpha / 2]
+    mean_ci = np.quantile(boot_means, quantiles, axis=0)  # (2, K, m)
+    diff_ci = np.quantile(
+        boot_means[:, first, :] - boot_means[:, second, :], quantiles, axis=0
+    )  # (2, pairs, m)
+    return mean_ci, diff_ci
+
+
+#### Benjamini-Hochberg adjusted p-values (false discovery rate) ####
+# [https://en.wikipedia.org/wiki/False_discovery_rate#Benjamini%E2%80%93Hochberg_procedure]
+def benjamini_hochberg(p_values):
+    p_values = np.asarray(p_values, dtype=float)
+    order = np.argsort(p_values)
+    ranked = p_values[order] * p_values.size / np.arange(1, p_values.size + 1)
+    adjusted = np.minimum.accumulate(ranked[::-1])[::-1]
+    q_values = np.empty_like(adjusted)
+    q_values[order] = np.minimum(adjusted, 1.0)
+    return q_values
+
+
+#### Tidy contrast table: one row per (column, cluster pair) ####
+def contrast_table(
+    columns,
+    cluster_names,
+    rates,
+    labels,
+    permutations=10_000,
+    resamples=10_000,
+    chunk_size=2_000,
+    seed=838,
+):
+    pairs, means, diffs, p_values = permutation_pvalues(
+        rates, labels, permutations=permutations, chunk_size=chunk_size, seed=seed
+    )
+    mean_ci, diff_ci = bootstrap_intervals(
+        rates, labels, resamples=resamples, chunk_size=chunk_size, seed=seed
+    )
+
+    records = []
+    for p, (a, b) in enumerate(pairs):
+        for j, column in enumerate(columns):
+            records.append(
+                {
+                    "variable": column,
+                    "cluster_a": cluster_names[a],
+                    "cluster_b": cluster_names[b],
+                    "mean_a": means[a, j],
+                    "mean_a_low": mean_ci[0, a, j],
+                    "mean_a_high": mean_ci[1, a, j],
+                    "mean_b": means[b, j],
+                    "mean_b_low": mean_ci[0, b, j],
+                    "mean_b_high": mean_ci[1, b, j],
+                    "difference": diffs[p, j],
+                    "difference_low": diff_ci[0, p, j],
+                    "difference_high": diff_ci[1, p, j],
+                    "p_value": p_values[p, j],
+                }
+            )
+    table = pl.DataFrame(records)
+    return table.with_columns(
+        pl.Series("q_value", benjamini_hochberg(table["p_value"].to_numpy()))
+    )
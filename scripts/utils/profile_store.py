@@ -0,0 +1,257 @@
+#### Preamble ####
+# Purpose: Multi-vintage Census profile store with cached label crosswalks and areal interpolation.
+# Author: Mike Cowan
+# Date: 19 May 2025
+# Contact: m.cowan@mail.utoronto.ca
+# License: MIT
+# Pre-requisites:
+# - `polars` must be installed (pip install polars)
+# - `fastexcel` must be installed (pip install fastexcel); reads the .xlsx profiles
+# - `numpy`, `scipy` and `matplotlib` must be installed (point-in-polygon tests use matplotlib.path)
+# References:
+# - [https://open.toronto.ca/dataset/neighbourhood-profiles/]
+# - [https://matplotlib.org/stable/api/path_api.html#matplotlib.path.Path.contains_points]
+# - Goodchild & Lam (1980), Areal interpolation (area-weighting of extensive/intensive variables)
+
+#### Workspace setup ####
+import hashlib  # inherent to Python
+import json  # inherent to Python
+from pathlib import Path  # inherent to Python
+
+import numpy as np
+import polars as pl
+from matplotlib.path import Path as PolygonPath
+from scipy import sparse
+
+from utils.artifacts import write_json, write_parquet
+from utils.config import load_city, profile_vintages
+from utils.schema import normalize_profile_names
+from utils.spatial import load_boundaries
+
+
+#### Canonical profile variables ####
+# "extensive" = counts (split by area when boundaries change); "intensive" = rates/medians (averaged)
+CANONICAL_VARIABLES = {
+    "total_households": "extensive",
+    "two_parent_families": "extensive",
+    "one_parent_families": "extensive",
+    "median_income": "intensive",
+    "unemployment_rate": "intensive",
+    "total_education": "extensive",
+    "bachelors_or_higher": "extensive",
+}
+
+#### Census vintages: source file, layout and label crosswalk ####
+# Per city, from the [profiles.<vintage>] tables of config/cities/<city>.toml (see
+# utils/config.py). Each crosswalk entry maps a canonical variable to (row label, occurrence).
+# Labels are matched after stripping whitespace and standardizing apostrophes; "last" picks the
+# later of duplicated labels.
+VINTAGES = profile_vintages(load_city())
+
+
+#### Hash a file's bytes (cache key for workbooks and boundary files) ####
+def file_hash(path):
+    return hashlib.sha256(Path(path).read_bytes()).hexdigest()
+
+
+#### Read a profile workbook as strings ####
+def read_workbook(path):
+    if str(path).endswith(".xlsx"):
+        return pl.read_excel(path, infer_schema_length=0)
+    return pl.read_csv(path, infer_schema_length=0)
+
+
+#### Hash a vintage's config spec (path, layout and crosswalk) ####
+def spec_hash(spec):
+    return hashlib.sha256(
+        json.dumps(spec, sort_keys=True, default=list).encode("utf-8")
+    ).hexdigest()
+
+
+#### Resolve crosswalk labels to row positions ####
+def resolve_rows(labels, crosswalk):
+    labels = [
+        (label or "").strip().replace("’", "'").replace("‘", "'") for label in labels
+    ]
+    rows, missing = {}, []
+    for variable, (label, occurrence) in crosswalk.items():
+        matches = [i for i, value in enumerate(labels) if value == label]
+        if not matches:
+            missing.append(label)
+            continue
+        rows[variable] = matches[-1] if occurrence == "last" else matches[0]
+    if missing:
+        raise KeyError(f"Crosswalk labels not found in workbook: {missing}")
+    return rows
+
+
+#### Ingest one vintage into the store (skipped when the workbook is unchanged) ####
+# Store layout: <store>/<vintage>.parquet (neighbourhood, variable, value) + manifest.json,
+# which records each workbook's hash, the hash of its config spec and the resolved crosswalk
+# rows. A re-downloaded but identical workbook with an unchanged spec is never re-parsed; a
+# revised one reuses the cached rows when the labels at those positions still match. Editing
+# the spec (crosswalk, label_column, skip_columns) re-ingests the vintage.
+def ingest_vintage(vintage, store_path, force=False):
+    spec = VINTAGES[vintage]
+    store_path = Path(store_path)
+    store_path.mkdir(parents=True, exist_ok=True)
+    manifest_path = store_path / "manifest.json"
+    manifest = (
+        json.loads(manifest_path.read_text(encoding="utf-8"))
+        if manifest_path.exists()
+        else {}
+    )
+    entry = manifest.get(str(vintage), {})
+    output_path = store_path / f"{vintage}.parquet"
+
+    source_hash, config_hash = file_hash(spec["path"]), spec_hash(spec)
+    if (
+        not force
+        and entry.get("source_hash") == source_hash
+        and entry.get("spec_hash") == config_hash
+        and output_path.exists()
+    ):
+        return False
+
+    workbook = read_workbook(spec["path"])
+    labels = workbook[spec["label_column"]].to_list()
+    rows = entry.get("rows")
+    cached_ok = rows is not None and set(rows) == set(spec["crosswalk"])
+    if cached_ok:
+        cached_ok = all(
+            row < len(labels)
+            and (labels[row] or "").strip().replace("’", "'").replace("‘", "'")
+            == spec["crosswalk"][variable][0]
+            for variable, row in rows.items()
+        )
+    if not cached_ok:
+        rows = resolve_rows(labels, spec["crosswalk"])
+
+    area_columns = [
+        c
+        for c in workbook.columns
+        if c != spec["label_column"] and c not in spec["skip_columns"]
+    ]
+    selected = workbook.select(area_columns)[list(rows.values())]
+    long_df = pl.DataFrame(
+        {
+            "neighbourhood": np.repeat(
+                normalize_profile_names(area_columns), len(rows)
+            ),
+            "variable": np.tile(list(rows), len(area_columns)),
+            "value": selected.transpose()
+            .to_numpy()
+            .ravel()
+            .astype(str),  # strings like "1,234" are cleaned below
+        }
+    ).with_columns(
+        pl.col("value").str.replace_all(",", "").cast(pl.Float64, strict=False)
+    )
+    write_parquet(long_df, output_path)
+
+    manifest[str(vintage)] = {
+        "source_hash": source_hash,
+        "spec_hash": config_hash,
+        "rows": rows,
+    }
+    write_json(manifest, manifest_path)
+    return True
+
+
+#### Wide view of one vintage (neighbourhood + canonical variables, workbook column order) ####
+def read_vintage(store_path, vintage):
+    long_df = pl.read_parquet(Path(store_path) / f"{vintage}.parquet")
+    return long_df.pivot(
+        index="neighbourhood", on="variable", values="value", maintain_order=True
+    ).select(["neighbourhood", *CANONICAL_VARIABLES])
+
+
+#### Assign grid points to polygons (first containing polygon wins; -1 = outside) ####
+def _point_owners(points, rings):
+    owners = np.full(len(points), -1)
+    for i, area_rings in enumerate(rings):
+        for ring in area_rings:
+            lo, hi = ring.min(axis=0), ring.max(axis=0)
+            in_box = np.flatnonzero(
+                (owners == -1) & np.all((points >= lo) & (points <= hi), axis=1)
+            )
+            if in_box.size == 0:
+                continue
+            inside = PolygonPath(ring).contains_points(points[in_box])
+            owners[in_box[inside]] = i
+    return owners
+
+
+#### Area-overlap matrix between two boundary sets (target x source) ####
+# Areas are estimated by sampling a regular grid of points, so no polygon-clipping library is
+# needed; the result is cached on disk and keyed by both files' hashes and the grid resolution.
+def area_overlap(source_geojson, target_geojson, cache_path, resolution=600):
+    cache_key = f"{file_hash(source_geojson)}:{file_hash(target_geojson)}:{resolution}"
+    cache_path = Path(cache_path)
+    if cache_path.exists():
+        cached = np.load(cache_path, allow_pickle=False)
+        if str(cached["key"]) == cache_key:
+            overlap = sparse.csr_matrix(
+                (cached["data"], cached["indices"], cached["indptr"]),
+                shape=tuple(cached["shape"]),
+            )
+            return (
+                cached["source_names"].tolist(),
+                cached["target_names"].tolist(),
+                overlap,
+            )
+
+    source_names, source_rings = load_boundaries(source_geojson)
+    target_names, target_rings = load_boundaries(target_geojson)
+    vertices = np.vstack([r for rings in source_rings + target_rings for r in rings])
+    (x0, y0), (x1, y1) = vertices.min(axis=0), vertices.max(axis=0)
+    xs = np.linspace(x0, x1, resolution)
+    ys = np.linspace(y0, y1, resolution)
+    points = np.column_stack([np.repeat(xs, resolution), np.tile(ys, resolution)])
+
+    source_owner = _point_owners(points, source_rings)
+    target_owner = _point_owners(points, target_rings)
+    both = (source_owner >= 0) & (target_owner >= 0)
+    overlap = sparse.csr_matrix(
+        (np.ones(both.sum()), (target_owner[both], source_owner[both])),
+        shape=(len(target_names), len(source_names)),
+    )  # duplicate (target, source) entries are summed into point counts
+
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    np.savez_compressed(
+        cache_path,
+        key=cache_key,
+        source_names=np.array(source_names),
+        target_names=np.array(target_names),
+        data=overlap.data,
+        indices=overlap.indices,
+        indptr=overlap.indptr,
+        shape=np.array(overlap.shape),
+    )
+    return source_names, target_names, overlap
+
+
+#### Interpolate source-geography values onto the target geography ####
+# Extensive: target_j = sum_i (overlap_ji / area_i) * source_i   (counts are split by area share)
+# Intensive: target_j = sum_i (overlap_ji / area_j) * source_i   (rates are area-weighted averages)
+# Each kind is one sparse @ dense product over all variables at once.
+def interpolate(overlap, values, kinds):
+    values = np.nan_to_num(np.asarray(values, dtype=float))
+    source_area = np.asarray(overlap.sum(axis=0)).ravel()
+    target_area = np.asarray(overlap.sum(axis=1)).ravel()
+    to_share = sparse.diags(
+        np.divide(
+            1.0, source_area, out=np.zeros_like(source_area), where=source_area > 0
+        )
+    )
+    to_mean = sparse.diags(
+        np.divide(
+            1.0, target_area, out=np.zeros_like(target_area), where=target_area > 0
+        )
+    )
+    extensive = np.array([kind == "extensive" for kind in kinds])
+
+    result = np.empty((overlap.shape[0], values.shape[1]))
+    result[:, extensive] = (overlap @ to_share) @ values[:, extensive]
+    result[:, ~extensive] = (to_mean @ overlap) @ values[:, ~extensive]
+    return result
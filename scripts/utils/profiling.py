@@ -0,0 +1,267 @@
+#### Preamble ####
+# Purpose: Per-stage profiling (cProfile, tracemalloc, stack sampling, memory) and named timing spans inside stages.
+# Author: Mike Cowan
+# Date: 19 May 2025
+# Contact: m.cowan@mail.utoronto.ca
+# License: MIT
+# Pre-requisites:
+# - Standard library only
+# - Enabled by `00.0-run_pipeline.py --profile`; spans cost one global lookup when it is off
+# References:
+# - [https://docs.python.org/3/library/profile.html]
+# - [https://docs.python.org/3/library/tracemalloc.html]
+# - [https://github.com/brendangregg/FlameGraph] (folded-stack format; also opens in speedscope.app)
+
+#### Workspace setup ####
+import cProfile  # inherent to Python
+import collections  # inherent to Python
+import os  # inherent to Python
+import pstats  # inherent to Python
+import sys  # inherent to Python
+import threading  # inherent to Python
+import time  # inherent to Python
+import tracemalloc  # inherent to Python
+from pathlib import Path  # inherent to Python
+
+try:
+    import resource  # Unix only: peak resident set size
+except ImportError:
+    resource = None
+
+
+# Outputs per stage, in the profile directory:
+# - <stage>.prof         cProfile stats (python -m pstats, snakeviz)
+# - <stage>.folded       sampled stacks, one "frame;frame;frame count" line each (flamegraph.pl)
+# - <stage>.memory.txt   top allocation sites at the end of the stage (tracemalloc)
+# Only the main process is profiled; work sent to process pools shows up as waiting time.
+# tracemalloc sees Python and NumPy allocations but not Polars/Arrow buffers (allocated in Rust),
+# so the summary also reports the process's resident set (at the end of the stage, its change
+# over the stage, and the peak so far) and the size of the tables a stage registers with
+# track_frame().
+PROFILE_DIR = "data/cache/profiles"
+
+_active = None  # StageProfile collecting spans, or None when profiling is off
+
+
+#### Named span inside a stage ####
+# Usage:
+#   with span("fit"):
+#       model.fit(X)
+# Without an active profile this returns a shared no-op context manager.
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name):
+    if _active is None:
+        return _NULL_SPAN
+    return _Span(_active, name)
+
+
+#### Register a table's in-memory size with the active stage (no-op when profiling is off) ####
+# Usage:
+#   track_frame("merged", merged_data)
+def track_frame(name, frame):
+    if _active is not None:
+        _active.frames[name] = round(frame.estimated_size("mb"), 3)
+
+
+class _Span:
+    def __init__(self, profile, name):
+        self.profile = profile
+        self.name = name
+        self.peak = 0
+
+    def __enter__(self):
+        self.profile.mark_peak()
+        self.profile.stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        seconds = time.perf_counter() - self.start
+        self.profile.mark_peak()
+        path = "/".join(open_span.name for open_span in self.profile.stack)
+        self.profile.stack.pop()
+        record = self.profile.spans.setdefault(
+            path, {"calls": 0, "seconds": 0.0, "peak_mib": 0.0}
+        )
+        record["calls"] += 1
+        record["seconds"] += seconds
+        record["peak_mib"] = max(record["peak_mib"], round(self.peak / 2**20, 2))
+        return False
+
+
+#### Stack sampler (wall-clock, main thread) for flamegraphs ####
+class StackSampler:
+    def __init__(self, root, interval=0.005):
+        self.root = root
+        self.interval = interval
+        self.counts = collections.Counter()
+        self.thread_id = threading.main_thread().ident
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(
+                    f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+                )
+                frame = frame.f_back
+            self.counts[";".join([self.root, *reversed(stack)])] += 1
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+    def write(self, path):
+        with open(path, "w", encoding="utf-8") as file:
+            for stack, count in sorted(self.counts.items()):
+                file.write(f"{stack} {count}\n")
+
+
+#### Profile one stage ####
+# Usage (00.0-run_pipeline.py):
+#   with StageProfile("06.0-table_crime_clusters") as profile:
+#       module.main()
+#   profile.summary  -> wall/CPU seconds, peak traced memory, spans
+class StageProfile:
+    def __init__(
+        self, stage, directory=PROFILE_DIR, cpu=True, memory=True, sample_interval=0.005
+    ):
+        self.stage = stage
+        self.directory = Path(directory)
+        self.cpu = cpu
+        self.memory = memory
+        self.sample_interval = sample_interval
+        self.spans = {}
+        self.stack = []
+        self.frames = {}
+        self.peak = 0
+
+    # Fold tracemalloc's peak since the last mark into the stage and every open span, then
+    # reset it, so a span's peak covers exactly its own lifetime (nested spans included)
+    def mark_peak(self):
+        if not tracemalloc.is_tracing():
+            return
+        peak = tracemalloc.get_traced_memory()[1]
+        self.peak = max(self.peak, peak)
+        for open_span in self.stack:
+            open_span.peak = max(open_span.peak, peak)
+        tracemalloc.reset_peak()
+
+    def __enter__(self):
+        global _active
+        self.directory.mkdir(parents=True, exist_ok=True)
+        if self.memory:
+            tracemalloc.start()
+        self.sampler = StackSampler(self.stage, self.sample_interval)
+        self.sampler.start()
+        self.profiler = cProfile.Profile() if self.cpu else None
+        self.start_wall, self.start_cpu = time.perf_counter(), time.process_time()
+        self.start_rss = rss_mib()
+        _active = self
+        if self.profiler is not None:
+            self.profiler.enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        global _active
+        if self.profiler is not None:
+            self.profiler.disable()
+        wall = time.perf_counter() - self.start_wall
+        cpu = time.process_time() - self.start_cpu
+        _active = None
+        self.sampler.stop()
+
+        stem = self.directory / self.stage
+        self.sampler.write(f"{stem}.folded")
+        if self.profiler is not None:
+            self.profiler.dump_stats(f"{stem}.prof")
+        if self.memory:
+            self.mark_peak()
+            # Leave out the profiler's own bookkeeping
+            snapshot = tracemalloc.take_snapshot().filter_traces(
+                [
+                    tracemalloc.Filter(False, cProfile.__file__),
+                    tracemalloc.Filter(False, pstats.__file__),
+                    tracemalloc.Filter(False, __file__),
+                ]
+            )
+            top = snapshot.statistics("lineno")[:15]
+            tracemalloc.stop()
+            Path(f"{stem}.memory.txt").write_text(
+                "\n".join(str(stat) for stat in top) + "\n", encoding="utf-8"
+            )
+
+        self.summary = {
+            "stage": self.stage,
+            "wall_seconds": round(wall, 4),
+            "cpu_seconds": round(cpu, 4),
+            "peak_mib": round(self.peak / 2**20, 2),
+            "max_rss_mib": max_rss_mib(),
+            "rss_mib": rss_mib(),
+            "rss_delta_mib": (
+                None if self.start_rss is None else round(rss_mib() - self.start_rss, 1)
+            ),
+            "frames_mib": dict(self.frames),
+            "spans": {
+                name: {**record, "seconds": round(record["seconds"], 4)}
+                for name, record in self.spans.items()
+            },
+        }
+        return False
+
+
+#### Peak resident set size of this process so far (MiB; None where unavailable) ####
+def max_rss_mib():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (2**20 if sys.platform == "darwin" else 2**10), 1)
+
+
+#### Current resident set size (MiB; Linux /proc only, None elsewhere) ####
+def rss_mib():
+    try:
+        with open("/proc/self/statm", encoding="ascii") as statm:
+            pages = int(statm.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return round(pages * os.sysconf("SC_PAGE_SIZE") / 2**20, 1)
+
+
+#### Report across stages ####
+def format_summary(summaries):
+    lines = [
+        f"{'stage':<36} {'wall s':>8} {'cpu s':>8} {'peak MiB':>9} {'max RSS':>8} {'RSS +/-':>8}"
+    ]
+    for summary in summaries:
+        delta = summary.get("rss_delta_mib")
+        lines.append(
+            f"{summary['stage']:<36} {summary['wall_seconds']:>8.2f} "
+            f"{summary['cpu_seconds']:>8.2f} {summary['peak_mib']:>9.1f} "
+            f"{summary['max_rss_mib'] or 0:>8.0f} "
+            f"{'' if delta is None else f'{delta:+.0f}':>8}"
+        )
+        for name, record in summary["spans"].items():
+            lines.append(
+                f"  {name:<34} {record['seconds']:>8.2f} {'':>8} {record['peak_mib']:>9.1f}"
+            )
+        for name, size in summary.get("frames_mib", {}).items():
+            lines.append(f"  table {name:<28} {'':>8} {'':>8} {size:>9.2f}")
+    return "\n".join(lines)
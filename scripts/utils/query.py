@@ -0,0 +1,213 @@
+#### Preamble ####
+# Purpose: In-memory query engine over the merged crime panel (Arrow, memory-mapped) with an LRU result cache.
+# Author: Mike Cowan
+# Date: 19 May 2025
+# Contact: m.cowan@mail.utoronto.ca
+# License: MIT
+# Pre-requisites:
+# - `polars` must be installed (pip install polars)
+# - `pyarrow` must be installed (pip install pyarrow); Arrow IPC files are memory-mapped
+# References:
+# - [https://docs.pola.rs/api/python/stable/reference/api/polars.read_ipc.html]
+# - [https://docs.python.org/3/library/functools.html#functools.lru_cache]
+
+#### Workspace setup ####
+import functools  # inherent to Python
+import hashlib  # inherent to Python
+import threading  # inherent to Python
+from pathlib import Path  # inherent to Python
+
+import polars as pl
+
+from utils.artifacts import atomic_write
+
+
+# Dimensions a query may filter or group on, and the statistics it may ask for
+DIMENSIONS = ["crime", "year", "cluster", "neighbourhood"]
+STATISTICS = {
+    "mean": pl.mean,
+    "median": pl.median,
+    "sum": pl.sum,
+    "min": pl.min,
+    "max": pl.max,
+}
+
+
+#### Long panel from the merged (wide) analysis data ####
+# One row per (neighbourhood, crime, year): cluster label and rate per 100K
+def long_panel(merged_data, cluster_col="opportunity_index"):
+    rate_columns = [c for c in merged_data.columns if "_rate_" in c]
+    return (
+        merged_data.unpivot(
+            index=["neighbourhood", cluster_col],
+            on=rate_columns,
+            variable_name="column",
+            value_name="rate",
+        )
+        .with_columns(
+            pl.col("column").str.extract(r"^(\w+?)_rate_", 1).alias("crime"),
+            pl.col("column").str.extract(r"_(\d{4})$", 1).cast(pl.Int32).alias("year"),
+        )
+        .rename({cluster_col: "cluster"})
+        .select(["neighbourhood", "cluster", "crime", "year", "rate"])
+        .sort(["crime", "year", "neighbourhood"])
+    )
+
+
+#### Build (or reuse) the Arrow panel file ####
+# The data version is the hash of the merged CSV; the Arrow file is only rewritten when it changes.
+# Written uncompressed so it can be memory-mapped rather than decoded on load. Both files are
+# replaced atomically: a running engine keeps reading the old (still mapped) file until it swaps.
+def build_panel(merged_path, arrow_path):
+    merged_path, arrow_path = Path(merged_path), Path(arrow_path)
+    version = hashlib.sha256(merged_path.read_bytes()).hexdigest()[:16]
+    version_path = arrow_path.with_suffix(".version")
+    if (
+        arrow_path.exists()
+        and version_path.exists()
+        and version_path.read_text() == version
+    ):
+        return version
+
+    panel = long_panel(pl.read_csv(merged_path))
+    atomic_write(
+        arrow_path,
+        lambda tmp: panel.write_ipc(tmp, compression="uncompressed"),
+        root=None,
+    )
+    atomic_write(version_path, lambda tmp: Path(tmp).write_text(version), root=None)
+    return version
+
+
+#### Normalize query parameters into a hashable cache key ####
+# Lists are de-duplicated and sorted, so "robbery,assault" and "assault,robbery" share a cache entry.
+# Raises ValueError on unknown dimensions/statistics or a malformed year range.
+def normalize_query(
+    crime=None,
+    year_min=None,
+    year_max=None,
+    cluster=None,
+    neighbourhood=None,
+    group_by=("cluster", "year"),
+    stat="mean",
+):
+    def as_tuple(values):
+        if values is None:
+            return None
+        if isinstance(values, str):
+            values = values.split(",")
+        values = tuple(sorted({str(v).strip() for v in values if str(v).strip()}))
+        return values or None
+
+    group_by = as_tuple(group_by) or ()
+    unknown = [g for g in group_by if g not in DIMENSIONS]
+    if unknown:
+        raise ValueError(f"Unknown group_by dimension(s): {unknown}")
+    if stat not in STATISTICS:
+        raise ValueError(f"Unknown stat {stat!r}; expected one of {list(STATISTICS)}")
+    year_min = None if year_min is None else int(year_min)
+    year_max = None if year_max is None else int(year_max)
+    if year_min is not None and year_max is not None and year_min > year_max:
+        raise ValueError(f"year_min ({year_min}) is after year_max ({year_max})")
+
+    return (
+        ("crime", as_tuple(crime)),
+        ("year_min", year_min),
+        ("year_max", year_max),
+        ("cluster", as_tuple(cluster)),
+        ("neighbourhood", as_tuple(neighbourhood)),
+        ("group_by", tuple(g for g in DIMENSIONS if g in group_by)),
+        ("stat", stat),
+    )
+
+
+#### A loaded panel and its data version (compared and hashed by version only) ####
+# Passed to the cached aggregate as one argument, so a result is always computed on the panel
+# of the version it is cached under.
+class PanelSnapshot:
+    __slots__ = ("panel", "version")
+
+    def __init__(self, panel, version):
+        self.panel, self.version = panel, version
+
+    def __eq__(self, other):
+        return isinstance(other, PanelSnapshot) and other.version == self.version
+
+    def __hash__(self):
+        return hash(self.version)
+
+
+#### Query engine over the memory-mapped panel ####
+class PanelQueryEngine:
+    def __init__(self, merged_path, arrow_path, cache_size=4096):
+        self.merged_path = Path(merged_path)
+        self.arrow_path = Path(arrow_path)
+        # Results are cached per (data version, normalized query)
+        self._cached_aggregate = functools.lru_cache(maxsize=cache_size)(
+            self._aggregate
+        )
+        self._lock = threading.Lock()  # guards the (panel, version) swap
+        self._refresh_lock = threading.Lock()  # one rebuild at a time
+        self._snapshot = None
+        self.refresh()
+
+    @property
+    def panel(self):
+        return self.snapshot().panel
+
+    @property
+    def version(self):
+        return self.snapshot().version
+
+    def snapshot(self):
+        with self._lock:
+            return self._snapshot
+
+    # Reload the panel when the merged CSV has changed (new version => old cache keys stop matching).
+    # The new panel is loaded first, then swapped in together with its version.
+    def refresh(self):
+        with self._refresh_lock:
+            version = build_panel(self.merged_path, self.arrow_path)
+            snapshot = PanelSnapshot(
+                pl.read_ipc(self.arrow_path, memory_map=True), version
+            )
+            with self._lock:
+                self._snapshot = snapshot
+        return version
+
+    # Callers get fresh row dicts, so editing a result never changes what the cache serves
+    def aggregate(self, **params):
+        return self.aggregate_at(self.snapshot(), **params)
+
+    # Against a snapshot the caller already holds (e.g., to report the version it came from)
+    def aggregate_at(self, snapshot, **params):
+        rows = self._cached_aggregate(snapshot, normalize_query(**params))
+        return tuple(dict(row) for row in rows)
+
+    def cache_info(self):
+        return self._cached_aggregate.cache_info()
+
+    # Filter + group-by + statistic; returns a tuple of row dicts (the cached copy; see aggregate)
+    def _aggregate(self, snapshot, query):
+        query = dict(query)
+        filters = []
+        for dimension in ("crime", "cluster", "neighbourhood"):
+            if query[dimension] is not None:
+                filters.append(pl.col(dimension).is_in(list(query[dimension])))
+        if query["year_min"] is not None:
+            filters.append(pl.col("year") >= query["year_min"])
+        if query["year_max"] is not None:
+            filters.append(pl.col("year") <= query["year_max"])
+
+        frame = snapshot.panel.lazy()
+        if filters:
+            frame = frame.filter(pl.all_horizontal(filters))
+
+        statistic = STATISTICS[query["stat"]]("rate").alias("rate")
+        count = pl.len().alias("n")
+        group_by = list(query["group_by"])
+        if group_by:
+            frame = frame.group_by(group_by).agg(statistic, count).sort(group_by)
+        else:
+            frame = frame.select(statistic, count)
+        return tuple(frame.collect().to_dicts())
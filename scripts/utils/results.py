@@ -0,0 +1,137 @@
+#### Preamble ####
+# Purpose: Results bundle for paper/paper.qmd (every table, series and quoted number, computed once by the pipeline).
+# Author: Mike Cowan
+# Date: 19 May 2025
+# Contact: m.cowan@mail.utoronto.ca
+# License: MIT
+# Pre-requisites:
+# - `polars` must be installed (pip install polars)
+# References:
+# - [https://docs.pola.rs/api/python/stable/reference/api/polars.DataFrame.write_parquet.html]
+# - [https://quarto.org/docs/computations/inline-code.html]
+
+#### Workspace setup ####
+import hashlib  # inherent to Python
+import json  # inherent to Python
+from pathlib import Path  # inherent to Python
+
+import polars as pl
+
+from utils.artifacts import current_run_id, write_json, write_parquet
+
+
+# The manuscript only loads and plots: it never refits a model or re-aggregates raw data.
+# - <table>.parquet: one file per table or series the paper shows
+# - results.json: the quoted numbers ("values"), and for each table its file, row count and
+#   content hash; "version" hashes all of it
+# Every file goes through utils/artifacts.py, so the run that wrote the bundle is recorded in
+# the artifact store (runs/<run_id>/), not in the committed files: an unchanged bundle is
+# byte-identical across runs.
+RESULTS_DIR = "data/02-analysis_data/16-results_bundle"
+
+
+#### Crime trends: mean rate per cluster and year (long; the 07.0 / fig-crime_trends series) ####
+def crime_trends(merged, crime_types, years):
+    frames = []
+    for crime in crime_types:
+        rate_cols = [f"{crime}_rate_{year}" for year in years]
+        frames.append(
+            merged.select(["opportunity_index", *rate_cols])
+            .unpivot(
+                on=rate_cols,
+                index="opportunity_index",
+                variable_name="year",
+                value_name="rate",
+            )
+            .with_columns(pl.col("year").str.extract(r"_(\d{4})$", 1).cast(pl.Int64))
+            .group_by(["opportunity_index", "year"])
+            .agg(pl.col("rate").cast(pl.Float64).mean().alias("average_rate"))
+            .with_columns(pl.lit(crime).alias("crime"))
+        )
+    return (
+        pl.concat(frames)
+        .select(["crime", "opportunity_index", "year", "average_rate"])
+        .sort(["crime", "opportunity_index", "year"])
+    )
+
+
+#### Descriptive statistics by cluster (tbl-cluster_stats) ####
+def cluster_summary(merged):
+    return (
+        merged.group_by("cluster")
+        .agg(
+            [
+                pl.count("neighbourhood").alias("Neighbourhoods"),
+                pl.mean("median_income").round(2).alias("Med. Income ($)"),
+                pl.mean("prop_single_parent").round(2).alias("Single-Parent"),
+                pl.mean("education_rate").round(2).alias("Education"),
+                pl.mean("unemployment_rate").round(2).alias("Unemployed (%)"),
+            ]
+        )
+        .sort("cluster")
+        .rename({"cluster": "Cluster"})
+    )
+
+
+#### Raw-data previews (tbl-crime_data_preview, tbl-census_data_preview) ####
+# The columns shown come from the [preview] table of the city config
+def crime_preview(crime_raw, area_column, columns):
+    return crime_raw.select(
+        [
+            pl.col(area_column).str.slice(0, 16),  # keep only first 16 characters
+            *[pl.col(column).fill_null(0) for column in columns],
+            pl.lit("").alias("…"),  # fake column truncate
+        ]
+    )
+
+
+# columns: [profile column, short label] pairs
+def census_preview(profile_raw, label_column, columns):
+    return (
+        profile_raw.select(
+            [
+                pl.col(label_column).str.slice(0, 24),
+                *[pl.col(column).alias(label) for column, label in columns],
+                pl.lit("").alias("…"),  # fake column truncate
+            ]
+        )
+        .with_row_index("row_nr")
+        .filter(pl.col("row_nr") != 1)
+        .drop("row_nr")
+    )
+
+
+#### Write the bundle ####
+# tables: name -> DataFrame; values: JSON-serializable numbers and labels quoted in the text
+def write_results(tables, values, directory=RESULTS_DIR, run_id=None):
+    directory = Path(directory)
+    run_id = run_id or current_run_id()
+    entries = {}
+    for name, table in tables.items():
+        path = directory / f"{name}.parquet"
+        entries[name] = {
+            "file": path.name,
+            "rows": table.height,
+            "columns": table.columns,
+            "sha256": write_parquet(table, path, run_id=run_id),
+        }
+
+    contents = json.dumps({"tables": entries, "values": values}, sort_keys=True)
+    manifest = {
+        "version": hashlib.sha256(contents.encode("utf-8")).hexdigest()[:16],
+        "tables": entries,
+        "values": values,
+    }
+    write_json(manifest, directory / "results.json", run_id=run_id)
+    return manifest
+
+
+#### Read the bundle back (as the paper does) ####
+def read_results(directory=RESULTS_DIR):
+    directory = Path(directory)
+    manifest = json.loads((directory / "results.json").read_text(encoding="utf-8"))
+    tables = {
+        name: pl.read_parquet(directory / entry["file"])
+        for name, entry in manifest["tables"].items()
+    }
+    return manifest, tables
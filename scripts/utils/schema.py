@@ -0,0 +1,80 @@
+#### Preamble ####
+# Purpose: Shared naming and column-schema rules for Toronto neighbourhood data (used across the numbered scripts).
+# Author: Mike Cowan
+# Date: 19 May 2025
+# Contact: m.cowan@mail.utoronto.ca
+# License: MIT
+# Pre-requisites:
+# - `polars` must be installed (pip install polars)
+
+#### Workspace setup ####
+import re  # inherent to Python
+
+import polars as pl
+
+
+#### Normalize neighbourhood names (same rules as 03.0-clean_crime_data.py) ####
+def normalize_names(names):
+    return (
+        pl.Series("neighbourhood", names)
+        .str.normalize(form="NFKC")
+        # Boundary files append the area code, e.g. "South Eglinton-Davisville (174)"
+        .str.replace(r"\s*\(\d+\)$", "")
+        .str.strip_chars(" ")
+        .str.replace_all("`", "'")
+        .str.replace_all(r"\s+", "-")
+        .str.replace_all(r"\.", "")
+        .str.to_lowercase()
+        .to_list()
+    )
+
+
+#### Detect the years available in a wide crime table ####
+# Reads years from rate column names (e.g., "ASSAULT_RATE_2025" or "assault_rate_2025"),
+# so new annual releases are picked up without editing year lists in every script.
+# Only years reported for every requested crime are kept, from `start_year` onwards.
+def detect_years(columns, crime_types=None, start_year=2019):
+    found = {}
+    for column in columns:
+        match = re.fullmatch(r"([a-z]+)_rate_(\d{4})", column.strip().lower())
+        if match:
+            found.setdefault(match.group(1), set()).add(int(match.group(2)))
+    crime_types = list(found) if crime_types is None else crime_types
+    if not crime_types or any(crime not in found for crime in crime_types):
+        return []
+    common = set.intersection(*(found[crime] for crime in crime_types))
+    return sorted(year for year in common if year >= start_year)
+
+
+#### Latest population column in a wide crime table (e.g., "POPULATION_2024") ####
+# Releases publish population for some years only; None when the table has none.
+def latest_population_column(columns):
+    found = {}
+    for column in columns:
+        match = re.fullmatch(r"population_(\d{4})", column.strip().lower())
+        if match:
+            found[int(match.group(1))] = column
+    return found[max(found)] if found else None
+
+
+#### Normalize Census profile neighbourhood names (same rules as 03.1-clean_profile_data.py) ####
+# Profile spellings differ from the crime data for a few areas (e.g., "St.James Town"),
+# so they are mapped onto the crime-side form after the shared rules.
+def normalize_profile_names(names):
+    return (
+        pl.Series("neighbourhood", names)
+        .str.normalize(form="NFKC")
+        .str.strip_chars(" ")
+        .str.replace("’", "'")
+        .str.replace("‘", "'")
+        .str.replace_all("`", "'")
+        .str.replace_all(r"\s+", "-")
+        .str.replace_all(r"\.", "")
+        .str.to_lowercase()
+        .str.replace_all(r"st-james", "stjames")
+        .str.replace_all(r"st-clair", "stclair")
+        .str.replace_all(
+            r"cabbagetown-south-st-james-town", "cabbagetown-south-stjames-town"
+        )
+        .to_list()
+    )
@@ -0,0 +1,136 @@
+#### Preamble ####
+# Purpose: Nearest-neighbour index over scaled SES profiles ("which neighbourhoods look most like X?"), cached by feature hash.
+# Author: Mike Cowan
+# Date: 19 May 2025
+# Contact: m.cowan@mail.utoronto.ca
+# License: MIT
+# Pre-requisites:
+# - `numpy` and `polars` must be installed
+# - `scikit-learn` must be installed (pip install scikit-learn)
+# References:
+# - [https://scikit-learn.org/stable/modules/generated/sklearn.neighbors.KDTree.html]
+# - [https://scikit-learn.org/stable/modules/neighbors.html#choice-of-nearest-neighbors-algorithm]
+
+#### Workspace setup ####
+import hashlib  # inherent to Python
+import pickle  # inherent to Python
+from pathlib import Path  # inherent to Python
+
+import numpy as np
+import polars as pl
+from sklearn.neighbors import KDTree
+
+from utils.artifacts import atomic_write
+from utils.features import feature_hash, load_or_fit_transform
+
+
+# Distances are Euclidean in the standardized SES space 05.0 clusters in (the shared,
+# hash-cached transform), so "similar" means the same thing as it does to K-means.
+# A KD-tree answers k-nearest and radius queries in O(log n) per query for the handful of
+# SES dimensions we use, so the same code serves 158 neighbourhoods or ~50K dissemination
+# areas. The tree is pickled (scikit-learn's supported way to persist it) under
+# data/cache/similarity/<hash>.pkl, keyed on the features and the area names, and rebuilt
+# only when either changes (or INDEX_VERSION, when this class changes shape). The cache is
+# local and never committed.
+INDEX_VERSION = 1
+
+
+class SimilarityIndex:
+    def __init__(self, names, scaled, mean, scale, key, leaf_size=40):
+        self.names = list(names)
+        self.positions = {name: i for i, name in enumerate(self.names)}
+        self.mean, self.scale = np.asarray(mean), np.asarray(scale)
+        self.key = key
+        self.scaled = np.asarray(scaled, dtype=float)
+        self.tree = KDTree(self.scaled, leaf_size=leaf_size)
+
+    #### Rows of the index for names (KeyError names the missing one) ####
+    def rows(self, names):
+        missing = [name for name in names if name not in self.positions]
+        if missing:
+            raise KeyError(f"not in the index: {missing[0]!r}")
+        return np.array([self.positions[name] for name in names], dtype=int)
+
+    #### Top-k most similar areas to one area (itself excluded) ####
+    # Returns [(name, distance), ...] nearest first.
+    def similar(self, name, k=5):
+        point = self.scaled[self.rows([name])[0]][None, :]
+        distances, rows = self.tree.query(point, k=min(k + 1, len(self.names)))
+        return [
+            (self.names[row], float(distance))
+            for row, distance in zip(rows[0], distances[0])
+            if row != self.positions[name]
+        ][:k]
+
+    #### Every area within `radius` (standardized units) of one area ####
+    def within(self, name, radius):
+        point = self.scaled[self.rows([name])[0]][None, :]
+        rows, distances = self.tree.query_radius(
+            point, r=radius, return_distance=True, sort_results=True
+        )
+        return [
+            (self.names[row], float(distance))
+            for row, distance in zip(rows[0], distances[0])
+            if row != self.positions[name]
+        ]
+
+    #### Batch: top-k for many areas, or for raw SES profiles not in the index ####
+    # Pass names (areas in the index) or profiles (rows of raw feature values, scaled here
+    # with the index's mean and scale). Returns a long table: query, rank, neighbourhood, distance.
+    def query(self, names=None, profiles=None, k=5):
+        if profiles is None:
+            names = list(names)
+            points = self.scaled[self.rows(names)]
+            exclude_self, labels = 1, names
+        else:
+            points = (np.atleast_2d(profiles) - self.mean) / self.scale
+            exclude_self, labels = 0, [f"profile_{i}" for i in range(len(points))]
+        distances, rows = self.tree.query(
+            points, k=min(k + exclude_self, len(self.names))
+        )
+        if exclude_self:
+            # A query area is its own nearest neighbour unless it has an exact twin, so drop
+            # its own row wherever it landed rather than assuming column 0
+            keep = rows != self.rows(names)[:, None]
+            keep &= np.cumsum(keep, axis=1) <= k
+            rows = rows[keep].reshape(len(points), -1)
+            distances = distances[keep].reshape(len(points), -1)
+        width = rows.shape[1]
+        return pl.DataFrame(
+            {
+                "query": np.repeat(labels, width),
+                "rank": np.tile(np.arange(1, width + 1), len(points)),
+                "neighbourhood": np.array(self.names)[rows.ravel()],
+                "distance": distances.ravel(),
+            }
+        )
+
+
+#### Cached index: load if the features and names are unchanged, else build and save ####
+def load_or_build_index(
+    X,
+    columns,
+    names,
+    cache_dir="data/cache/similarity",
+    feature_cache_dir="data/cache/features",
+):
+    digest = hashlib.sha256(feature_hash(X, columns).encode("utf-8"))
+    digest.update("\0".join([str(INDEX_VERSION), *names]).encode("utf-8"))
+    key = digest.hexdigest()[:16]
+    cache_path = Path(cache_dir) / f"{key}.pkl"
+    if cache_path.exists():
+        with open(cache_path, "rb") as f:
+            return pickle.load(f)
+
+    transform = load_or_fit_transform(X, columns, feature_cache_dir)
+    index = SimilarityIndex(
+        names, transform["scaled"], transform["mean"], transform["scale"], key
+    )
+
+    # Atomic: the cache is shared between cities running at once (see utils/cities.py)
+    def write(tmp):
+        with open(tmp, "wb") as f:
+            pickle.dump(index, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    atomic_write(cache_path, write, root=None)
+    return index
@@ -0,0 +1,172 @@
+#### Preamble ####
+# Purpose: Empirical-Bayes (Poisson-Gamma) smoothing of crime rates, vectorized over every area, crime and period.
+# Author: Mike Cowan
+# Date: 19 May 2025
+# Contact: m.cowan@mail.utoronto.ca
+# License: MIT
+# Pre-requisites:
+# - `numpy` and `polars` must be installed
+# - `scipy` must be installed (pip install scipy); gamma quantiles for the intervals
+# References:
+# - [https://doi.org/10.2307/2347503] (Marshall 1991, moment estimator for the Gamma prior)
+# - [https://docs.scipy.org/doc/scipy/reference/generated/scipy.special.gammaincinv.html]
+
+#### Workspace setup ####
+from pathlib import Path  # inherent to Python
+
+import numpy as np
+import polars as pl
+from scipy.special import gammaincinv
+
+
+# Model, per (crime, year) group g of areas i:
+#   count_i ~ Poisson(exposure_i * theta_i),  theta_i ~ Gamma(alpha_g, beta_g)
+# exposure is population / 100K, so theta is a rate per 100K. The prior is fitted by moments
+# (mean m, between-area variance a), and each area's posterior is Gamma(count + alpha,
+# exposure + beta): its mean is the smoothed rate, its quantiles the interval. Small areas
+# and rare crimes are pulled towards the group mean; large counts barely move.
+# Every group is handled at once with np.bincount over a group index, so the cost is a few
+# passes over flat arrays (dissemination areas x months is the same code as neighbourhoods x years).
+SMOOTHED_PATH = "data/02-analysis_data/17-smoothed_rates.parquet"
+PER = 100_000
+RATES = ("raw", "smoothed")
+
+
+#### Poisson-Gamma shrinkage over flat arrays ####
+# counts, population: one entry per (area, crime, period); groups: integer prior group per entry.
+# Missing counts are zeros (the City's release leaves zero-count cells empty). An entry with
+# unknown population (null/NaN or 0, e.g., an area with no positive count in any period) is
+# left out of its group's prior and keeps its raw rate (`rates`, or 0 for a zero count).
+def eb_smooth(counts, population, groups, level=0.95, rates=None):
+    counts = np.nan_to_num(np.asarray(counts, dtype=np.float64))
+    exposure = np.asarray(population, dtype=np.float64) / PER
+    groups = np.asarray(groups)
+    n_groups = groups.max() + 1
+    known = np.isfinite(exposure) & (exposure > 0)
+    passthrough = (
+        np.full(counts.shape, np.nan)
+        if rates is None
+        else np.asarray(rates, dtype=np.float64)
+    )
+    passthrough = np.where(np.isnan(passthrough) & (counts == 0), 0.0, passthrough)
+    weight = np.where(known, exposure, 0.0)
+
+    # Prior moments per group (exposure-weighted mean and variance of the raw rates)
+    total_counts = np.bincount(groups, np.where(known, counts, 0.0), n_groups)
+    total_exposure = np.bincount(groups, weight, n_groups)
+    areas = np.bincount(groups, known, n_groups)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = total_counts / total_exposure
+        raw = np.where(known, counts / exposure, passthrough)
+        deviation = np.where(known, (raw - mean[groups]) ** 2, 0.0)
+        variance = np.bincount(groups, weight * deviation, n_groups) / total_exposure
+    # Between-area variance: observed variance less the Poisson noise (floored just above 0,
+    # i.e., near-complete pooling when the areas look alike)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        between = np.maximum(
+            variance - mean / (total_exposure / areas), 1e-8 * mean**2 + 1e-12
+        )
+        alpha = mean**2 / between
+        beta = mean / between
+
+        # Posterior per entry (entries with unknown exposure pass their raw rate through)
+        shape = counts + alpha[groups]
+        rate = exposure + beta[groups]
+        lower = np.where(shape > 0, gammaincinv(shape, (1 - level) / 2) / rate, 0.0)
+        upper = np.where(shape > 0, gammaincinv(shape, (1 + level) / 2) / rate, 0.0)
+        smoothed = shape / rate
+        shrinkage = beta[groups] / rate
+    # shrinkage: weight on the prior mean (0 = raw rate, 1 = fully pooled)
+    return {
+        "rate_raw": raw,
+        "rate_smoothed": np.where(known, smoothed, raw),
+        "rate_lower": np.where(known, lower, raw),
+        "rate_upper": np.where(known, upper, raw),
+        "shrinkage": np.where(known, shrinkage, 0.0),
+    }
+
+
+#### Population per area and period ####
+# The City's rates use yearly population estimates, so count * 100K / rate recovers the
+# denominator; an area-period with no positive count takes the area's mean over the periods.
+# An area with no positive count in any period stays null (eb_smooth keeps its raw rate).
+def implied_population(panel, area="neighbourhood", period="year"):
+    implied = (
+        panel.filter((pl.col("count") > 0) & (pl.col("rate") > 0))
+        .group_by([area, period])
+        .agg((pl.col("count") * PER / pl.col("rate")).median().alias("population"))
+    )
+    grid = panel.select([area, period]).unique()
+    return (
+        grid.join(implied, on=[area, period], how="left")
+        .with_columns(
+            pl.col("population").fill_null(pl.col("population").mean().over(area))
+        )
+        .sort([area, period])
+    )
+
+
+#### Smooth a long panel (area, crime, period, count, rate) ####
+def smooth_panel(panel, by=("crime", "year"), level=0.95, area="neighbourhood"):
+    period = by[-1]
+    panel = panel.join(
+        implied_population(panel, area, period), on=[area, period], how="left"
+    )
+    groups = panel.select(pl.struct(list(by)).rank("dense") - 1).to_series()
+    smoothed = eb_smooth(
+        panel["count"].cast(pl.Float64).to_numpy(),
+        panel["population"].to_numpy(),
+        groups.to_numpy(),
+        level,
+        rates=panel["rate"].cast(pl.Float64).to_numpy(),
+    )
+    return panel.drop("rate").with_columns(
+        [pl.Series(name, values) for name, values in smoothed.items()]
+    )
+
+
+#### Which rates a stage reports ("raw" City rates or "smoothed" 03.4 rates) ####
+def check_rates(rates):
+    if rates not in RATES:
+        raise ValueError(f"rates must be one of {RATES}, not {rates!r}")
+
+
+#### Raw or smoothed rates in the wide merged table ####
+# rates="smoothed" swaps each `<crime>_rate_<year>` column for its smoothed value.
+def use_rates(merged, rates, crime_types, years, path=SMOOTHED_PATH):
+    check_rates(rates)
+    if rates == "raw":
+        return merged
+    columns = [f"{crime}_rate_{year}" for crime in crime_types for year in years]
+    wide = (
+        pl.read_parquet(path)
+        .filter(pl.col("crime").is_in(crime_types) & pl.col("year").is_in(years))
+        .with_columns(
+            (pl.col("crime") + "_rate_" + pl.col("year").cast(pl.String)).alias(
+                "column"
+            )
+        )
+        .pivot(index="neighbourhood", on="column", values="rate_smoothed")
+    )
+    # Names join as the merged table's type (String, or Enum in the compact layout)
+    wide = wide.with_columns(
+        pl.col("neighbourhood").cast(merged.schema["neighbourhood"])
+    )
+    return merged.drop(columns, strict=False).join(
+        wide.select(["neighbourhood", *columns]),
+        on="neighbourhood",
+        how="left",
+        maintain_order="left",
+    )
+
+
+#### Where a rates variant of an output goes ####
+# Raw outputs keep their committed paths; smoothed ones get a `_smoothed` suffix on the file or
+# directory name (04-cluster_crime_rates_smoothed.csv, 1_assault_smoothed.png,
+# 16-results_bundle_smoothed/), so a smoothed run never overwrites a raw table, figure or bundle.
+def rates_path(path, rates):
+    check_rates(rates)
+    path = Path(path)
+    if rates == "raw":
+        return path
+    return path.with_name(f"{path.stem}_{rates}{path.suffix}")
@@ -0,0 +1,233 @@
+#### Preamble ####
+# Purpose: Sparse spatial weights, spatial lags and Moran's I for Toronto neighbourhoods.
+# Author: Mike Cowan
+# Date: 19 May 2025
+# Contact: m.cowan@mail.utoronto.ca
+# License: MIT
+# Pre-requisites:
+# - `polars` must be installed (pip install polars)
+# - `numpy` must be installed (pip install numpy)
+# - `scipy` must be installed (pip install scipy)
+# References:
+# - [https://docs.scipy.org/doc/scipy/reference/generated/scipy.sparse.csr_matrix.html]
+# - [https://pysal.org/libpysal/api.html] (contiguity/k-NN weights definitions)
+# - [https://en.wikipedia.org/wiki/Moran%27s_I]
+
+#### Workspace setup ####
+import hashlib  # inherent to Python
+import json  # inherent to Python
+from pathlib import Path  # inherent to Python
+
+import numpy as np
+import polars as pl
+from scipy import sparse
+from scipy.spatial import cKDTree
+
+from utils.schema import normalize_names
+
+
+#### Load neighbourhood boundaries from a local GeoJSON ####
+# Returns the normalized names and, for each area, a list of exterior rings as (n, 2) arrays
+# Polygon = [exterior, holes...]; MultiPolygon = [[exterior, holes...], ...]
+# [https://datatracker.ietf.org/doc/html/rfc7946#section-3.1.6]
+def load_boundaries(geojson_path, name_property="AREA_NAME"):
+    with open(geojson_path, encoding="utf-8") as f:
+        collection = json.load(f)
+
+    names, rings = [], []
+    for feature in collection["features"]:
+        geometry = feature["geometry"]
+        if geometry["type"] == "Polygon":
+            polygons = [geometry["coordinates"]]
+        elif geometry["type"] == "MultiPolygon":
+            polygons = geometry["coordinates"]
+        else:
+            continue  # points/lines carry no area
+        names.append(feature["properties"][name_property])
+        rings.append(
+            [np.asarray(polygon[0], dtype=float)[:, :2] for polygon in polygons]
+        )
+
+    return normalize_names(names), rings
+
+
+#### Area-weighted polygon centroids (shoelace formula) ####
+# [https://en.wikipedia.org/wiki/Centroid#Of_a_polygon]
+def ring_centroids(rings):
+    centroids = np.empty((len(rings), 2))
+    for i, area_rings in enumerate(rings):
+        total_area, weighted = 0.0, np.zeros(2)
+        for ring in area_rings:
+            x, y = ring[:, 0], ring[:, 1]
+            x_next, y_next = np.roll(x, -1), np.roll(y, -1)
+            cross = x * y_next - x_next * y
+            area = cross.sum() / 2
+            if area == 0:
+                continue
+            cx = ((x + x_next) * cross).sum() / (6 * area)
+            cy = ((y + y_next) * cross).sum() / (6 * area)
+            total_area += abs(area)
+            weighted += abs(area) * np.array([cx, cy])
+        # Degenerate rings fall back to the mean vertex
+        centroids[i] = (
+            weighted / total_area
+            if total_area > 0
+            else np.vstack(area_rings).mean(axis=0)
+        )
+    return centroids
+
+
+#### Queen contiguity weights (areas sharing at least one vertex) ####
+# Vertices are snapped to a grid, de-duplicated with np.unique and turned into a sparse
+# area x vertex incidence matrix B; B @ B.T counts shared vertices between each pair of areas.
+# Memory grows with the number of vertices, never with n_areas^2.
+def contiguity_weights(rings, precision=6):
+    area_ids = np.concatenate(
+        [
+            np.full(sum(len(ring) for ring in area_rings), i)
+            for i, area_rings in enumerate(rings)
+        ]
+    )
+    vertices = np.round(
+        np.vstack([np.vstack(area_rings) for area_rings in rings]), precision
+    )
+    _, vertex_ids = np.unique(vertices, axis=0, return_inverse=True)
+    vertex_ids = vertex_ids.ravel()
+
+    incidence = sparse.csr_matrix(
+        (np.ones(len(area_ids)), (area_ids, vertex_ids)),
+        shape=(len(rings), vertex_ids.max() + 1),
+    )
+    incidence.data[:] = 1.0  # duplicate (area, vertex) entries were summed; binarize
+    shared = (incidence @ incidence.T).tocsr()
+    shared.setdiag(0)
+    shared.eliminate_zeros()
+    shared.data[:] = 1.0
+    return shared
+
+
+#### k-nearest-neighbour weights on centroids ####
+# [https://docs.scipy.org/doc/scipy/reference/generated/scipy.spatial.cKDTree.query.html]
+def knn_weights(centroids, k=6):
+    n = len(centroids)
+    k = min(k, n - 1)
+    _, neighbours = cKDTree(centroids).query(centroids, k=k + 1)
+    neighbours = neighbours[:, 1:]  # first hit is the area itself
+    rows = np.repeat(np.arange(n), k)
+    return sparse.csr_matrix((np.ones(n * k), (rows, neighbours.ravel())), shape=(n, n))
+
+
+#### Row-standardize so each row sums to 1 (islands keep a zero row) ####
+def row_standardize(weights):
+    row_sums = np.asarray(weights.sum(axis=1)).ravel()
+    inverse = np.divide(1.0, row_sums, out=np.zeros_like(row_sums), where=row_sums > 0)
+    return (sparse.diags(inverse) @ weights).tocsr()
+
+
+#### Spatial lag: average of each area's neighbours (W @ X) ####
+def spatial_lag(weights, values):
+    return weights @ np.asarray(values, dtype=float)
+
+
+#### Moran's I for every column of X at once ####
+# I = (n / S0) * (z' W z) / (z' z), with z = x - mean(x)
+# Pseudo p-values come from random permutations of z, evaluated as sparse @ dense products over
+# chunks of permutations: each chunk is at most `chunk_size` values (n x permutations-per-chunk),
+# so memory stays flat at dissemination-area scale instead of growing as n x 999 per column.
+# [https://pysal.org/esda/generated/esda.Moran.html]
+def morans_i(weights, values, permutations=999, seed=838, chunk_size=2**22):
+    values = np.asarray(values, dtype=float)
+    if values.ndim == 1:
+        values = values[:, None]
+    n, n_columns = values.shape
+    s0 = weights.sum()
+
+    z = values - values.mean(axis=0)
+    denominator = (z**2).sum(axis=0)
+    statistic = n / s0 * (z * (weights @ z)).sum(axis=0) / denominator
+
+    p_values = np.full(n_columns, np.nan)
+    if permutations:
+        rng = np.random.default_rng(seed)
+        per_chunk = max(1, chunk_size // n)
+        for j in range(n_columns):
+            simulated = np.empty(permutations)
+            for start in range(0, permutations, per_chunk):
+                stop = min(start + per_chunk, permutations)
+                # n x (stop - start) matrix, each column a shuffled copy of z_j
+                shuffled = z[:, j][
+                    rng.permuted(np.tile(np.arange(n), (stop - start, 1)), axis=1).T
+                ]
+                simulated[start:stop] = (
+                    n
+                    / s0
+                    * (shuffled * (weights @ shuffled)).sum(axis=0)
+                    / denominator[j]
+                )
+            extreme = (
+                np.abs(simulated - simulated.mean())
+                >= abs(statistic[j] - simulated.mean())
+            ).sum()
+            p_values[j] = (extreme + 1) / (permutations + 1)
+
+    return pl.DataFrame(
+        {
+            "morans_i": statistic,
+            "expected_i": np.full(n_columns, -1 / (n - 1)),
+            "p_value": p_values,
+        }
+    )
+
+
+#### Build (or reuse) the cached weights matrix ####
+# The cache key hashes the GeoJSON bytes plus the weighting options, so a new boundary file
+# or a different k triggers a rebuild; otherwise the CSR arrays are read straight from disk.
+# [https://numpy.org/doc/stable/reference/generated/numpy.savez_compressed.html]
+def load_or_build_weights(geojson_path, cache_path, method="queen", k=6):
+    geojson_path, cache_path = Path(geojson_path), Path(cache_path)
+    digest = hashlib.sha256(geojson_path.read_bytes()).hexdigest()
+    cache_key = f"{digest}:{method}:{k}"
+
+    if cache_path.exists():
+        cached = np.load(cache_path, allow_pickle=False)
+        if str(cached["key"]) == cache_key:
+            weights = sparse.csr_matrix(
+                (cached["data"], cached["indices"], cached["indptr"]),
+                shape=tuple(cached["shape"]),
+            )
+            return cached["names"].tolist(), weights
+
+    names, rings = load_boundaries(geojson_path)
+    if method == "queen":
+        weights = contiguity_weights(rings)
+    elif method == "knn":
+        weights = knn_weights(ring_centroids(rings), k=k)
+    else:
+        raise ValueError(f"Unknown weights method: {method} (use 'queen' or 'knn')")
+
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    np.savez_compressed(
+        cache_path,
+        key=cache_key,
+        names=np.array(names),
+        data=weights.data,
+        indices=weights.indices,
+        indptr=weights.indptr,
+        shape=np.array(weights.shape),
+    )
+    return names, weights
+
+
+#### Reorder a weights matrix to match a target list of neighbourhoods ####
+# Areas missing from the boundary file get an empty row/column (no neighbours)
+def align_weights(names, weights, target_names):
+    position = {name: i for i, name in enumerate(names)}
+    keep = np.array([position.get(name, -1) for name in target_names])
+    present = keep >= 0
+    selector = sparse.csr_matrix(
+        (np.ones(present.sum()), (np.flatnonzero(present), keep[present])),
+        shape=(len(target_names), len(names)),
+    )
+    return (selector @ weights @ selector.T).tocsr(), [
+        name for name, ok in zip(target_names, present) if not ok
+    ]
@@ -0,0 +1,165 @@
+#### Preamble ####
+# Purpose: Sensitivity sweep over SES feature subsets, feature weights, models, K and seeds (cluster -> table -> metrics).
+# Author: Mike Cowan
+# Date: 19 May 2025
+# Contact: m.cowan@mail.utoronto.ca
+# License: MIT
+# Pre-requisites:
+# - `numpy` and `polars` must be installed
+# - `scikit-learn` must be installed (pip install scikit-learn)
+# References:
+# - [https://docs.python.org/3/library/concurrent.futures.html#processpoolexecutor]
+# - [https://scikit-learn.org/stable/modules/generated/sklearn.metrics.adjusted_rand_score.html]
+
+#### Workspace setup ####
+import itertools  # inherent to Python
+from concurrent.futures import ProcessPoolExecutor  # inherent to Python
+
+import numpy as np
+import polars as pl
+from sklearn.metrics import adjusted_rand_score
+
+from utils.config import default_jobs
+from utils.metrics import ClusterMetrics
+from utils.models import MODELS, fit_chain
+
+
+# Standardization is per column, so every feature subset is a column slice of the one scaled
+# matrix from utils/features.py (cached by 05.0/08.0), and a weighting multiplies those
+# columns (weighted Euclidean distance). Workers receive the scaled matrix and rates once,
+# through the pool initializer, and each task covers one (features, weights, model, seed)
+# chain over every K, sharing one distance matrix across its labellings.
+
+# Sign of each SES column in the composite used to order clusters from Low to High Opportunity
+SES_DIRECTION = {
+    "education_rate": 1.0,
+    "prop_single_parent": -1.0,
+    "unemployment_rate": -1.0,
+    "median_income": 1.0,
+}
+
+
+#### Grid of configurations ####
+# feature_sets: lists of column names; weightings: name -> {column: weight} (missing = 1).
+# A weighting that touches none of a subset's columns would repeat "equal", so it is dropped.
+def expand_grid(feature_sets, weightings, ks, seeds, models=("kmeans",)):
+    unknown = [model for model in models if model not in MODELS]
+    if unknown:
+        raise ValueError(f"Unknown model(s): {unknown}; choose from {list(MODELS)}")
+    configs = []
+    for features, (weighting, weights), model, seed in itertools.product(
+        feature_sets, weightings.items(), models, seeds
+    ):
+        if weights and not set(weights) & set(features):
+            continue
+        configs.append(
+            {
+                "features": list(features),
+                "weighting": weighting,
+                "weights": [float(weights.get(f, 1.0)) for f in features],
+                "model": model,
+                "seed": seed,
+                "ks": list(ks),
+            }
+        )
+    return configs
+
+
+#### All subsets of at least `min_size` columns ####
+def feature_subsets(columns, min_size=2):
+    return [
+        list(subset)
+        for size in range(min_size, len(columns) + 1)
+        for subset in itertools.combinations(columns, size)
+    ]
+
+
+#### Worker state (set once per process) ####
+_shared = {}
+
+
+def _init_worker(scaled, columns, rates, crime_types, baseline):
+    _shared.update(
+        scaled=scaled,
+        columns=list(columns),
+        rates=rates,
+        crime_types=list(crime_types),
+        baseline=baseline,
+    )
+
+
+#### Cluster means of each crime's rate, ordered Low -> High Opportunity ####
+# rates: (n, crimes) for one year, NaN where missing (skipped, as in 06.0)
+def cluster_table(labels, rates, opportunity):
+    n_clusters = labels.max() + 1
+    onehot = np.eye(n_clusters)[labels]
+    present = ~np.isnan(rates)
+    means = (onehot.T @ np.where(present, rates, 0.0)) / np.maximum(
+        onehot.T @ present, 1
+    )
+    order = np.argsort(
+        np.bincount(labels, weights=opportunity, minlength=n_clusters)
+        / np.maximum(onehot.sum(axis=0), 1)
+    )
+    return means[order]
+
+
+#### One chain: cluster every K, tabulate rates by cluster, score ####
+def run_chain(config):
+    scaled, columns = _shared["scaled"], _shared["columns"]
+    X = scaled[:, [columns.index(f) for f in config["features"]]] * config["weights"]
+    # Clusters are ordered by the full SES composite, whatever subset was clustered on
+    opportunity = scaled @ np.array([SES_DIRECTION.get(c, 0.0) for c in columns])
+
+    metrics = ClusterMetrics(X)
+    rows = []
+    for fit in fit_chain(config["model"], X, config["ks"], False, config["seed"]):
+        labels = fit["labels"]
+        clustered = labels >= 0  # HDBSCAN noise (-1) belongs to no cluster
+        with np.errstate(divide="ignore", invalid="ignore"):
+            table = cluster_table(
+                labels[clustered], _shared["rates"][clustered], opportunity[clustered]
+            )
+            ratios = table[0] / table[-1]
+        scores = (
+            metrics.score_clustered(labels)
+            if fit["k_effective"] > 1
+            else dict.fromkeys(["Silhouette", "Davies-Bouldin", "Calinski-Harabasz"])
+        )
+        rows.append(
+            {
+                "features": "+".join(config["features"]),
+                "n_features": len(config["features"]),
+                "weighting": config["weighting"],
+                "model": config["model"],
+                "k": fit["k"],
+                "k_effective": fit["k_effective"],
+                "noise": fit["noise"],
+                "seed": config["seed"],
+                "silhouette": scores["Silhouette"],
+                "davies_bouldin": scores["Davies-Bouldin"],
+                "calinski_harabasz": scores["Calinski-Harabasz"],
+                "ari_baseline": float(adjusted_rand_score(_shared["baseline"], labels)),
+                "min_cluster_size": int(np.bincount(labels[clustered]).min()),
+                **{
+                    f"{crime}_low_high_ratio": float(ratios[i])
+                    for i, crime in enumerate(_shared["crime_types"])
+                },
+            }
+        )
+    return rows
+
+
+#### Run every configuration in parallel; one row per (configuration, K) ####
+def run_sweep(configs, scaled, columns, rates, crime_types, baseline, n_jobs=None):
+    n_jobs = default_jobs() if n_jobs is None else n_jobs
+    shared = (scaled, columns, rates, crime_types, baseline)
+    if n_jobs <= 1:
+        _init_worker(*shared)
+        chains = [run_chain(config) for config in configs]
+    else:
+        with ProcessPoolExecutor(
+            max_workers=n_jobs, initializer=_init_worker, initargs=shared
+        ) as pool:
+            chains = list(pool.map(run_chain, configs, chunksize=4))
+    return pl.DataFrame([row for chain in chains for row in chain])
@@ -0,0 +1,182 @@
+#### Preamble ####
+# Purpose: Synthetic neighbourhood data at any scale: the 01.0 simulation, portal-shaped raw crime tables and profile views, and the in-memory 03.0 -> 04.0 chain over them.
+# Author: Mike Cowan
+# Date: 19 May 2025
+# Contact: m.cowan@mail.utoronto.ca
+# License: MIT
+# Pre-requisites:
+# - `polars` and `numpy` must be installed
+# - Used by 01.0-simulate_data.py and the session fixtures in scripts/conftest.py
+# References:
+# - [https://numpy.org/doc/stable/reference/random/generator.html]
+
+#### Workspace setup ####
+import numpy as np
+import polars as pl
+
+from utils.cleaning import clean_crime, derive_profiles, merge_crime_profile
+from utils.profile_store import CANONICAL_VARIABLES
+from utils.schema import detect_years, normalize_profile_names
+
+
+# Everything is drawn from one seeded generator per call and sized by n_areas, so a test can
+# ask for Toronto's 158 neighbourhoods or 50K dissemination-area-sized rows and get the same
+# schema. Ranges follow the real data (see 01.0); crime counts are Poisson around per-1,000
+# baselines with a mild trend, so rates stay in the published range at every scale.
+CRIME_BASELINES = {
+    "assault": 8.0,
+    "autotheft": 3.0,
+    "biketheft": 1.0,
+    "breakenter": 2.0,
+    "homicide": 0.025,
+    "robbery": 4.0,
+    "shooting": 0.075,
+    "theftfrommv": 3.0,
+    "theftover": 0.5,
+}
+RAW_YEARS = range(2014, 2025)
+
+
+#### 01.0: simulated Census and crime data, one row per neighbourhood ####
+def simulate_areas(n_areas, seed=838):
+    # Create NumPy rng generator
+    # [https://numpy.org/doc/stable/reference/random/generator.html#numpy.random.Generator]
+    rng = np.random.default_rng(
+        seed
+    )  # random number generator with seed for reproducibility
+    neighbourhoods = [
+        f"neighbourhood {i}" for i in range(1, n_areas + 1)
+    ]  # generates a list of neighbourhood names (1-158)
+
+    #### Simulate Census Data ####
+    # Total families per neighbourhood using the min-max from the real dataset
+    # e.g., University = lowest, Glenfield-Jane Heights = highest in the real dataset
+    # [https://tellingstorieswithdata.com/21-python_essentials.html#python-vs-code-and-uv]
+    total_families = rng.integers(
+        low=600, high=4290, size=n_areas
+    )  # rng 158 family counts within the range
+
+    # Proportion of single-parent families (Beta distribution for proportions, bounded from ~15-55% based on the real dataset)
+    prop_single_parent = np.clip(
+        rng.beta(4, 18, size=n_areas),  # α=4, β=18 (mean ~0.18)
+        0.15,  # force lower bound at 15%
+        0.55,  # force upper bound at 55%
+    )
+
+    # Family counts
+    single_parent_families = (prop_single_parent * total_families).round().astype(int)
+    two_parent_families = total_families - single_parent_families
+
+    # Total population per neighbourhood using the min-max from the real dataset
+    total_population = rng.integers(low=6260, high=33300, size=n_areas)
+
+    #### Simulate Crime Data ####
+    # Crime counts (Poisson draws = counts) guesstimating baselines (more common crimes have higher rates)
+    # e.g., crime_count = rng.poisson(* crimes per 1000 people scaled to neighbourhood size)
+    # [https://www.slingacademy.com/article/numpy-understanding-random-generator-poisson-method-4-examples/]
+    assault = rng.poisson(8 * (total_population / 1000))
+    robbery = rng.poisson(4 * (total_population / 1000))
+    breakenter = rng.poisson(2 * (total_population / 1000))
+    homicide = rng.poisson(0.025 * (total_population / 1000))
+    shooting = rng.poisson(0.075 * (total_population / 1000))
+
+    # Convert to crime rates (standard is per 100K persons)
+    assault_rate = assault / total_population * 100000
+    robbery_rate = robbery / total_population * 100000
+    breakenter_rate = breakenter / total_population * 100000
+    homicide_rate = homicide / total_population * 100000
+    shooting_rate = shooting / total_population * 100000
+
+    # Convert all target columns to a Polars DF
+    return pl.DataFrame(
+        {
+            "neighbourhood": neighbourhoods,
+            "total_families": total_families,
+            "single_parent_families": single_parent_families,
+            "two_parent_families": two_parent_families,
+            "prop_single_parent": prop_single_parent,
+            "assault": assault,
+            "robbery": robbery,
+            "breakenter": breakenter,
+            "homicide": homicide,
+            "shooting": shooting,
+            "assault_rate": assault_rate,
+            "robbery_rate": robbery_rate,
+            "breakenter_rate": breakenter_rate,
+            "homicide_rate": homicide_rate,
+            "shooting_rate": shooting_rate,
+        }
+    )
+
+
+#### Raw names as the portal spells them ####
+# Every seventh name carries a period and a backtick apostrophe, which the crime-side
+# normalization must turn into the profile side's form.
+def area_names(n_areas):
+    return [
+        f"St. Area`s {i}" if i % 7 == 0 else f"Area {i}" for i in range(1, n_areas + 1)
+    ]
+
+
+#### Raw crime table shaped like the portal's CSV dump ####
+# _id, AREA_NAME, HOOD_ID, then <CRIME>_<year> counts and <CRIME>_RATE_<year> rates (per 100K);
+# about 1% of rates are missing, as in the real dump.
+def raw_crime(n_areas, crime_types, years=RAW_YEARS, seed=838):
+    rng = np.random.default_rng(seed)
+    years = list(years)
+    population = rng.integers(low=6260, high=33300, size=n_areas)
+    trend = 1 + 0.02 * (np.arange(len(years)) - len(years) / 2)  # (years,)
+    columns = {
+        "_id": np.arange(1, n_areas + 1),
+        "AREA_NAME": area_names(n_areas),
+        "HOOD_ID": np.arange(1, n_areas + 1),
+    }
+    for crime in crime_types:
+        expected = CRIME_BASELINES[crime] * population[:, None] / 1000 * trend
+        counts = rng.poisson(expected)  # (areas, years)
+        rates = counts / population[:, None] * 100_000
+        rates[rng.random(rates.shape) < 0.01] = np.nan
+        for j, year in enumerate(years):
+            columns[f"{crime.upper()}_{year}"] = counts[:, j]
+        for j, year in enumerate(years):
+            columns[f"{crime.upper()}_RATE_{year}"] = rates[:, j]
+    return pl.DataFrame(columns).fill_nan(None)
+
+
+#### Profile store view (read_vintage's shape: neighbourhood + canonical variables) ####
+def profile_view(n_areas, seed=838):
+    rng = np.random.default_rng(seed + 1)
+    families = rng.integers(low=600, high=4290, size=n_areas)
+    one_parent = np.round(families * np.clip(rng.beta(4, 18, n_areas), 0.06, 0.5))
+    education = rng.integers(low=3_000, high=25_000, size=n_areas)
+    names = [name.replace("`", "’") for name in area_names(n_areas)]
+    return pl.DataFrame(
+        {
+            "neighbourhood": normalize_profile_names(names),
+            "total_households": rng.integers(6_000, 33_000, n_areas).astype(float),
+            "two_parent_families": (families - one_parent).astype(float),
+            "one_parent_families": one_parent.astype(float),
+            "median_income": rng.uniform(50_000, 200_000, n_areas).round(),
+            "unemployment_rate": rng.uniform(4, 16, n_areas).round(1),
+            "total_education": education.astype(float),
+            "bachelors_or_higher": np.round(education * rng.uniform(0.2, 0.8, n_areas)),
+        }
+    ).select(["neighbourhood", *CANONICAL_VARIABLES])
+
+
+#### Raw inputs and every in-memory stage output for one synthetic city ####
+def build_city(n_areas, crime_types, seed=838):
+    raw = raw_crime(n_areas, crime_types, seed=seed)
+    years = detect_years(raw.columns, crime_types)
+    crime = clean_crime(raw, crime_types, years)
+    profiles = derive_profiles(profile_view(n_areas, seed))
+    return {
+        "n_areas": n_areas,
+        "crime_types": list(crime_types),
+        "years": years,
+        "simulated": simulate_areas(n_areas, seed),
+        "raw_crime": raw,
+        "crime": crime,
+        "profiles": profiles,
+        "merged": merge_crime_profile(crime, profiles, crime_types, years),
+    }
@@ -0,0 +1,181 @@
+#### Preamble ####
+# Purpose: Vectorized dynamic time warping (DTW), LB_Keogh pruning and k-medoids for crime trajectories.
+# Author: Mike Cowan
+# Date: 19 May 2025
+# Contact: m.cowan@mail.utoronto.ca
+# License: MIT
+# Pre-requisites:
+# - `numpy` must be installed (pip install numpy)
+# References:
+# - Keogh & Ratanamahatana (2005), Exact indexing of dynamic time warping (LB_Keogh)
+# - [https://en.wikipedia.org/wiki/Dynamic_time_warping]
+# - [https://en.wikipedia.org/wiki/K-medoids]
+# - [https://docs.python.org/3/library/concurrent.futures.html#processpoolexecutor]
+
+#### Workspace setup ####
+from concurrent.futures import ProcessPoolExecutor  # inherent to Python
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from utils.config import default_jobs
+
+
+# Trajectories are stored as a tensor X of shape (areas, crimes, periods).
+# The distance between two areas is sqrt(sum over crimes of the squared-cost DTW),
+# i.e. each crime is warped independently and the costs are added.
+
+
+#### Z-normalize each (area, crime) series so clustering compares shape, not level ####
+def znormalize(X):
+    mean = X.mean(axis=-1, keepdims=True)
+    std = X.std(axis=-1, keepdims=True)
+    return np.divide(X - mean, std, out=np.zeros_like(X), where=std > 0)
+
+
+#### Squared-cost DTW for many pairs of series at once ####
+# Q, S: (M, T). The dynamic-programming recursion runs over the T x T grid (inside a
+# Sakoe-Chiba band of half-width `window`) while every cell update is a vector op over M pairs.
+# [https://en.wikipedia.org/wiki/Dynamic_time_warping#Implementation]
+def dtw_batch(Q, S, window=None):
+    M, T = Q.shape
+    w = T if window is None else max(int(window), 0)
+    previous = np.full((M, T + 1), np.inf)
+    previous[:, 0] = 0.0
+    for i in range(1, T + 1):
+        current = np.full((M, T + 1), np.inf)
+        lo, hi = max(1, i - w), min(T, i + w)
+        cost = (Q[:, i - 1, None] - S[:, lo - 1 : hi]) ** 2  # (M, band)
+        # Diagonal and vertical moves only depend on the previous row, so take them together
+        best_previous = np.minimum(previous[:, lo : hi + 1], previous[:, lo - 1 : hi])
+        for j in range(lo, hi + 1):
+            current[:, j] = cost[:, j - lo] + np.minimum(
+                best_previous[:, j - lo], current[:, j - 1]
+            )
+        previous = current
+    return previous[:, T]
+
+
+#### DTW from one query trajectory (C, T) to many trajectories (N, C, T) ####
+def dtw_to_all(query, X, window=None):
+    N, C, T = X.shape
+    Q = np.broadcast_to(query, (N, C, T)).reshape(N * C, T)
+    return np.sqrt(dtw_batch(Q, X.reshape(N * C, T), window).reshape(N, C).sum(axis=1))
+
+
+#### LB_Keogh lower bound from one query to many trajectories ####
+# The query's upper/lower envelope over the warping window bounds any warping path,
+# so LB <= DTW and candidates with LB >= best-so-far can be skipped without running DTW.
+def lb_keogh(query, X, window=None):
+    C, T = query.shape
+    w = T if window is None else max(int(window), 0)
+    padded = np.pad(query, ((0, 0), (w, w)), mode="edge")
+    windows = sliding_window_view(padded, 2 * w + 1, axis=1)  # (C, T, 2w + 1)
+    upper, lower = windows.max(axis=-1), windows.min(axis=-1)
+    above = np.clip(X - upper, 0, None)
+    below = np.clip(lower - X, 0, None)
+    return np.sqrt((above**2 + below**2).sum(axis=(1, 2)))
+
+
+#### Worker: DTW from a block of queries to every target (runs in a child process) ####
+def _dtw_block(queries, targets, window):
+    return np.vstack([dtw_to_all(q, targets, window) for q in queries])
+
+
+#### Query x target DTW matrix, split into row blocks across processes ####
+def cross_dtw(queries, targets, window=None, n_jobs=None):
+    n_jobs = default_jobs() if n_jobs is None else n_jobs
+    if n_jobs <= 1 or len(queries) < 2 * n_jobs:
+        return _dtw_block(queries, targets, window)
+    blocks = np.array_split(np.arange(len(queries)), n_jobs)
+    with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+        results = pool.map(
+            _dtw_block,
+            [queries[b] for b in blocks],
+            [targets] * len(blocks),
+            [window] * len(blocks),
+        )
+        return np.vstack(list(results))
+
+
+#### Assign each trajectory to its nearest medoid, pruning with LB_Keogh ####
+# Start from the distance to each area's previous medoid (or the first one); for every other
+# medoid only areas whose lower bound beats their current best are sent through DTW.
+def assign_to_medoids(X, medoids, window=None, labels=None):
+    N = X.shape[0]
+    labels = np.zeros(N, dtype=int) if labels is None else labels.copy()
+    best = np.empty(N)
+    for k, m in enumerate(medoids):
+        rows = np.flatnonzero(labels == k)
+        if rows.size:
+            best[rows] = dtw_to_all(X[m], X[rows], window)
+
+    computed, skipped = 0, 0
+    for k, m in enumerate(medoids):
+        candidates = np.flatnonzero(labels != k)
+        bound = lb_keogh(X[m], X[candidates], window)
+        candidates = candidates[bound < best[candidates]]
+        skipped += (labels != k).sum() - candidates.size
+        computed += candidates.size
+        if candidates.size == 0:
+            continue
+        distance = dtw_to_all(X[m], X[candidates], window)
+        closer = distance < best[candidates]
+        best[candidates[closer]] = distance[closer]
+        labels[candidates[closer]] = k
+    return labels, best, skipped / max(computed + skipped, 1)
+
+
+#### k-medoids (alternating) with DTW distances ####
+# Initialization follows k-means++ (next medoid drawn with probability proportional to the
+# squared distance to the nearest chosen medoid). Each update picks, within a cluster, the
+# member minimizing the summed DTW to the others; large clusters only try `max_candidates`
+# sampled members, so a step costs O(candidates x members) instead of O(members^2).
+# [https://en.wikipedia.org/wiki/K-means%2B%2B]
+def kmedoids_dtw(
+    X,
+    n_clusters,
+    window=None,
+    max_iter=20,
+    max_candidates=200,
+    n_jobs=None,
+    seed=838,
+):
+    rng = np.random.default_rng(seed)
+    N = X.shape[0]
+
+    medoids = [int(rng.integers(N))]
+    nearest = dtw_to_all(X[medoids[0]], X, window)
+    for _ in range(1, n_clusters):
+        weights = nearest**2
+        probabilities = (
+            weights / weights.sum() if weights.sum() > 0 else np.full(N, 1 / N)
+        )
+        medoids.append(int(rng.choice(N, p=probabilities)))
+        nearest = np.minimum(nearest, dtw_to_all(X[medoids[-1]], X, window))
+
+    labels, pruned = None, []
+    for _ in range(max_iter):
+        labels, distances, pruned_share = assign_to_medoids(X, medoids, window, labels)
+        pruned.append(pruned_share)
+
+        new_medoids = []
+        for k in range(n_clusters):
+            members = np.flatnonzero(labels == k)
+            if members.size == 0:
+                # Re-seed an empty cluster with the worst-fitting area
+                new_medoids.append(int(np.argmax(distances)))
+                continue
+            candidates = members
+            if members.size > max_candidates:
+                candidates = rng.choice(members, max_candidates, replace=False)
+            totals = cross_dtw(X[candidates], X[members], window, n_jobs).sum(axis=1)
+            new_medoids.append(int(candidates[np.argmin(totals)]))
+
+        if new_medoids == medoids:
+            break
+        medoids = new_medoids
+
+    labels, distances, pruned_share = assign_to_medoids(X, medoids, window, labels)
+    pruned.append(pruned_share)
+    return labels, np.array(medoids), distances, float(np.mean(pruned))
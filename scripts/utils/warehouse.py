@@ -0,0 +1,118 @@
+#### Preamble ####
+# Purpose: Optional embedded DuckDB store for the raw, cleaned and merged tables, with SQL aggregations.
+# Author: Mike Cowan
+# Date: 19 May 2025
+# Contact: m.cowan@mail.utoronto.ca
+# License: MIT
+# Pre-requisites:
+# - `duckdb` is optional (uv sync --extra duckdb, or pip install duckdb); stages use Polars unless run
+#   with engine="duckdb"
+# - `polars` must be installed (pip install polars)
+# References:
+# - [https://duckdb.org/docs/api/python/overview]
+# - [https://duckdb.org/docs/guides/performance/how_to_tune_workloads] (memory_limit, temp_directory)
+# - [https://duckdb.org/docs/sql/statements/unpivot]
+
+#### Workspace setup ####
+from pathlib import Path  # inherent to Python
+
+import polars as pl
+
+try:
+    import duckdb
+except ImportError:  # optional engine; the Polars path needs nothing extra
+    duckdb = None
+
+
+# One database file for every stage (and for analysts' ad hoc queries)
+STORE_PATH = "data/02-analysis_data/crime.duckdb"
+
+
+#### Is the DuckDB engine installed? ####
+def available():
+    return duckdb is not None
+
+
+def require_duckdb():
+    if duckdb is None:
+        raise ImportError(
+            "engine='duckdb' needs the optional DuckDB extra, which is not installed: "
+            "run `uv sync --extra duckdb` (or `pip install duckdb`), or use engine='polars'"
+        )
+
+
+#### Open the store ####
+# memory_limit caps the buffer pool; anything larger spills to temp_directory, so joins and
+# aggregations over data bigger than RAM run out-of-core instead of failing.
+def connect(path=STORE_PATH, read_only=False, memory_limit="2GB"):
+    require_duckdb()
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    con = duckdb.connect(str(path), read_only=read_only)
+    con.execute(f"SET memory_limit = '{memory_limit}'")
+    if not read_only:
+        Path("data/cache/duckdb").mkdir(parents=True, exist_ok=True)
+        con.execute("SET temp_directory = 'data/cache/duckdb'")
+    return con
+
+
+#### Write a table from a CSV file (streamed by DuckDB) or a Polars DataFrame ####
+def write_table(con, name, source):
+    if isinstance(source, pl.DataFrame):
+        con.register("incoming", source)
+        con.execute(f'CREATE OR REPLACE TABLE "{name}" AS SELECT * FROM incoming')
+        con.unregister("incoming")
+    else:
+        con.execute(
+            f'CREATE OR REPLACE TABLE "{name}" AS '
+            # Dialect is given explicitly: the raw export's quoted GeoJSON strings defeat the sniffer
+            "SELECT * FROM read_csv(?, header = true, delim = ',', quote = '\"', "
+            "escape = '\"', strict_mode = false)",
+            [str(source)],
+        )
+
+
+#### Long crime-rate table (neighbourhood, crime, year, rate) from the merged table ####
+# Rows are written sorted by (crime, year) so each column chunk's min/max zonemap is tight and
+# filters on crime/year skip most of the table; the ART index serves point lookups.
+def write_crime_rates(con, source_table="merged"):
+    con.execute(
+        f"""
+        CREATE OR REPLACE TABLE crime_rates AS
+        SELECT
+            neighbourhood,
+            regexp_extract(column_name, '^(\\w+?)_rate_', 1) AS crime,
+            CAST(regexp_extract(column_name, '_(\\d{{4}})$', 1) AS INTEGER) AS year,
+            CAST(rate AS DOUBLE) AS rate
+        FROM "{source_table}"
+        UNPIVOT INCLUDE NULLS (
+            rate FOR column_name IN (COLUMNS('_rate_\\d{{4}}$'))
+        )  -- keep missing rates as NULL rows, like the Polars unpivot
+        ORDER BY crime, year, neighbourhood
+        """
+    )
+    con.execute(
+        "CREATE INDEX IF NOT EXISTS crime_rates_crime_year ON crime_rates (crime, year)"
+    )
+
+
+#### Average rate per (cluster, crime, year) ####
+# Same long layout as the Polars path in 06.0 (cluster column, avg_rate, crime, year).
+def cluster_rates(con, crime_types, years, cluster_col="opportunity_index"):
+    tables = {row[0] for row in con.execute("SHOW TABLES").fetchall()}
+    missing = {"crime_rates", "clusters"} - tables
+    if missing:
+        raise RuntimeError(
+            f"DuckDB store has no {sorted(missing)} table(s); "
+            "run 04.0 and 06.0 with engine='duckdb' first"
+        )
+    return con.execute(
+        f"""
+        SELECT c."{cluster_col}", avg(r.rate) AS avg_rate, r.crime, r.year
+        FROM crime_rates AS r
+        JOIN clusters AS c USING (neighbourhood)
+        WHERE r.crime IN (SELECT unnest(?)) AND r.year IN (SELECT unnest(?))
+        GROUP BY ALL
+        ORDER BY r.crime, r.year, c."{cluster_col}"
+        """,
+        [list(crime_types), [int(y) for y in years]],
+    ).pl()